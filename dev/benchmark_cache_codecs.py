@@ -0,0 +1,74 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compare the size and speed of the cache codecs in `warehouse.cache.codecs` on
+values shaped like the largest things we cache:
+
+* the serial of every project, as returned by `list_packages_with_serial`
+* the `top_dependents_corpus` stored in the query results cache
+* the roles of a single project, as returned by `package_roles`
+
+Run it inside the web container, where Warehouse and its dependencies are
+installed:
+
+    docker compose run --rm web python dev/benchmark_cache_codecs.py [projects]
+"""
+
+import random
+import string
+import sys
+import timeit
+
+from warehouse.cache import codecs
+
+
+def _name(rng):
+    length = rng.randint(3, 24)
+    return "".join(rng.choices(string.ascii_lowercase, k=length))
+
+
+def samples(projects):
+    rng = random.Random(0)  # noqa: S311
+    names = [f"{_name(rng)}-{i}" for i in range(projects)]
+    return {
+        "list_packages_with_serial": {
+            name: rng.randint(1, 30_000_000) for name in names
+        },
+        "top_dependents_corpus": {
+            name: rng.randint(1, 100_000) for name in names[: projects // 100]
+        },
+        "package_roles": [
+            ["Owner", _name(rng)],
+            ["Maintainer", _name(rng)],
+            ["Maintainer", _name(rng)],
+        ],
+    }
+
+
+def measure(func, arg, number):
+    return min(timeit.repeat(lambda: func(arg), number=number, repeat=5)) / number
+
+
+def main(projects):
+    print(
+        f"{'value':<28}{'codec':<14}{'bytes':>12}{'ratio':>8}"
+        f"{'encode ms':>12}{'decode ms':>12}"
+    )
+    for label, value in samples(projects).items():
+        number = max(1, 100_000 // max(1, len(value)))
+        baseline = None
+        for name in codecs.CODECS:
+            codec = codecs.get_codec(name)
+            encoded = codec.encode(value)
+            size = len(encoded.encode() if isinstance(encoded, str) else encoded)
+            baseline = baseline or size
+            encode = measure(codec.encode, value, number) * 1000
+            decode = measure(codecs.decode, encoded, number) * 1000
+            print(
+                f"{label:<28}{name:<14}{size:>12,}{size / baseline:>8.2f}"
+                f"{encode:>12.3f}{decode:>12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 700_000)
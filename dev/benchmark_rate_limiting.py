@@ -0,0 +1,100 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compare the cost of the rate limiting done on the login and upload paths when
+every limit is tested or hit on its own, the way `RateLimiter` used to, with
+evaluating all of them together using `first_exceeded` and `hit_all`:
+
+* login, a failed `check_password`: the IP and global limiters are tested, then
+  the IP, global and user limiters, then all three are hit
+* upload, `create_project`: the IP and user limiters are tested, then the IP
+  limiter is hit, and then the user limiter (which is only hit once the IP
+  limiter has allowed the request, so it can't be batched with it)
+
+Run it inside the web container, against the development Redis:
+
+    docker compose run --rm web python dev/benchmark_rate_limiting.py [requests]
+
+Every run uses its own keys, which expire along with their windows.
+"""
+
+import os
+import sys
+import time
+import uuid
+
+from limits.storage import storage_from_string
+from limits.strategies import MovingWindowRateLimiter
+
+from warehouse.metrics.services import NullMetrics
+from warehouse.rate_limiting import RateLimiter, first_exceeded, hit_all
+
+# The default limits, except for the global login limit, which is raised so
+# that it isn't exhausted part way through a run.
+LIMITS = {
+    "login": {
+        "ip": "10 per 5 minutes",
+        "global": "1000000 per 5 minutes",
+        "user": "10 per 5 minutes",
+    },
+    "upload": {"ip": "40 per hour", "user": "20 per hour"},
+}
+
+STEPS = {
+    "login": [
+        ("test", ["ip", "global"]),
+        ("test", ["ip", "global", "user"]),
+        ("hit", ["user", "global", "ip"]),
+    ],
+    "upload": [("test", ["ip", "user"]), ("hit", ["ip"]), ("hit", ["user"])],
+}
+
+
+def per_limit(window, checks, action):
+    for limiter, identifiers in checks:
+        key_identifiers = limiter._get_identifiers(identifiers)
+        for limit in limiter._limits:
+            getattr(window, action)(limit, *key_identifiers)
+
+
+def batched(window, checks, action):
+    if action == "test":
+        first_exceeded(checks)
+    else:
+        hit_all(checks)
+
+
+def run(storage, path, strategy, requests):
+    namespace = uuid.uuid4().hex
+    limiters = {
+        name: RateLimiter(
+            storage, limit, identifiers=[namespace, name], metrics=NullMetrics()
+        )
+        for name, limit in LIMITS[path].items()
+    }
+    window = MovingWindowRateLimiter(storage)
+
+    start = time.perf_counter()
+    for i in range(requests):
+        identifiers = {"ip": [f"ip-{i}"], "global": [], "user": [f"user-{i}"]}
+        for action, names in STEPS[path]:
+            checks = [(limiters[name], identifiers[name]) for name in names]
+            strategy(window, checks, action)
+    return (time.perf_counter() - start) / requests
+
+
+def main(requests):
+    storage = storage_from_string(os.environ["REDIS_URL"])
+
+    print(f"{'path':<10}{'strategy':<12}{'round trips':>14}{'ms/request':>14}")
+    for path, steps in STEPS.items():
+        for label, strategy, round_trips in [
+            ("per limit", per_limit, sum(len(names) for _, names in steps)),
+            ("batched", batched, len(steps)),
+        ]:
+            elapsed = run(storage, path, strategy, requests)
+            print(f"{path:<10}{label:<12}{round_trips:>14}{elapsed * 1000:>14.3f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
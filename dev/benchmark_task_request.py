@@ -0,0 +1,71 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Compare the cost of setting up and tearing down the request that each task runs
+with, when it is built from scratch with `pyramid.scripting.prepare` for every
+task, the way `WarehouseTask` used to, with resetting the request that each
+worker thread keeps between tasks.
+
+Only the request itself is measured: the tasks don't do anything, and neither
+touch the database, so the difference is the most that a trivial task gains.
+
+Run it inside the web container, where Warehouse is configured:
+
+    docker compose run --rm web python dev/benchmark_task_request.py [tasks]
+"""
+
+import hashlib
+import sys
+import time
+import types
+
+import pyramid.scripting
+import structlog
+import transaction
+
+from warehouse import tasks
+from warehouse.config import configure
+
+
+def per_task(registry, task):
+    env = pyramid.scripting.prepare(registry=registry)
+    request = env["request"]
+    request.remote_addr = "127.0.0.1"
+    request.remote_addr_hashed = hashlib.sha256(
+        ("127.0.0.1" + registry.settings["warehouse.ip_salt"]).encode("utf8")
+    ).hexdigest()
+    request.tm = transaction.TransactionManager(explicit=True)
+    request.timings = {"new_request_start": time.time() * 1000}
+    request.task_name = task.name
+    return env
+
+
+def reused(registry, task):
+    environment = getattr(tasks._local, "environment", None)
+    if environment is None:
+        environment = tasks._local.environment = tasks._TaskRequestEnvironment(registry)
+    return environment.begin(task)
+
+
+def run(registry, strategy, count):
+    task = types.SimpleNamespace(name="warehouse.tasks.benchmark")
+    start = time.perf_counter()
+    for _ in range(count):
+        env = strategy(registry, task)
+        # What every task does with its request, whether it uses it or not.
+        structlog.contextvars.bind_contextvars(**{"request.id": env["request"].id})
+        env["request"]._process_finished_callbacks()
+        env["closer"]()
+    return count / (time.perf_counter() - start)
+
+
+def main(count):
+    registry = configure().registry
+
+    print(f"{'strategy':<12}{'tasks/second':>14}")
+    for label, strategy in [("per task", per_task), ("reused", reused)]:
+        print(f"{label:<12}{run(registry, strategy, count):>14,.0f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
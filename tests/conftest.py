@@ -829,6 +829,18 @@ def testpypi_webtest(app_config_dbsession_from_env, tm):
     )
 
 
+class _MockRedisLock:
+    def __init__(self, redis, name):
+        self.redis = redis
+        self.name = name
+
+    def acquire(self, blocking=None):
+        return self.redis.set(self.name, "locked", nx=True) is not None
+
+    def release(self):
+        self.redis.delete(self.name)
+
+
 class _MockRedis:
     """
     Just enough Redis for our tests.
@@ -848,8 +860,9 @@ class _MockRedis:
     def __exit__(self, exc_type, exc_value, traceback):
         pass
 
-    def delete(self, key):
-        del self.cache[key]
+    def delete(self, *keys):
+        for key in keys:
+            del self.cache[key]
 
     def execute(self):
         pass
@@ -857,7 +870,7 @@ class _MockRedis:
     def exists(self, key):
         return key in self.cache
 
-    def expire(self, _key, _seconds):
+    def expire(self, _key, _seconds, **_kwargs):
         pass
 
     def from_url(self, _url):
@@ -877,12 +890,28 @@ class _MockRedis:
     def get(self, key):
         return self.cache.get(key)
 
+    def incr(self, key):
+        self.cache[key] = int(self.cache.get(key, 0)) + 1
+        return self.cache[key]
+
+    def lock(self, name, timeout=None, **_kwargs):
+        return _MockRedisLock(self, name)
+
     def pipeline(self):
         return self
 
     def register_script(self, script):
         return script  # pragma: no cover
 
+    def sadd(self, key, *values):
+        self.cache.setdefault(key, set()).update(values)
+
+    def sinter(self, keys):
+        return set.intersection(*(self.cache.get(key, set()) for key in keys))
+
+    def sismember(self, key, value):
+        return value in self.cache.get(key, set())
+
     def scan_iter(self, search, count):
         del count  # unused
         return [key for key in self.cache if re.search(search, key)]
@@ -903,6 +932,16 @@ class _MockRedis:
     def setex(self, key, value, _seconds):
         self.cache[key] = value
 
+    def smembers(self, key):
+        return set(self.cache.get(key, set()))
+
+    def srem(self, key, *values):
+        if key not in self.cache:
+            return
+        self.cache[key].difference_update(values)
+        if not self.cache[key]:  # pragma: no branch
+            del self.cache[key]
+
 
 @pytest.fixture
 def mockredis():
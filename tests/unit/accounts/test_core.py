@@ -1,5 +1,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
+from unittest import mock
+
 import pretend
 
 from celery.schedules import crontab
@@ -86,6 +88,10 @@ class TestUnauthenticatedUserid:
 
 
 def test_includeme(monkeypatch):
+    redis_obj = pretend.stub()
+    from_url = pretend.call_recorder(lambda url: redis_obj)
+    monkeypatch.setattr(accounts.redis.StrictRedis, "from_url", from_url)
+
     multi_policy_obj = pretend.stub()
     multi_policy_cls = pretend.call_recorder(lambda ps: multi_policy_obj)
     monkeypatch.setattr(accounts, "MultiSecurityPolicy", multi_policy_cls)
@@ -105,6 +111,7 @@ def test_includeme(monkeypatch):
     config = pretend.stub(
         registry=pretend.stub(
             settings={
+                "sessions.url": "redis://redis:6379/2",
                 "warehouse.account.user_login_ratelimit_string": "10 per 5 minutes",
                 "warehouse.account.ip_login_ratelimit_string": "10 per 5 minutes",
                 "warehouse.account.global_login_ratelimit_string": "1000 per 5 minutes",
@@ -116,7 +123,8 @@ def test_includeme(monkeypatch):
                 "warehouse.account.password_reset_ratelimit_string": "5 per day",
                 "warehouse.account.accounts_search_ratelimit_string": "100 per hour",
                 "github.oauth.backend": accounts.NullGitHubOAuthClient,
-            }
+            },
+            __setitem__=pretend.call_recorder(lambda key, value: None),
         ),
         register_service_factory=pretend.call_recorder(
             lambda factory, iface, name=None: None
@@ -131,6 +139,13 @@ def test_includeme(monkeypatch):
 
     accounts.includeme(config)
 
+    assert config.registry.__setitem__.calls == [
+        pretend.call("accounts.identity_cache", mock.ANY)
+    ]
+    identity_cache = config.registry.__setitem__.calls[0].args[1]
+    assert isinstance(identity_cache, accounts.IdentityCache)
+    assert identity_cache.conn is redis_obj
+    assert from_url.calls == [pretend.call("redis://redis:6379/2")]
     assert config.register_service_factory.calls == [
         pretend.call(database_login_factory, IUserService),
         pretend.call(
@@ -229,7 +244,8 @@ def test_includeme_with_gitlab_oauth():
                 "warehouse.account.accounts_search_ratelimit_string": "100 per hour",
                 "github.oauth.backend": accounts.NullGitHubOAuthClient,
                 "gitlab.oauth.backend": accounts.NullGitLabOAuthClient,
-            }
+            },
+            __setitem__=lambda key, value: None,
         ),
         register_service_factory=register_service_factory,
         register_rate_limiter=pretend.call_recorder(lambda limit_string, name: None),
@@ -0,0 +1,247 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import types
+import uuid
+
+import pretend
+import pytest
+import redis
+
+from pyramid.authorization import Allow
+from pyramid.security import Authenticated
+
+from warehouse.accounts import identity
+from warehouse.accounts.identity import IdentityCache, IdentitySnapshot
+from warehouse.accounts.models import Email, User
+from warehouse.accounts.security_policy import SessionSecurityPolicy
+from warehouse.accounts.utils import SessionUserContext
+
+from ...common.db.accounts import EmailFactory, UserFactory, WebAuthnFactory
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(identity.time, "monotonic", clock)
+    return clock
+
+
+def _snapshot(user_id, **kwargs):
+    return IdentitySnapshot(
+        **{
+            "user_id": str(user_id),
+            "is_disabled": False,
+            "disabled_reason": None,
+            "password_timestamp": 0,
+            "has_two_factor": True,
+            "has_primary_verified_email": True,
+            "principals": (Authenticated, f"user:{user_id}"),
+            **kwargs,
+        }
+    )
+
+
+class TestIdentityCache:
+    def test_miss(self, clock, mockredis):
+        assert IdentityCache(mockredis).get(uuid.uuid4(), 0) is None
+
+    def test_hit(self, clock, mockredis):
+        user_id = uuid.uuid4()
+        snapshot = _snapshot(user_id)
+        identity_cache = IdentityCache(mockredis)
+
+        identity_cache.add(snapshot, 0)
+
+        assert identity_cache.get(user_id, 0) is snapshot
+        assert identity_cache.get(str(user_id), 0) is snapshot
+
+    def test_expires(self, clock, mockredis):
+        user_id = uuid.uuid4()
+        identity_cache = IdentityCache(mockredis, expires=10)
+        identity_cache.add(_snapshot(user_id), 0)
+
+        clock.now += 10
+
+        assert identity_cache.get(user_id, 0) is None
+        assert identity_cache._entries == {}
+
+    @pytest.mark.parametrize("generation", [1, None])
+    def test_generation_mismatch(self, clock, mockredis, generation):
+        user_id = uuid.uuid4()
+        identity_cache = IdentityCache(mockredis)
+        identity_cache.add(_snapshot(user_id), 0)
+
+        assert identity_cache.get(user_id, generation) is None
+        assert identity_cache._entries == {}
+
+    def test_drops_least_recently_used(self, clock, mockredis):
+        first, second, third = (_snapshot(uuid.uuid4()) for _ in range(3))
+        identity_cache = IdentityCache(mockredis, max_entries=2)
+
+        identity_cache.add(first, 0)
+        identity_cache.add(second, 0)
+        assert identity_cache.get(first.user_id, 0) is first
+        identity_cache.add(third, 0)
+
+        assert identity_cache.get(first.user_id, 0) is first
+        assert identity_cache.get(second.user_id, 0) is None
+        assert identity_cache.get(third.user_id, 0) is third
+
+    def test_generation(self, mockredis):
+        user_id = uuid.uuid4()
+        identity_cache = IdentityCache(mockredis)
+
+        assert identity_cache.generation(user_id) == 0
+        identity_cache.invalidate({str(user_id)})
+        assert identity_cache.generation(user_id) == 1
+        assert mockredis.get(f"warehouse/identity/generation/{user_id}") == 1
+
+    def test_generation_unavailable(self, mocker):
+        identity_cache = IdentityCache(mocker.Mock())
+        identity_cache.conn.get.side_effect = redis.exceptions.ConnectionError
+
+        assert identity_cache.generation(uuid.uuid4()) is None
+
+    def test_invalidate(self, clock, mockredis):
+        kept, dropped, unknown = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        identity_cache = IdentityCache(mockredis)
+        identity_cache.add(_snapshot(kept), 0)
+        identity_cache.add(_snapshot(dropped), 0)
+
+        identity_cache.invalidate({dropped, unknown})
+
+        assert identity_cache.get(kept, 0) is not None
+        assert identity_cache.get(dropped, 0) is None
+        assert identity_cache.generation(kept) == 0
+        assert identity_cache.generation(dropped) == 1
+        assert identity_cache.generation(unknown) == 1
+
+    def test_invalidated_on_another_worker(self, clock, mockredis):
+        user_id = uuid.uuid4()
+        worker, other_worker = IdentityCache(mockredis), IdentityCache(mockredis)
+        worker.add(_snapshot(user_id), worker.generation(user_id))
+
+        other_worker.invalidate({str(user_id)})
+
+        assert worker.get(user_id, worker.generation(user_id)) is None
+
+
+class TestSessionUserContext:
+    def test_from_snapshot(self):
+        snapshot = _snapshot(uuid.uuid4(), has_two_factor=False)
+        get_user = pretend.call_recorder(lambda user_id: None)
+        context = SessionUserContext(snapshot, get_user)
+
+        assert context.macaroon is None
+        assert context.__principals__() == list(snapshot.principals)
+        assert not context.has_two_factor
+        assert context.has_primary_verified_email
+        assert get_user.calls == []
+
+    def test_loads_user_once(self):
+        user = pretend.stub()
+        snapshot = _snapshot(uuid.uuid4())
+        get_user = pretend.call_recorder(lambda user_id: user)
+        context = SessionUserContext(snapshot, get_user)
+
+        assert context.user is user
+        assert context.user is user
+        assert get_user.calls == [pretend.call(snapshot.user_id)]
+
+    def test_set_user(self):
+        user = pretend.stub()
+        get_user = pretend.call_recorder(lambda user_id: None)
+        context = SessionUserContext(_snapshot(uuid.uuid4()), get_user)
+
+        context.user = user
+
+        assert context.user is user
+        assert get_user.calls == []
+
+    def test_permits_without_user(self):
+        user_id = uuid.uuid4()
+        request = pretend.stub(
+            identity=SessionUserContext(
+                _snapshot(user_id),
+                pretend.raiser(AssertionError("the user should not be loaded")),
+            ),
+            matched_route=pretend.stub(name="manage.projects"),
+        )
+        context = pretend.stub(__acl__=[(Allow, f"user:{user_id}", "myperm")])
+
+        assert SessionSecurityPolicy().permits(request, context, "myperm")
+
+
+class TestInvalidation:
+    def test_store_identity_changes(self, db_session, mocker):
+        dirty_user = UserFactory.create()
+        deleted_user = UserFactory.create()
+        email = EmailFactory.create()
+        webauthn = WebAuthnFactory.create()
+        session = types.SimpleNamespace(
+            info={},
+            new={webauthn, User(username="pending"), object()},
+            dirty={dirty_user, email},
+            deleted={deleted_user, Email(email="pending@example.com")},
+        )
+
+        identity.store_identity_changes(
+            mocker.sentinel.config, session, mocker.sentinel.flush_context
+        )
+
+        assert session.info == {
+            "warehouse.accounts.identity.changed": {
+                str(dirty_user.id),
+                str(deleted_user.id),
+                str(email.user_id),
+                str(webauthn.user_id),
+            }
+        }
+
+    @pytest.mark.parametrize("changed", [{"1"}, set()])
+    def test_invalidate_identities(self, mocker, changed):
+        identity_cache = mocker.Mock(spec=IdentityCache)
+        config = types.SimpleNamespace(
+            registry={"accounts.identity_cache": identity_cache}
+        )
+        session = types.SimpleNamespace(
+            info={"warehouse.accounts.identity.changed": changed}
+        )
+
+        identity.invalidate_identities(config, session)
+
+        assert identity_cache.invalidate.called is bool(changed)
+        assert session.info == {}
+
+    def test_invalidate_identities_redis_unavailable(self, mocker):
+        identity_cache = mocker.Mock(spec=IdentityCache)
+        identity_cache.invalidate.side_effect = redis.exceptions.ConnectionError
+        config = types.SimpleNamespace(
+            registry={"accounts.identity_cache": identity_cache}
+        )
+        session = types.SimpleNamespace(
+            info={"warehouse.accounts.identity.changed": {"1"}}
+        )
+
+        identity.invalidate_identities(config, session)
+
+        identity_cache.invalidate.assert_called_once_with({"1"})
+        assert session.info == {}
+
+    def test_invalidate_identities_not_configured(self):
+        config = types.SimpleNamespace(registry={})
+        session = types.SimpleNamespace(
+            info={"warehouse.accounts.identity.changed": {"1"}}
+        )
+
+        identity.invalidate_identities(config, session)
+
+        assert session.info == {}
@@ -11,6 +11,7 @@ from zope.interface.verify import verifyClass
 from warehouse.accounts import UserContext, security_policy
 from warehouse.accounts.interfaces import IUserService
 from warehouse.accounts.models import DisableReason
+from warehouse.accounts.utils import SessionUserContext
 from warehouse.predicates import AuthMethodsPredicate
 from warehouse.utils.security_policy import AuthenticationMethod
 
@@ -336,7 +337,9 @@ class TestSessionSecurityPolicy:
         add_vary_cb = pretend.call_recorder(lambda *v: vary_cb)
         monkeypatch.setattr(security_policy, "add_vary_callback", add_vary_cb)
 
-        user_service = pretend.stub(get_user=pretend.call_recorder(lambda uid: None))
+        user_service = pretend.stub(
+            get_identity=pretend.call_recorder(lambda uid: None)
+        )
         request = pretend.stub(
             add_response_callback=pretend.call_recorder(lambda cb: None),
             matched_route=pretend.stub(name="a.permitted.route", predicates=[]),
@@ -350,7 +353,7 @@ class TestSessionSecurityPolicy:
         assert session_helper_obj.authenticated_userid.calls == [pretend.call(request)]
         assert session_helper_cls.calls == [pretend.call()]
         assert request.find_service.calls == [pretend.call(IUserService, context=None)]
-        assert user_service.get_user.calls == [pretend.call(userid)]
+        assert user_service.get_identity.calls == [pretend.call(userid)]
 
         assert add_vary_cb.calls == [pretend.call("Cookie")]
         assert request.add_response_callback.calls == [pretend.call(vary_cb)]
@@ -373,10 +376,12 @@ class TestSessionSecurityPolicy:
 
         user = pretend.stub()
         timestamp = pretend.stub()
+        identity = pretend.stub(
+            user_id=userid, is_disabled=False, password_timestamp=timestamp
+        )
         user_service = pretend.stub(
+            get_identity=pretend.call_recorder(lambda uid: identity),
             get_user=pretend.call_recorder(lambda uid: user),
-            get_password_timestamp=pretend.call_recorder(lambda uid: timestamp),
-            is_disabled=lambda uid: (False, None),
         )
         request = pretend.stub(
             add_response_callback=pretend.call_recorder(lambda cb: None),
@@ -396,9 +401,9 @@ class TestSessionSecurityPolicy:
         assert session_helper_obj.authenticated_userid.calls == [pretend.call(request)]
         assert session_helper_cls.calls == [pretend.call()]
         assert request.find_service.calls == [pretend.call(IUserService, context=None)]
-        assert user_service.get_user.calls == [pretend.call(userid)]
+        assert user_service.get_identity.calls == [pretend.call(userid)]
+        assert user_service.get_user.calls == []
         assert request.session.password_outdated.calls == [pretend.call(timestamp)]
-        assert user_service.get_password_timestamp.calls == [pretend.call(userid)]
         assert request.session.invalidate.calls == [pretend.call()]
         assert request.session.flash.calls == [
             pretend.call("Session invalidated by password change", queue="error")
@@ -423,14 +428,11 @@ class TestSessionSecurityPolicy:
         add_vary_cb = pretend.call_recorder(lambda *v: vary_cb)
         monkeypatch.setattr(security_policy, "add_vary_callback", add_vary_cb)
 
-        user = pretend.stub()
-        timestamp = pretend.stub()
+        identity = pretend.stub(
+            is_disabled=True, disabled_reason=DisableReason.AccountFrozen
+        )
         user_service = pretend.stub(
-            get_user=pretend.call_recorder(lambda uid: user),
-            get_password_timestamp=pretend.call_recorder(lambda uid: timestamp),
-            is_disabled=pretend.call_recorder(
-                lambda uid: (True, DisableReason.AccountFrozen)
-            ),
+            get_identity=pretend.call_recorder(lambda uid: identity)
         )
         request = pretend.stub(
             add_response_callback=pretend.call_recorder(lambda cb: None),
@@ -450,10 +452,8 @@ class TestSessionSecurityPolicy:
         assert session_helper_obj.authenticated_userid.calls == [pretend.call(request)]
         assert session_helper_cls.calls == [pretend.call()]
         assert request.find_service.calls == [pretend.call(IUserService, context=None)]
-        assert user_service.get_user.calls == [pretend.call(userid)]
+        assert user_service.get_identity.calls == [pretend.call(userid)]
         assert request.session.password_outdated.calls == []
-        assert user_service.get_password_timestamp.calls == []
-        assert user_service.is_disabled.calls == [pretend.call(userid)]
         assert request.session.invalidate.calls == [pretend.call()]
         assert request.session.flash.calls == [
             pretend.call(
@@ -482,14 +482,11 @@ class TestSessionSecurityPolicy:
         add_vary_cb = pretend.call_recorder(lambda *v: vary_cb)
         monkeypatch.setattr(security_policy, "add_vary_callback", add_vary_cb)
 
-        user = pretend.stub()
-        timestamp = pretend.stub()
+        identity = pretend.stub(
+            is_disabled=True, disabled_reason=DisableReason.CompromisedPassword
+        )
         user_service = pretend.stub(
-            get_user=pretend.call_recorder(lambda uid: user),
-            get_password_timestamp=pretend.call_recorder(lambda uid: timestamp),
-            is_disabled=pretend.call_recorder(
-                lambda uid: (True, DisableReason.CompromisedPassword)
-            ),
+            get_identity=pretend.call_recorder(lambda uid: identity)
         )
         request = pretend.stub(
             add_response_callback=pretend.call_recorder(lambda cb: None),
@@ -509,10 +506,8 @@ class TestSessionSecurityPolicy:
         assert session_helper_obj.authenticated_userid.calls == [pretend.call(request)]
         assert session_helper_cls.calls == [pretend.call()]
         assert request.find_service.calls == [pretend.call(IUserService, context=None)]
-        assert user_service.get_user.calls == [pretend.call(userid)]
+        assert user_service.get_identity.calls == [pretend.call(userid)]
         assert request.session.password_outdated.calls == []
-        assert user_service.get_password_timestamp.calls == []
-        assert user_service.is_disabled.calls == [pretend.call(userid)]
         assert request.session.invalidate.calls == [pretend.call()]
         assert request.session.flash.calls == [
             pretend.call("Session invalidated", queue="error")
@@ -539,10 +534,12 @@ class TestSessionSecurityPolicy:
 
         user = pretend.stub()
         timestamp = pretend.stub()
+        identity = pretend.stub(
+            user_id=userid, is_disabled=False, password_timestamp=timestamp
+        )
         user_service = pretend.stub(
+            get_identity=pretend.call_recorder(lambda uid: identity),
             get_user=pretend.call_recorder(lambda uid: user),
-            get_password_timestamp=pretend.call_recorder(lambda uid: timestamp),
-            is_disabled=lambda uid: (False, None),
         )
         request = pretend.stub(
             add_response_callback=pretend.call_recorder(lambda cb: None),
@@ -555,13 +552,21 @@ class TestSessionSecurityPolicy:
             remote_addr=REMOTE_ADDR,
         )
 
-        assert policy.identity(request).user is user
+        context = policy.identity(request)
+        assert isinstance(context, SessionUserContext)
+        assert context.snapshot is identity
+        assert context.macaroon is None
         assert request.authentication_method == AuthenticationMethod.SESSION
         assert session_helper_obj.authenticated_userid.calls == [pretend.call(request)]
         assert session_helper_cls.calls == [pretend.call()]
         assert request.find_service.calls == [pretend.call(IUserService, context=None)]
         assert request.session.password_outdated.calls == [pretend.call(timestamp)]
-        assert user_service.get_password_timestamp.calls == [pretend.call(userid)]
+        assert user_service.get_identity.calls == [pretend.call(userid)]
+
+        # The user is only loaded when something asks for it.
+        assert user_service.get_user.calls == []
+        assert context.user is user
+        assert context.user is user
         assert user_service.get_user.calls == [pretend.call(userid)]
 
         assert add_vary_cb.calls == [pretend.call("Cookie")]
@@ -583,11 +588,8 @@ class TestSessionSecurityPolicy:
         add_vary_cb = pretend.call_recorder(lambda *v: vary_cb)
         monkeypatch.setattr(security_policy, "add_vary_callback", add_vary_cb)
 
-        user = pretend.stub()
-        timestamp = pretend.stub()
         user_service = pretend.stub(
-            get_user=pretend.call_recorder(lambda uid: user),
-            get_password_timestamp=pretend.call_recorder(lambda uid: timestamp),
+            get_identity=pretend.call_recorder(lambda uid: pretend.stub())
         )
         request = pretend.stub(
             add_response_callback=pretend.call_recorder(lambda cb: None),
@@ -606,8 +608,7 @@ class TestSessionSecurityPolicy:
         assert session_helper_cls.calls == [pretend.call()]
         assert request.find_service.calls == []
         assert request.session.password_outdated.calls == []
-        assert user_service.get_password_timestamp.calls == []
-        assert user_service.get_user.calls == []
+        assert user_service.get_identity.calls == []
 
         assert add_vary_cb.calls == [pretend.call("Cookie")]
         assert request.add_response_callback.calls == [pretend.call(vary_cb)]
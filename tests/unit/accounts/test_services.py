@@ -7,6 +7,7 @@ import freezegun
 import passlib.exc
 import pretend
 import pytest
+import redis
 import requests
 
 from webauthn.helpers import bytes_to_base64url
@@ -15,6 +16,7 @@ from webauthn.registration.verify_registration_response import VerifiedRegistrat
 from zope.interface.verify import verifyClass
 
 from warehouse.accounts import services
+from warehouse.accounts.identity import IdentityCache, IdentitySnapshot
 from warehouse.accounts.interfaces import (
     BurnedRecoveryCode,
     IDomainStatusService,
@@ -512,6 +514,105 @@ class TestDatabaseUserService:
 
         assert user_service.get_admin_user() == admin
 
+    def test_get_identity(self, user_service):
+        user = UserFactory.create(is_superuser=True)
+        EmailFactory.create(user=user, primary=True, verified=True)
+
+        assert user_service.get_identity(user.id) == IdentitySnapshot(
+            user_id=str(user.id),
+            is_disabled=False,
+            disabled_reason=None,
+            password_timestamp=user_service.get_password_timestamp(user.id),
+            has_two_factor=False,
+            has_primary_verified_email=True,
+            principals=tuple(user.__principals__()),
+        )
+
+    def test_get_identity_frozen(self, user_service):
+        user = UserFactory.create(is_frozen=True)
+
+        identity = user_service.get_identity(user.id)
+
+        assert identity.is_disabled
+        assert identity.disabled_reason == DisableReason.AccountFrozen
+        assert not identity.has_primary_verified_email
+
+    def test_get_identity_no_user(self, user_service):
+        assert user_service.get_identity(uuid.uuid4()) is None
+
+    def test_get_identity_cached(self, db_session, metrics, mockredis):
+        identity_cache = IdentityCache(mockredis)
+        user = UserFactory.create()
+
+        user_service = services.DatabaseUserService(
+            db_session,
+            metrics=metrics,
+            remote_addr=REMOTE_ADDR,
+            identity_cache=identity_cache,
+        )
+        identity = user_service.get_identity(user.id)
+        assert identity_cache.get(user.id, 0) is identity
+
+        # Another request gets the same snapshot without loading the user.
+        user_service = services.DatabaseUserService(
+            db_session,
+            metrics=metrics,
+            remote_addr=REMOTE_ADDR,
+            identity_cache=identity_cache,
+        )
+        assert user_service.get_identity(user.id) is identity
+        assert user_service.cached_get_user.cache_info().currsize == 0
+
+    def test_get_identity_changed_elsewhere(self, db_session, metrics, mockredis):
+        user = UserFactory.create()
+        worker, other_worker = IdentityCache(mockredis), IdentityCache(mockredis)
+        identity = services.DatabaseUserService(
+            db_session,
+            metrics=metrics,
+            remote_addr=REMOTE_ADDR,
+            identity_cache=worker,
+        ).get_identity(user.id)
+
+        user.is_frozen = True
+        other_worker.invalidate({str(user.id)})
+
+        user_service = services.DatabaseUserService(
+            db_session,
+            metrics=metrics,
+            remote_addr=REMOTE_ADDR,
+            identity_cache=worker,
+        )
+        assert not identity.is_disabled
+        assert user_service.get_identity(user.id).is_disabled
+        assert worker.get(user.id, 1).is_disabled
+
+    def test_get_identity_generation_unavailable(self, db_session, metrics, mocker):
+        identity_cache = IdentityCache(mocker.Mock())
+        identity_cache.conn.get.side_effect = redis.exceptions.ConnectionError
+        user = UserFactory.create()
+        user_service = services.DatabaseUserService(
+            db_session,
+            metrics=metrics,
+            remote_addr=REMOTE_ADDR,
+            identity_cache=identity_cache,
+        )
+
+        assert user_service.get_identity(user.id).user_id == str(user.id)
+        assert identity_cache._entries == {}
+
+    def test_get_identity_cached_no_user(self, db_session, metrics, mockredis):
+        identity_cache = IdentityCache(mockredis)
+        user_service = services.DatabaseUserService(
+            db_session,
+            metrics=metrics,
+            remote_addr=REMOTE_ADDR,
+            identity_cache=identity_cache,
+        )
+        user_id = uuid.uuid4()
+
+        assert user_service.get_identity(user_id) is None
+        assert identity_cache.get(user_id, 0) is None
+
     @pytest.mark.parametrize(
         ("reason", "expected"),
         [
@@ -567,6 +668,16 @@ class TestDatabaseUserService:
         user = UserFactory.create(is_frozen=True)
         assert user_service.is_disabled(user.id) == (True, DisableReason.AccountFrozen)
 
+    def test_is_user_disabled(self, user_service, mocker):
+        user = UserFactory.create(is_frozen=True)
+        get_user = mocker.spy(user_service, "get_user")
+
+        assert user_service.is_user_disabled(user) == (
+            True,
+            DisableReason.AccountFrozen,
+        )
+        get_user.assert_not_called()
+
     def test_updating_password_undisables(self, user_service):
         request = pretend.stub(
             remote_addr="127.0.0.1",
@@ -1717,9 +1828,13 @@ def test_database_login_factory(monkeypatch, pyramid_services, metrics):
             }
         ).get(name)
 
+    identity_cache = pretend.stub()
     context = pretend.stub()
     request = pretend.stub(
-        db=pretend.stub(), find_service=find_service, remote_addr=REMOTE_ADDR
+        db=pretend.stub(),
+        find_service=find_service,
+        registry={"accounts.identity_cache": identity_cache},
+        remote_addr=REMOTE_ADDR,
     )
 
     assert services.database_login_factory(context, request) is service_obj
@@ -1728,6 +1843,7 @@ def test_database_login_factory(monkeypatch, pyramid_services, metrics):
             request.db,
             metrics=metrics,
             remote_addr=REMOTE_ADDR,
+            identity_cache=identity_cache,
             ratelimiters={
                 "global.login": global_login_ratelimiter,
                 "user.login": user_login_ratelimiter,
@@ -1,14 +1,46 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import ipaddress
+import types
+
 import pretend
+import pytest
 
+from pyramid.registry import Registry
 from sqlalchemy import sql
 
-from warehouse.ip_addresses.models import BanReason
+from warehouse.admin import bans
+from warehouse.admin.bans import BannedIPs, Bans
+from warehouse.ip_addresses.models import BanReason, IpAddress
+from warehouse.utils import refresh
 
 from ...common.db.ip_addresses import IpAddressFactory
 
 
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(refresh.time, "monotonic", clock)
+    return clock
+
+
+def _ban(ip_address):
+    return IpAddressFactory(
+        ip_address=ip_address,
+        is_banned=True,
+        ban_reason=BanReason.AUTHENTICATION_ATTEMPTS,
+        ban_date=sql.func.now(),
+    )
+
+
 class TestAdminFlag:
     def test_no_ip_not_banned(self, db_request):
         assert not db_request.banned.by_ip("4.3.2.1")
@@ -34,3 +66,173 @@ class TestAdminFlag:
         assert user_service._check_ratelimits.calls == [
             pretend.call(userid=None, tags=["banned:by_ip"])
         ]
+
+    @pytest.mark.parametrize(
+        ("ip_address", "banned"), [("4.3.2.1", True), ("4.3.2.2", False)]
+    )
+    def test_by_ip_cached(self, db_request, clock, ip_address, banned):
+        user_service = pretend.stub(
+            _hit_ratelimits=lambda userid=None: None,
+            _check_ratelimits=lambda userid=None, tags=None: None,
+        )
+        db_request.find_service = lambda service_name, context=None: user_service
+        db_request.registry["admin.banned_ips"] = BannedIPs()
+        _ban("4.3.2.1")
+
+        assert Bans(db_request).by_ip(ip_address) is banned
+
+
+class TestBannedIPs:
+    def test_is_banned_before_refresh(self):
+        with pytest.raises(RuntimeError):
+            BannedIPs().is_banned("4.3.2.1")
+
+    def test_loads_banned_addresses(self, db_session, clock):
+        _ban("4.3.2.1")
+        _ban("2001:db8::1")
+        IpAddressFactory(ip_address="4.3.2.2")
+
+        banned_ips = BannedIPs()
+        banned_ips.refresh(db_session)
+
+        assert banned_ips.is_banned("4.3.2.1")
+        assert banned_ips.is_banned("2001:db8::1")
+        assert not banned_ips.is_banned("4.3.2.2")
+        assert not banned_ips.is_banned("not an address")
+
+    def test_networks(self, clock):
+        db = pretend.stub(
+            scalars=lambda query: [
+                ipaddress.ip_address("4.3.2.1"),
+                ipaddress.ip_interface("10.1.0.0/16"),
+                ipaddress.ip_interface("2001:db8::/32"),
+            ]
+        )
+
+        banned_ips = BannedIPs()
+        banned_ips.refresh(db)
+
+        assert banned_ips._state.addresses == {ipaddress.ip_address("4.3.2.1")}
+        assert banned_ips.is_banned("10.1.2.3")
+        assert banned_ips.is_banned("2001:db8:1::1")
+        assert not banned_ips.is_banned("10.2.0.1")
+        assert not banned_ips.is_banned("2001:db9::1")
+
+    def test_refresh_is_rate_limited(self, db_session, clock):
+        banned_ips = BannedIPs()
+        banned_ips.refresh(db_session)
+
+        _ban("4.3.2.1")
+        clock.now += bans.REFRESH_INTERVAL - 1
+        banned_ips.refresh(db_session)
+
+        assert not banned_ips.is_banned("4.3.2.1")
+
+        clock.now += 1
+        banned_ips.refresh(db_session)
+
+        assert banned_ips.is_banned("4.3.2.1")
+
+    def test_invalidate(self, db_session, clock):
+        banned_ips = BannedIPs()
+        banned_ips.refresh(db_session)
+
+        _ban("4.3.2.1")
+        banned_ips.invalidate()
+        banned_ips.refresh(db_session)
+
+        assert banned_ips.is_banned("4.3.2.1")
+
+    def test_refresh_skipped_while_locked(self, db_session, clock):
+        banned_ips = BannedIPs()
+        banned_ips.refresh(db_session)
+
+        _ban("4.3.2.1")
+        clock.now += bans.REFRESH_INTERVAL
+
+        # Another thread is already refreshing, so we use what we have.
+        with banned_ips._lock:
+            banned_ips.refresh(db_session)
+
+        assert not banned_ips.is_banned("4.3.2.1")
+
+    def test_refresh_rechecks_after_lock(self, db_session, clock, mocker):
+        banned_ips = BannedIPs()
+        load = mocker.patch.object(banned_ips, "_load")
+        banned_ips._is_fresh = mocker.Mock(side_effect=[False, True])
+
+        banned_ips.refresh(db_session)
+
+        load.assert_not_called()
+
+
+class TestInvalidation:
+    @pytest.mark.parametrize(
+        ("new", "dirty", "deleted"),
+        [
+            (True, False, False),
+            (False, True, False),
+            (False, False, True),
+        ],
+    )
+    def test_store_ban_changes(self, db_session, mocker, new, dirty, deleted):
+        existing = _ban("4.3.2.1")
+        existing.is_banned = False
+        added = IpAddress(ip_address="4.3.2.2", is_banned=True)
+        session = types.SimpleNamespace(
+            info={},
+            new={added} if new else set(),
+            dirty={existing} if dirty else set(),
+            deleted={_ban("4.3.2.3")} if deleted else set(),
+        )
+
+        bans.store_ban_changes(
+            mocker.sentinel.config, session, mocker.sentinel.flush_context
+        )
+
+        assert session.info == {"warehouse.admin.bans.changed": True}
+
+    def test_store_ban_changes_none(self, db_session, mocker):
+        unchanged = IpAddressFactory()
+        unchanged.geoip_info = {"city": "Nowhere"}
+        session = types.SimpleNamespace(
+            info={},
+            new={IpAddress(ip_address="4.3.2.3"), object()},
+            dirty={unchanged},
+            deleted={IpAddressFactory(ip_address="4.3.2.4", is_banned=False)},
+        )
+
+        bans.store_ban_changes(
+            mocker.sentinel.config, session, mocker.sentinel.flush_context
+        )
+
+        assert session.info == {}
+
+    @pytest.mark.parametrize("changed", [True, False])
+    def test_invalidate_banned_ips(self, mocker, changed):
+        banned_ips = mocker.Mock(spec=BannedIPs)
+        config = types.SimpleNamespace(registry={"admin.banned_ips": banned_ips})
+        info = {"warehouse.admin.bans.changed": True} if changed else {}
+        session = types.SimpleNamespace(info=info)
+
+        bans.invalidate_banned_ips(config, session)
+
+        assert banned_ips.invalidate.called is changed
+        assert session.info == {}
+
+    def test_invalidate_banned_ips_not_configured(self):
+        config = types.SimpleNamespace(registry={})
+        session = types.SimpleNamespace(info={"warehouse.admin.bans.changed": True})
+
+        bans.invalidate_banned_ips(config, session)
+
+        assert session.info == {}
+
+
+def test_includeme(mocker):
+    config = mocker.Mock(registry=Registry())
+
+    bans.includeme(config)
+
+    assert isinstance(config.registry["admin.banned_ips"], BannedIPs)
+    config.add_request_method.assert_called_once_with(Bans, name="banned", reify=True)
@@ -12,6 +12,7 @@ def test_includeme(mocker):
 
     assert config.add_route.call_args_list == [
         mocker.call("admin.dashboard", "/admin/", domain=warehouse),
+        mocker.call("admin.db_pool", "/admin/db-pool/", domain=warehouse),
         mocker.call(
             "admin.organization.list", "/admin/organizations/", domain=warehouse
         ),
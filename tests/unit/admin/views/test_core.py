@@ -1,5 +1,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+
 import pretend
 
 from warehouse.admin.views import core as views
@@ -84,3 +86,20 @@ class TestDashboard:
         assert db_request.has_permission.calls == [
             pretend.call(views.Permissions.AdminObservationsRead),
         ]
+
+
+class TestDbPool:
+    def test_db_pool(self, pyramid_request, mocker):
+        stats = mocker.Mock(spec=["as_dict"])
+        stats.as_dict.return_value = {"checked_out": 3}
+        pyramid_request.registry = {"sqlalchemy.pool_stats": {"primary": stats}}
+
+        assert views.db_pool(pyramid_request) == {
+            "pid": os.getpid(),
+            "pools": {"primary": {"checked_out": 3}},
+        }
+
+    def test_db_pool_not_configured(self, pyramid_request):
+        pyramid_request.registry = {}
+
+        assert views.db_pool(pyramid_request) == {"pid": os.getpid(), "pools": {}}
@@ -0,0 +1,211 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import pretend
+import pytest
+import requests
+
+from warehouse.cache.origin import debounce
+from warehouse.cache.origin.debounce import CHANGED_KEY, PENDING_KEY, PurgeDebouncer
+from warehouse.cache.origin.interfaces import IOriginCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.sorted_sets = {}
+
+    def zadd(self, name, mapping, nx=False):
+        members = self.sorted_sets.setdefault(name, {})
+        for member, score in mapping.items():
+            if not (nx and member in members):
+                members[member] = score
+
+    def zrangebyscore(self, name, min, max):
+        members = self.sorted_sets.get(name, {})
+        return [
+            member.encode("utf-8")
+            for member, score in sorted(members.items(), key=lambda m: m[1])
+            if score <= max
+        ]
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        assert script == debounce._REMOVE_PURGED_SCRIPT
+
+        def remove_purged(keys, args):
+            pending, changed = (self.sorted_sets.get(key, {}) for key in keys)
+            read_at, *members = args
+            for member in members:
+                if changed.get(member, read_at) <= read_at:
+                    pending.pop(member, None)
+                    changed.pop(member, None)
+
+        return remove_purged
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+
+        return queue
+
+    def execute(self):
+        return [
+            getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(debounce.time, "time", clock)
+    return clock
+
+
+class TestPurgeDebouncer:
+    def test_collapses_keys_within_window(self, clock):
+        debouncer = PurgeDebouncer(FakeRedis(), window=30)
+
+        debouncer.add({"project/foo", "all-projects"})
+        clock.now += 10
+        debouncer.add({"project/foo", "project/bar"})
+
+        assert debouncer.due() == (set(), clock.now)
+
+        clock.now += 20
+        keys, read_at = debouncer.due()
+
+        assert keys == {"project/foo", "all-projects"}
+        debouncer.purged(keys, read_at)
+        assert debouncer.due() == (set(), clock.now)
+
+        clock.now += 10
+
+        assert debouncer.due() == ({"project/bar"}, clock.now)
+
+    def test_key_that_keeps_changing_is_purged(self, clock):
+        debouncer = PurgeDebouncer(FakeRedis(), window=30)
+
+        for _ in range(3):
+            debouncer.add({"project/foo"})
+            clock.now += 10
+
+        assert debouncer.due() == ({"project/foo"}, clock.now)
+
+    def test_keys_stay_until_purged(self, clock):
+        debouncer = PurgeDebouncer(FakeRedis(), window=30)
+        debouncer.add({"project/foo"})
+        clock.now += 30
+
+        assert debouncer.due() == ({"project/foo"}, clock.now)
+        assert debouncer.due() == ({"project/foo"}, clock.now)
+
+    def test_change_during_purge_is_purged_again(self, clock):
+        redis = FakeRedis()
+        debouncer = PurgeDebouncer(redis, window=30)
+        debouncer.add({"project/foo", "project/bar"})
+        clock.now += 30
+        keys, read_at = debouncer.due()
+
+        clock.now += 1
+        debouncer.add({"project/foo"})
+        debouncer.purged(keys, read_at)
+
+        assert redis.sorted_sets[PENDING_KEY] == {"project/foo": 1000.0}
+        assert redis.sorted_sets[CHANGED_KEY] == {"project/foo": 1031.0}
+        assert debouncer.due() == ({"project/foo"}, clock.now)
+
+    def test_change_after_purge_is_purged_again(self, clock):
+        debouncer = PurgeDebouncer(FakeRedis(), window=30)
+        debouncer.add({"project/foo"})
+        clock.now += 30
+        debouncer.purged(*debouncer.due())
+
+        debouncer.add({"project/foo"})
+
+        assert debouncer.due() == (set(), clock.now)
+        clock.now += 30
+        assert debouncer.due() == ({"project/foo"}, clock.now)
+
+    def test_purged_nothing(self):
+        redis = FakeRedis()
+        debouncer = PurgeDebouncer(redis, window=30)
+
+        debouncer.purged(set(), 1000.0)
+
+        assert redis.sorted_sets == {}
+
+
+class TestFlushPurges:
+    def test_not_configured(self, pyramid_request, metrics):
+        pyramid_request.registry = {}
+
+        debounce.flush_purges(pyramid_request)
+
+        metrics.histogram.assert_not_called()
+
+    def test_nothing_due(self, pyramid_request, metrics, mocker):
+        debouncer = mocker.Mock(spec=PurgeDebouncer)
+        debouncer.due.return_value = (set(), 1000.0)
+        pyramid_request.registry = {"origin_cache.debouncer": debouncer}
+
+        debounce.flush_purges(pyramid_request)
+
+        metrics.histogram.assert_not_called()
+        debouncer.purged.assert_not_called()
+
+    def test_purges_due_keys(self, pyramid_request, pyramid_services, metrics, mocker):
+        cacher = mocker.Mock(spec=["purge", "purge_keys"])
+        pyramid_services.register_service(cacher, IOriginCache, None)
+        debouncer = mocker.Mock(spec=PurgeDebouncer)
+        debouncer.due.return_value = ({"project/foo", "all-projects"}, 1000.0)
+        pyramid_request.registry = {"origin_cache.debouncer": debouncer}
+
+        debounce.flush_purges(pyramid_request)
+
+        cacher.purge_keys.assert_called_once_with(
+            {"project/foo", "all-projects"}, metrics=metrics
+        )
+        cacher.purge.assert_not_called()
+        metrics.histogram.assert_called_once_with(
+            "warehouse.cache.origin.debounce.flushed", 2
+        )
+        debouncer.purged.assert_called_once_with(
+            {"project/foo", "all-projects"}, 1000.0
+        )
+
+    def test_keeps_keys_on_failure(self, pyramid_request, pyramid_services, clock):
+        cacher = pretend.stub(
+            purge_keys=pretend.raiser(requests.ConnectionError("unavailable"))
+        )
+        pyramid_services.register_service(cacher, IOriginCache, None)
+        debouncer = PurgeDebouncer(FakeRedis(), window=30)
+        debouncer.add({"project/foo"})
+        clock.now += 30
+        pyramid_request.registry = {"origin_cache.debouncer": debouncer}
+
+        with pytest.raises(requests.ConnectionError, match="unavailable"):
+            debounce.flush_purges(pyramid_request)
+
+        assert debouncer.due() == ({"project/foo"}, clock.now)
@@ -1,5 +1,8 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import http.server
+import json
+import threading
 import types
 
 from unittest.mock import call
@@ -16,6 +19,128 @@ from warehouse.cache.origin.interfaces import IOriginCache
 from warehouse.metrics.interfaces import IMetricsService
 
 
+@pytest.fixture(autouse=True)
+def _sessions():
+    fastly._session.cache_clear()
+    yield
+    fastly._session.cache_clear()
+
+
+class FakeFastlyAPI:
+    """
+    A local stand-in for the purge endpoints of the Fastly API, which records
+    each purge request and how many connections they came over.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.connections = 0
+        # Keys which the API claims to have purged but leaves out of its response.
+        self.unpurged = set()
+        self.status = 200
+
+    @property
+    def handler(self):
+        api = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                api.connections += 1
+
+            def do_POST(self):
+                api.requests.append((self.path, dict(self.headers)))
+                if self.path.endswith("/purge"):
+                    keys = self.headers["Surrogate-Key"].split()
+                    result = {k: f"purge-{k}" for k in keys if k not in api.unpurged}
+                else:
+                    result = {"status": "ok"}
+                body = json.dumps(result).encode()
+                self.send_response(api.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def fastly_api():
+    api = FakeFastlyAPI()
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), api.handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    api.endpoint = f"http://127.0.0.1:{server.server_port}"
+    yield api
+    server.shutdown()
+    server.server_close()
+
+
+class TestPurgeKeys:
+    def test_purges_successfully(self, pyramid_request, mocker, metrics):
+        cacher = mocker.Mock(spec=["purge_keys"])
+        find_service = mocker.patch.object(
+            pyramid_request,
+            "find_service",
+            side_effect=lambda svc, context=None, name=None: {
+                IOriginCache: cacher,
+                IMetricsService: metrics,
+            }.get(svc),
+        )
+
+        fastly.purge_keys(mocker.sentinel.task, pyramid_request, ["bar", "foo"])
+
+        assert find_service.call_args_list == [
+            call(IOriginCache),
+            call(IMetricsService, context=None),
+        ]
+        cacher.purge_keys.assert_called_once_with(["bar", "foo"], metrics=metrics)
+        pyramid_request.log.info.assert_called_once_with(
+            "Purging cache keys", keys=["bar", "foo"]
+        )
+
+    @pytest.mark.parametrize(
+        "exception_type",
+        [
+            requests.ConnectionError,
+            requests.HTTPError,
+            requests.Timeout,
+            fastly.UnsuccessfulPurgeError,
+        ],
+    )
+    def test_purges_fails(self, pyramid_request, mocker, metrics, exception_type):
+        exc = exception_type()
+
+        cacher = mocker.Mock(spec=["purge_keys"])
+        cacher.purge_keys.side_effect = exc
+        task = mocker.Mock(spec=["retry"])
+        task.retry.side_effect = celery.exceptions.Retry
+        mocker.patch.object(
+            pyramid_request,
+            "find_service",
+            side_effect=lambda svc, context=None, name=None: {
+                IOriginCache: cacher,
+                IMetricsService: metrics,
+            }.get(svc),
+        )
+
+        with pytest.raises(celery.exceptions.Retry):
+            fastly.purge_keys(task, pyramid_request, ["foo"])
+
+        cacher.purge_keys.assert_called_once_with(["foo"], metrics=metrics)
+        task.retry.assert_called_once_with(exc=exc)
+        pyramid_request.log.error.assert_called_once_with(
+            "Error purging cache keys", keys=["foo"], error=str(exc)
+        )
+
+
 class TestPurgeKey:
     def test_purges_successfully(self, pyramid_request, mocker, metrics):
         cacher = mocker.Mock(spec=["purge_key"])
@@ -98,7 +223,7 @@ class TestFastlyCache:
         assert cacher.api_key == "the api key"
         assert cacher.service_id == "the service id"
         assert cacher._purger is task.delay
-        pyramid_request.task.assert_called_once_with(fastly.purge_key)
+        pyramid_request.task.assert_called_once_with(fastly.purge_keys)
 
     def test_create_service_default_endpoint(self, pyramid_request, mocker):
         task = mocker.Mock(spec=["delay"])
@@ -243,9 +368,125 @@ class TestFastlyCache:
             purger=purge_delay,
         )
 
-        cacher.purge(["one", "two"])
+        cacher.purge({"two", "one"})
+        cacher.purge(set())
+
+        assert purge_delay.call_args_list == [call(["one", "two"])]
+
+    def test_session_is_reused(self):
+        session = fastly._session("https://api.fastly.com", None)
+
+        assert fastly._session("https://api.fastly.com", None) is session
+        assert fastly._session("https://api.fastly.com", "172.16.0.1") is not session
+
+    def test_purge_keys(self, fastly_api, metrics):
+        keys = [f"project/{i:03}" for i in range(fastly.MAX_KEYS_PER_PURGE + 2)]
+
+        # Each purge comes from a new service, as each one comes from a new task.
+        for batch in (keys[::-1], ["all-projects"]):
+            cacher = fastly.FastlyCache(
+                api_endpoint=fastly_api.endpoint,
+                api_connect_via=None,
+                api_key="an api key",
+                service_id="the-service-id",
+                purger=None,
+            )
+            cacher.purge_keys(batch, metrics=metrics)
+
+        assert [path for path, _ in fastly_api.requests] == [
+            "/service/the-service-id/purge"
+        ] * 3
+        assert [headers["Surrogate-Key"] for _, headers in fastly_api.requests] == [
+            " ".join(keys[: fastly.MAX_KEYS_PER_PURGE]),
+            " ".join(keys[fastly.MAX_KEYS_PER_PURGE :]),
+            "all-projects",
+        ]
+        assert all(
+            headers["Fastly-Key"] == "an api key"
+            and headers["Fastly-Soft-Purge"] == "1"
+            for _, headers in fastly_api.requests
+        )
+        assert fastly_api.connections == 1
+        assert metrics.histogram.call_args_list == [
+            call(
+                "warehouse.cache.origin.fastly.purge.batch_size",
+                fastly.MAX_KEYS_PER_PURGE,
+            ),
+            call("warehouse.cache.origin.fastly.purge.batch_size", 2),
+            call("warehouse.cache.origin.fastly.purge.batch_size", 1),
+        ]
+        assert (
+            metrics.timed.call_args_list
+            == [call("warehouse.cache.origin.fastly.purge.duration")] * 3
+        )
+
+    def test_purge_keys_unsuccessful(self, fastly_api, metrics):
+        fastly_api.unpurged = {"two"}
+        cacher = fastly.FastlyCache(
+            api_endpoint=fastly_api.endpoint,
+            api_connect_via=None,
+            api_key="an api key",
+            service_id="the-service-id",
+            purger=None,
+        )
+
+        with pytest.raises(fastly.UnsuccessfulPurgeError, match="two"):
+            cacher.purge_keys(["one", "two"], metrics=metrics)
+
+    def test_purge_keys_error(self, fastly_api, metrics):
+        fastly_api.status = 500
+        cacher = fastly.FastlyCache(
+            api_endpoint=fastly_api.endpoint,
+            api_connect_via=None,
+            api_key="an api key",
+            service_id="the-service-id",
+            purger=None,
+        )
 
-        assert purge_delay.call_args_list == [call("one"), call("two")]
+        with pytest.raises(requests.HTTPError):
+            cacher.purge_keys(["one"], metrics=metrics)
+
+    def test_purge_keys_fallback(self, mocker, metrics):
+        sleep = mocker.patch("time.sleep")
+        cacher = fastly.FastlyCache(
+            api_endpoint="https://api.fastly.com",
+            api_connect_via="172.16.0.1",
+            api_key="an api key",
+            service_id="the-service-id",
+            purger=None,
+        )
+        cacher._purge_keys = mocker.Mock(
+            side_effect=[requests.ConnectionError, None, None]
+        )
+
+        cacher.purge_keys(["two", "one"], metrics=metrics)
+
+        assert cacher._purge_keys.call_args_list == [
+            call(["one", "two"], connect_via="172.16.0.1"),
+            call(["one", "two"], connect_via=None),
+            call(["one", "two"], connect_via=None),
+        ]
+        sleep.assert_called_once_with(2)
+        metrics.increment.assert_called_once_with(
+            "warehouse.cache.origin.fastly.connect_via.failed",
+            tags=["ip_address:172.16.0.1"],
+        )
+
+    def test_purge_keys_no_fallback(self, mocker, metrics):
+        cacher = fastly.FastlyCache(
+            api_endpoint="https://api.fastly.com",
+            api_connect_via=None,
+            api_key="an api key",
+            service_id="the-service-id",
+            purger=None,
+        )
+        cacher._purge_keys = mocker.Mock(side_effect=requests.ConnectionError)
+
+        with pytest.raises(requests.ConnectionError):
+            cacher.purge_keys(["one"], metrics=metrics)
+
+        assert cacher._purge_keys.call_args_list == [call(["one"], connect_via=None)]
+        metrics.increment.assert_not_called()
 
     @pytest.mark.parametrize(
         ("connect_via", "forced_ip_https_adapter_calls"),
@@ -579,5 +820,26 @@ class TestNullFastlyCache:
 Origin cache purge issued:
 * URL: 'https://api.example.com/service/the service id/purge/one'
 * Headers: {'Accept': 'application/json', 'Fastly-Key': 'the api key', 'Fastly-Soft-Purge': '1'}
+"""  # noqa: E501
+        assert captured.out.strip() == expected.strip()
+
+    def test_purge_keys_prints(self, pyramid_request, mocker, capsys, metrics):
+        task = mocker.Mock(spec=["delay"])
+        mocker.patch.object(pyramid_request, "task", return_value=task)
+        pyramid_request.registry.settings.update(
+            {
+                "origin_cache.api_endpoint": "https://api.example.com",
+                "origin_cache.api_key": "the api key",
+                "origin_cache.service_id": "the service id",
+            }
+        )
+        cacher = fastly.NullFastlyCache.create_service(None, pyramid_request)
+        cacher.purge_keys(["two", "one"], metrics=metrics)
+
+        captured = capsys.readouterr()
+        expected = """
+Origin cache purge issued:
+* URL: 'https://api.example.com/service/the service id/purge'
+* Headers: {'Accept': 'application/json', 'Fastly-Key': 'the api key', 'Fastly-Soft-Purge': '1', 'Surrogate-Key': 'one two'}
 """  # noqa: E501
         assert captured.out.strip() == expected.strip()
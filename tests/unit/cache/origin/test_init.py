@@ -3,6 +3,9 @@
 import types
 
 import pytest
+import redis
+
+from pyramid.registry import Registry
 
 from tests.common.db.accounts import UserFactory
 from tests.common.db.packaging import (
@@ -14,6 +17,7 @@ from tests.common.db.packaging import (
 )
 from warehouse.accounts.models import User
 from warehouse.cache import origin
+from warehouse.cache.origin.debounce import FLUSH_INTERVAL, PurgeDebouncer, flush_purges
 from warehouse.cache.origin.derivers import html_cache_deriver
 from warehouse.cache.origin.interfaces import IOriginCache
 from warehouse.observations.models import ObservationKind
@@ -210,6 +214,44 @@ def test_execute_purge_no_backend(app_config, mocker):
     assert "warehouse.cache.origin.purges" not in session.info
 
 
+def test_execute_purge_debounced(app_config, mocker):
+    debouncer = mocker.Mock(spec=["add"])
+    mocker.patch.dict(app_config.registry, {"origin_cache.debouncer": debouncer})
+    find_service_factory = mocker.patch.object(
+        app_config, "find_service_factory", autospec=True
+    )
+    session = types.SimpleNamespace(
+        info={"warehouse.cache.origin.purges": {"type_1", "type_2"}}
+    )
+
+    origin.execute_purge(app_config, session)
+
+    debouncer.add.assert_called_once_with({"type_1", "type_2"})
+    assert not find_service_factory.called
+    assert "warehouse.cache.origin.purges" not in session.info
+
+
+def test_execute_purge_debounce_fails(app_config, mocker):
+    debouncer = mocker.Mock(spec=["add"])
+    debouncer.add.side_effect = redis.ConnectionError("unavailable")
+    mocker.patch.dict(app_config.registry, {"origin_cache.debouncer": debouncer})
+    cacher = mocker.Mock(spec=["purge"])
+    mocker.patch.object(
+        app_config,
+        "find_service_factory",
+        autospec=True,
+        return_value=mocker.Mock(return_value=cacher),
+    )
+    session = types.SimpleNamespace(
+        info={"warehouse.cache.origin.purges": {"type_1", "type_2"}}
+    )
+
+    origin.execute_purge(app_config, session)
+
+    debouncer.add.assert_called_once_with({"type_1", "type_2"})
+    cacher.purge.assert_called_once_with({"type_1", "type_2"})
+
+
 class TestOriginCache:
     def test_no_cache_key(self, pyramid_request, mocker):
         response = mocker.sentinel.response
@@ -471,3 +513,32 @@ def test_includeme_with_origin_cache(mocker):
     config.register_service_factory.assert_called_once_with(
         cache_class.create_service, IOriginCache
     )
+
+
+def test_includeme_with_debounce(mocker):
+    from_url = mocker.patch("redis.StrictRedis.from_url")
+    config = mocker.Mock(
+        spec=[
+            "add_directive",
+            "add_periodic_task",
+            "add_view_deriver",
+            "maybe_dotted",
+            "register_service_factory",
+            "registry",
+        ]
+    )
+    config.registry = Registry()
+    config.registry.settings = {
+        "origin_cache.backend": "warehouse.cache.origin.fastly.FastlyCache",
+        "origin_cache.debounce_window": "30",
+        "origin_cache.debounce_url": "redis://redis:6379/6",
+    }
+
+    origin.includeme(config)
+
+    debouncer = config.registry["origin_cache.debouncer"]
+    assert isinstance(debouncer, PurgeDebouncer)
+    assert debouncer.redis is from_url.return_value
+    assert debouncer.window == 30
+    from_url.assert_called_once_with("redis://redis:6379/6")
+    config.add_periodic_task.assert_called_once_with(FLUSH_INTERVAL, flush_purges)
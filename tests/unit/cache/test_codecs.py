@@ -0,0 +1,59 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import math
+
+import pytest
+
+from warehouse.cache import codecs
+
+VALUE = {"projects": {"foo": 1, "日本語": 2}, "list": [1, 2.5, None, True, "x"]}
+
+
+class TestCodecs:
+    @pytest.mark.parametrize("name", ["json", "msgpack", "msgpack+zstd"])
+    def test_round_trip(self, name):
+        codec = codecs.get_codec(name)
+
+        assert codecs.decode(codec.encode(VALUE)) == VALUE
+
+    @pytest.mark.parametrize(
+        ("name", "header"),
+        [
+            ("msgpack", codecs.MSGPACK_HEADER),
+            ("msgpack+zstd", codecs.MSGPACK_ZSTD_HEADER),
+        ],
+    )
+    def test_header(self, name, header):
+        assert codecs.get_codec(name).encode(VALUE)[:1] == header
+
+    def test_json_is_plain_compact_json(self):
+        assert codecs.JSONCodec().encode({"a": [1, 2]}) == '{"a":[1,2]}'
+
+    def test_json_options(self):
+        codec = codecs.get_codec("json", allow_nan=False)
+
+        with pytest.raises(ValueError, match="not JSON compliant"):
+            codec.encode(math.nan)
+
+    def test_json_options_ignored_for_binary_codecs(self):
+        codec = codecs.get_codec("msgpack", allow_nan=False)
+
+        assert math.isnan(codecs.decode(codec.encode(math.nan)))
+
+    def test_msgpack_keeps_dict_keys(self):
+        assert codecs.decode(codecs.MsgpackCodec().encode({1: "a"})) == {1: "a"}
+
+    @pytest.mark.parametrize("data", ['{"a":1}', b'{"a":1}', b' {"a":1}'])
+    def test_decodes_json_written_before_codecs(self, data):
+        assert codecs.decode(data) == {"a": 1}
+
+    def test_compresses(self):
+        value = {f"project-{i}": i for i in range(1000)}
+
+        assert len(codecs.MsgpackZstdCodec().encode(value)) < len(
+            codecs.MsgpackCodec().encode(value)
+        )
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError, match="Unknown cache codec: 'pickle'"):
+            codecs.get_codec("pickle")
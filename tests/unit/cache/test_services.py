@@ -1,7 +1,10 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import pytest
+
 from zope.interface.verify import verifyClass
 
+from warehouse.cache import codecs
 from warehouse.cache.interfaces import IQueryResultsCache
 from warehouse.cache.services import RedisQueryResults
 
@@ -16,6 +19,16 @@ class TestRedisQueryResults:
         service = RedisQueryResults.create_service(None, pyramid_request)
 
         assert isinstance(service, RedisQueryResults)
+        assert isinstance(service.codec, codecs.JSONCodec)
+        assert service.codec.options["allow_nan"] is False
+
+    def test_create_service_with_codec(self, pyramid_request):
+        pyramid_request.registry.settings["db_results_cache.url"] = "redis://"
+        pyramid_request.registry.settings["db_results_cache.codec"] = "msgpack+zstd"
+
+        service = RedisQueryResults.create_service(None, pyramid_request)
+
+        assert isinstance(service.codec, codecs.MsgpackZstdCodec)
 
     def test_get_missing(self, query_results_cache_service):
         # Attempt to get a value that doesn't exist in the cache
@@ -42,3 +55,18 @@ class TestRedisQueryResults:
         result = query_results_cache_service.get("complex_key")
 
         assert result == obj
+
+    @pytest.mark.parametrize("codec", ["msgpack", "msgpack+zstd"])
+    def test_set_get_binary_codec(self, mockredis, codec):
+        service = RedisQueryResults(mockredis, codec=codecs.get_codec(codec))
+        obj = {"list": [1, 2, 3], "dict": {"key": "value"}}
+
+        service.set("key", obj)
+
+        assert service.get("key") == obj
+
+    def test_get_json_written_by_any_codec(self, mockredis):
+        service = RedisQueryResults(mockredis, codec=codecs.MsgpackCodec())
+        mockredis.set("key", b'{"foo":"bar"}')
+
+        assert service.get("key") == {"foo": "bar"}
@@ -0,0 +1,34 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import types
+
+import redis
+
+from warehouse.cli.xmlrpc import index_cache_tags
+from warehouse.legacy.api.xmlrpc import cache
+
+
+class TestCLIXMLRPC:
+    def test_index_cache_tags(self, cli, mocker):
+        conn = mocker.Mock()
+        from_url = mocker.patch.object(redis.StrictRedis, "from_url", return_value=conn)
+        index_tags = mocker.patch.object(
+            cache.RedisLru, "index_tags", autospec=True, return_value=3
+        )
+        config = types.SimpleNamespace(
+            registry=types.SimpleNamespace(
+                settings={
+                    "warehouse.xmlrpc.cache.url": "redis://localhost:6379/0",
+                    "warehouse.xmlrpc.cache.name": "xmlrpc",
+                }
+            )
+        )
+
+        result = cli.invoke(index_cache_tags, obj=config)
+
+        assert result.exit_code == 0
+        assert result.output == "Indexed 3 cache entries.\n"
+        from_url.assert_called_once_with("redis://localhost:6379/0", db=0)
+        (redis_lru,) = index_tags.call_args.args
+        assert redis_lru.conn is conn
+        assert redis_lru.name == "xmlrpc"
@@ -2,7 +2,7 @@
 
 import pytest
 
-from pyramid.httpexceptions import HTTPMovedPermanently, HTTPNotFound
+from pyramid.httpexceptions import HTTPBadRequest, HTTPMovedPermanently, HTTPNotFound
 
 from warehouse.legacy.api import json
 from warehouse.packaging.models import LifecycleStatus, ReleaseURL
@@ -849,3 +849,42 @@ class TestJSONReleaseSlash:
         assert resp.headers["Location"] == "/project/the-redirect/3.0/"
         _assert_has_cors_headers(resp.headers)
         current_route_path.assert_called_once_with(name=release.project.normalized_name)
+
+
+class TestJSONSerials:
+    def test_since_serial(self, db_request):
+        old, new = ProjectFactory.create_batch(2)
+        JournalEntryFactory.create(name=old.name)
+        since = JournalEntryFactory.create(name=new.name).id
+        last = JournalEntryFactory.create(name=new.name)
+        ProjectFactory.create()
+
+        db_request.params = {"since": str(since)}
+
+        assert json.json_serials(db_request) == {
+            "last_serial": last.id,
+            "projects": {new.name: last.id},
+        }
+        assert db_request.response.headers["X-PyPI-Last-Serial"] == str(last.id)
+        _assert_has_cors_headers(db_request.response.headers)
+
+    def test_nothing_changed(self, db_request):
+        db_request.params = {"since": "0"}
+
+        assert json.json_serials(db_request) == {"last_serial": 0, "projects": {}}
+
+    @pytest.mark.parametrize(
+        ("params", "message"),
+        [
+            ({}, "'since' is required."),
+            ({"since": "nope"}, "'since' must be an integer."),
+        ],
+    )
+    def test_invalid_since(self, db_request, params, message):
+        db_request.params = params
+
+        with pytest.raises(HTTPBadRequest) as exc:
+            json.json_serials(db_request)
+
+        assert exc.value.message == message
+        _assert_has_cors_headers(exc.value.headers)
@@ -10,19 +10,27 @@ import redis
 
 from packaging.utils import canonicalize_name
 from pyramid.exceptions import ConfigurationError
+from pyramid.registry import Registry
 
 import warehouse.legacy.api.xmlrpc.cache
 
+from warehouse.cache import codecs
 from warehouse.legacy.api.xmlrpc import cache
 from warehouse.legacy.api.xmlrpc.cache import (
+    ClassifierIndex,
+    LocalLru,
     NullXMLRPCCache,
     RedisLru,
     RedisXMLRPCCache,
     cached_return_view,
+    fncache,
     services,
 )
 from warehouse.legacy.api.xmlrpc.cache.fncache import StubMetricReporter
 from warehouse.legacy.api.xmlrpc.cache.interfaces import CacheError, IXMLRPCCache
+from warehouse.packaging.models import Classifier
+
+from .....common.db.packaging import ReleaseFactory
 
 
 def func_test(arg0, arg1, kwarg0=0, kwarg1=1):
@@ -64,6 +72,8 @@ class TestRedisXMLRPCCache:
             name="lru",
             expires=None,
             metric_reporter=None,
+            local_cache=None,
+            codec=None,
         )
 
         assert service.fetch(
@@ -90,12 +100,12 @@ class TestIncludeMe:
     def test_configuration(self, url, cache_class, mocker):
         mocker.patch.object(cache, cache_class, autospec=True)
 
+        registry = Registry()
+        registry.settings = {"warehouse.xmlrpc.cache.url": url}
         config = types.SimpleNamespace(
             add_view_deriver=mocker.stub(name="add_view_deriver"),
             register_service_factory=mocker.stub(name="register_service_factory"),
-            registry=types.SimpleNamespace(
-                settings={"warehouse.xmlrpc.cache.url": url}
-            ),
+            registry=registry,
         )
 
         cache.includeme(config)
@@ -103,6 +113,33 @@ class TestIncludeMe:
         config.add_view_deriver.assert_called_once_with(
             cache.cached_return_view, under="rendered_view", over="mapped_view"
         )
+        local_cache = registry["xmlrpc.cache.local"]
+        assert isinstance(local_cache, LocalLru)
+        assert local_cache.max_entries == 256
+        assert local_cache.expires == 30
+        if cache_class == "RedisXMLRPCCache":
+            assert isinstance(registry["xmlrpc.cache.classifiers"], ClassifierIndex)
+        else:
+            assert "xmlrpc.cache.classifiers" not in registry
+
+    def test_local_cache_configuration(self, mocker):
+        registry = Registry()
+        registry.settings = {
+            "warehouse.xmlrpc.cache.url": "redis://",
+            "warehouse.xmlrpc.cache.local_max_entries": "10",
+            "warehouse.xmlrpc.cache.local_expires": "5",
+        }
+        config = types.SimpleNamespace(
+            add_view_deriver=mocker.stub(name="add_view_deriver"),
+            register_service_factory=mocker.stub(name="register_service_factory"),
+            registry=registry,
+        )
+
+        cache.includeme(config)
+
+        local_cache = registry["xmlrpc.cache.local"]
+        assert local_cache.max_entries == 10
+        assert local_cache.expires == 5
 
     def test_no_url_configuration(self):
         config = types.SimpleNamespace(registry=types.SimpleNamespace(settings={}))
@@ -156,6 +193,7 @@ class TestIncludeMe:
         pyramid_request.registry.settings.update(
             {"warehouse.xmlrpc.cache.url": "redis://"}
         )
+        pyramid_request.registry["xmlrpc.cache.local"] = LocalLru()
         delay = mocker.stub(name="delay")
         pyramid_request.task = mocker.Mock(return_value=mocker.Mock(delay=delay))
 
@@ -166,6 +204,24 @@ class TestIncludeMe:
         assert service._purger is delay
         # Without this the cache falls back to StubMetricReporter and reports nothing.
         assert service.redis_lru.metric_reporter is pyramid_request.metrics
+        assert (
+            service.redis_lru.local_cache
+            is pyramid_request.registry["xmlrpc.cache.local"]
+        )
+        assert isinstance(service.redis_lru.codec, codecs.JSONCodec)
+
+    def test_create_redis_service_with_codec(self, pyramid_request, mocker):
+        pyramid_request.registry.settings.update(
+            {
+                "warehouse.xmlrpc.cache.url": "redis://",
+                "warehouse.xmlrpc.cache.codec": "msgpack+zstd",
+            }
+        )
+        pyramid_request.task = mocker.Mock()
+
+        service = RedisXMLRPCCache.create_service(None, pyramid_request)
+
+        assert isinstance(service.redis_lru.codec, codecs.MsgpackZstdCodec)
 
     def test_create_redis_service_without_a_request(self, mocker):
         """The factory tolerates being handed something that is not a request.
@@ -175,10 +231,10 @@ class TestIncludeMe:
         AttributeError would break every `after_commit`.
         """
         delay = mocker.stub(name="delay")
+        registry = Registry()
+        registry.settings = {"warehouse.xmlrpc.cache.url": "redis://"}
         config = types.SimpleNamespace(
-            registry=types.SimpleNamespace(
-                settings={"warehouse.xmlrpc.cache.url": "redis://"}
-            ),
+            registry=registry,
             task=mocker.Mock(return_value=mocker.Mock(delay=delay)),
         )
 
@@ -236,6 +292,25 @@ class TestRedisLru:
         assert stored.isascii()
         assert json.loads(stored) == {"name": "日本語"}
 
+    @pytest.mark.parametrize("codec", ["msgpack", "msgpack+zstd"])
+    def test_binary_codec(self, mockredis, codec):
+        redis_lru = RedisLru(mockredis, codec=codecs.get_codec(codec))
+
+        expected = func_test(0, 1)
+
+        assert redis_lru.fetch(func_test, [0, 1], {}, "[0,1]", None, None) == expected
+        assert redis_lru.fetch(func_test, [0, 1], {}, "[0,1]", None, None) == expected
+        stored = mockredis.cache["lru:tag:func_test"]["[0,1]"]
+        assert stored[:1] in {codecs.MSGPACK_HEADER, codecs.MSGPACK_ZSTD_HEADER}
+
+    def test_reads_json_with_binary_codec(self, mockredis, mocker):
+        func = mocker.Mock(__name__="func")
+        mockredis.cache["lru:tag:func"] = {"[]": b'{"a":1}'}
+        redis_lru = RedisLru(mockredis, codec=codecs.MsgpackZstdCodec())
+
+        assert redis_lru.fetch(func, [], {}, "[]", None, None) == {"a": 1}
+        func.assert_not_called()
+
     def test_unserializable_value_raises(self, mockredis):
         """Types the stdlib encoder rejects raise instead of being cached.
 
@@ -315,11 +390,71 @@ class TestRedisLru:
             mocker.call("warehouse.lru.cache.hit"),
         ]
 
+    def test_redis_purge_only_touches_tag(self, mockredis):
+        redis_lru = RedisLru(mockredis)
+        redis_lru.fetch(func_test, [0, 1], {}, "a", "test", None)
+        redis_lru.fetch(func_test, [0, 1], {}, "b", "test", None)
+        redis_lru.fetch(func_test, [0, 1], {}, "a", "other", None)
+
+        assert mockredis.cache["lru:test"] == {"lru:test:func_test"}
+
+        redis_lru.purge("test")
+
+        assert set(mockredis.cache) == {
+            "lru:other",
+            "lru:other:func_test",
+            "lru-generation:test",
+        }
+
+    def test_redis_purge_empty_tag(self, metrics, mockredis, mocker):
+        redis_lru = RedisLru(mockredis, metric_reporter=metrics)
+
+        redis_lru.purge("test")
+
+        assert mockredis.cache == {"lru-generation:test": 1}
+        assert metrics.increment.call_args_list == [
+            mocker.call("warehouse.lru.cache.purge"),
+        ]
+
+    def test_index_tags(self, mocker):
+        conn = mocker.create_autospec(redis.StrictRedis, instance=True)
+        conn.scan_iter.return_value = [
+            b"lru:project/foo:package_roles",
+            b"lru:project/foo:other",
+            b"lru:tag:func_test",
+            b"lru:all-projects:list_packages_with_serial",
+        ]
+        pipeline = conn.pipeline.return_value
+        pipeline.execute.side_effect = [[100, -2, -1], None, [300], None]
+        redis_lru = RedisLru(conn)
+
+        assert redis_lru.index_tags(batch_size=3) == 2
+
+        conn.scan_iter.assert_called_once_with("lru:*:*", count=3)
+        assert pipeline.ttl.call_args_list == [
+            mocker.call(b"lru:project/foo:package_roles"),
+            mocker.call(b"lru:project/foo:other"),
+            mocker.call(b"lru:tag:func_test"),
+            mocker.call(b"lru:all-projects:list_packages_with_serial"),
+        ]
+        assert pipeline.sadd.call_args_list == [
+            mocker.call("lru:project/foo", b"lru:project/foo:package_roles"),
+            mocker.call(
+                "lru:all-projects", b"lru:all-projects:list_packages_with_serial"
+            ),
+        ]
+        assert pipeline.expire.call_args_list == [
+            mocker.call("lru:project/foo", 100, nx=True),
+            mocker.call("lru:project/foo", 100, gt=True),
+            mocker.call("lru:all-projects", 300, nx=True),
+            mocker.call("lru:all-projects", 300, gt=True),
+        ]
+
     def test_redis_down(self, metrics, mocker):
         down_redis = mocker.create_autospec(redis.StrictRedis, instance=True)
         down_redis.hget.side_effect = redis.exceptions.RedisError
         down_redis.pipeline.side_effect = redis.exceptions.RedisError
-        down_redis.scan_iter.side_effect = redis.exceptions.RedisError
+        down_redis.smembers.side_effect = redis.exceptions.RedisError
         redis_lru = RedisLru(down_redis, metric_reporter=metrics)
 
         expected = func_test(0, 1, kwarg0=2, kwarg1=3)
@@ -344,6 +479,305 @@ class TestRedisLru:
         ]
 
 
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(fncache.time, "monotonic", clock)
+    return clock
+
+
+class TestLocalLru:
+    def test_get_and_add(self, clock):
+        local_cache = LocalLru()
+
+        assert local_cache.get("key", 0) is None
+        local_cache.add("key", ["value"], 0)
+        assert local_cache.get("key", 0) == ["value"]
+
+    def test_expires(self, clock):
+        local_cache = LocalLru(expires=30)
+        local_cache.add("key", ["value"], 0)
+
+        clock.now += 29
+        assert local_cache.get("key", 0) == ["value"]
+
+        clock.now += 1
+        assert local_cache.get("key", 0) is None
+        assert "key" not in local_cache._entries
+
+    def test_generation_mismatch(self, clock):
+        local_cache = LocalLru()
+        local_cache.add("key", ["value"], 0)
+
+        assert local_cache.get("key", 1) is None
+        assert "key" not in local_cache._entries
+
+    def test_evicts_least_recently_used(self, clock):
+        local_cache = LocalLru(max_entries=2)
+        local_cache.add("one", 1, 0)
+        local_cache.add("two", 2, 0)
+        assert local_cache.get("one", 0) == 1
+
+        local_cache.add("three", 3, 0)
+
+        assert list(local_cache._entries) == ["one", "three"]
+
+    def test_generation_is_checked_periodically(self, clock, mocker):
+        load = mocker.Mock(side_effect=[0, 1])
+        local_cache = LocalLru(generation_interval=1)
+
+        assert local_cache.generation("tag", load) == 0
+        clock.now += 0.5
+        assert local_cache.generation("tag", load) == 0
+        clock.now += 0.5
+        assert local_cache.generation("tag", load) == 1
+
+        assert load.call_args_list == [mocker.call("tag"), mocker.call("tag")]
+
+    def test_generations_are_bounded(self, clock, mocker):
+        load = mocker.Mock(return_value=0)
+        local_cache = LocalLru(max_entries=2, generation_interval=1)
+        local_cache.generation("one", load)
+        local_cache.generation("two", load)
+        clock.now += 1
+        local_cache.generation("one", load)
+
+        local_cache.generation("three", load)
+
+        assert list(local_cache._generations) == ["one", "three"]
+
+    def test_generation_unavailable(self, clock, mocker):
+        load = mocker.Mock(return_value=None)
+        local_cache = LocalLru()
+
+        assert local_cache.generation("tag", load) is None
+        assert local_cache.generation("tag", load) is None
+
+        assert load.call_count == 2
+
+
+class TestTwoTierLru:
+    def test_local_hit(self, clock, metrics, mockredis, mocker):
+        func = mocker.Mock(return_value=[1, 2], __name__="func")
+        redis_lru = RedisLru(mockredis, metric_reporter=metrics, local_cache=LocalLru())
+        hget = mocker.spy(mockredis, "hget")
+
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1, 2]
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1, 2]
+
+        func.assert_called_once_with()
+        hget.assert_called_once_with("lru:test:func", "[]")
+        assert metrics.increment.call_args_list == [
+            mocker.call("warehouse.lru.cache.miss"),
+            mocker.call("warehouse.lru.cache.local_hit"),
+        ]
+
+    def test_purge_bumps_generation(self, clock, metrics, mockredis, mocker):
+        func = mocker.Mock(side_effect=[[1], [2]], __name__="func")
+        redis_lru = RedisLru(mockredis, local_cache=LocalLru(generation_interval=1))
+
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+        redis_lru.purge("test")
+
+        # The purge goes unnoticed until the generation is checked again.
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+        clock.now += 1
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [2]
+        assert redis_lru.generation("test") == 1
+
+    def test_redis_down(self, clock, metrics, mocker):
+        down_redis = mocker.create_autospec(redis.StrictRedis, instance=True)
+        down_redis.get.side_effect = redis.exceptions.RedisError
+        down_redis.hget.side_effect = redis.exceptions.RedisError
+        down_redis.pipeline.side_effect = redis.exceptions.RedisError
+        func = mocker.Mock(return_value=[1], __name__="func")
+        local_cache = LocalLru()
+        redis_lru = RedisLru(
+            down_redis, metric_reporter=metrics, local_cache=local_cache
+        )
+
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+
+        # Without a generation to check against nothing is kept locally.
+        assert func.call_count == 2
+        assert local_cache._entries == {}
+
+
+class TestSingleFlight:
+    def test_lock_is_released(self, mockredis, mocker):
+        func = mocker.Mock(return_value=[1], __name__="func")
+        redis_lru = RedisLru(mockredis)
+
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+
+        assert "lru-lock:test:func:[]" not in mockredis.cache
+
+    def test_waits_for_lock_holder(self, clock, metrics, mockredis, mocker):
+        func = mocker.Mock(__name__="func")
+        redis_lru = RedisLru(mockredis, metric_reporter=metrics)
+        # Another worker is already refilling this entry.
+        mockredis.set("lru-lock:test:func:[]", "locked")
+
+        # The entry is filled in while we're waiting on the second poll.
+        polls = iter([None, lambda: mockredis.hset("lru:test:func", "[]", "[1]")])
+
+        def sleep(seconds):
+            clock.now += seconds
+            if fill := next(polls):
+                fill()
+
+        mocker.patch.object(fncache.time, "sleep", side_effect=sleep)
+
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+
+        func.assert_not_called()
+        assert fncache.time.sleep.call_count == 2
+        assert metrics.increment.call_args_list == [
+            mocker.call("warehouse.lru.cache.coalesced"),
+        ]
+
+    def test_lock_holder_failed(self, clock, metrics, mockredis, mocker):
+        func = mocker.Mock(return_value=[1], __name__="func")
+        redis_lru = RedisLru(mockredis, metric_reporter=metrics)
+        mockredis.set("lru-lock:test:func:[]", "locked")
+
+        # The other worker's `func` raises on the second poll, which releases
+        # the lock without storing anything.
+        polls = iter([None, lambda: mockredis.delete("lru-lock:test:func:[]")])
+
+        def sleep(seconds):
+            clock.now += seconds
+            if release := next(polls):
+                release()
+
+        mocker.patch.object(fncache.time, "sleep", side_effect=sleep)
+
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+
+        func.assert_called_once_with()
+        assert fncache.time.sleep.call_count == 2
+        assert metrics.increment.call_args_list == [
+            mocker.call("warehouse.lru.cache.miss"),
+        ]
+        assert "lru-lock:test:func:[]" not in mockredis.cache
+
+    def test_lock_unavailable_while_waiting(self, clock, metrics, mockredis, mocker):
+        func = mocker.Mock(return_value=[1], __name__="func")
+        redis_lru = RedisLru(mockredis, metric_reporter=metrics)
+        mockredis.set("lru-lock:test:func:[]", "locked")
+        mocker.patch.object(fncache.time, "sleep")
+        mocker.patch.object(
+            mockredis, "exists", side_effect=redis.exceptions.ConnectionError
+        )
+
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+
+        func.assert_called_once_with()
+        assert metrics.increment.call_args_list == [
+            mocker.call("warehouse.lru.cache.error"),
+            mocker.call("warehouse.lru.cache.miss"),
+        ]
+
+    def test_gives_up_waiting(self, clock, metrics, mockredis, mocker):
+        func = mocker.Mock(return_value=[1], __name__="func")
+        redis_lru = RedisLru(mockredis, metric_reporter=metrics, lock_timeout=1)
+        mockredis.set("lru-lock:test:func:[]", "locked")
+
+        def sleep(seconds):
+            clock.now += seconds
+
+        mocker.patch.object(fncache.time, "sleep", side_effect=sleep)
+
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+
+        func.assert_called_once_with()
+        assert metrics.increment.call_args_list == [
+            mocker.call("warehouse.lru.cache.lock_timeout"),
+            mocker.call("warehouse.lru.cache.miss"),
+        ]
+
+    def test_lock_unavailable(self, metrics, mockredis, mocker):
+        func = mocker.Mock(return_value=[1], __name__="func")
+        lock = mocker.Mock()
+        lock.acquire.side_effect = redis.exceptions.ConnectionError
+        mocker.patch.object(mockredis, "lock", return_value=lock)
+        redis_lru = RedisLru(mockredis, metric_reporter=metrics)
+
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+
+        func.assert_called_once_with()
+        assert metrics.increment.call_args_list == [
+            mocker.call("warehouse.lru.cache.error"),
+            mocker.call("warehouse.lru.cache.miss"),
+        ]
+
+    def test_lock_expired_before_release(self, mockredis, mocker):
+        func = mocker.Mock(return_value=[1], __name__="func")
+        lock = mocker.Mock()
+        lock.acquire.return_value = True
+        lock.release.side_effect = redis.exceptions.LockNotOwnedError
+        mocker.patch.object(mockredis, "lock", return_value=lock)
+        redis_lru = RedisLru(mockredis)
+
+        assert redis_lru.fetch(func, [], {}, "[]", "test", None) == [1]
+
+        mockredis.lock.assert_called_once_with(
+            "lru-lock:test:func:[]", timeout=fncache.DEFAULT_LOCK_TIMEOUT
+        )
+        lock.release.assert_called_once_with()
+
+
+class TestClassifierIndex:
+    def test_builds_missing_sets(self, mockredis, mocker):
+        mockredis.sadd("xmlrpc-classifier:2", "b", "c", "")
+        index = ClassifierIndex(mockredis, batch_size=2)
+        load = mocker.Mock(side_effect=lambda classifier_id: iter(["a", "b", "d"]))
+
+        assert index.release_ids([1, 2], load) == {"b"}
+
+        load.assert_called_once_with(1)
+        assert mockredis.cache["xmlrpc-classifier:1"] == {"a", "b", "d", ""}
+
+        assert index.release_ids([1, 2], load) == {"b"}
+        assert load.call_count == 1
+
+    def test_builds_set_that_was_only_updated(self, mockredis):
+        index = ClassifierIndex(mockredis)
+        index.update([(True, 1, "new")])
+
+        assert index.release_ids([1], lambda classifier_id: ["old"]) == {
+            "old",
+            "new",
+        }
+
+    def test_classifier_without_releases(self, mockredis, mocker):
+        index = ClassifierIndex(mockredis)
+        load = mocker.Mock(return_value=[])
+
+        assert index.release_ids([1], load) == set()
+        assert index.release_ids([1], load) == set()
+
+        load.assert_called_once_with(1)
+
+    def test_update(self, mockredis):
+        mockredis.sadd("xmlrpc-classifier:1", "a", "b", "")
+        index = ClassifierIndex(mockredis)
+
+        index.update([(True, 1, "c"), (False, 1, "a"), (False, 2, "a"), (True, 1, "a")])
+
+        assert mockredis.cache["xmlrpc-classifier:1"] == {"a", "b", "c", ""}
+        assert "xmlrpc-classifier:2" not in mockredis.cache
+
+
 class TestDeriver:
     @pytest.mark.parametrize(
         ("service_available", "xmlrpc_cache"),
@@ -546,6 +980,86 @@ class TestPurgeTask:
             "foo",
         }
 
+    def test_store_classifier_changes(self, db_session, mocker):
+        added, removed, kept = (
+            Classifier(classifier=f"Topic :: {name}")
+            for name in ["Added", "Removed", "Kept"]
+        )
+        db_session.add_all([added, removed, kept])
+        release = ReleaseFactory.create(_classifiers=[removed, kept])
+        unchanged = ReleaseFactory.create(_classifiers=[kept])
+        release._classifiers = [added, kept]
+        session = types.SimpleNamespace(
+            info={}, new={object()}, dirty={release, unchanged}
+        )
+
+        cache.store_classifier_changes(
+            mocker.sentinel.config, session, mocker.sentinel.flush_context
+        )
+
+        assert session.info["warehouse.legacy.api.xmlrpc.cache.classifier_changes"] == [
+            (True, added.id, release.id),
+            (False, removed.id, release.id),
+        ]
+
+    def test_execute_classifier_changes(self, mocker):
+        index = mocker.Mock(spec=ClassifierIndex)
+        config = types.SimpleNamespace(registry={"xmlrpc.cache.classifiers": index})
+        changes = [(True, 1, "release-id")]
+        session = types.SimpleNamespace(
+            info={"warehouse.legacy.api.xmlrpc.cache.classifier_changes": changes}
+        )
+
+        cache.execute_classifier_changes(config, session)
+
+        index.update.assert_called_once_with(changes)
+        assert session.info == {}
+
+    @pytest.mark.parametrize(
+        "registry", [{}, {"xmlrpc.cache.classifiers": ClassifierIndex(None)}]
+    )
+    def test_execute_classifier_changes_nothing_to_do(self, registry):
+        config = types.SimpleNamespace(registry=registry)
+        session = types.SimpleNamespace(
+            info={"warehouse.legacy.api.xmlrpc.cache.classifier_changes": []}
+        )
+
+        cache.execute_classifier_changes(config, session)
+
+        assert session.info == {}
+
+    def test_execute_classifier_changes_fails(self, mocker):
+        logger = mocker.patch.object(cache, "logger")
+        index = mocker.Mock(spec=ClassifierIndex)
+        index.update.side_effect = redis.exceptions.ConnectionError
+        config = types.SimpleNamespace(registry={"xmlrpc.cache.classifiers": index})
+        session = types.SimpleNamespace(
+            info={
+                "warehouse.legacy.api.xmlrpc.cache.classifier_changes": [
+                    (True, 1, "release-id")
+                ]
+            }
+        )
+
+        cache.execute_classifier_changes(config, session)
+
+        logger.warning.assert_called_once_with(
+            "xmlrpc_classifier_index_update_failed", changes=1
+        )
+
+    def test_discard_classifier_changes(self, mocker):
+        session = types.SimpleNamespace(
+            info={
+                "warehouse.legacy.api.xmlrpc.cache.classifier_changes": [
+                    (True, 1, "release-id")
+                ]
+            }
+        )
+
+        cache.discard_classifier_changes(mocker.sentinel.config, session)
+
+        assert session.info == {}
+
     def test_execute_purge(self, app_config, mocker):
         service = NullXMLRPCCache("null://", mocker.stub(name="purger"))
         purge_tags = mocker.spy(service, "purge_tags")
@@ -0,0 +1,166 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import datetime
+
+import pytest
+
+from warehouse.legacy.api.xmlrpc import changelog
+from warehouse.legacy.api.xmlrpc.changelog import JournalWindow
+from warehouse.legacy.api.xmlrpc.views import _clean_for_xml
+from warehouse.utils import refresh
+
+from .....common.db.packaging import JournalEntryFactory
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(refresh.time, "monotonic", clock)
+    return clock
+
+
+def _tuple(entry):
+    return (
+        entry.name,
+        entry.version,
+        int(entry.submitted_date.replace(tzinfo=datetime.UTC).timestamp()),
+        entry.action,
+        entry.id,
+    )
+
+
+class TestJournalWindow:
+    def test_since_before_refresh(self):
+        with pytest.raises(RuntimeError):
+            JournalWindow(_clean_for_xml).since(0, 10)
+
+    def test_loads_recent_entries(self, db_session, clock):
+        entries = JournalEntryFactory.create_batch(5)
+
+        window = JournalWindow(_clean_for_xml)
+        window.refresh(db_session)
+
+        assert window.since(0, 10) == [_tuple(e) for e in entries]
+        assert window.since(entries[1].id, 10) == [_tuple(e) for e in entries[2:]]
+        assert window.since(entries[1].id, 2) == [_tuple(e) for e in entries[2:4]]
+        assert window.since(entries[-1].id, 10) == []
+        # Anything before the first journal entry is still covered.
+        assert window._window.floor == 0
+        assert window.since(-1, 10) is None
+
+    def test_empty(self, db_session, clock):
+        window = JournalWindow(_clean_for_xml)
+        window.refresh(db_session)
+
+        assert window.since(0, 10) == []
+
+    def test_cleans_actions(self, db_session, clock):
+        JournalEntryFactory.create(action="Stripe\x1b")
+
+        window = JournalWindow(_clean_for_xml)
+        window.refresh(db_session)
+
+        ((_, _, _, action, _),) = window.since(0, 10)
+        assert action == "Stripe"
+
+    def test_only_loads_window(self, db_session, clock, monkeypatch):
+        monkeypatch.setattr(changelog, "WINDOW_SIZE", 3)
+        entries = JournalEntryFactory.create_batch(5)
+
+        window = JournalWindow(_clean_for_xml)
+        window.refresh(db_session)
+
+        assert window.since(entries[0].id, 10) is None
+        assert window.since(entries[1].id, 10) == [_tuple(e) for e in entries[2:]]
+
+    def test_refresh_is_rate_limited(self, db_session, clock):
+        first = JournalEntryFactory.create()
+        window = JournalWindow(_clean_for_xml)
+        window.refresh(db_session)
+
+        second = JournalEntryFactory.create()
+        clock.now += changelog.REFRESH_INTERVAL / 2
+        window.refresh(db_session)
+
+        assert window.since(0, 10) == [_tuple(first)]
+
+        clock.now += changelog.REFRESH_INTERVAL / 2
+        window.refresh(db_session)
+
+        assert window.since(0, 10) == [_tuple(first), _tuple(second)]
+
+    def test_refresh_without_new_entries(self, db_session, clock):
+        JournalEntryFactory.create()
+        window = JournalWindow(_clean_for_xml)
+        window.refresh(db_session)
+        loaded = window._window
+
+        clock.now += changelog.REFRESH_INTERVAL
+        window.refresh(db_session)
+
+        assert window._window is loaded
+
+    def test_refresh_trims_window(self, db_session, clock, monkeypatch):
+        monkeypatch.setattr(changelog, "WINDOW_SIZE", 3)
+        entries = JournalEntryFactory.create_batch(2)
+        window = JournalWindow(_clean_for_xml)
+        window.refresh(db_session)
+
+        entries.extend(JournalEntryFactory.create_batch(3))
+        clock.now += changelog.REFRESH_INTERVAL
+        window.refresh(db_session)
+
+        assert window._window.floor == entries[1].id
+        assert window.since(entries[0].id, 10) is None
+        assert window.since(entries[1].id, 10) == [_tuple(e) for e in entries[2:]]
+
+    def test_refresh_reloads_periodically(self, db_session, clock):
+        entry = JournalEntryFactory.create(action="create")
+        window = JournalWindow(_clean_for_xml)
+        window.refresh(db_session)
+
+        # This change doesn't add a journal entry, so only a reload will find it.
+        entry.action = "changed"
+        db_session.flush()
+
+        clock.now += changelog.REFRESH_INTERVAL
+        window.refresh(db_session)
+
+        assert window.since(0, 10)[0][3] == "create"
+
+        clock.now += changelog.RELOAD_INTERVAL
+        window.refresh(db_session)
+
+        assert window.since(0, 10)[0][3] == "changed"
+        assert window._window.loaded_at == clock.now
+
+    def test_refresh_skipped_while_locked(self, db_session, clock):
+        JournalEntryFactory.create()
+        window = JournalWindow(_clean_for_xml)
+        window.refresh(db_session)
+
+        JournalEntryFactory.create()
+        clock.now += changelog.REFRESH_INTERVAL
+
+        # Another thread is already refreshing, so we use what we have.
+        with window._lock:
+            window.refresh(db_session)
+
+        assert len(window.since(0, 10)) == 1
+
+    def test_refresh_rechecks_after_lock(self, db_session, clock, mocker):
+        window = JournalWindow(_clean_for_xml)
+        load = mocker.patch.object(window, "_load")
+        window._is_fresh = mocker.Mock(side_effect=[False, True])
+
+        window.refresh(db_session)
+
+        load.assert_not_called()
@@ -0,0 +1,20 @@
+# SPDX-License-Identifier: Apache-2.0
+
+from pyramid.registry import Registry
+
+from warehouse.legacy.api import xmlrpc
+from warehouse.legacy.api.xmlrpc.changelog import JournalWindow
+from warehouse.legacy.api.xmlrpc.views import _clean_for_xml
+
+
+def test_includeme(mocker):
+    registry = Registry()
+    registry.settings = {"warehouse.xmlrpc.client.ratelimit_string": "10 per hour"}
+    config = mocker.Mock(registry=registry)
+
+    xmlrpc.includeme(config)
+
+    config.register_rate_limiter.assert_called_once_with("10 per hour", "xmlrpc.client")
+    window = registry["xmlrpc.changelog"]
+    assert isinstance(window, JournalWindow)
+    assert window._clean is _clean_for_xml
@@ -3,11 +3,14 @@
 import datetime
 
 import pytest
+import redis
 
 from pyramid.httpexceptions import HTTPMethodNotAllowed
 from pyramid_rpc.xmlrpc import XmlRpcApplicationError
 
-from warehouse.legacy.api.xmlrpc import views as xmlrpc
+from warehouse.legacy.api.xmlrpc import changelog, views as xmlrpc
+from warehouse.legacy.api.xmlrpc.cache import ClassifierIndex
+from warehouse.legacy.api.xmlrpc.changelog import JournalWindow
 from warehouse.packaging.models import Classifier
 from warehouse.rate_limiting import RateLimiter
 from warehouse.rate_limiting.interfaces import IRateLimiter, WindowStats
@@ -169,6 +172,19 @@ def test_list_packages_with_serial(db_request):
     assert xmlrpc.list_packages_with_serial(db_request) == expected
 
 
+def test_list_packages_with_serial_since(db_request):
+    old, new = ProjectFactory.create_batch(2)
+    JournalEntryFactory.create(name=old.name)
+    since = JournalEntryFactory.create(name=new.name).id
+    last = JournalEntryFactory.create(name=new.name)
+    ProjectFactory.create()
+
+    assert xmlrpc.list_packages_with_serial_since(db_request, since) == {
+        new.name: last.id
+    }
+    assert xmlrpc.list_packages_with_serial_since(db_request, last.id) == {}
+
+
 def test_user_packages(db_request):
     user = UserFactory.create()
     other_user = UserFactory.create()
@@ -324,6 +340,28 @@ def test_changelog_since_serial(db_request):
     assert xmlrpc.changelog_since_serial(db_request, serial) == expected
 
 
+@pytest.mark.parametrize("window_size", [100, 10])
+def test_changelog_since_serial_window(db_request, monkeypatch, window_size):
+    monkeypatch.setattr(changelog, "WINDOW_SIZE", window_size)
+    db_request.registry["xmlrpc.changelog"] = JournalWindow(xmlrpc._clean_for_xml)
+    entries = JournalEntryFactory.create_batch(20)
+
+    expected = [
+        (
+            e.name,
+            e.version,
+            int(e.submitted_date.replace(tzinfo=datetime.UTC).timestamp()),
+            e.action,
+            e.id,
+        )
+        for e in entries
+    ]
+
+    # With a window of 10 entries, the older serial has to go to the database.
+    assert xmlrpc.changelog_since_serial(db_request, entries[4].id) == expected[5:]
+    assert xmlrpc.changelog_since_serial(db_request, entries[14].id) == expected[15:]
+
+
 def test_changelog(pyramid_request):
     with pytest.raises(xmlrpc.XMLRPCWrappedError) as exc:
         xmlrpc.changelog(pyramid_request, 0)
@@ -390,6 +428,82 @@ def test_browse(db_request):
     ) == {(expected_release.project.name, expected_release.version)}
 
 
+@pytest.mark.parametrize(
+    "classifiers",
+    [
+        [],
+        ["Unknown :: Classifier"],
+        ["Environment :: Other Environment", "Unknown :: Classifier"],
+        ["Environment :: Other Environment", "Environment :: Other Environment"],
+    ],
+)
+def test_browse_matches_nothing(db_request, classifiers):
+    classifier = Classifier(classifier="Environment :: Other Environment")
+    db_request.db.add(classifier)
+    ReleaseFactory.create(_classifiers=[classifier])
+
+    assert xmlrpc.browse(db_request, classifiers) == []
+
+
+def test_browse_no_intersection(db_request):
+    classifiers = [
+        Classifier(classifier="Environment :: Other Environment"),
+        Classifier(classifier="Programming Language :: Python"),
+    ]
+    for classifier in classifiers:
+        db_request.db.add(classifier)
+        ReleaseFactory.create(_classifiers=[classifier])
+
+    assert xmlrpc.browse(db_request, [c.classifier for c in classifiers]) == []
+
+
+def test_browse_indexed(db_request, mockredis):
+    classifiers = [
+        Classifier(classifier="Environment :: Other Environment"),
+        Classifier(classifier="Programming Language :: Python"),
+    ]
+    for classifier in classifiers:
+        db_request.db.add(classifier)
+    release = ReleaseFactory.create(_classifiers=classifiers)
+    ReleaseFactory.create(_classifiers=classifiers[:1])
+    deleted = ReleaseFactory.create(_classifiers=classifiers)
+    deleted_id = str(deleted.id)
+    db_request.db.delete(deleted)
+    db_request.db.flush()
+    index = ClassifierIndex(mockredis)
+    db_request.registry["xmlrpc.cache.classifiers"] = index
+
+    # The index may still include releases which have since been deleted.
+    index.update([(True, classifier.id, deleted_id) for classifier in classifiers])
+
+    assert xmlrpc.browse(db_request, [c.classifier for c in classifiers]) == [
+        (release.project.name, release.version)
+    ]
+    assert mockredis.cache[index.format_key(classifiers[1].id)] == {
+        str(release.id),
+        deleted_id,
+        "",
+    }
+
+
+def test_browse_index_unavailable(db_request, mocker):
+    classifiers = [
+        Classifier(classifier="Environment :: Other Environment"),
+        Classifier(classifier="Programming Language :: Python"),
+    ]
+    for classifier in classifiers:
+        db_request.db.add(classifier)
+    release = ReleaseFactory.create(_classifiers=classifiers)
+    ReleaseFactory.create(_classifiers=classifiers[1:])
+    index = mocker.Mock(spec=ClassifierIndex)
+    index.release_ids.side_effect = redis.exceptions.ConnectionError
+    db_request.registry["xmlrpc.cache.classifiers"] = index
+
+    assert xmlrpc.browse(db_request, [c.classifier for c in classifiers]) == [
+        (release.project.name, release.version)
+    ]
+
+
 def test_multicall(pyramid_request):
     with pytest.raises(xmlrpc.XMLRPCWrappedError) as exc:
         xmlrpc.multicall(pyramid_request, [])
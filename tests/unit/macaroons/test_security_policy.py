@@ -136,7 +136,10 @@ class TestMacaroonSecurityPolicy:
             macaroon_service, "find_from_raw", autospec=True, return_value=macaroon
         )
         mocker.patch.object(
-            user_service, "is_disabled", autospec=True, return_value=(True, Exception)
+            user_service,
+            "is_user_disabled",
+            autospec=True,
+            return_value=(True, Exception),
         )
 
         find_service = mocker.spy(pyramid_request, "find_service")
@@ -151,9 +154,7 @@ class TestMacaroonSecurityPolicy:
         macaroon_service.find_from_raw.assert_called_once_with(
             mocker.sentinel.raw_macaroon
         )
-        user_service.is_disabled.assert_called_once_with(
-            "deadbeef-dead-beef-deadbeef-dead"
-        )
+        user_service.is_user_disabled.assert_called_once_with(user)
 
         add_vary_cb.assert_called_once_with("Authorization")
         add_response_callback.assert_called_once_with(add_vary_cb.spy_return)
@@ -177,7 +178,10 @@ class TestMacaroonSecurityPolicy:
             macaroon_service, "find_from_raw", autospec=True, return_value=macaroon
         )
         mocker.patch.object(
-            user_service, "is_disabled", autospec=True, return_value=(False, Exception)
+            user_service,
+            "is_user_disabled",
+            autospec=True,
+            return_value=(False, None),
         )
 
         find_service = mocker.spy(pyramid_request, "find_service")
@@ -192,9 +196,7 @@ class TestMacaroonSecurityPolicy:
         macaroon_service.find_from_raw.assert_called_once_with(
             mocker.sentinel.raw_macaroon
         )
-        user_service.is_disabled.assert_called_once_with(
-            "deadbeef-dead-beef-deadbeef-dead"
-        )
+        user_service.is_user_disabled.assert_called_once_with(user)
 
         add_vary_cb.assert_called_once_with("Authorization")
         add_response_callback.assert_called_once_with(add_vary_cb.spy_return)
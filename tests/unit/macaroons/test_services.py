@@ -23,12 +23,52 @@ def test_database_macaroon_factory(db_request):
     assert service.db is db_request.db
 
 
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(services.time, "monotonic", clock)
+    return clock
+
+
+class TestLastUsedRecorder:
+    def test_due_once_per_interval(self, clock):
+        last_used = services.LastUsedRecorder(interval=60)
+        macaroon_id = uuid4()
+
+        assert last_used.due(macaroon_id)
+        clock.now += 59
+        assert not last_used.due(macaroon_id)
+        assert last_used.due(uuid4())
+        clock.now += 1
+        assert last_used.due(macaroon_id)
+
+    def test_forgets_least_recently_recorded(self, clock):
+        last_used = services.LastUsedRecorder(max_entries=2)
+        first, second, third = uuid4(), uuid4(), uuid4()
+
+        assert last_used.due(first)
+        assert last_used.due(second)
+        assert last_used.due(third)
+
+        assert last_used.due(first)
+        assert not last_used.due(third)
+
+
 class TestDatabaseMacaroonService:
     def test_creation(self, mocker):
         session = mocker.sentinel.session
         service = services.DatabaseMacaroonService(session)
 
         assert service.db is session
+        assert service.last_used is None
 
     @pytest.mark.parametrize(
         ("raw_macaroon", "result"),
@@ -63,6 +103,21 @@ class TestDatabaseMacaroonService:
         assert macaroon.id == dm.id
         assert macaroon.user == user
 
+    def test_find_macaroon_cached(self, mocker, macaroon_service):
+        user = UserFactory.create()
+        _, macaroon = macaroon_service.create_macaroon(
+            "fake location",
+            "fake description",
+            [caveats.RequestUser(user_id=str(user.id))],
+            user_id=user.id,
+        )
+        execute = mocker.spy(macaroon_service.db, "execute")
+
+        dm = macaroon_service.find_macaroon(str(macaroon.id))
+
+        assert macaroon_service.find_macaroon(str(macaroon.id)) is dm
+        assert execute.call_count == 1
+
     def test_find_from_raw(self, user_service, macaroon_service):
         user = UserFactory.create()
         serialized, macaroon = macaroon_service.create_macaroon(
@@ -337,6 +392,33 @@ class TestDatabaseMacaroonService:
             {"cid": "[0,5,2]", "cl": None, "vid": None},
         ]
 
+    @pytest.mark.parametrize("due", [True, False])
+    def test_verify_records_last_used(self, mocker, db_request, db_session, due):
+        last_used = mocker.Mock(spec=services.LastUsedRecorder)
+        last_used.due.return_value = due
+        macaroon_service = services.DatabaseMacaroonService(
+            db_session, last_used=last_used
+        )
+        user = UserFactory.create()
+        raw_macaroon, dm = macaroon_service.create_macaroon(
+            "fake location",
+            "fake description",
+            [caveats.RequestUser(user_id=str(user.id))],
+            user_id=user.id,
+        )
+        mocker.patch.object(caveats, "verify", autospec=True, return_value=True)
+
+        assert macaroon_service.verify(
+            raw_macaroon,
+            db_request,
+            mocker.sentinel.context,
+            mocker.sentinel.permission,
+        )
+
+        last_used.due.assert_called_once_with(dm.id)
+        db_session.refresh(dm)
+        assert (dm.last_used is not None) is due
+
     @pytest.fixture
     def user_macaroon(self, macaroon_service):
         """A user-scoped macaroon, as a (raw, database model) pair."""
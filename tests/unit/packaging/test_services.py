@@ -44,6 +44,7 @@ from warehouse.packaging.services import (
     project_service_factory,
 )
 from warehouse.packaging.tasks import typo_check_project_name
+from warehouse.rate_limiting import DummyRateLimiter
 from warehouse.rate_limiting.interfaces import WindowStats
 
 from ...common.db.accounts import UserFactory
@@ -1098,6 +1099,24 @@ class TestProjectService:
 
         ratelimit_service.hit.assert_not_called()
 
+    def test_hit_ratelimits_stops_at_ip_limiter(
+        self, project_service, db_request, mocker
+    ):
+        """A request refused by the IP limiter doesn't hit the user limiter."""
+        creator = UserFactory.create()
+        ip_limiter = DummyRateLimiter()
+        user_limiter = DummyRateLimiter()
+        mocker.patch.object(ip_limiter, "hit", return_value=False)
+        mocker.spy(user_limiter, "hit")
+        project_service.ratelimiters["project.create.ip"] = ip_limiter
+        project_service.ratelimiters["project.create.user"] = user_limiter
+
+        with pytest.raises(TooManyProjectsCreated):
+            project_service._hit_ratelimits(db_request, creator)
+
+        ip_limiter.hit.assert_called_once_with(db_request.remote_addr)
+        user_limiter.hit.assert_not_called()
+
     def test_create_project_rejects_when_hit_exceeds_limit(
         self, project_service, db_request, ratelimit_service, mocker
     ):
@@ -0,0 +1,129 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+
+from limits import parse_many
+
+from warehouse.rate_limiting import buckets
+from warehouse.rate_limiting.buckets import TokenBuckets
+from warehouse.rate_limiting.interfaces import WindowStats
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(buckets.time, "monotonic", clock)
+    return clock
+
+
+class TestTokenBuckets:
+    @pytest.mark.parametrize(
+        ("limit", "fraction", "expected"),
+        [
+            ("3600 per hour", 0.01, 36),
+            ("100 per minute, 1000 per hour", 0.1, 10),
+            ("10 per 5 minutes", 0.1, 0),
+            ("20 per hour", 0.1, 2),
+        ],
+    )
+    def test_lease_size(self, limit, fraction, expected):
+        assert TokenBuckets(fraction=fraction).lease_size(parse_many(limit)) == (
+            expected
+        )
+
+    def test_take(self, clock):
+        token_buckets = TokenBuckets(fraction=0.1)
+        assert not token_buckets.take("foo")
+
+        token_buckets.fill("foo", 2, expires_in=60)
+
+        assert token_buckets.has_tokens("foo")
+        assert token_buckets.take("foo")
+        assert token_buckets.take("foo")
+        assert not token_buckets.has_tokens("foo")
+        assert not token_buckets.take("foo")
+        assert token_buckets.may_lease("foo")
+
+    @pytest.mark.parametrize(("ttl", "expires_in"), [(10, 60), (60, 10)])
+    def test_expires(self, clock, ttl, expires_in):
+        token_buckets = TokenBuckets(fraction=0.1, ttl=ttl)
+        token_buckets.fill("foo", 2, expires_in=expires_in)
+
+        clock.now += 10
+
+        assert not token_buckets.has_tokens("foo")
+        assert token_buckets._leases == {}
+
+    def test_refuse(self, clock):
+        token_buckets = TokenBuckets(fraction=0.1)
+
+        token_buckets.refuse("foo", expires_in=60)
+
+        assert not token_buckets.may_lease("foo")
+        assert not token_buckets.take("foo")
+
+        clock.now += 10
+
+        assert token_buckets.may_lease("foo")
+
+    def test_window_stats(self, clock):
+        token_buckets = TokenBuckets(fraction=0.1)
+        assert token_buckets.window_stats("foo") is None
+        token_buckets.fill(
+            "foo",
+            3,
+            expires_in=60,
+            stats=[
+                WindowStats(
+                    amount=100, window_seconds=60, remaining=90, resets_in_seconds=60
+                ),
+                WindowStats(
+                    amount=10, window_seconds=5, remaining=9, resets_in_seconds=4
+                ),
+            ],
+        )
+
+        token_buckets.take("foo")
+        clock.now += 5.5
+
+        assert token_buckets.window_stats("foo") == [
+            WindowStats(
+                amount=100, window_seconds=60, remaining=92, resets_in_seconds=55
+            ),
+            WindowStats(amount=10, window_seconds=5, remaining=10, resets_in_seconds=0),
+        ]
+
+    def test_window_stats_without_stats(self, clock):
+        token_buckets = TokenBuckets(fraction=0.1)
+        token_buckets.fill("foo", 3, expires_in=60)
+
+        assert token_buckets.window_stats("foo") is None
+
+    def test_drops_least_recently_used(self, clock):
+        token_buckets = TokenBuckets(fraction=0.1, max_entries=2)
+
+        token_buckets.fill("first", 1, expires_in=60)
+        token_buckets.fill("second", 1, expires_in=60)
+        assert token_buckets.has_tokens("first")
+        token_buckets.fill("third", 1, expires_in=60)
+
+        assert token_buckets.has_tokens("first")
+        assert not token_buckets.has_tokens("second")
+        assert token_buckets.has_tokens("third")
+
+    def test_drop(self, clock):
+        token_buckets = TokenBuckets(fraction=0.1)
+        token_buckets.fill("foo", 1, expires_in=60)
+
+        token_buckets.drop("foo")
+        token_buckets.drop("bar")
+
+        assert not token_buckets.has_tokens("foo")
@@ -3,12 +3,33 @@
 import datetime
 
 import pretend
+import pytest
 import redis
 
 from limits import storage
 
 from warehouse import rate_limiting
-from warehouse.rate_limiting import DummyRateLimiter, RateLimit, RateLimiter
+from warehouse.rate_limiting import (
+    DummyRateLimiter,
+    RateLimit,
+    RateLimiter,
+    first_exceeded,
+    hit_all,
+)
+from warehouse.rate_limiting.buckets import TokenBuckets
+
+
+@pytest.fixture
+def redis_storage():
+    return storage.RedisStorage("redis://localhost:0/")
+
+
+@pytest.fixture
+def script(mocker):
+    script = mocker.Mock()
+    mocker.patch.object(rate_limiting, "_moving_windows_script", return_value=script)
+    mocker.patch.object(rate_limiting.time, "time", return_value=1000.0)
+    return script
 
 
 class TestRateLimiter:
@@ -149,6 +170,311 @@ class TestRateLimiter:
         assert resets_in <= datetime.timedelta(seconds=5)
 
 
+class TestScriptedRateLimiter:
+    @pytest.mark.parametrize(("results", "expected"), [([1, 1], True), ([1, 0], False)])
+    def test_test(self, redis_storage, script, metrics, results, expected):
+        script.return_value = results
+        limiter = RateLimiter(
+            redis_storage,
+            "1 per minute, 5 per hour",
+            identifiers=["foo"],
+            metrics=metrics,
+        )
+
+        assert limiter.test("bar") is expected
+        script.assert_called_once_with(
+            keys=[
+                "LIMITS:LIMITER/foo/bar/1/1/minute",
+                "LIMITS:LIMITER/foo/bar/5/1/hour",
+            ],
+            args=[1000.0, 0, 1, 60, 0, 1, 5, 3600, 0, 1],
+        )
+
+    @pytest.mark.parametrize(("results", "expected"), [([1], True), ([0], False)])
+    def test_hit(self, redis_storage, script, metrics, results, expected):
+        script.return_value = results
+        limiter = RateLimiter(redis_storage, "1 per minute", metrics=metrics)
+
+        assert limiter.hit("bar") is expected
+        script.assert_called_once_with(
+            keys=["LIMITS:LIMITER/bar/1/1/minute"], args=[1000.0, 1, 1, 60, 0, 1]
+        )
+
+    def test_registers_script_once(self):
+        register_script = pretend.call_recorder(lambda script: pretend.stub())
+        storage_ = pretend.stub(
+            get_connection=lambda: pretend.stub(register_script=register_script)
+        )
+
+        try:
+            assert rate_limiting._moving_windows_script(
+                storage_
+            ) is rate_limiting._moving_windows_script(storage_)
+        finally:
+            rate_limiting._moving_windows_script.cache_clear()
+
+        assert register_script.calls == [
+            pretend.call(rate_limiting._MOVING_WINDOWS_SCRIPT)
+        ]
+
+    def test_not_for_cluster(self):
+        cluster = storage.RedisClusterStorage.__new__(storage.RedisClusterStorage)
+
+        assert rate_limiting._redis_storage(cluster) is None
+
+
+class TestFirstExceeded:
+    @pytest.mark.parametrize(
+        ("results", "expected"),
+        [([1, 1, 1], None), ([1, 1, 0], 1), ([0, 1, 0], 0)],
+    )
+    def test_scripted(self, redis_storage, script, metrics, results, expected):
+        script.return_value = results
+        ip = RateLimiter(redis_storage, "1 per minute", metrics=metrics)
+        user = RateLimiter(redis_storage, "1 per minute, 5 per hour", metrics=metrics)
+
+        assert first_exceeded([(ip, ["1.2.3.4"]), (user, [1])]) == expected
+        script.assert_called_once_with(
+            keys=[
+                "LIMITS:LIMITER/1.2.3.4/1/1/minute",
+                "LIMITS:LIMITER/1/1/1/minute",
+                "LIMITS:LIMITER/1/5/1/hour",
+            ],
+            args=[1000.0, 0, 1, 60, 0, 1, 1, 60, 1, 1, 5, 3600, 1, 1],
+        )
+
+    def test_sequential(self, metrics):
+        storage_ = storage.MemoryStorage()
+        ip = RateLimiter(storage_, "1 per minute", identifiers=["ip"], metrics=metrics)
+        user = RateLimiter(
+            storage_, "1 per minute", identifiers=["user"], metrics=metrics
+        )
+        dummy = pretend.stub(test=pretend.call_recorder(lambda *a: True))
+
+        assert first_exceeded([(ip, ["foo"]), (user, ["foo"]), (dummy, [])]) is None
+
+        user.hit("foo")
+
+        assert first_exceeded([(ip, ["foo"]), (user, ["foo"]), (dummy, [])]) == 1
+        assert dummy.test.calls == [pretend.call()]
+
+    def test_different_storages(self, redis_storage, script, metrics):
+        scripted = RateLimiter(redis_storage, "1 per minute", metrics=metrics)
+        memory = RateLimiter(storage.MemoryStorage(), "1 per minute", metrics=metrics)
+        script.return_value = [0]
+
+        assert first_exceeded([(memory, ["foo"]), (scripted, ["foo"])]) == 1
+        assert script.call_count == 1
+
+    def test_error(self, redis_storage, script, metrics):
+        script.side_effect = redis.ConnectionError
+        limiter = RateLimiter(redis_storage, "1 per minute", metrics=metrics)
+
+        assert first_exceeded([(limiter, ["foo"]), (limiter, ["bar"])]) is None
+        assert metrics.increment.calls == [
+            pretend.call("warehouse.ratelimiter.error", tags=["call:first_exceeded"])
+        ]
+
+
+class TestHitAll:
+    def test_scripted(self, redis_storage, script, metrics):
+        script.return_value = [1, 0, 0]
+        ip = RateLimiter(redis_storage, "1 per minute", metrics=metrics)
+        user = RateLimiter(redis_storage, "1 per minute, 5 per hour", metrics=metrics)
+
+        assert hit_all([(ip, ["1.2.3.4"]), (user, [1])]) == [True, False]
+        script.assert_called_once_with(
+            keys=[
+                "LIMITS:LIMITER/1.2.3.4/1/1/minute",
+                "LIMITS:LIMITER/1/1/1/minute",
+                "LIMITS:LIMITER/1/5/1/hour",
+            ],
+            args=[1000.0, 1, 1, 60, 0, 1, 1, 60, 1, 1, 5, 3600, 1, 1],
+        )
+
+    def test_sequential(self, metrics):
+        storage_ = storage.MemoryStorage()
+        ip = RateLimiter(storage_, "1 per minute", identifiers=["ip"], metrics=metrics)
+        user = RateLimiter(
+            storage_, "2 per minute", identifiers=["user"], metrics=metrics
+        )
+
+        assert hit_all([(ip, ["foo"]), (user, ["foo"])]) == [True, True]
+        assert hit_all([(ip, ["foo"]), (user, ["foo"])]) == [False, True]
+        assert hit_all([(ip, ["foo"]), (user, ["foo"])]) == [False, False]
+
+    def test_error(self, redis_storage, script, metrics):
+        script.side_effect = redis.ConnectionError
+        limiter = RateLimiter(redis_storage, "1 per minute", metrics=metrics)
+
+        assert hit_all([(limiter, ["foo"]), (limiter, ["bar"])]) == [True, True]
+        assert metrics.increment.calls == [
+            pretend.call("warehouse.ratelimiter.error", tags=["call:hit_all"])
+        ]
+
+
+class TestPreFilteredRateLimiter:
+    def test_small_limits_not_prefiltered(self, metrics):
+        limiter = RateLimiter(
+            storage.MemoryStorage(),
+            "10 per minute",
+            metrics=metrics,
+            buckets=TokenBuckets(fraction=0.1),
+        )
+
+        assert limiter._buckets is None
+        assert limiter._lease_cost(["foo"]) == 1
+
+    def test_hits_from_lease(self, metrics, mocker):
+        limiter = RateLimiter(
+            storage.MemoryStorage(),
+            "100 per minute, 1000 per hour",
+            metrics=metrics,
+            buckets=TokenBuckets(fraction=0.1),
+        )
+        hit = mocker.spy(limiter._window, "hit")
+        test = mocker.spy(limiter._window, "test")
+
+        assert all(limiter.hit("foo") for _ in range(10))
+        assert hit.call_count == 2
+        assert limiter.hit("foo")
+        assert hit.call_count == 4
+        assert {c.kwargs["cost"] for c in hit.call_args_list} == {10}
+        assert limiter.test("foo")
+        test.assert_not_called()
+        assert [s.remaining for s in limiter.get_window_stats("foo")] == [89, 989]
+
+    def test_refused_lease(self, metrics, mocker):
+        storage_ = storage.MemoryStorage()
+        limiter = RateLimiter(
+            storage_,
+            "20 per minute",
+            metrics=metrics,
+            buckets=TokenBuckets(fraction=0.5),
+        )
+        unfiltered = RateLimiter(storage_, "20 per minute", metrics=metrics)
+        for _ in range(15):
+            unfiltered.hit("foo")
+        hit = mocker.spy(limiter._window, "hit")
+
+        assert limiter.hit("foo")
+        assert limiter.hit("foo")
+
+        assert [c.kwargs["cost"] for c in hit.call_args_list] == [10, 1, 1]
+        assert limiter._buckets.window_stats(limiter._bucket_key(["foo"])) is None
+        assert limiter.get_window_stats("foo")[0].remaining == 3
+
+    def test_clear_drops_lease(self, metrics):
+        limiter = RateLimiter(
+            storage.MemoryStorage(),
+            "100 per minute",
+            metrics=metrics,
+            buckets=TokenBuckets(fraction=0.1),
+        )
+        limiter.hit("foo")
+
+        limiter.clear("foo")
+
+        assert not limiter._buckets.has_tokens(limiter._bucket_key(["foo"]))
+        assert limiter.get_window_stats("foo")[0].remaining == 100
+
+
+class TestPreFilteredBatches:
+    @pytest.fixture
+    def buckets(self):
+        return TokenBuckets(fraction=0.1)
+
+    def test_first_exceeded_from_leases(self, redis_storage, script, buckets):
+        limiter = RateLimiter(
+            redis_storage, "100 per minute", metrics=pretend.stub(), buckets=buckets
+        )
+        limiter._fill_bucket(["foo"], 5)
+
+        assert first_exceeded([(limiter, ["foo"])]) is None
+        assert script.call_count == 0
+
+    def test_first_exceeded_partly_from_leases(
+        self, redis_storage, script, buckets, metrics
+    ):
+        leased = RateLimiter(
+            redis_storage,
+            "100 per minute",
+            identifiers=["leased"],
+            metrics=metrics,
+            buckets=buckets,
+        )
+        other = RateLimiter(
+            redis_storage, "1 per minute", identifiers=["other"], metrics=metrics
+        )
+        leased._fill_bucket(["foo"], 5)
+        script.return_value = [0]
+
+        assert first_exceeded([(leased, ["foo"]), (other, ["foo"])]) == 1
+        script.assert_called_once_with(
+            keys=["LIMITS:LIMITER/other/foo/1/1/minute"],
+            args=[1000.0, 0, 1, 60, 0, 1],
+        )
+
+    def test_hit_all_from_leases(self, redis_storage, script, buckets, metrics):
+        limiter = RateLimiter(
+            redis_storage, "100 per minute", metrics=metrics, buckets=buckets
+        )
+        limiter._fill_bucket(["foo"], 1)
+
+        assert hit_all([(limiter, ["foo"])]) == [True]
+        assert script.call_count == 0
+
+    def test_hit_all_leases(self, redis_storage, script, buckets, metrics):
+        leased = RateLimiter(
+            redis_storage,
+            "100 per minute",
+            identifiers=["leased"],
+            metrics=metrics,
+            buckets=buckets,
+        )
+        other = RateLimiter(
+            redis_storage, "1 per minute", identifiers=["other"], metrics=metrics
+        )
+        script.return_value = [1, 1]
+
+        assert hit_all([(leased, ["foo"]), (other, ["foo"])]) == [True, True]
+        script.assert_called_once_with(
+            keys=[
+                "LIMITS:LIMITER/leased/foo/100/1/minute",
+                "LIMITS:LIMITER/other/foo/1/1/minute",
+            ],
+            args=[1000.0, 1, 100, 60, 0, 10, 1, 60, 1, 1],
+        )
+        assert buckets.take(leased._bucket_key(["foo"]))
+
+    @pytest.mark.parametrize(("retried", "expected"), [([1], True), ([0], False)])
+    def test_hit_all_refused_lease(
+        self, redis_storage, script, buckets, metrics, retried, expected
+    ):
+        limiter = RateLimiter(
+            redis_storage, "100 per minute", metrics=metrics, buckets=buckets
+        )
+        script.side_effect = [[0], retried]
+
+        assert hit_all([(limiter, ["foo"])]) == [expected]
+        assert [c.kwargs["args"][-1] for c in script.call_args_list] == [10, 1]
+        assert not buckets.may_lease(limiter._bucket_key(["foo"]))
+
+    @pytest.mark.parametrize(
+        "results", [[redis.ConnectionError], [[0], redis.ConnectionError]]
+    )
+    def test_hit_all_error(self, redis_storage, script, buckets, metrics, results):
+        limiter = RateLimiter(
+            redis_storage, "100 per minute", metrics=metrics, buckets=buckets
+        )
+        script.side_effect = results
+
+        assert hit_all([(limiter, ["foo"])]) == [True]
+        assert metrics.increment.calls == [
+            pretend.call("warehouse.ratelimiter.error", tags=["call:hit_all"])
+        ]
+
+
 class TestDummyRateLimiter:
     def test_basic(self):
         limiter = DummyRateLimiter()
@@ -167,6 +493,7 @@ class TestRateLimit:
 
         context = pretend.stub()
         pyramid_request.registry["ratelimiter.storage"] = pretend.stub()
+        pyramid_request.registry["ratelimiter.buckets"] = pretend.stub()
 
         result = RateLimit(
             "1 per 5 minutes", identifiers=["foo"], limiter_class=limiter_class
@@ -179,6 +506,7 @@ class TestRateLimit:
                 limit="1 per 5 minutes",
                 identifiers=["foo"],
                 metrics=metrics,
+                buckets=pyramid_request.registry["ratelimiter.buckets"],
             )
         ]
 
@@ -217,6 +545,24 @@ def test_includeme():
         pretend.call("warehouse.rate_limiting.headers.rate_limit_headers_tween_factory")
     ]
     assert isinstance(registry["ratelimiter.storage"], storage.MemoryStorage)
+    assert "ratelimiter.buckets" not in registry
+
+
+def test_includeme_with_local_fraction():
+    registry = {}
+    config = pretend.stub(
+        add_directive=lambda name, func: None,
+        add_tween=lambda factory: None,
+        registry=pretend.stub(
+            settings={"ratelimit.url": "memory://", "ratelimit.local_fraction": 0.05},
+            __setitem__=registry.__setitem__,
+        ),
+    )
+
+    rate_limiting.includeme(config)
+
+    assert isinstance(registry["ratelimiter.buckets"], TokenBuckets)
+    assert registry["ratelimiter.buckets"].fraction == 0.05
 
 
 def test_register_rate_limiter_directive():
@@ -55,7 +55,7 @@ def test_execute_reindex_success(app_config, mocker):
 
     search.execute_project_reindex(app_config, session)
 
-    delay.assert_called_once_with("foo")
+    delay.assert_called_once_with(["foo"])
     assert "warehouse.search.project_updates" not in session.info
 
 
@@ -72,7 +72,7 @@ def test_execute_unindex_success(app_config, mocker):
 
     search.execute_project_reindex(app_config, session)
 
-    delay.assert_called_once_with("foo")
+    delay.assert_called_once_with(["foo"])
     assert "warehouse.search.project_deletes" not in session.info
 
 
@@ -158,6 +158,7 @@ def test_includeme(mocker):
     assert registry["opensearch.index"] == "some-index"
     assert registry["opensearch.shards"] == 1
     assert registry["opensearch.replicas"] == 0
+    assert isinstance(registry["search.name_index"], search.ProjectNameIndex)
     config.add_request_method.assert_called_once_with(
         search.opensearch, name="opensearch", reify=True
     )
@@ -1,9 +1,50 @@
 # SPDX-License-Identifier: Apache-2.0
 
-from warehouse.search.services import NullSearchService
+import types
+
+from warehouse.search import services, tasks
+from warehouse.search.services import NullSearchService, SearchService
 
 
 class TestSearchService:
+    def test_reindex_batches_projects(self, mocker):
+        mocker.patch.object(services, "REINDEX_BATCH_SIZE", 2)
+        delay = mocker.stub(name="delay")
+        task = mocker.Mock(return_value=types.SimpleNamespace(delay=delay))
+        config = types.SimpleNamespace(task=task)
+        projects = [types.SimpleNamespace(normalized_name=n) for n in "cbad"]
+
+        service = SearchService.create_service(mocker.sentinel.context, config)
+        service.reindex(config, projects)
+
+        task.assert_called_with(tasks.reindex_projects)
+        assert delay.call_args_list == [
+            mocker.call(["a", "b"]),
+            mocker.call(["c", "d"]),
+        ]
+
+    def test_unindex_batches_projects(self, mocker):
+        delay = mocker.stub(name="delay")
+        task = mocker.Mock(return_value=types.SimpleNamespace(delay=delay))
+        config = types.SimpleNamespace(task=task)
+        projects = [types.SimpleNamespace(normalized_name=n) for n in "ba"]
+
+        service = SearchService.create_service(mocker.sentinel.context, config)
+        service.unindex(config, projects)
+
+        task.assert_called_once_with(tasks.reindex_projects)
+        delay.assert_called_once_with(["a", "b"])
+
+    def test_no_projects(self, mocker):
+        task = mocker.Mock()
+        config = types.SimpleNamespace(task=task)
+
+        service = SearchService.create_service(mocker.sentinel.context, config)
+        service.reindex(config, [])
+        service.unindex(config, set())
+
+        task.assert_not_called()
+
     def test_null_service(self, mocker):
         service = NullSearchService.create_service(
             mocker.sentinel.context, mocker.sentinel.request
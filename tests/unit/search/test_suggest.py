@@ -0,0 +1,215 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+
+from warehouse.packaging.models import LifecycleStatus
+from warehouse.search import suggest
+from warehouse.search.suggest import ProjectNameIndex, _SortedNames
+
+from ...common.db.packaging import JournalEntryFactory, ProjectFactory
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(suggest.time, "monotonic", clock)
+    return clock
+
+
+class TestSortedNames:
+    def test_sequence(self):
+        names = _SortedNames([b"a", b"bar", b"baz", b"foo"])
+
+        assert len(names) == 4
+        assert names[1] == b"bar"
+        assert list(names) == [b"a", b"bar", b"baz", b"foo"]
+        assert b"baz" in names
+        assert b"ba" not in names
+        assert b"zzz" not in names
+
+    def test_startswith(self):
+        names = _SortedNames([b"a", b"bar", b"baz", b"foo"])
+
+        assert list(names.startswith(b"ba")) == [b"bar", b"baz"]
+        assert list(names.startswith(b"f")) == [b"foo"]
+        assert list(names.startswith(b"q")) == []
+
+    def test_empty(self):
+        names = _SortedNames([])
+
+        assert len(names) == 0
+        assert b"foo" not in names
+        assert list(names.startswith(b"")) == []
+
+
+class TestProjectNameIndex:
+    def test_suggest_before_refresh(self):
+        with pytest.raises(RuntimeError):
+            ProjectNameIndex().suggest("foo")
+
+    def test_loads_visible_projects(self, db_session, clock):
+        for name in ["foo-bar", "Foo_Baz", "foo", "bar"]:
+            ProjectFactory.create(name=name)
+        ProjectFactory.create(
+            name="foo-quarantined", lifecycle_status=LifecycleStatus.QuarantineEnter
+        )
+        ProjectFactory.create(
+            name="foo-archived", lifecycle_status=LifecycleStatus.ArchivedNoindex
+        )
+
+        index = ProjectNameIndex()
+        index.refresh(db_session)
+
+        assert index.suggest("foo") == ["foo", "foo-bar", "foo-baz"]
+        assert index.suggest("foo", limit=2) == ["foo", "foo-bar"]
+        assert index.suggest("foo-") == ["foo-bar", "foo-baz"]
+        assert index.suggest("nope") == []
+
+    def test_refresh_is_rate_limited(self, db_session, clock):
+        ProjectFactory.create(name="foo")
+        index = ProjectNameIndex()
+        index.refresh(db_session)
+
+        ProjectFactory.create(name="foo-new")
+        JournalEntryFactory.create(name="foo-new", action="create")
+        clock.now += suggest.REFRESH_INTERVAL - 1
+        index.refresh(db_session)
+
+        assert index.suggest("foo") == ["foo"]
+
+        clock.now += 1
+        index.refresh(db_session)
+
+        assert index.suggest("foo") == ["foo", "foo-new"]
+
+    def test_refresh_applies_journals(self, db_session, clock):
+        JournalEntryFactory.create(name="old")
+        removed = ProjectFactory.create(name="foo-removed")
+        ProjectFactory.create(name="foo-kept")
+        readded = ProjectFactory.create(name="foo-readded")
+
+        index = ProjectNameIndex()
+        index.refresh(db_session)
+
+        # A project is created, deleted, and hidden.
+        ProjectFactory.create(name="Foo_Added")
+        JournalEntryFactory.create(name="Foo_Added", action="create")
+        db_session.delete(removed)
+        JournalEntryFactory.create(name="foo-removed", action="remove project")
+        readded.lifecycle_status = LifecycleStatus.QuarantineEnter
+        JournalEntryFactory.create(name="foo-readded", action="quarantine")
+        # A project which is created and then removed again never shows up.
+        transient = ProjectFactory.create(name="foo-transient")
+        JournalEntryFactory.create(name="foo-transient", action="create")
+        db_session.flush()
+
+        clock.now += suggest.REFRESH_INTERVAL
+        index.refresh(db_session)
+
+        assert index.suggest("foo") == ["foo-added", "foo-kept", "foo-transient"]
+
+        readded.lifecycle_status = None
+        JournalEntryFactory.create(name="foo-readded", action="unquarantine")
+        db_session.delete(transient)
+        JournalEntryFactory.create(name="foo-transient", action="remove project")
+        db_session.flush()
+
+        clock.now += suggest.REFRESH_INTERVAL
+        index.refresh(db_session)
+
+        assert index.suggest("foo") == ["foo-added", "foo-kept", "foo-readded"]
+        # Changes are still pending, rather than folded into the sorted names.
+        assert index._state.added == (b"foo-added",)
+        assert index._state.removed == frozenset({b"foo-removed"})
+
+    def test_refresh_compacts_pending_changes(self, db_session, clock, monkeypatch):
+        monkeypatch.setattr(suggest, "MAX_PENDING_CHANGES", 1)
+        removed = ProjectFactory.create(name="foo-removed")
+        ProjectFactory.create(name="foo-kept")
+
+        index = ProjectNameIndex()
+        index.refresh(db_session)
+
+        ProjectFactory.create(name="foo-added")
+        JournalEntryFactory.create(name="foo-added", action="create")
+        db_session.delete(removed)
+        JournalEntryFactory.create(name="foo-removed", action="remove project")
+        db_session.flush()
+
+        clock.now += suggest.REFRESH_INTERVAL
+        index.refresh(db_session)
+
+        assert index.suggest("foo") == ["foo-added", "foo-kept"]
+        assert list(index._state.names) == [b"foo-added", b"foo-kept"]
+        assert index._state.added == ()
+        assert index._state.removed == frozenset()
+
+    def test_refresh_reloads_after_many_journals(self, db_session, clock, monkeypatch):
+        monkeypatch.setattr(suggest, "MAX_JOURNAL_ENTRIES", 1)
+        ProjectFactory.create(name="foo")
+
+        index = ProjectNameIndex()
+        index.refresh(db_session)
+
+        for name in ["foo-one", "foo-two"]:
+            ProjectFactory.create(name=name)
+            JournalEntryFactory.create(name=name, action="create")
+
+        clock.now += suggest.REFRESH_INTERVAL
+        index.refresh(db_session)
+
+        assert list(index._state.names) == [b"foo", b"foo-one", b"foo-two"]
+        assert index._loaded_at == clock.now
+
+    def test_refresh_reloads_periodically(self, db_session, clock):
+        ProjectFactory.create(name="foo")
+
+        index = ProjectNameIndex()
+        index.refresh(db_session)
+
+        # This change isn't journaled, so only a full reload will find it.
+        ProjectFactory.create(name="foo-unjournaled")
+
+        clock.now += suggest.REFRESH_INTERVAL
+        index.refresh(db_session)
+
+        assert index.suggest("foo") == ["foo"]
+
+        clock.now += suggest.RELOAD_INTERVAL
+        index.refresh(db_session)
+
+        assert index.suggest("foo") == ["foo", "foo-unjournaled"]
+
+    def test_refresh_skipped_while_locked(self, db_session, clock):
+        ProjectFactory.create(name="foo")
+
+        index = ProjectNameIndex()
+        index.refresh(db_session)
+
+        ProjectFactory.create(name="foo-new")
+        JournalEntryFactory.create(name="foo-new", action="create")
+        clock.now += suggest.REFRESH_INTERVAL
+
+        # Another thread is already refreshing, so we use what we have.
+        with index._lock:
+            index.refresh(db_session)
+
+        assert index.suggest("foo") == ["foo"]
+
+    def test_refresh_rechecks_after_lock(self, db_session, clock, mocker):
+        index = ProjectNameIndex()
+        load = mocker.patch.object(index, "_load")
+        index._refreshed_at = clock.now
+        index._is_fresh = mocker.Mock(side_effect=[False, True])
+
+        index.refresh(db_session)
+
+        load.assert_not_called()
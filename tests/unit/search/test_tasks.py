@@ -20,6 +20,7 @@ from warehouse.search.tasks import (
     _project_docs,
     reindex,
     reindex_project,
+    reindex_projects,
     unindex_project,
 )
 
@@ -115,6 +116,38 @@ def test_single_project_doc(db_session):
     ]
 
 
+def test_project_docs_normalized_names(db_session):
+    projects = ProjectFactory.create_batch(3)
+    releases = {p: ReleaseFactory.create(project=p) for p in projects}
+
+    for p, r in releases.items():
+        r.files = [
+            FileFactory.create(
+                release=r,
+                filename=f"{p.name}-{r.version}.tar.gz",
+                python_version="source",
+            )
+        ]
+
+    wanted = sorted(projects[:2], key=lambda p: p.name)
+    docs = _project_docs(
+        db_session, normalized_names=[p.normalized_name for p in wanted]
+    )
+
+    assert list(docs) == [
+        {
+            "_id": p.normalized_name,
+            "_source": {
+                "created": p.created,
+                "name": p.name,
+                "normalized_name": p.normalized_name,
+                "description": releases[p].description.raw,
+            },
+        }
+        for p in wanted
+    ]
+
+
 def test_project_docs_empty(db_session):
     projects = ProjectFactory.create_batch(2)
     releases = {
@@ -578,3 +611,85 @@ class TestPartialReindex:
         es_client.indices.delete.assert_not_called()
         assert es_client.indices.aliases == {"warehouse": ["warehouse-aaaaaaaaaa"]}
         es_client.indices.put_settings.assert_not_called()
+
+
+class TestBatchReindex:
+    def test_retry_on_lock(self, db_request, mocker):
+        task = types.SimpleNamespace(
+            retry=mocker.Mock(side_effect=celery.exceptions.Retry)
+        )
+
+        db_request.registry.settings = {"celery.scheduler_url": "redis://redis:6379/0"}
+
+        le = redis.exceptions.LockError("Failed to acquire lock")
+        mocker.patch.object(SearchLock, "acquire", side_effect=le)
+
+        with pytest.raises(celery.exceptions.Retry):
+            reindex_projects(task, db_request, ["foo", "bar"])
+
+        task.retry.assert_called_once_with(countdown=60, exc=le)
+
+    def test_indexes_and_unindexes(self, db_request, mocker):
+        db_request.registry.settings = {"celery.scheduler_url": "redis://redis:6379/0"}
+
+        project_docs = mocker.patch.object(
+            warehouse.search.tasks,
+            "_project_docs",
+            return_value=iter([{"_id": "foo"}, {"_id": "bar"}]),
+        )
+
+        es_client = FakeESClient(mocker)
+        db_request.registry.update(
+            {"opensearch.client": es_client, "opensearch.index": "warehouse"}
+        )
+
+        actions = []
+
+        def parallel_bulk(client, iterable, index=None, ignore_status=()):
+            assert client is es_client
+            assert index == "warehouse"
+            assert ignore_status == (404,)
+            actions.extend(iterable)
+            return [None]
+
+        mocker.patch.object(
+            warehouse.search.tasks, "parallel_bulk", side_effect=parallel_bulk
+        )
+        mocker.patch.object(warehouse.search.tasks, "SearchLock", NotLock)
+
+        reindex_projects(
+            mocker.sentinel.task, db_request, ["foo", "quux", "bar", "baz"]
+        )
+
+        project_docs.assert_called_once_with(
+            db_request.db, normalized_names=["foo", "quux", "bar", "baz"]
+        )
+        assert actions == [
+            {"_id": "foo"},
+            {"_id": "bar"},
+            {"_op_type": "delete", "_id": "baz"},
+            {"_op_type": "delete", "_id": "quux"},
+        ]
+        es_client.indices.create.assert_not_called()
+        es_client.indices.put_settings.assert_not_called()
+
+    def test_fails_when_raising(self, db_request, mocker):
+        db_request.registry.settings = {"celery.scheduler_url": "redis://redis:6379/0"}
+
+        mocker.patch.object(warehouse.search.tasks, "_project_docs", return_value=[])
+
+        es_client = FakeESClient(mocker)
+        db_request.registry.update(
+            {"opensearch.client": es_client, "opensearch.index": "warehouse"}
+        )
+
+        class TestError(Exception):
+            pass
+
+        mocker.patch.object(
+            warehouse.search.tasks, "parallel_bulk", side_effect=TestError
+        )
+        mocker.patch.object(warehouse.search.tasks, "SearchLock", NotLock)
+
+        with pytest.raises(TestError):
+            reindex_projects(mocker.sentinel.task, db_request, ["foo"])
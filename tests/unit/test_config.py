@@ -347,6 +347,8 @@ def test_configure(monkeypatch, mocker, settings, environment):
         "warehouse.packaging.project_create_user_ratelimit_string": "20 per hour",
         "warehouse.packaging.project_create_ip_ratelimit_string": "40 per hour",
         "warehouse.search.ratelimit_string": "5 per second",
+        "warehouse.search.slow_query_threshold_ms": 1000,
+        "warehouse.search.slow_query_sample_rate": 0.1,
         "oidc.backend": "warehouse.oidc.services.OIDCPublisherService",
         "integrity.backend": "warehouse.attestations.services.IntegrityService",
         "warehouse.organizations.max_undecided_organization_applications": 3,
@@ -5,10 +5,12 @@ import types
 import alembic.config
 import psycopg
 import pytest
+import redis
 import sqlalchemy
 import venusian
 import zope.sqlalchemy  # pyright: ignore[reportMissingImports]
 
+from pyramid.tweens import EXCVIEW
 from sqlalchemy import event
 from sqlalchemy.exc import DBAPIError, OperationalError
 
@@ -16,13 +18,26 @@ from warehouse import db
 from warehouse.admin.flags import AdminFlag, AdminFlagValue
 from warehouse.db import (
     DEFAULT_ISOLATION,
+    DEFAULT_REPLICA_MAX_LAG,
+    PRIMARY_LSN_QUERY,
+    REPLAY_LSN_QUERY,
+    REPLICA_LAG_QUERY,
+    WRITTEN_LSN_KEY,
     DatabaseNotAvailableError,
     ModelBase,
+    PoolStats,
+    QueryStats,
+    ReadReplica,
     _configure_alembic,
     _create_session,
+    count_queries,
+    count_query,
     includeme,
+    query_stats_tween_factory,
+    time_query,
     unwrap_dbapi_exceptions,
 )
+from warehouse.predicates import ReadReplicaPredicate
 
 from ..common.db.admin import AdminFlagFactory
 
@@ -100,6 +115,44 @@ def test_configure_alembic(pyramid_config, mocker):
     ]
 
 
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(db.time, "monotonic", clock)
+    return clock
+
+
+def _engine(mocker, connection=None, *, checkedout=1, overflow=0):
+    return types.SimpleNamespace(
+        connect=mocker.Mock(return_value=connection),
+        pool=types.SimpleNamespace(
+            size=lambda: 35,
+            timeout=lambda: 20,
+            checkedout=lambda: checkedout,
+            overflow=lambda: overflow,
+        ),
+    )
+
+
+def _lag_engine(mocker, lag):
+    engine = _engine(mocker, mocker.MagicMock())
+    _set_lag(engine, lag)
+    return engine
+
+
+def _set_lag(engine, lag):
+    connection = engine.connect.return_value.__enter__.return_value
+    connection.execute.return_value.scalar.return_value = lag
+
+
 def test_raises_db_available_error(pyramid_services, metrics, mocker):
     def raiser():
         raise OperationalError("foo", {}, psycopg.OperationalError())
@@ -108,14 +161,18 @@ def test_raises_db_available_error(pyramid_services, metrics, mocker):
     request = types.SimpleNamespace(
         find_service=pyramid_services.find_service,
         registry={"sqlalchemy.engine": engine},
+        matched_route=None,
     )
 
     with pytest.raises(DatabaseNotAvailableError):
         _create_session(request)
 
     assert metrics.increment.call_args_list == [
-        mocker.call("warehouse.db.session.start"),
-        mocker.call("warehouse.db.session.error", tags=["error_in:connecting"]),
+        mocker.call("warehouse.db.session.start", tags=["engine:primary"]),
+        mocker.call(
+            "warehouse.db.session.error",
+            tags=["error_in:connecting", "engine:primary"],
+        ),
     ]
 
 
@@ -126,10 +183,11 @@ def test_create_session(mocker, pyramid_services):
     session_cls = mocker.patch.object(db, "Session", return_value=session_obj)
 
     connection = types.SimpleNamespace(close=mocker.Mock())
-    engine = types.SimpleNamespace(connect=mocker.Mock(return_value=connection))
+    engine = _engine(mocker, connection)
     request = types.SimpleNamespace(
         find_service=pyramid_services.find_service,
         registry={"sqlalchemy.engine": engine},
+        matched_route=None,
         tm=mocker.sentinel.tm,
         add_finished_callback=mocker.Mock(),
     )
@@ -167,10 +225,11 @@ def test_create_session_read_only_mode(
     mocker.patch.object(zope.sqlalchemy, "register", autospec=True)
 
     connection = types.SimpleNamespace(close=mocker.Mock())
-    engine = types.SimpleNamespace(connect=mocker.Mock(return_value=connection))
+    engine = _engine(mocker, connection)
     request = types.SimpleNamespace(
         find_service=pyramid_services.find_service,
         registry={"sqlalchemy.engine": engine},
+        matched_route=None,
         tm=types.SimpleNamespace(doom=mocker.Mock()),
         add_finished_callback=lambda callback: None,
     )
@@ -180,18 +239,482 @@ def test_create_session_read_only_mode(
     assert request.tm.doom.call_count == doom_count
 
 
+class TestPoolStats:
+    def test_listen(self, mocker):
+        listen = mocker.patch.object(event, "listen", autospec=True)
+        stats = PoolStats(mocker.sentinel.engine)
+
+        stats.listen()
+
+        assert listen.call_args_list == [
+            mocker.call(mocker.sentinel.engine, "checkout", stats._on_checkout),
+            mocker.call(mocker.sentinel.engine, "connect", stats._on_connect),
+            mocker.call(mocker.sentinel.engine, "invalidate", stats._on_invalidate),
+        ]
+
+    def test_as_dict(self, mocker):
+        stats = PoolStats(_engine(mocker, checkedout=40, overflow=5))
+
+        stats._on_connect(None, None)
+        stats._on_checkout(None, None, None)
+        stats._on_checkout(None, None, None)
+        stats._on_invalidate(None, None, None)
+        stats.record_wait(0.5)
+        stats.record_wait(0.25)
+        stats.record_timeout()
+
+        assert stats.as_dict() == {
+            "size": 35,
+            "timeout": 20,
+            "checked_out": 40,
+            "overflow": 5,
+            "checkouts": 2,
+            "connects": 1,
+            "invalidations": 1,
+            "timeouts": 1,
+            "wait_total": 0.75,
+            "wait_max": 0.5,
+        }
+
+    def test_overflow_before_pool_is_full(self, mocker):
+        stats = PoolStats(_engine(mocker, overflow=-30))
+
+        assert stats.as_dict()["overflow"] == 0
+
+
+class TestPoolMetrics:
+    def _request(self, pyramid_services, engine, stats, **kwargs):
+        return types.SimpleNamespace(
+            find_service=pyramid_services.find_service,
+            registry={
+                "sqlalchemy.engine": engine,
+                "sqlalchemy.pool_stats": {"primary": stats},
+            },
+            matched_route=None,
+            **kwargs,
+        )
+
+    def test_checkout_wait(self, clock, pyramid_services, metrics, mocker):
+        engine = _engine(mocker, mocker.sentinel.connection)
+
+        def connect():
+            clock.now += 0.25
+            return mocker.sentinel.connection
+
+        engine.connect.side_effect = connect
+        stats = PoolStats(engine)
+        request = self._request(
+            pyramid_services, engine, stats, task_name="warehouse.sync_file"
+        )
+
+        assert db._connect(request, metrics, "primary", engine) is (
+            mocker.sentinel.connection
+        )
+        metrics.timing.assert_called_once_with(
+            "warehouse.db.pool.checkout_wait",
+            250.0,
+            tags=["engine:primary", "task:warehouse.sync_file"],
+        )
+        assert stats.wait_total == 0.25
+
+    def test_timeout(self, clock, pyramid_services, metrics, mocker):
+        engine = _engine(mocker)
+        engine.connect.side_effect = sqlalchemy.exc.TimeoutError("pool exhausted")
+        stats = PoolStats(engine)
+        request = self._request(pyramid_services, engine, stats)
+
+        with pytest.raises(sqlalchemy.exc.TimeoutError, match="pool exhausted"):
+            db._connect(request, metrics, "primary", engine)
+
+        metrics.increment.assert_called_once_with(
+            "warehouse.db.pool.timeout", tags=["engine:primary"]
+        )
+        assert stats.timeouts == 1
+        metrics.timing.assert_not_called()
+
+
+class TestReadReplica:
+    @pytest.fixture
+    def primary(self, mocker):
+        return _lag_engine(mocker, 1234)
+
+    @pytest.mark.parametrize(("lag", "usable"), [(0, True), (5.0, True), (5.5, False)])
+    def test_lag(self, clock, metrics, mocker, primary, lag, usable):
+        engine = _lag_engine(mocker, lag)
+        replica = ReadReplica(engine, primary, mocker.Mock(), max_lag=5)
+
+        assert replica.is_usable(metrics) is usable
+        primary_connection = primary.connect.return_value.__enter__.return_value
+        primary_connection.execute.assert_called_once_with(PRIMARY_LSN_QUERY)
+        connection = engine.connect.return_value.__enter__.return_value
+        connection.execute.assert_called_once_with(
+            REPLICA_LAG_QUERY, {"primary_lsn": 1234}
+        )
+        metrics.gauge.assert_called_once_with("warehouse.db.replica.lag", float(lag))
+
+    def test_not_receiving(self, clock, metrics, mocker, primary):
+        replica = ReadReplica(
+            _lag_engine(mocker, None), primary, mocker.Mock(), max_lag=5
+        )
+
+        assert not replica.is_usable(metrics)
+        metrics.increment.assert_called_once_with(
+            "warehouse.db.replica.error", tags=["error_in:receiver"]
+        )
+        metrics.gauge.assert_not_called()
+
+    def test_checks_once_per_interval(self, clock, metrics, mocker, primary):
+        engine = _lag_engine(mocker, 10)
+        replica = ReadReplica(engine, primary, mocker.Mock(), max_lag=5, interval=5)
+
+        assert not replica.is_usable(metrics)
+        clock.now += 4
+        assert not replica.is_usable(metrics)
+        assert engine.connect.call_count == 1
+
+        _set_lag(engine, 0)
+        clock.now += 1
+
+        assert replica.is_usable(metrics)
+        assert engine.connect.call_count == 2
+
+    @pytest.mark.parametrize("unreachable", ["primary", "replica"])
+    def test_unreachable(self, clock, metrics, mocker, primary, unreachable):
+        engine = _lag_engine(mocker, 0)
+        {"primary": primary, "replica": engine}[
+            unreachable
+        ].connect.side_effect = OperationalError("foo", {}, psycopg.OperationalError())
+        replica = ReadReplica(engine, primary, mocker.Mock(), max_lag=5)
+
+        assert not replica.is_usable(metrics)
+        metrics.increment.assert_called_once_with(
+            "warehouse.db.replica.error", tags=["error_in:lag"]
+        )
+        metrics.gauge.assert_not_called()
+
+    def test_mark_unusable(self, clock, metrics, mocker, primary):
+        engine = _lag_engine(mocker, 0)
+        replica = ReadReplica(engine, primary, mocker.Mock(), max_lag=5, interval=5)
+
+        replica.mark_unusable()
+
+        assert not replica.is_usable(metrics)
+        engine.connect.assert_not_called()
+
+        clock.now += 5
+
+        assert replica.is_usable(metrics)
+
+    def test_record_write(self, mocker, primary):
+        conn = mocker.Mock()
+        replica = ReadReplica(_engine(mocker), primary, conn, max_lag=5)
+
+        replica.record_write()
+
+        conn.register_script.return_value.assert_called_once_with(
+            keys=[WRITTEN_LSN_KEY], args=["00000000000004d2"]
+        )
+
+    @pytest.mark.parametrize(
+        ("written", "replayed", "has_replayed"),
+        [(None, None, True), ("00000000000004d2", 1234, True), ("04d3", 1234, False)],
+    )
+    def test_has_replayed_writes(
+        self, metrics, mocker, primary, written, replayed, has_replayed
+    ):
+        conn = mocker.Mock()
+        conn.get.return_value = written
+        connection = mocker.Mock()
+        connection.execute.return_value.scalar.return_value = replayed
+        replica = ReadReplica(_engine(mocker), primary, conn, max_lag=5)
+
+        assert replica.has_replayed_writes(connection, metrics) is has_replayed
+        conn.get.assert_called_once_with(WRITTEN_LSN_KEY)
+        if replayed is None:
+            connection.execute.assert_not_called()
+        else:
+            connection.execute.assert_called_once_with(REPLAY_LSN_QUERY)
+            connection.rollback.assert_called_once_with()
+
+    def test_has_replayed_writes_remembers_replay_position(
+        self, metrics, mocker, primary
+    ):
+        conn = mocker.Mock()
+        conn.get.return_value = "00000000000004d2"
+        connection = mocker.Mock()
+        connection.execute.return_value.scalar.return_value = 2000
+        replica = ReadReplica(_engine(mocker), primary, conn, max_lag=5)
+
+        assert replica.has_replayed_writes(connection, metrics)
+        assert replica.has_replayed_writes(connection, metrics)
+        conn.get.return_value = f"{2001:016x}"
+        connection.execute.return_value.scalar.return_value = 2001
+        assert replica.has_replayed_writes(connection, metrics)
+
+        assert connection.execute.call_count == 2
+
+    def test_has_replayed_writes_redis_unavailable(self, metrics, mocker, primary):
+        conn = mocker.Mock()
+        conn.get.side_effect = redis.exceptions.ConnectionError
+        connection = mocker.Mock()
+        replica = ReadReplica(_engine(mocker), primary, conn, max_lag=5)
+
+        assert not replica.has_replayed_writes(connection, metrics)
+        connection.execute.assert_not_called()
+        metrics.increment.assert_called_once_with(
+            "warehouse.db.replica.error", tags=["error_in:written"]
+        )
+
+
+class TestWriteTracking:
+    def test_store_write(self, mocker):
+        session = types.SimpleNamespace(info={})
+
+        db.store_write(mocker.sentinel.config, session, mocker.sentinel.flush_context)
+
+        assert session.info == {"warehouse.db.wrote": True}
+
+    def test_record_write(self, mocker):
+        replica = mocker.Mock(spec=ReadReplica)
+        config = types.SimpleNamespace(registry={"sqlalchemy.replica": replica})
+        session = types.SimpleNamespace(info={"warehouse.db.wrote": True})
+
+        db.record_write(config, session)
+
+        replica.record_write.assert_called_once_with()
+        assert session.info == {}
+
+    def test_record_write_without_writes(self, mocker):
+        replica = mocker.Mock(spec=ReadReplica)
+        config = types.SimpleNamespace(registry={"sqlalchemy.replica": replica})
+
+        db.record_write(config, types.SimpleNamespace(info={}))
+
+        replica.record_write.assert_not_called()
+
+    def test_record_write_without_replica(self):
+        session = types.SimpleNamespace(info={"warehouse.db.wrote": True})
+
+        db.record_write(types.SimpleNamespace(registry={}), session)
+
+        assert session.info == {}
+
+    @pytest.mark.parametrize(
+        "error",
+        [
+            redis.exceptions.ConnectionError(),
+            OperationalError("foo", {}, psycopg.OperationalError()),
+        ],
+    )
+    def test_record_write_fails(self, mocker, error):
+        replica = mocker.Mock(spec=ReadReplica)
+        replica.record_write.side_effect = error
+        config = types.SimpleNamespace(registry={"sqlalchemy.replica": replica})
+        session = types.SimpleNamespace(info={"warehouse.db.wrote": True})
+
+        db.record_write(config, session)
+
+        assert session.info == {}
+
+    def test_discard_write(self, mocker):
+        session = types.SimpleNamespace(info={"warehouse.db.wrote": True})
+
+        db.discard_write(mocker.sentinel.config, session)
+
+        assert session.info == {}
+
+
+class TestReplicaRouting:
+    @pytest.fixture
+    def session_cls(self, mocker):
+        session_obj = types.SimpleNamespace(
+            close=mocker.Mock(), get=mocker.Mock(return_value=None)
+        )
+        mocker.patch.object(zope.sqlalchemy, "register", autospec=True)
+        return mocker.patch.object(db, "Session", return_value=session_obj)
+
+    def _request(self, pyramid_services, mocker, registry, *, read_replica=True):
+        return types.SimpleNamespace(
+            find_service=pyramid_services.find_service,
+            registry=registry,
+            matched_route=types.SimpleNamespace(
+                name="api.simple.index",
+                predicates=[ReadReplicaPredicate(read_replica, None)],
+            ),
+            tm=mocker.sentinel.tm,
+            add_finished_callback=lambda callback: None,
+        )
+
+    def test_reads_from_replica(self, session_cls, pyramid_services, metrics, mocker):
+        primary = _engine(mocker, mocker.sentinel.primary)
+        replica_engine = _engine(mocker, mocker.sentinel.replica, checkedout=3)
+        replica = mocker.Mock(spec=ReadReplica, engine=replica_engine)
+        replica.is_usable.return_value = True
+        replica.has_replayed_writes.return_value = True
+        request = self._request(
+            pyramid_services,
+            mocker,
+            {"sqlalchemy.engine": primary, "sqlalchemy.replica": replica},
+        )
+
+        _create_session(request)
+
+        session_cls.assert_called_once_with(bind=mocker.sentinel.replica)
+        replica.has_replayed_writes.assert_called_once_with(
+            mocker.sentinel.replica, metrics
+        )
+        primary.connect.assert_not_called()
+        metrics.increment.assert_called_once_with(
+            "warehouse.db.session.start", tags=["engine:replica"]
+        )
+        tags = ["engine:replica", "route:api.simple.index"]
+        assert metrics.gauge.call_args_list == [
+            mocker.call("warehouse.db.pool.checkedout", 3, tags=tags),
+            mocker.call("warehouse.db.pool.overflow", 0, tags=tags),
+        ]
+
+    @pytest.mark.parametrize("read_replica", [True, False])
+    def test_no_replica(
+        self, session_cls, pyramid_services, metrics, mocker, read_replica
+    ):
+        primary = _engine(mocker, mocker.sentinel.primary)
+        request = self._request(
+            pyramid_services,
+            mocker,
+            {"sqlalchemy.engine": primary},
+            read_replica=read_replica,
+        )
+
+        _create_session(request)
+
+        session_cls.assert_called_once_with(bind=mocker.sentinel.primary)
+
+    def test_route_not_marked(self, session_cls, pyramid_services, mocker):
+        primary = _engine(mocker, mocker.sentinel.primary)
+        replica = mocker.Mock(spec=ReadReplica)
+        request = self._request(
+            pyramid_services,
+            mocker,
+            {"sqlalchemy.engine": primary, "sqlalchemy.replica": replica},
+            read_replica=False,
+        )
+
+        _create_session(request)
+
+        session_cls.assert_called_once_with(bind=mocker.sentinel.primary)
+        replica.is_usable.assert_not_called()
+
+    def test_falls_back_when_lagging(
+        self, session_cls, pyramid_services, metrics, mocker
+    ):
+        primary = _engine(mocker, mocker.sentinel.primary)
+        replica = mocker.Mock(spec=ReadReplica, engine=_engine(mocker))
+        replica.is_usable.return_value = False
+        request = self._request(
+            pyramid_services,
+            mocker,
+            {"sqlalchemy.engine": primary, "sqlalchemy.replica": replica},
+        )
+
+        _create_session(request)
+
+        session_cls.assert_called_once_with(bind=mocker.sentinel.primary)
+        replica.engine.connect.assert_not_called()
+        assert metrics.increment.call_args_list == [
+            mocker.call("warehouse.db.replica.fallback", tags=["reason:lag"]),
+            mocker.call("warehouse.db.session.start", tags=["engine:primary"]),
+        ]
+
+    def test_falls_back_when_behind_writes(
+        self, session_cls, pyramid_services, metrics, mocker
+    ):
+        primary = _engine(mocker, mocker.sentinel.primary)
+        replica_connection = mocker.Mock()
+        replica = mocker.Mock(
+            spec=ReadReplica, engine=_engine(mocker, replica_connection)
+        )
+        replica.is_usable.return_value = True
+        replica.has_replayed_writes.return_value = False
+        request = self._request(
+            pyramid_services,
+            mocker,
+            {"sqlalchemy.engine": primary, "sqlalchemy.replica": replica},
+        )
+
+        _create_session(request)
+
+        session_cls.assert_called_once_with(bind=mocker.sentinel.primary)
+        replica_connection.close.assert_called_once_with()
+        replica.mark_unusable.assert_not_called()
+        assert metrics.increment.call_args_list == [
+            mocker.call("warehouse.db.session.start", tags=["engine:replica"]),
+            mocker.call("warehouse.db.replica.fallback", tags=["reason:writes"]),
+        ]
+
+    def test_falls_back_when_unreachable(
+        self, session_cls, pyramid_services, metrics, mocker
+    ):
+        primary = _engine(mocker, mocker.sentinel.primary)
+        replica = mocker.Mock(spec=ReadReplica, engine=_engine(mocker))
+        replica.engine.connect.side_effect = OperationalError(
+            "foo", {}, psycopg.OperationalError()
+        )
+        replica.is_usable.return_value = True
+        request = self._request(
+            pyramid_services,
+            mocker,
+            {"sqlalchemy.engine": primary, "sqlalchemy.replica": replica},
+        )
+
+        _create_session(request)
+
+        session_cls.assert_called_once_with(bind=mocker.sentinel.primary)
+        replica.mark_unusable.assert_called_once_with()
+        assert metrics.increment.call_args_list == [
+            mocker.call("warehouse.db.session.start", tags=["engine:replica"]),
+            mocker.call(
+                "warehouse.db.session.error",
+                tags=["error_in:connecting", "engine:replica"],
+            ),
+            mocker.call("warehouse.db.replica.fallback", tags=["reason:connecting"]),
+        ]
+
+    def test_primary_unreachable_too(self, session_cls, pyramid_services, mocker):
+        error = OperationalError("foo", {}, psycopg.OperationalError())
+        primary = _engine(mocker)
+        primary.connect.side_effect = error
+        replica = mocker.Mock(spec=ReadReplica, engine=_engine(mocker))
+        replica.engine.connect.side_effect = error
+        replica.is_usable.return_value = True
+        request = self._request(
+            pyramid_services,
+            mocker,
+            {"sqlalchemy.engine": primary, "sqlalchemy.replica": replica},
+        )
+
+        with pytest.raises(DatabaseNotAvailableError):
+            _create_session(request)
+
+        session_cls.assert_not_called()
+
+
 def test_includeme(pyramid_config, mocker):
     create_engine = mocker.patch.object(
         sqlalchemy, "create_engine", autospec=True, return_value=mocker.sentinel.engine
     )
+    listen = mocker.patch.object(PoolStats, "listen", autospec=True)
     pyramid_config.registry.settings["database.url"] = mocker.sentinel.database_url
     mocker.spy(pyramid_config, "add_directive")
+    mocker.spy(pyramid_config, "add_tween")
 
     includeme(pyramid_config)
 
     pyramid_config.add_directive.assert_called_once_with(
         "alembic_config", _configure_alembic
     )
+    pyramid_config.add_tween.assert_called_once_with(
+        "warehouse.db.query_stats_tween_factory", over=EXCVIEW
+    )
     create_engine.assert_called_once_with(
         mocker.sentinel.database_url,
         isolation_level=DEFAULT_ISOLATION,
@@ -200,6 +723,77 @@ def test_includeme(pyramid_config, mocker):
         pool_timeout=20,
     )
     assert pyramid_config.registry["sqlalchemy.engine"] is mocker.sentinel.engine
+    assert "sqlalchemy.replica" not in pyramid_config.registry
+    pool_stats = pyramid_config.registry["sqlalchemy.pool_stats"]
+    assert list(pool_stats) == ["primary"]
+    assert pool_stats["primary"].engine is mocker.sentinel.engine
+    listen.assert_called_once_with(pool_stats["primary"])
+
+
+def test_includeme_with_pool_settings(pyramid_config, mocker):
+    create_engine = mocker.patch.object(sqlalchemy, "create_engine", autospec=True)
+    mocker.patch.object(PoolStats, "listen", autospec=True)
+    pyramid_config.registry.settings.update(
+        {
+            "database.url": mocker.sentinel.database_url,
+            "database.pool_size": 10,
+            "database.max_overflow": 5,
+            "database.pool_timeout": 3,
+        }
+    )
+
+    includeme(pyramid_config)
+
+    create_engine.assert_called_once_with(
+        mocker.sentinel.database_url,
+        isolation_level=DEFAULT_ISOLATION,
+        pool_size=10,
+        max_overflow=5,
+        pool_timeout=3,
+    )
+
+
+@pytest.mark.parametrize(
+    ("settings", "max_lag"),
+    [({}, DEFAULT_REPLICA_MAX_LAG), ({"database.replica_max_lag": 2.5}, 2.5)],
+)
+def test_includeme_with_replica(pyramid_config, mocker, settings, max_lag):
+    create_engine = mocker.patch.object(
+        sqlalchemy,
+        "create_engine",
+        autospec=True,
+        side_effect=[mocker.sentinel.engine, mocker.sentinel.replica_engine],
+    )
+    listen = mocker.patch.object(PoolStats, "listen", autospec=True)
+    from_url = mocker.patch.object(redis.StrictRedis, "from_url", autospec=True)
+    pyramid_config.registry.settings.update(
+        {
+            "database.url": mocker.sentinel.database_url,
+            "database.replica_url": mocker.sentinel.replica_url,
+            "database.replica_redis_url": mocker.sentinel.replica_redis_url,
+            **settings,
+        }
+    )
+
+    includeme(pyramid_config)
+
+    assert create_engine.call_args_list[1] == mocker.call(
+        mocker.sentinel.replica_url,
+        isolation_level=DEFAULT_ISOLATION,
+        pool_size=35,
+        max_overflow=65,
+        pool_timeout=20,
+    )
+    replica = pyramid_config.registry["sqlalchemy.replica"]
+    assert isinstance(replica, ReadReplica)
+    assert replica.engine is mocker.sentinel.replica_engine
+    assert replica.primary is mocker.sentinel.engine
+    assert replica.conn is from_url.return_value
+    from_url.assert_called_once_with(mocker.sentinel.replica_redis_url)
+    assert replica.max_lag == max_lag
+    pool_stats = pyramid_config.registry["sqlalchemy.pool_stats"]
+    assert pool_stats["replica"].engine is mocker.sentinel.replica_engine
+    assert listen.call_count == 2
 
 
 def test_unwrap_dbapi_exceptions():
@@ -230,3 +824,129 @@ def test_unwrap_dbapi_exceptions_no_op():
         original_exception=None,
     )
     unwrap_dbapi_exceptions(context)
+
+
+class TestQueryStats:
+    @pytest.fixture
+    def perf_counter(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(db.time, "perf_counter", clock)
+        return clock
+
+    def test_counts_and_times_queries(self, perf_counter):
+        with count_queries() as stats:
+            for statement, duration in [("SELECT 1", 0.5), ("SELECT 2", 0.25)] * 2:
+                count_query(None, None, statement, None, None, False)
+                perf_counter.now += duration
+                time_query(None, None, statement, None, None, False)
+
+        assert db._query_stats.get() is None
+        assert stats.count == 4
+        assert stats.duration == 1.5
+        assert stats.statements == {"SELECT 1": 2, "SELECT 2": 2}
+
+    def test_failed_query_is_not_timed(self, perf_counter):
+        stats = QueryStats()
+        stats.start("SELECT 1")
+        perf_counter.now += 10
+        stats.start("SELECT 2")
+        perf_counter.now += 1
+        stats.finish()
+        stats.finish()
+
+        assert stats.count == 2
+        assert stats.duration == 1
+
+    def test_outside_of_a_request(self):
+        assert db._query_stats.get() is None
+
+        count_query(None, None, "SELECT 1", None, None, False)
+        time_query(None, None, "SELECT 1", None, None, False)
+
+
+class TestQueryStatsTween:
+    def _run(self, mocker, settings, request, statements):
+        def handler(request):
+            for statement in statements:
+                count_query(None, None, statement, None, None, False)
+                time_query(None, None, statement, None, None, False)
+            return mocker.sentinel.response
+
+        registry = types.SimpleNamespace(settings=settings)
+        tween = query_stats_tween_factory(handler, registry)
+        return tween(request)
+
+    def _request(self, pyramid_services, route="packaging.release"):
+        return types.SimpleNamespace(
+            find_service=pyramid_services.find_service,
+            matched_route=None if route is None else types.SimpleNamespace(name=route),
+            path="/project/foo/1.0/",
+        )
+
+    def test_records_metrics(self, pyramid_services, metrics, mocker):
+        logger = mocker.patch.object(db, "logger")
+        request = self._request(pyramid_services)
+
+        response = self._run(mocker, {}, request, ["SELECT 1", "SELECT 2"])
+
+        assert response is mocker.sentinel.response
+        tags = ["route:packaging.release"]
+        metrics.histogram.assert_called_once_with(
+            "warehouse.db.request.queries", 2, tags=tags
+        )
+        metrics.timing.assert_called_once_with(
+            "warehouse.db.request.query_time", mocker.ANY, tags=tags
+        )
+        logger.warning.assert_not_called()
+        assert db._query_stats.get() is None
+
+    def test_records_metrics_on_error(self, pyramid_services, metrics):
+        def handler(request):
+            count_query(None, None, "SELECT 1", None, None, False)
+            raise ValueError("view failed")
+
+        registry = types.SimpleNamespace(settings={})
+        tween = query_stats_tween_factory(handler, registry)
+
+        with pytest.raises(ValueError, match="view failed"):
+            tween(self._request(pyramid_services))
+
+        metrics.histogram.assert_called_once_with(
+            "warehouse.db.request.queries", 1, tags=["route:packaging.release"]
+        )
+        assert db._query_stats.get() is None
+
+    def test_no_matched_route(self, pyramid_services, metrics, mocker):
+        request = self._request(pyramid_services, route=None)
+
+        self._run(mocker, {}, request, ["SELECT 1"])
+
+        metrics.histogram.assert_not_called()
+
+    @pytest.mark.parametrize(
+        ("settings", "exceeded"),
+        [
+            ({"database.query_budget.count": 3}, False),
+            ({"database.query_budget.count": 2}, True),
+            ({"database.query_budget.duration": 1000.0}, False),
+            ({"database.query_budget.duration": -1.0}, True),
+        ],
+    )
+    def test_budget(self, pyramid_services, metrics, mocker, settings, exceeded):
+        logger = mocker.patch.object(db, "logger")
+        request = self._request(pyramid_services)
+
+        self._run(mocker, settings, request, ["SELECT 1", "SELECT 2", "SELECT 1"])
+
+        if exceeded:
+            logger.warning.assert_called_once_with(
+                "query_budget_exceeded",
+                route="packaging.release",
+                path="/project/foo/1.0/",
+                queries=3,
+                query_time_ms=mocker.ANY,
+                most_repeated="SELECT 1",
+                most_repeated_count=2,
+            )
+        else:
+            logger.warning.assert_not_called()
@@ -15,8 +15,10 @@ from warehouse.predicates import (
     AuthMethodsPredicate,
     DomainPredicate,
     HeadersPredicate,
+    ReadReplicaPredicate,
     auth_methods_for_route,
     includeme,
+    uses_read_replica,
 )
 from warehouse.subscriptions.models import StripeSubscriptionStatus
 from warehouse.utils.security_policy import AuthenticationMethod
@@ -99,6 +101,41 @@ class TestAuthMethodsForRoute:
         assert auth_methods_for_route(route) is None
 
 
+class TestReadReplicaPredicate:
+    @pytest.mark.parametrize(
+        ("value", "expected"),
+        [(True, "read_replica = True"), (False, "read_replica = False")],
+    )
+    def test_text_and_phash(self, value, expected):
+        predicate = ReadReplicaPredicate(value, None)
+        assert predicate.text() == expected
+        assert predicate.phash() == expected
+
+    @pytest.mark.parametrize("value", [True, False])
+    def test_always_matches(self, value):
+        assert ReadReplicaPredicate(value, None)(None, None) is True
+
+
+class TestUsesReadReplica:
+    @pytest.mark.parametrize(
+        ("predicates", "expected"),
+        [
+            (
+                [DomainPredicate("pypi.io", None), ReadReplicaPredicate(True, None)],
+                True,
+            ),
+            ([ReadReplicaPredicate(False, None)], False),
+            ([DomainPredicate("pypi.io", None)], False),
+        ],
+    )
+    def test_route(self, predicates, expected):
+        route = types.SimpleNamespace(predicates=predicates)
+        assert uses_read_replica(route) is expected
+
+    def test_no_matched_route(self):
+        assert uses_read_replica(None) is False
+
+
 class TestHeadersPredicate:
     @pytest.mark.parametrize(
         ("value", "expected"),
@@ -285,6 +322,7 @@ def test_includeme(pyramid_config, mocker):
     assert add_route_predicate.call_args_list == [
         mocker.call("domain", DomainPredicate),
         mocker.call("auth_methods", AuthMethodsPredicate),
+        mocker.call("read_replica", ReadReplicaPredicate),
     ]
 
     assert add_view_predicate.call_args_list == [
@@ -52,8 +52,15 @@ def test_routes(warehouse, mocker):
             domain=warehouse,
         ),
         mocker.call("opensearch.xml", "/opensearch.xml", domain=warehouse),
-        mocker.call("index.sitemap.xml", "/sitemap.xml", domain=warehouse),
-        mocker.call("bucket.sitemap.xml", "/{bucket}.sitemap.xml", domain=warehouse),
+        mocker.call(
+            "index.sitemap.xml", "/sitemap.xml", read_replica=True, domain=warehouse
+        ),
+        mocker.call(
+            "bucket.sitemap.xml",
+            "/{bucket}.sitemap.xml",
+            read_replica=True,
+            domain=warehouse,
+        ),
         mocker.call(
             "includes.current-user-indicator",
             "/_includes/authed/current-user-indicator/",
@@ -123,6 +130,8 @@ def test_routes(warehouse, mocker):
         ),
         mocker.call("classifiers", "/classifiers/", domain=warehouse),
         mocker.call("search", "/search/", domain=warehouse),
+        mocker.call("search.json", "/search/json", domain=warehouse),
+        mocker.call("search.suggest", "/search/suggest", domain=warehouse),
         mocker.call("stats", "/stats/", accept="text/html", domain=warehouse),
         mocker.call(
             "stats.json", "/stats/", accept="application/json", domain=warehouse
@@ -554,13 +563,18 @@ def test_routes(warehouse, mocker):
         ),
         mocker.call("packaging.file", "https://files.example.com/packages/{path}"),
         mocker.call("ses.hook", "/_/ses-hook/", domain=warehouse),
-        mocker.call("rss.updates", "/rss/updates.xml", domain=warehouse),
-        mocker.call("rss.packages", "/rss/packages.xml", domain=warehouse),
+        mocker.call(
+            "rss.updates", "/rss/updates.xml", read_replica=True, domain=warehouse
+        ),
+        mocker.call(
+            "rss.packages", "/rss/packages.xml", read_replica=True, domain=warehouse
+        ),
         mocker.call(
             "rss.project.releases",
             "/rss/project/{name}/releases.xml",
             factory="warehouse.packaging.models:ProjectFactory",
             traverse="/{name}/",
+            read_replica=True,
             domain=warehouse,
         ),
         mocker.call(
@@ -579,12 +593,15 @@ def test_routes(warehouse, mocker):
             domain=warehouse,
         ),
         mocker.call("api.billing.webhook", "/billing/webhook/", domain=warehouse),
-        mocker.call("api.simple.index", "/simple/", domain=warehouse),
+        mocker.call(
+            "api.simple.index", "/simple/", read_replica=True, domain=warehouse
+        ),
         mocker.call(
             "api.simple.detail",
             "/simple/{name}/",
             factory="warehouse.packaging.models:ProjectFactory",
             traverse="/{name}/",
+            read_replica=True,
             domain=warehouse,
         ),
         # API URLs
@@ -636,24 +653,34 @@ def test_routes(warehouse, mocker):
             "legacy.api.json.project",
             "/pypi/{name}/json",
             factory="warehouse.legacy.api.json.latest_release_factory",
+            read_replica=True,
             domain=warehouse,
         ),
         mocker.call(
             "legacy.api.json.project_slash",
             "/pypi/{name}/json/",
             factory="warehouse.legacy.api.json.latest_release_factory",
+            read_replica=True,
             domain=warehouse,
         ),
         mocker.call(
             "legacy.api.json.release",
             "/pypi/{name}/{version}/json",
             factory="warehouse.legacy.api.json.release_factory",
+            read_replica=True,
             domain=warehouse,
         ),
         mocker.call(
             "legacy.api.json.release_slash",
             "/pypi/{name}/{version}/json/",
             factory="warehouse.legacy.api.json.release_factory",
+            read_replica=True,
+            domain=warehouse,
+        ),
+        mocker.call(
+            "legacy.api.json.serials",
+            "/pypi/json/serials",
+            read_replica=True,
             domain=warehouse,
         ),
         mocker.call("legacy.docs", docs_route_url),
@@ -755,18 +782,21 @@ def test_routes(warehouse, mocker):
             "xmlrpc.pypi",
             pattern="/pypi",
             header="Content-Type:text/xml",
+            read_replica=True,
             domain=warehouse,
         ),
         mocker.call(
             "xmlrpc.pypi_slash",
             pattern="/pypi/",
             header="Content-Type:text/xml",
+            read_replica=True,
             domain=warehouse,
         ),
         mocker.call(
             "xmlrpc.RPC2",
             pattern="/RPC2",
             header="Content-Type:text/xml",
+            read_replica=True,
             domain=warehouse,
         ),
     ]
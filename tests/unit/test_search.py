@@ -309,3 +309,68 @@ class TestQueries:
             },
             "sort": [{"created": {"order": "desc", "unmapped_type": "long"}}],
         }
+
+
+class TestQueryTags:
+    @pytest.mark.parametrize(
+        ("terms", "order", "classifiers", "expected"),
+        [
+            (
+                "",
+                "",
+                [],
+                [
+                    "query_type:match_all",
+                    "prefix:false",
+                    "classifiers:false",
+                    "order:relevance",
+                ],
+            ),
+            (
+                "",
+                "-created",
+                ["foo :: bar"],
+                [
+                    "query_type:classifier_only",
+                    "prefix:false",
+                    "classifiers:true",
+                    "order:created",
+                ],
+            ),
+            (
+                "a",
+                "",
+                [],
+                [
+                    "query_type:best_fields",
+                    "prefix:false",
+                    "classifiers:false",
+                    "order:relevance",
+                ],
+            ),
+            (
+                '"foo bar"',
+                "created",
+                ["foo :: bar"],
+                [
+                    "query_type:phrase",
+                    "prefix:true",
+                    "classifiers:true",
+                    "order:other",
+                ],
+            ),
+            (
+                '"foo bar" baz',
+                "",
+                [],
+                [
+                    "query_type:mixed",
+                    "prefix:true",
+                    "classifiers:false",
+                    "order:relevance",
+                ],
+            ),
+        ],
+    )
+    def test_get_query_tags(self, terms, order, classifiers, expected):
+        assert queries.get_query_tags(terms, order, classifiers) == expected
@@ -1,5 +1,6 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import datetime
 import time
 
 import markupsafe
@@ -172,18 +173,95 @@ class TestSession:
         [
             ({"foo": "bar"}, "__delitem__", ["foo"]),
             ({}, "__setitem__", ["foo", "bar"]),
-            ({}, "clear", []),
+            ({"foo": "bar"}, "__setitem__", ["foo", "baz"]),
+            ({"foo": "bar"}, "clear", []),
             ({"foo": "bar"}, "pop", ["foo"]),
             ({"foo": "bar"}, "popitem", []),
             ({}, "setdefault", ["foo", "bar"]),
+            ({"foo": []}, "setdefault", ["foo", []]),
             ({}, "update", [{"foo": "bar"}]),
         ],
     )
-    def test_methods_call_changed(self, data, method, args):
+    def test_methods_mark_changed(self, data, method, args):
         session = Session(data)
-        session.changed = pretend.call_recorder(lambda: None)
         getattr(session, method)(*args)
-        assert session.changed.calls == [pretend.call()]
+        assert session.should_save()
+
+    @pytest.mark.parametrize(
+        ("data", "method", "args"),
+        [
+            ({"foo": "bar"}, "__setitem__", ["foo", "bar"]),
+            ({"foo": None}, "__setitem__", ["foo", None]),
+            ({"foo": [1]}, "__setitem__", ["foo", [1]]),
+            ({}, "clear", []),
+            ({}, "pop", ["foo", None]),
+            ({"foo": "bar"}, "update", [{"foo": "bar"}]),
+        ],
+    )
+    def test_methods_unchanged(self, data, method, args):
+        session = Session(data)
+        getattr(session, method)(*args)
+        assert not session.should_save()
+
+    def test_set_mutated_value_marks_changed(self):
+        session = Session({"foo": [1]})
+        value = session["foo"]
+        value.append(2)
+        session["foo"] = value
+        assert session.should_save()
+
+    def test_loads_lazily(self):
+        loader = pretend.call_recorder(lambda: {"foo": "bar"})
+        session = Session(session_id="wat", new=False, loader=loader)
+
+        assert loader.calls == []
+        assert session["foo"] == "bar"
+        assert session == {"foo": "bar"}
+        assert session.sid == "wat"
+        assert not session.new
+        assert not session.should_save()
+        assert loader.calls == [pretend.call()]
+
+    def test_loads_missing_session(self, monkeypatch):
+        monkeypatch.setattr(crypto, "random_token", lambda: "123456")
+        session = Session(session_id="wat", new=False, loader=lambda: None)
+
+        assert session.new
+        assert session == {}
+        assert session.sid == "123456"
+
+    def test_loads_before_changes(self):
+        session = Session(session_id="wat", new=False, loader=lambda: {"foo": "bar"})
+        session["baz"] = "qux"
+        assert session == {"foo": "bar", "baz": "qux"}
+
+    def test_invalidate_without_loading(self, monkeypatch):
+        monkeypatch.setattr(crypto, "random_token", lambda: "123456")
+        loader = pretend.call_recorder(lambda: {"foo": "bar"})
+        session = Session(session_id="wat", new=False, loader=loader)
+
+        session.invalidate()
+
+        assert session == {}
+        assert session.new
+        assert session.sid == "123456"
+        assert session.invalidated == {"wat"}
+        assert loader.calls == []
+
+    @pytest.mark.parametrize(
+        ("stale", "load", "data", "expected"),
+        [
+            (False, True, {"foo": "bar"}, False),
+            (True, False, {"foo": "bar"}, False),
+            (True, True, None, False),
+            (True, True, {"foo": "bar"}, True),
+        ],
+    )
+    def test_should_refresh(self, stale, load, data, expected):
+        session = Session(session_id="wat", new=False, loader=lambda: data, stale=stale)
+        if load:
+            session.get("foo")
+        assert session.should_refresh() is expected
 
     @pytest.mark.parametrize(
         ("queue", "expected"),
@@ -347,6 +425,14 @@ class TestSession:
         assert session.password_outdated(current) == expected
 
 
+class FakePipeline:
+    def __init__(self):
+        self.delete = pretend.call_recorder(lambda key: None)
+        self.setex = pretend.call_recorder(lambda key, age, data: None)
+        self.expire = pretend.call_recorder(lambda key, age: None)
+        self.execute = pretend.call_recorder(lambda: [])
+
+
 class TestSessionFactory:
     def test_initialize(self, monkeypatch):
         timestamp_signer_obj = pretend.stub()
@@ -355,20 +441,30 @@ class TestSessionFactory:
         )
         monkeypatch.setattr(crypto, "TimestampSigner", timestamp_signer_create)
 
+        pool_obj = pretend.stub()
+        pool_cls = pretend.stub(
+            from_url=pretend.call_recorder(lambda url, **kw: pool_obj)
+        )
+        monkeypatch.setattr(redis, "BlockingConnectionPool", pool_cls)
         strict_redis_obj = pretend.stub()
-        strict_redis_cls = pretend.stub(
-            from_url=pretend.call_recorder(lambda url: strict_redis_obj)
+        strict_redis_cls = pretend.call_recorder(
+            lambda connection_pool: strict_redis_obj
         )
         monkeypatch.setattr(redis, "StrictRedis", strict_redis_cls)
 
-        session_factory = SessionFactory("mysecret", "my url")
+        session_factory = SessionFactory(
+            "mysecret", "my url", max_connections=10, pool_timeout=5
+        )
 
         assert session_factory.signer is timestamp_signer_obj
         assert session_factory.redis is strict_redis_obj
         assert timestamp_signer_create.calls == [
             pretend.call("mysecret", salt="session")
         ]
-        assert strict_redis_cls.from_url.calls == [pretend.call("my url")]
+        assert pool_cls.from_url.calls == [
+            pretend.call("my url", max_connections=10, timeout=5)
+        ]
+        assert strict_redis_cls.calls == [pretend.call(connection_pool=pool_obj)]
 
     def test_redis_key(self):
         session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
@@ -412,7 +508,10 @@ class TestSessionFactory:
 
         session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
         session_factory.signer.unsign = pretend.call_recorder(
-            lambda session_id, max_age: b"123456"
+            lambda session_id, max_age, return_timestamp: (
+                b"123456",
+                datetime.datetime.now(datetime.UTC),
+            )
         )
         session_factory.redis = pretend.stub(
             get=pretend.call_recorder(lambda key: None)
@@ -426,23 +525,29 @@ class TestSessionFactory:
         )
 
         assert session_factory.signer.unsign.calls == [
-            pretend.call("123456", max_age=12 * 60 * 60)
+            pretend.call("123456", max_age=12 * 60 * 60, return_timestamp=True)
         ]
 
-        assert session_factory.redis.get.calls == [
-            pretend.call("warehouse/session/data/123456")
-        ]
+        # The session isn't loaded until it is used.
+        assert session_factory.redis.get.calls == []
 
         assert isinstance(session, Session)
-        assert session._sid is None
         assert session.new
+        assert session._sid is None
+
+        assert session_factory.redis.get.calls == [
+            pretend.call("warehouse/session/data/123456")
+        ]
 
     def test_valid_session_id_invalid_data(self, pyramid_request):
         pyramid_request.cookies["session_id"] = "123456"
 
         session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
         session_factory.signer.unsign = pretend.call_recorder(
-            lambda session_id, max_age: b"123456"
+            lambda session_id, max_age, return_timestamp: (
+                b"123456",
+                datetime.datetime.now(datetime.UTC),
+            )
         )
         session_factory.redis = pretend.stub(
             get=pretend.call_recorder(lambda key: b"invalid data")
@@ -456,17 +561,17 @@ class TestSessionFactory:
         )
 
         assert session_factory.signer.unsign.calls == [
-            pretend.call("123456", max_age=12 * 60 * 60)
+            pretend.call("123456", max_age=12 * 60 * 60, return_timestamp=True)
         ]
 
+        assert isinstance(session, Session)
+        assert session.new
+        assert session._sid is None
+
         assert session_factory.redis.get.calls == [
             pretend.call("warehouse/session/data/123456")
         ]
 
-        assert isinstance(session, Session)
-        assert session._sid is None
-        assert session.new
-
     def test_valid_session_id_valid_data(self, monkeypatch, pyramid_request):
         msgpack_unpackb = pretend.call_recorder(
             lambda bdata, raw, use_list: {"foo": "bar"}
@@ -477,7 +582,10 @@ class TestSessionFactory:
 
         session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
         session_factory.signer.unsign = pretend.call_recorder(
-            lambda session_id, max_age: b"123456"
+            lambda session_id, max_age, return_timestamp: (
+                b"123456",
+                datetime.datetime.now(datetime.UTC),
+            )
         )
         session_factory.redis = pretend.stub(
             get=pretend.call_recorder(lambda key: b"valid data")
@@ -491,21 +599,39 @@ class TestSessionFactory:
         )
 
         assert session_factory.signer.unsign.calls == [
-            pretend.call("123456", max_age=12 * 60 * 60)
+            pretend.call("123456", max_age=12 * 60 * 60, return_timestamp=True)
         ]
 
+        assert isinstance(session, Session)
+        assert session == {"foo": "bar"}
+        assert session.sid == "123456"
+        assert not session.new
+        assert not session.should_refresh()
+
         assert session_factory.redis.get.calls == [
             pretend.call("warehouse/session/data/123456")
         ]
-
         assert msgpack_unpackb.calls == [
             pretend.call(b"valid data", raw=False, use_list=True)
         ]
 
-        assert isinstance(session, Session)
+    @pytest.mark.parametrize(
+        ("age", "stale"),
+        [(0, False), (60 * 60 - 1, False), (60 * 60, True)],
+    )
+    def test_stale_session(self, pyramid_request, age, stale):
+        pyramid_request.cookies["session_id"] = "123456"
+
+        session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
+        session_factory.signer.unsign = lambda session_id, max_age, return_timestamp: (
+            b"123456",
+            datetime.datetime.fromtimestamp(time.time() - age, datetime.UTC),
+        )
+        session_factory._load = lambda session_id: {"foo": "bar"}
+        session = session_factory(pyramid_request)
+
         assert session == {"foo": "bar"}
-        assert session.sid == "123456"
-        assert not session.new
+        assert session.should_refresh() is stale
 
     def test_no_save_invalid_session(self, pyramid_request):
         session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
@@ -517,32 +643,44 @@ class TestSessionFactory:
     def test_noop_unused_session(self, pyramid_request):
         session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
         session_factory.redis = pretend.stub()
-        pyramid_request.session.invalidated = set()
-        pyramid_request.session.should_save = pretend.call_recorder(lambda: False)
+        pyramid_request.session = Session(
+            session_id="123456",
+            new=False,
+            loader=pretend.call_recorder(lambda: {"foo": "bar"}),
+            stale=True,
+        )
         response = pretend.stub()
         session_factory._process_response(pyramid_request, response)
-        assert pyramid_request.session.should_save.calls == [pretend.call()]
 
-    def test_invalidated_deletes_no_save(self, pyramid_request):
+        assert pyramid_request.session._loader.calls == []
+
+    def test_noop_unchanged_session(self, pyramid_request):
         session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
-        session_factory.redis = pretend.stub(
-            delete=pretend.call_recorder(lambda key: None)
+        session_factory.redis = pretend.stub()
+        pyramid_request.session = Session(
+            session_id="123456", new=False, loader=lambda: {"foo": "bar"}
         )
+        assert pyramid_request.session.pop_flash() == []
+        response = pretend.stub()
+        session_factory._process_response(pyramid_request, response)
+
+    def test_invalidated_deletes_no_save(self, pyramid_request):
+        session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
+        pipeline = FakePipeline()
+        session_factory.redis = pretend.stub(pipeline=lambda: pipeline)
+        pyramid_request.session = Session()
         pyramid_request.session.invalidated = ["1", "2"]
-        pyramid_request.session.should_save = pretend.call_recorder(lambda: False)
         response = pretend.stub(
             delete_cookie=pretend.call_recorder(lambda cookie: None)
         )
         session_factory._process_response(pyramid_request, response)
 
-        assert session_factory.redis.delete.calls == [
+        assert pipeline.delete.calls == [
             pretend.call("warehouse/session/data/1"),
             pretend.call("warehouse/session/data/2"),
         ]
-        assert pyramid_request.session.should_save.calls == [
-            pretend.call(),
-            pretend.call(),
-        ]
+        assert pipeline.setex.calls == []
+        assert pipeline.execute.calls == [pretend.call()]
         assert response.delete_cookie.calls == [pretend.call("session_id")]
 
     def test_invalidated_deletes_save_non_secure(self, monkeypatch, pyramid_request):
@@ -550,15 +688,13 @@ class TestSessionFactory:
         monkeypatch.setattr(msgpack, "packb", msgpack_packb)
 
         session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
-        session_factory.redis = pretend.stub(
-            delete=pretend.call_recorder(lambda key: None),
-            setex=pretend.call_recorder(lambda key, age, data: None),
-        )
+        pipeline = FakePipeline()
+        session_factory.redis = pretend.stub(pipeline=lambda: pipeline)
         session_factory.signer.sign = pretend.call_recorder(lambda data: "cookie data")
         pyramid_request.scheme = "http"
-        pyramid_request.session.sid = "123456"
+        pyramid_request.session = Session(session_id="123456")
+        pyramid_request.session["foo"] = "bar"
         pyramid_request.session.invalidated = ["1", "2"]
-        pyramid_request.session.should_save = pretend.call_recorder(lambda: True)
         response = pretend.stub(
             set_cookie=pretend.call_recorder(
                 lambda cookie, data, httponly=False, secure=True, samesite=b"none": None
@@ -567,7 +703,7 @@ class TestSessionFactory:
         )
         session_factory._process_response(pyramid_request, response)
 
-        assert session_factory.redis.delete.calls == [
+        assert pipeline.delete.calls == [
             pretend.call("warehouse/session/data/1"),
             pretend.call("warehouse/session/data/2"),
         ]
@@ -576,13 +712,10 @@ class TestSessionFactory:
                 pyramid_request.session, default=object_encode, use_bin_type=True
             )
         ]
-        assert session_factory.redis.setex.calls == [
+        assert pipeline.setex.calls == [
             pretend.call("warehouse/session/data/123456", 12 * 60 * 60, b"msgpack data")
         ]
-        assert pyramid_request.session.should_save.calls == [
-            pretend.call(),
-            pretend.call(),
-        ]
+        assert pipeline.execute.calls == [pretend.call()]
         assert session_factory.signer.sign.calls == [pretend.call(b"123456")]
         assert response.set_cookie.calls == [
             pretend.call(
@@ -597,6 +730,44 @@ class TestSessionFactory:
             pretend.call("user_id__insecure"),
         ]
 
+    def test_refresh_stale_session(self, pyramid_request):
+        session_factory = SessionFactory("mysecret", "redis://redis://localhost:6379/0")
+        pipeline = FakePipeline()
+        session_factory.redis = pretend.stub(pipeline=lambda: pipeline)
+        session_factory.signer.sign = pretend.call_recorder(lambda data: "cookie data")
+        pyramid_request.scheme = "https"
+        pyramid_request.session = Session(
+            session_id="123456",
+            new=False,
+            loader=lambda: {"auth.userid": "1"},
+            stale=True,
+        )
+        assert pyramid_request.session.get("auth.userid") == "1"
+        response = pretend.stub(
+            set_cookie=pretend.call_recorder(
+                lambda cookie, data, httponly=False, secure=True, samesite=b"none": None
+            ),
+            delete_cookie=pretend.call_recorder(lambda cookie: None),
+        )
+        session_factory._process_response(pyramid_request, response)
+
+        assert pipeline.delete.calls == []
+        assert pipeline.setex.calls == []
+        assert pipeline.expire.calls == [
+            pretend.call("warehouse/session/data/123456", 12 * 60 * 60)
+        ]
+        assert pipeline.execute.calls == [pretend.call()]
+        assert response.set_cookie.calls == [
+            pretend.call(
+                "session_id",
+                "cookie data",
+                httponly=True,
+                secure=True,
+                samesite=b"lax",
+            )
+        ]
+        assert response.delete_cookie.calls == []
+
 
 class TestSessionView:
     def test_has_options(self):
@@ -644,15 +815,28 @@ class TestSessionView:
         assert add_vary_cb.calls == [pretend.call(view)]
 
 
-def test_includeme(monkeypatch):
+@pytest.mark.parametrize(
+    ("settings", "max_connections", "pool_timeout"),
+    [
+        ({}, 50, 20),
+        ({"sessions.max_connections": 10, "sessions.pool_timeout": 5}, 10, 5),
+    ],
+)
+def test_includeme(monkeypatch, settings, max_connections, pool_timeout):
     session_factory_obj = pretend.stub()
-    session_factory_cls = pretend.call_recorder(lambda secret, url: session_factory_obj)
+    session_factory_cls = pretend.call_recorder(
+        lambda secret, url, **kw: session_factory_obj
+    )
     monkeypatch.setattr(warehouse.sessions, "SessionFactory", session_factory_cls)
 
     config = pretend.stub(
         set_session_factory=pretend.call_recorder(lambda factory: None),
         registry=pretend.stub(
-            settings={"sessions.secret": "my secret", "sessions.url": "my url"}
+            settings={
+                "sessions.secret": "my secret",
+                "sessions.url": "my url",
+                **settings,
+            }
         ),
         add_view_deriver=pretend.call_recorder(lambda *a, **kw: None),
     )
@@ -660,7 +844,14 @@ def test_includeme(monkeypatch):
     includeme(config)
 
     assert config.set_session_factory.calls == [pretend.call(session_factory_obj)]
-    assert session_factory_cls.calls == [pretend.call("my secret", "my url")]
+    assert session_factory_cls.calls == [
+        pretend.call(
+            "my secret",
+            "my url",
+            max_connections=max_connections,
+            pool_timeout=pool_timeout,
+        )
+    ]
     assert config.add_view_deriver.calls == [
         pretend.call(session_view, over="csrf_view", under=viewderivers.INGRESS)
     ]
@@ -1,5 +1,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import itertools
+import threading
 import types
 
 import pytest
@@ -7,12 +9,18 @@ import structlog
 import transaction
 
 from celery import Celery, Task, signals
+from celery.utils.threads import LocalStack
 from kombu import Queue
 from pyramid import scripting
+from pyramid.config import Configurator
+from pyramid.threadlocal import get_current_request, manager
 from pyramid_retry import RetryableException
 
 from warehouse import tasks
 from warehouse.config import Environment
+from warehouse.db import QueryStats, count_query, time_query
+from warehouse.packaging.interfaces import ISimpleStorage
+from warehouse.utils.profiling import SamplingProfiler
 
 
 @pytest.fixture(autouse=True)
@@ -23,6 +31,14 @@ def clean_contextvars():
     structlog.contextvars.clear_contextvars()
 
 
+@pytest.fixture(autouse=True)
+def clean_request_environments(monkeypatch):
+    """Give each test its own per-thread task request environment."""
+    monkeypatch.setattr(tasks, "_local", threading.local())
+    yield
+    manager.clear()
+
+
 def test_tls_redis_backend():
     backend = tasks.TLSRedisBackend(app=Celery())
     redis_url = "rediss://localhost?ssl_cert_reqs=CERT_REQUIRED"
@@ -49,7 +65,7 @@ class TestWarehouseTask:
 
     def test_call(self, mocker):
         registry = types.SimpleNamespace(settings={"warehouse.ip_salt": "peppa"})
-        request = types.SimpleNamespace(id="a-request-id")
+        request = types.SimpleNamespace(id="a-request-id", environ={})
 
         prepared = {
             "registry": registry,
@@ -129,67 +145,231 @@ class TestWarehouseTask:
         apply_async.assert_called_once_with(task)
         get_current_request.assert_called_once_with()
 
-    def test_request_after_commit(self, mocker):
-        manager = mocker.Mock()
-        request = mocker.Mock()
-        request.tm.get.return_value = manager
+    def test_request_after_commit(self, pyramid_services, metrics, mocker):
+        tm = transaction.TransactionManager(explicit=True)
+        request = types.SimpleNamespace(
+            tm=tm, find_service=pyramid_services.find_service
+        )
         get_current_request = mocker.patch.object(
             tasks, "get_current_request", return_value=request
         )
+        apply_async = mocker.patch.object(Task, "apply_async", autospec=True)
 
+        app = Celery()
+        producer_or_acquire = mocker.patch.object(app, "producer_or_acquire")
+        producer_or_acquire.return_value.__enter__.return_value = (
+            mocker.sentinel.producer
+        )
         task = tasks.WarehouseTask()
-        task.app = Celery()
+        task.app = app
+        other = tasks.WarehouseTask()
+        other.app = app
 
-        args = (mocker.sentinel.arg0, mocker.sentinel.arg1)
-        kwargs = {"foo": mocker.sentinel.foo}
+        with tm:
+            assert (
+                task.apply_async(mocker.sentinel.arg0, foo=mocker.sentinel.foo) is None
+            )
+            assert other.apply_async(mocker.sentinel.arg1) is None
 
-        assert task.apply_async(*args, **kwargs) is None
-        get_current_request.assert_called_once_with()
-        request.tm.get.assert_called_once_with()
-        manager.addAfterCommitHook.assert_called_once_with(
-            task._after_commit_hook, args=args, kws=kwargs
-        )
+            assert len(list(tm.get().getAfterCommitHooks())) == 1
+            apply_async.assert_not_called()
 
-    @pytest.mark.parametrize("success", [True, False])
-    def test_after_commit_hook(self, mocker, success):
-        args = [mocker.sentinel.arg0, mocker.sentinel.arg1]
-        kwargs = {"foo": mocker.sentinel.foo, "bar": mocker.sentinel.bar}
+        assert get_current_request.call_count == 2
+        producer_or_acquire.assert_called_once_with()
+        assert apply_async.call_args_list == [
+            mocker.call(
+                task,
+                mocker.sentinel.arg0,
+                producer=mocker.sentinel.producer,
+                foo=mocker.sentinel.foo,
+            ),
+            mocker.call(other, mocker.sentinel.arg1, producer=mocker.sentinel.producer),
+        ]
+        metrics.histogram.assert_called_once_with("warehouse.task.batch_size", 2)
 
-        apply_async = mocker.patch.object(
-            Task, "apply_async", autospec=True, return_value=None
+    def test_batch_per_transaction(self, pyramid_services, mocker):
+        tm = transaction.TransactionManager(explicit=True)
+        request = types.SimpleNamespace(
+            tm=tm, find_service=pyramid_services.find_service
         )
 
+        with tm:
+            first = tasks._TaskBatch.for_request(request)
+            assert tasks._TaskBatch.for_request(request) is first
+        with tm:
+            assert tasks._TaskBatch.for_request(request) is not first
+
+    def test_publish_unsuccessful(self, metrics, mocker):
+        apply_async = mocker.patch.object(Task, "apply_async", autospec=True)
         task = tasks.WarehouseTask()
         task.app = Celery()
+        producer_or_acquire = mocker.patch.object(task.app, "producer_or_acquire")
+        batch = tasks._TaskBatch(metrics)
+        batch.add(task, (), {})
 
-        task._after_commit_hook(success, *args, **kwargs)
+        batch.publish(False)
 
-        if success:
-            apply_async.assert_called_once_with(task, *args, **kwargs)
-        else:
-            apply_async.assert_not_called()
+        producer_or_acquire.assert_not_called()
+        apply_async.assert_not_called()
+        metrics.histogram.assert_not_called()
 
-    def test_creates_request(self, mocker):
-        registry = types.SimpleNamespace(settings={"warehouse.ip_salt": "peppa"})
-        pyramid_env = {"request": types.SimpleNamespace(id="a-request-id")}
+    def test_publish_failure_sends_the_rest(self, metrics, mocker):
+        logger = mocker.patch.object(tasks, "logger")
+        apply_async = mocker.patch.object(
+            Task, "apply_async", autospec=True, side_effect=[ValueError, None]
+        )
+        task = tasks.WarehouseTask()
+        task.name = "warehouse.tasks.failing"
+        task.app = Celery()
+        mocker.patch.object(task.app, "producer_or_acquire")
+        batch = tasks._TaskBatch(metrics)
+        batch.add(task, (), {})
+        batch.add(task, (), {})
 
-        mocker.patch.object(scripting, "prepare", return_value=pyramid_env)
+        batch.publish(True)
 
+        assert apply_async.call_count == 2
+        logger.exception.assert_called_once_with(
+            "task_publish_failed", task_name="warehouse.tasks.failing"
+        )
+        metrics.increment.assert_called_once_with(
+            "warehouse.task.publish_failed", tags=["task:warehouse.tasks.failing"]
+        )
+
+    @pytest.fixture
+    def registry(self):
+        config = Configurator(settings={"warehouse.ip_salt": "peppa"})
+        ids = itertools.count()
+        config.add_request_method(
+            lambda r: f"request-{next(ids)}", name="id", reify=True
+        )
+        config.commit()
+        return config.registry
+
+    def _task(self, registry, name="warehouse.tasks.test"):
         obj = tasks.WarehouseTask()
+        obj.name = name
         obj.app.pyramid_config = types.SimpleNamespace(registry=registry)
+        # Each task has its own stack, as every task registered with the app is
+        # its own class.
+        obj.request_stack = LocalStack()
+        obj.push_request()
+        return obj
+
+    def _finish(self, obj):
+        obj.after_return(None, None, None, None, None, None)
+        obj.pop_request()
+
+    def test_creates_request(self, registry):
+        obj = self._task(registry)
 
         request = obj.get_request()
 
-        assert obj.request.pyramid_env == pyramid_env
-        assert request is pyramid_env["request"]
+        assert obj.request.pyramid_env["request"] is request
+        assert request.registry is registry
         assert isinstance(request.tm, transaction.TransactionManager)
         assert 1.5e12 < request.timings["new_request_start"] < 1e13
+        assert request.task_name == "warehouse.tasks.test"
         assert request.remote_addr == "127.0.0.1"
         assert (
             request.remote_addr_hashed
             == "cc9dfe9c4e6b6579bbf789d04339bd2d7f10aadf84ff4394193d99f14a0333f0"
         )
-        assert structlog.contextvars.get_contextvars()["request.id"] == "a-request-id"
+        assert structlog.contextvars.get_contextvars()["request.id"] == "request-0"
+        assert get_current_request() is request
+
+        self._finish(obj)
+
+        assert get_current_request() is None
+
+    def test_resets_request_between_tasks(self, registry, mocker):
+        prepare = mocker.spy(scripting, "prepare")
+        finished = mocker.Mock()
+
+        first = self._task(registry)
+        request = first.get_request()
+        first_tm = request.tm
+        request.add_finished_callback(finished)
+        request.foo = "bar"
+        request.environ["HTTP_FOO"] = "bar"
+        assert request.id == "request-0"
+        self._finish(first)
+
+        finished.assert_called_once_with(request)
+
+        second = self._task(registry, name="warehouse.tasks.other")
+
+        assert second.get_request() is request
+        assert not hasattr(request, "foo")
+        assert "HTTP_FOO" not in request.environ
+        assert request.id == "request-1"
+        assert request.tm is not first_tm
+        assert request.task_name == "warehouse.tasks.other"
+        assert not request.finished_callbacks
+        assert request.remote_addr == "127.0.0.1"
+        prepare.assert_called_once_with(registry=registry)
+
+        self._finish(second)
+
+    def test_callbacks_are_not_shared_between_tasks(self, registry):
+        first = self._task(registry)
+        request = first.get_request()
+        finished_callbacks = request.finished_callbacks
+        response_callbacks = request.response_callbacks
+        self._finish(first)
+
+        second = self._task(registry)
+        second.get_request()
+
+        assert request.finished_callbacks is not finished_callbacks
+        assert request.response_callbacks is not response_callbacks
+
+        self._finish(second)
+
+    def test_failing_finished_callback_still_closes(self, registry, mocker):
+        first = self._task(registry)
+        request = first.get_request()
+        request.add_finished_callback(mocker.Mock(side_effect=ValueError("broken")))
+
+        with pytest.raises(ValueError, match="broken"):
+            first.after_return(None, None, None, None, None, None)
+        first.pop_request()
+
+        assert get_current_request() is None
+
+        second = self._task(registry)
+
+        assert second.get_request() is request
+
+        self._finish(second)
+
+    def test_task_called_from_task(self, registry):
+        outer = self._task(registry)
+        outer_request = outer.get_request()
+        inner = self._task(registry, name="warehouse.tasks.inner")
+
+        inner_request = inner.get_request()
+
+        assert inner_request is not outer_request
+        assert inner_request.task_name == "warehouse.tasks.inner"
+        assert outer_request.task_name == "warehouse.tasks.test"
+
+        self._finish(inner)
+        assert get_current_request() is outer_request
+        self._finish(outer)
+
+    def test_new_registry(self, registry):
+        first = self._task(registry)
+        request = first.get_request()
+        self._finish(first)
+
+        other = Configurator(settings={"warehouse.ip_salt": "peppa"})
+        other.add_request_method(lambda r: "other", name="id", reify=True)
+        other.commit()
+        second = self._task(other.registry)
+
+        assert second.get_request() is not request
+        self._finish(second)
 
     def test_reuses_request(self, mocker):
         pyramid_env = {"request": mocker.sentinel.request}
@@ -202,6 +382,7 @@ class TestWarehouseTask:
 
     def test_run_creates_transaction(self, mocker, metrics):
         request = types.SimpleNamespace(
+            registry={},
             tm=mocker.MagicMock(),
             find_service=lambda *a, **kw: metrics,
         )
@@ -252,6 +433,7 @@ class TestWarehouseTask:
         )
 
         request = types.SimpleNamespace(
+            registry={},
             tm=mocker.MagicMock(),
             find_service=lambda *a, **kw: metrics,
         )
@@ -286,6 +468,7 @@ class TestWarehouseTask:
         )
 
         request = types.SimpleNamespace(
+            registry={},
             tm=mocker.MagicMock(),
             find_service=lambda *a, **kw: metrics,
         )
@@ -429,6 +612,173 @@ class TestTaskLoggingSignals:
         assert structlog.contextvars.get_contextvars() == {}
 
 
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTaskProfiler:
+    def test_enabled_by_settings(self):
+        profiler = tasks.TaskProfiler(tasks=["warehouse.tasks.slow"])
+
+        assert profiler.enabled_for("warehouse.tasks.slow")
+        assert not profiler.enabled_for("warehouse.tasks.fast")
+
+    def test_enabled_by_redis_flag(self, mocker, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(tasks.time, "monotonic", clock)
+        redis = mocker.Mock(spec=["exists"])
+        redis.exists.return_value = 1
+        profiler = tasks.TaskProfiler(redis=redis, flag_ttl=30)
+
+        assert profiler.enabled_for("warehouse.tasks.slow")
+        redis.exists.return_value = 0
+        clock.now += 29
+        assert profiler.enabled_for("warehouse.tasks.slow")
+        clock.now += 1
+        assert not profiler.enabled_for("warehouse.tasks.slow")
+
+        assert redis.exists.call_args_list == [
+            mocker.call("warehouse.tasks.profile:warehouse.tasks.slow"),
+            mocker.call("warehouse.tasks.profile:warehouse.tasks.slow"),
+        ]
+
+    def test_redis_unavailable(self, mocker):
+        redis = mocker.Mock(spec=["exists"])
+        redis.exists.side_effect = tasks.redis.ConnectionError
+        profiler = tasks.TaskProfiler(redis=redis)
+
+        assert not profiler.enabled_for("warehouse.tasks.slow")
+        assert not profiler.enabled_for("warehouse.tasks.slow")
+
+        redis.exists.assert_called_once_with(
+            "warehouse.tasks.profile:warehouse.tasks.slow"
+        )
+
+    @pytest.fixture
+    def sampler(self):
+        sampler = SamplingProfiler(interval=0.01)
+        sampler.samples.update({"a;b": 1, "a;b;c": 3})
+        sampler.duration = 0.5
+        return sampler
+
+    @pytest.fixture
+    def stats(self):
+        stats = QueryStats()
+        stats.count = 2
+        stats.duration = 0.125
+        return stats
+
+    def test_save_to_directory(self, mocker, tmp_path, sampler, stats):
+        logger = mocker.patch.object(tasks, "logger")
+        profiler = tasks.TaskProfiler(directory=str(tmp_path))
+        request = types.SimpleNamespace(id="request-id")
+
+        profiler.save(request, "warehouse.tasks.slow", sampler, stats)
+
+        (path,) = (tmp_path / "warehouse.tasks.slow").iterdir()
+        assert path.name.endswith("-request-id.collapsed")
+        assert path.read_text() == "a;b;c 3\na;b 1\n"
+        logger.info.assert_called_once_with(
+            "task_profiled",
+            task_name="warehouse.tasks.slow",
+            path=str(path),
+            samples=4,
+            duration_ms=500.0,
+            db_time_ms=125.0,
+            queries=2,
+        )
+
+    def test_save_to_simple_storage(self, mocker, sampler, stats):
+        stored = {}
+
+        def store(path, file_path, *, meta=None):
+            with open(file_path) as f:
+                stored[path] = (f.read(), meta)
+
+        storage = mocker.Mock(spec=["store"])
+        storage.store.side_effect = store
+        request = types.SimpleNamespace(
+            id="request-id",
+            find_service=lambda iface, **kw: {ISimpleStorage: storage}[iface],
+        )
+        profiler = tasks.TaskProfiler()
+
+        profiler.save(request, "warehouse.tasks.slow", sampler, stats)
+
+        ((path, (profile, meta)),) = stored.items()
+        assert path.startswith("_task-profiles/warehouse.tasks.slow/")
+        assert path.endswith("-request-id.collapsed")
+        assert profile == "a;b;c 3\na;b 1\n"
+        assert meta == {"task": "warehouse.tasks.slow"}
+
+
+class TestTaskTimings:
+    @pytest.fixture
+    def perf_counter(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(tasks.time, "perf_counter", clock)
+        return clock
+
+    def _run(self, request, metrics, perf_counter):
+        tags = ["task:warehouse.tasks.slow"]
+        with tasks._task_timings(request, "warehouse.tasks.slow", metrics, tags):
+            perf_counter.now += 0.25
+            count_query(None, None, "SELECT 1", None, None, False)
+            perf_counter.now += 0.5
+            time_query(None, None, "SELECT 1", None, None, False)
+
+    def test_records_db_and_python_time(self, mocker, metrics, perf_counter):
+        request = types.SimpleNamespace(registry={})
+
+        self._run(request, metrics, perf_counter)
+
+        tags = ["task:warehouse.tasks.slow"]
+        assert metrics.timing.call_args_list == [
+            mocker.call("warehouse.task.db_time", 500.0, tags=tags),
+            mocker.call("warehouse.task.python_time", 250.0, tags=tags),
+        ]
+
+    def test_profiles_enabled_task(self, mocker, metrics, perf_counter):
+        profiler = tasks.TaskProfiler(tasks=["warehouse.tasks.slow"], interval=60)
+        save = mocker.patch.object(profiler, "save")
+        request = types.SimpleNamespace(registry={"tasks.profiler": profiler})
+
+        self._run(request, metrics, perf_counter)
+
+        (_, name, sampler, stats), _ = save.call_args
+        assert name == "warehouse.tasks.slow"
+        assert isinstance(sampler, SamplingProfiler)
+        assert sampler.interval == 60
+        assert not sampler._thread.is_alive()
+        assert stats.count == 1
+
+    def test_profile_that_cannot_be_saved(self, mocker, metrics, perf_counter):
+        logger = mocker.patch.object(tasks, "logger")
+        profiler = tasks.TaskProfiler(tasks=["warehouse.tasks.slow"], interval=60)
+        mocker.patch.object(profiler, "save", side_effect=OSError)
+        request = types.SimpleNamespace(registry={"tasks.profiler": profiler})
+
+        self._run(request, metrics, perf_counter)
+
+        logger.exception.assert_called_once_with(
+            "task_profile_failed", task_name="warehouse.tasks.slow"
+        )
+        assert metrics.timing.call_count == 2
+
+    def test_task_not_profiled(self, mocker, metrics, perf_counter):
+        profiler = tasks.TaskProfiler(tasks=["warehouse.tasks.other"])
+        save = mocker.patch.object(profiler, "save")
+        request = types.SimpleNamespace(registry={"tasks.profiler": profiler})
+
+        self._run(request, metrics, perf_counter)
+
+        save.assert_not_called()
+
+
 @pytest.mark.parametrize(
     (
         "env",
@@ -518,3 +868,52 @@ def test_includeme(mocker, env, ssl, broker_redis_url, expected_url, transport_o
     config.add_request_method.assert_called_once_with(
         tasks._get_task_from_request, name="task", reify=True
     )
+    assert "tasks.profiler" not in config.registry
+
+
+@pytest.mark.parametrize(
+    ("settings", "profiled", "flags", "interval"),
+    [
+        (
+            {"tasks.profiling.tasks": ["warehouse.tasks.slow"]},
+            {"warehouse.tasks.slow"},
+            False,
+            0.01,
+        ),
+        (
+            {
+                "tasks.profiling.url": "redis://127.0.0.1:6379/7",
+                "tasks.profiling.interval": 5.0,
+                "tasks.profiling.directory": "/tmp/profiles",
+            },
+            set(),
+            True,
+            0.005,
+        ),
+    ],
+)
+def test_includeme_task_profiling(mocker, settings, profiled, flags, interval):
+    class Registry(dict):
+        pass
+
+    registry = Registry()
+    registry.settings = {
+        "warehouse.env": Environment.development,
+        "celery.broker_redis_url": "redis://127.0.0.1:6379/10",
+        "celery.scheduler_url": "redis://127.0.0.1:6379/0",
+        **settings,
+    }
+    config = mocker.Mock(
+        spec=["action", "add_directive", "add_request_method", "registry"]
+    )
+    config.registry = registry
+    mocker.patch.object(signals.task_prerun, "connect", autospec=True)
+    mocker.patch.object(signals.task_postrun, "connect", autospec=True)
+
+    tasks.includeme(config)
+
+    profiler = config.registry["tasks.profiler"]
+    assert profiler.tasks == profiled
+    assert (profiler.redis is not None) is flags
+    assert profiler.interval == interval
+    assert profiler.directory == settings.get("tasks.profiling.directory")
@@ -3,6 +3,7 @@
 import datetime
 
 from pathlib import Path
+from unittest import mock
 
 import opensearchpy
 import pretend
@@ -43,6 +44,8 @@ from warehouse.views import (
     opensearchxml,
     robotstxt,
     search,
+    search_json,
+    search_suggest,
     service_unavailable,
     session_notifications,
     sidebar_sponsor_logo,
@@ -494,6 +497,13 @@ def test_csi_sidebar_sponsor_logo():
     assert sidebar_sponsor_logo(pretend.stub()) == {}
 
 
+def _fake_search_page(took=5, timed_out=False, failed_shards=0, **kwargs):
+    results = pretend.stub(
+        took=took, timed_out=timed_out, _shards=pretend.stub(failed=failed_shards)
+    )
+    return pretend.stub(collection=pretend.stub(results=results), **kwargs)
+
+
 class TestSearch:
     @pytest.mark.parametrize("page", [None, 1, 5])
     def test_with_a_query(
@@ -519,7 +529,7 @@ class TestSearch:
         get_opensearch_query = pretend.call_recorder(lambda *a, **kw: opensearch_query)
         monkeypatch.setattr(views, "get_opensearch_query", get_opensearch_query)
 
-        page_obj = pretend.stub(page_count=(page or 1) + 10, item_count=1000)
+        page_obj = _fake_search_page(page_count=(page or 1) + 10, item_count=1000)
         page_cls = pretend.call_recorder(lambda *a, **kw: page_obj)
         monkeypatch.setattr(views, "OpenSearchPage", page_cls)
 
@@ -544,6 +554,16 @@ class TestSearch:
         assert metrics.histogram.calls == [
             pretend.call("warehouse.views.search.results", 1000)
         ]
+        tags = [
+            "query_type:best_fields",
+            "prefix:true",
+            "classifiers:false",
+            "order:relevance",
+        ]
+        assert metrics.timing.calls == [
+            pretend.call("warehouse.views.search.duration", mock.ANY, tags=tags),
+            pretend.call("warehouse.views.search.took", 5, tags=tags),
+        ]
 
     @pytest.mark.parametrize("page", [None, 1, 5])
     def test_with_classifiers(
@@ -579,7 +599,7 @@ class TestSearch:
         release1._classifiers.append(classifier1)
         release1._classifiers.append(classifier2)
 
-        page_obj = pretend.stub(page_count=(page or 1) + 10, item_count=1000)
+        page_obj = _fake_search_page(page_count=(page or 1) + 10, item_count=1000)
         page_cls = pretend.call_recorder(lambda *a, **kw: page_obj)
         monkeypatch.setattr(views, "OpenSearchPage", page_cls)
 
@@ -634,7 +654,7 @@ class TestSearch:
         opensearch_query = pretend.stub()
         db_request.opensearch = pretend.stub(query=lambda *a, **kw: opensearch_query)
 
-        page_obj = pretend.stub(page_count=10, item_count=1000)
+        page_obj = _fake_search_page(page_count=10, item_count=1000)
         page_cls = pretend.call_recorder(lambda *a, **kw: page_obj)
         monkeypatch.setattr(views, "OpenSearchPage", page_cls)
 
@@ -670,7 +690,7 @@ class TestSearch:
         opensearch_query = pretend.stub()
         db_request.opensearch = pretend.stub(query=lambda *a, **kw: opensearch_query)
 
-        page_obj = pretend.stub(page_count=10, item_count=1000)
+        page_obj = _fake_search_page(page_count=10, item_count=1000)
         page_cls = pretend.call_recorder(lambda *a, **kw: page_obj)
         monkeypatch.setattr(views, "OpenSearchPage", page_cls)
 
@@ -791,6 +811,352 @@ class TestSearch:
         assert snapshots[0].partition_key == "ip"
         assert snapshots[0].stats is stats
 
+    def test_records_shard_failures_and_timeouts(
+        self, monkeypatch, pyramid_services, db_request, metrics
+    ):
+        db_request.params = MultiDict({"q": '"foo bar"', "o": "-created"})
+
+        fake_rate_limiter = pretend.stub(
+            test=lambda *a: True,
+            hit=lambda *a: True,
+            resets_in=lambda *a: None,
+            get_window_stats=lambda *a: [],
+        )
+        pyramid_services.register_service(
+            fake_rate_limiter, IRateLimiter, None, name="search"
+        )
+
+        db_request.opensearch = pretend.stub()
+        monkeypatch.setattr(views, "get_opensearch_query", lambda *a: pretend.stub())
+
+        page_obj = _fake_search_page(
+            timed_out=True, failed_shards=2, page_count=1, item_count=10
+        )
+        monkeypatch.setattr(views, "OpenSearchPage", lambda *a, **kw: page_obj)
+
+        search(db_request)
+
+        tags = [
+            "query_type:phrase",
+            "prefix:true",
+            "classifiers:false",
+            "order:created",
+        ]
+        assert metrics.increment.calls == [
+            pretend.call("warehouse.search.ratelimiter.hit"),
+            pretend.call("warehouse.views.search.shard_failures", 2, tags=tags),
+            pretend.call("warehouse.views.search.timed_out", tags=tags),
+        ]
+
+    @pytest.mark.parametrize(
+        ("threshold", "sample", "logged"),
+        [(None, 0.1, False), (0, 0.1, True), (0, 0.5, False), (60_000, 0.1, False)],
+    )
+    def test_logs_slow_queries(
+        self,
+        monkeypatch,
+        pyramid_services,
+        db_request,
+        metrics,
+        threshold,
+        sample,
+        logged,
+    ):
+        db_request.params = MultiDict({"c": "foo :: bar"})
+        db_request.registry.settings = {
+            "warehouse.search.slow_query_threshold_ms": threshold,
+            "warehouse.search.slow_query_sample_rate": 0.25,
+        }
+        db_request.log = pretend.stub(
+            warning=pretend.call_recorder(lambda *a, **kw: None)
+        )
+
+        fake_rate_limiter = pretend.stub(
+            test=lambda *a: True,
+            hit=lambda *a: True,
+            resets_in=lambda *a: None,
+            get_window_stats=lambda *a: [],
+        )
+        pyramid_services.register_service(
+            fake_rate_limiter, IRateLimiter, None, name="search"
+        )
+
+        db_request.opensearch = pretend.stub()
+        opensearch_query = pretend.stub(to_dict=lambda: {"query": {}})
+        monkeypatch.setattr(views, "get_opensearch_query", lambda *a: opensearch_query)
+        monkeypatch.setattr(views.random, "random", lambda: sample)
+
+        page_obj = _fake_search_page(took=42, page_count=1, item_count=10)
+        monkeypatch.setattr(views, "OpenSearchPage", lambda *a, **kw: page_obj)
+
+        search(db_request)
+
+        if logged:
+            assert db_request.log.warning.calls == [
+                pretend.call(
+                    "Slow search query",
+                    duration_ms=mock.ANY,
+                    took_ms=42,
+                    tags=[
+                        "query_type:classifier_only",
+                        "prefix:false",
+                        "classifiers:true",
+                        "order:relevance",
+                    ],
+                    query={"query": {}},
+                )
+            ]
+        else:
+            assert db_request.log.warning.calls == []
+
+    @pytest.mark.parametrize("cursor", ["", "abc"])
+    def test_with_a_cursor(
+        self, monkeypatch, pyramid_services, db_request, metrics, cursor
+    ):
+        params = MultiDict({"q": "foo bar", "cursor": cursor})
+        db_request.params = params
+
+        fake_rate_limiter = pretend.stub(
+            test=lambda *a: True,
+            hit=lambda *a: True,
+            resets_in=lambda *a: None,
+            get_window_stats=lambda *a: [],
+        )
+        pyramid_services.register_service(
+            fake_rate_limiter, IRateLimiter, None, name="search"
+        )
+
+        db_request.opensearch = pretend.stub()
+        opensearch_query = pretend.stub()
+        get_opensearch_query = pretend.call_recorder(lambda *a, **kw: opensearch_query)
+        monkeypatch.setattr(views, "get_opensearch_query", get_opensearch_query)
+
+        page_obj = _fake_search_page(item_count=1000)
+        page_cls = pretend.call_recorder(lambda *a, **kw: page_obj)
+        monkeypatch.setattr(views, "OpenSearchCursorPage", page_cls)
+
+        url_maker = pretend.stub()
+        url_maker_factory = pretend.call_recorder(lambda request, **kw: url_maker)
+        monkeypatch.setattr(views, "paginate_url_factory", url_maker_factory)
+
+        assert search(db_request) == {
+            "page": page_obj,
+            "term": "foo bar",
+            "order": "",
+            "applied_filters": [],
+            "available_filters": [],
+        }
+        assert page_cls.calls == [
+            pretend.call(
+                opensearch_query,
+                cursor=cursor or None,
+                items_per_page=20,
+                url_maker=url_maker,
+            )
+        ]
+        assert url_maker_factory.calls == [pretend.call(db_request, query_arg="cursor")]
+        assert metrics.histogram.calls == [
+            pretend.call("warehouse.views.search.results", 1000)
+        ]
+
+    def test_raises_400_with_invalid_cursor(
+        self, monkeypatch, pyramid_services, db_request, metrics
+    ):
+        db_request.params = MultiDict({"cursor": "invalid"})
+
+        fake_rate_limiter = pretend.stub(
+            test=lambda *a: True,
+            hit=lambda *a: True,
+            resets_in=lambda *a: None,
+            get_window_stats=lambda *a: [],
+        )
+        pyramid_services.register_service(
+            fake_rate_limiter, IRateLimiter, None, name="search"
+        )
+
+        opensearch_query = pretend.stub()
+        db_request.opensearch = pretend.stub(query=lambda *a, **kw: opensearch_query)
+
+        def raiser(*args, **kwargs):
+            raise ValueError("Invalid cursor.")
+
+        monkeypatch.setattr(views, "OpenSearchCursorPage", raiser)
+
+        with pytest.raises(HTTPBadRequest):
+            search(db_request)
+
+        assert metrics.histogram.calls == []
+
+    def test_cursor_returns_503_when_opensearch_unavailable(
+        self, monkeypatch, pyramid_services, db_request, metrics
+    ):
+        db_request.params = MultiDict({"cursor": ""})
+
+        fake_rate_limiter = pretend.stub(
+            test=lambda *a: True,
+            hit=lambda *a: True,
+            resets_in=lambda *a: None,
+            get_window_stats=lambda *a: [],
+        )
+        pyramid_services.register_service(
+            fake_rate_limiter, IRateLimiter, None, name="search"
+        )
+
+        opensearch_query = pretend.stub()
+        db_request.opensearch = pretend.stub(query=lambda *a, **kw: opensearch_query)
+
+        def raiser(*args, **kwargs):
+            raise opensearchpy.ConnectionError
+
+        monkeypatch.setattr(views, "OpenSearchCursorPage", raiser)
+
+        with pytest.raises(HTTPServiceUnavailable):
+            search(db_request)
+
+        assert metrics.increment.calls == [
+            pretend.call("warehouse.search.ratelimiter.hit"),
+            pretend.call("warehouse.views.search.error"),
+        ]
+        assert metrics.histogram.calls == []
+
+
+class TestSearchJSON:
+    @pytest.mark.parametrize("cursor", [None, "abc"])
+    def test_search_json(
+        self, monkeypatch, pyramid_services, db_request, metrics, cursor
+    ):
+        params = MultiDict({"q": "foo bar", "o": "-created", "c": "foo :: bar"})
+        if cursor is not None:
+            params["cursor"] = cursor
+        db_request.params = params
+
+        fake_rate_limiter = pretend.stub(
+            test=lambda *a: True,
+            hit=lambda *a: True,
+            resets_in=lambda *a: None,
+            get_window_stats=lambda *a: [],
+        )
+        pyramid_services.register_service(
+            fake_rate_limiter, IRateLimiter, None, name="search"
+        )
+
+        db_request.opensearch = pretend.stub()
+        opensearch_query = pretend.stub()
+        get_opensearch_query = pretend.call_recorder(lambda *a, **kw: opensearch_query)
+        monkeypatch.setattr(views, "get_opensearch_query", get_opensearch_query)
+
+        created = datetime.datetime(2020, 1, 1, 12, 30)
+        page_obj = _fake_search_page(
+            item_count=2,
+            next_cursor="next",
+            next_url="/search/json?cursor=next",
+            items=[
+                pretend.stub(
+                    name="Foo", normalized_name="foo", summary="A foo", created=created
+                ),
+                pretend.stub(
+                    name="bar", normalized_name="bar", summary=None, created=None
+                ),
+            ],
+        )
+        page_cls = pretend.call_recorder(lambda *a, **kw: page_obj)
+        monkeypatch.setattr(views, "OpenSearchCursorPage", page_cls)
+
+        url_maker = pretend.stub()
+        url_maker_factory = pretend.call_recorder(lambda request, **kw: url_maker)
+        monkeypatch.setattr(views, "paginate_url_factory", url_maker_factory)
+
+        assert search_json(db_request) == {
+            "meta": {
+                "total": 2,
+                "next_cursor": "next",
+                "next": "/search/json?cursor=next",
+            },
+            "projects": [
+                {
+                    "name": "Foo",
+                    "normalized_name": "foo",
+                    "summary": "A foo",
+                    "created": "2020-01-01T12:30:00",
+                },
+                {
+                    "name": "bar",
+                    "normalized_name": "bar",
+                    "summary": None,
+                    "created": None,
+                },
+            ],
+        }
+        assert get_opensearch_query.calls == [
+            pretend.call(db_request.opensearch, "foo bar", "-created", ["foo :: bar"])
+        ]
+        assert page_cls.calls == [
+            pretend.call(
+                opensearch_query,
+                cursor=cursor,
+                items_per_page=100,
+                url_maker=url_maker,
+            )
+        ]
+        assert url_maker_factory.calls == [pretend.call(db_request, query_arg="cursor")]
+        assert metrics.histogram.calls == [
+            pretend.call("warehouse.views.search.results", 2)
+        ]
+
+    def test_returns_429_when_ratelimited(self, pyramid_services, db_request, metrics):
+        db_request.params = MultiDict({"q": "foo bar"})
+
+        fake_rate_limiter = pretend.stub(
+            test=lambda *a: False,
+            hit=lambda *a: True,
+            resets_in=lambda *a: None,
+            get_window_stats=lambda *a: [],
+        )
+        pyramid_services.register_service(
+            fake_rate_limiter, IRateLimiter, None, name="search"
+        )
+
+        with pytest.raises(HTTPTooManyRequests):
+            search_json(db_request)
+
+        assert metrics.increment.calls == [
+            pretend.call("warehouse.search.ratelimiter.exceeded")
+        ]
+
+
+class TestSearchSuggest:
+    @pytest.mark.parametrize("query", [None, ""])
+    def test_no_query(self, pyramid_request, mocker, query):
+        if query is not None:
+            pyramid_request.params = MultiDict({"q": query})
+        name_index = mocker.Mock()
+        pyramid_request.registry["search.name_index"] = name_index
+
+        assert search_suggest(pyramid_request) == {"suggestions": []}
+        name_index.refresh.assert_not_called()
+
+    def test_query_too_long(self, pyramid_request, mocker):
+        pyramid_request.params = MultiDict({"q": "a" * 1001})
+        name_index = mocker.Mock()
+        pyramid_request.registry["search.name_index"] = name_index
+
+        with pytest.raises(HTTPRequestEntityTooLarge):
+            search_suggest(pyramid_request)
+        name_index.refresh.assert_not_called()
+
+    def test_suggests(self, pyramid_request, mocker):
+        pyramid_request.params = MultiDict({"q": "Foo_B"})
+        pyramid_request.db = mocker.sentinel.db
+        name_index = mocker.Mock()
+        name_index.suggest.return_value = ["foo-bar", "foo-baz"]
+        pyramid_request.registry["search.name_index"] = name_index
+
+        assert search_suggest(pyramid_request) == {
+            "suggestions": ["foo-bar", "foo-baz"]
+        }
+        name_index.refresh.assert_called_once_with(mocker.sentinel.db)
+        name_index.suggest.assert_called_once_with("foo-b")
+
 
 def test_classifiers(db_request):
     assert list_classifiers(db_request) == {"classifiers": sorted_classifiers}
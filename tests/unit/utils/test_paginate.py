@@ -2,6 +2,7 @@
 
 import types
 
+import pretend
 import pytest
 
 from webob.multidict import MultiDict
@@ -215,6 +216,154 @@ def test_opensearch_page_has_wrapper(mocker):
     )
 
 
+class FakeHit:
+    def __init__(self, value):
+        self.value = value
+        self.meta = types.SimpleNamespace(sort=[value, f"name-{value}"])
+
+    def __eq__(self, other):
+        return self.value == other
+
+
+class FakeCursorQuery:
+    def __init__(self, fake, sort=None, suggest=None, int_total=False):
+        self.fake = fake
+        self._sort = sort
+        self.suggest = suggest
+        self.int_total = int_total
+        self.sorted_by = None
+        self.search_after = None
+        self.range = slice(None)
+
+    def to_dict(self):
+        return {"sort": self._sort} if self._sort is not None else {}
+
+    def sort(self, *keys):
+        self.sorted_by = list(keys)
+        return self
+
+    def extra(self, search_after):
+        self.search_after = search_after
+        return self
+
+    def __getitem__(self, range):
+        self.range = range
+        return self
+
+    def execute(self):
+        start = 0
+        if self.search_after is not None:
+            start = [h.meta.sort for h in self.fake].index(self.search_after) + 1
+        data = self.fake[start:][self.range]
+        total = len(self.fake)
+        hits = types.SimpleNamespace(
+            total=total if self.int_total else {"value": total}
+        )
+        return FakeCursorResult(data, hits, self.suggest)
+
+
+class FakeCursorResult:
+    def __init__(self, data, hits, suggest):
+        self.data = data
+        self.hits = hits
+        if suggest is not None:
+            self.suggest = suggest
+
+    def __iter__(self):
+        yield from self.data
+
+
+class TestCursor:
+    def test_roundtrip(self):
+        cursor = paginate.encode_cursor([1.5, "foo"])
+        assert paginate.decode_cursor(cursor) == [1.5, "foo"]
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "not base64!",
+            "bm90IGpzb24=",  # "not json"
+            "e30=",  # "{}"
+            "W10=",  # "[]"
+            "\N{SNOWMAN}",
+        ],
+    )
+    def test_decode_invalid(self, cursor):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            paginate.decode_cursor(cursor)
+
+
+class TestOpenSearchCursorPage:
+    def test_first_page(self):
+        hits = [FakeHit(i) for i in range(5)]
+        query = FakeCursorQuery(hits)
+        url_maker = pretend.call_recorder(lambda cursor: f"/search/?cursor={cursor}")
+
+        page = paginate.OpenSearchCursorPage(
+            query, items_per_page=2, url_maker=url_maker
+        )
+
+        assert page.items == [0, 1]
+        assert page.item_count == 5
+        assert page.collection is page
+        assert page.best_guess is None
+        assert page.next_cursor == paginate.encode_cursor([1, "name-1"])
+        assert page.next_url == f"/search/?cursor={page.next_cursor}"
+        assert query.sorted_by == ["_score", paginate.SEARCH_AFTER_TIEBREAKER]
+        assert query.search_after is None
+        assert query.range == slice(None, 2)
+
+    def test_resumes_from_cursor(self):
+        hits = [FakeHit(i) for i in range(5)]
+        query = FakeCursorQuery(hits, sort=[{"created": {"order": "desc"}}])
+
+        page = paginate.OpenSearchCursorPage(
+            query, cursor=paginate.encode_cursor([1, "name-1"]), items_per_page=2
+        )
+
+        assert page.items == [2, 3]
+        assert query.sorted_by == [
+            {"created": {"order": "desc"}},
+            paginate.SEARCH_AFTER_TIEBREAKER,
+        ]
+        assert query.search_after == [1, "name-1"]
+        assert page.next_url is None
+
+    def test_last_page(self):
+        hits = [FakeHit(i) for i in range(5)]
+        query = FakeCursorQuery(hits, int_total=True)
+
+        page = paginate.OpenSearchCursorPage(
+            query, cursor=paginate.encode_cursor([3, "name-3"]), items_per_page=2
+        )
+
+        assert page.items == [4]
+        assert page.item_count == 5
+        assert page.next_cursor is None
+        assert page.next_url is None
+
+    def test_invalid_cursor(self):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            paginate.OpenSearchCursorPage(FakeCursorQuery([]), cursor="invalid")
+
+    def test_best_guess_suggestion(self, mocker):
+        fake_option = mocker.sentinel.fake_option
+        suggest = FakeSuggest(name_suggestion=[FakeSuggestion(options=[fake_option])])
+        query = FakeCursorQuery([FakeHit(1)], suggest=suggest)
+
+        page = paginate.OpenSearchCursorPage(query)
+
+        assert page.best_guess == fake_option
+
+    def test_best_guess_suggestion_no_options(self):
+        suggest = FakeSuggest(name_suggestion=[FakeSuggestion(options=[])])
+        query = FakeCursorQuery([FakeHit(1)], suggest=suggest)
+
+        page = paginate.OpenSearchCursorPage(query)
+
+        assert page.best_guess is None
+
+
 def test_paginate_url(pyramid_request, mocker):
     pyramid_request.GET = MultiDict(pyramid_request.GET)
     pyramid_request.GET["foo"] = "bar"
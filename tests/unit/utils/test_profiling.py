@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+
+from warehouse.utils.profiling import SamplingProfiler
+
+
+def _inner(profiler):
+    profiler.sample()
+
+
+def _outer(profiler):
+    _inner(profiler)
+
+
+class TestSamplingProfiler:
+    def test_samples_the_current_thread(self):
+        profiler = SamplingProfiler(interval=1)
+
+        _outer(profiler)
+        _outer(profiler)
+        profiler.sample()
+
+        assert profiler.thread_id == threading.get_ident()
+        (stack, count), (other, _) = profiler.samples.most_common()
+        assert count == 2
+        assert stack.endswith(
+            f"{__name__}:_outer;{__name__}:_inner;"
+            "warehouse.utils.profiling:SamplingProfiler.sample"
+        )
+        assert other.endswith(
+            f"{__name__}:TestSamplingProfiler.test_samples_the_current_thread;"
+            "warehouse.utils.profiling:SamplingProfiler.sample"
+        )
+
+    def test_thread_that_has_finished(self):
+        thread = threading.Thread(target=lambda: None)
+        thread.start()
+        thread.join()
+        profiler = SamplingProfiler(interval=1, thread_id=thread.ident)
+
+        profiler.sample()
+
+        assert not profiler.samples
+
+    def test_collapsed(self):
+        profiler = SamplingProfiler(interval=1)
+        profiler.samples.update({"a;b": 1, "a;b;c": 3})
+
+        assert profiler.collapsed() == "a;b;c 3\na;b 1\n"
+
+    def test_samples_from_another_thread(self):
+        sampled = threading.Event()
+
+        class Profiler(SamplingProfiler):
+            def sample(self):
+                super().sample()
+                sampled.set()
+
+        with Profiler(interval=0.001) as profiler:
+            assert sampled.wait(timeout=10)
+
+        assert profiler.samples
+        assert all(
+            f"{__name__}:TestSamplingProfiler.test_samples_from_another_thread;"
+            in stack
+            for stack in profiler.samples
+        )
+        assert profiler.duration > 0
+        assert not profiler._thread.is_alive()
@@ -0,0 +1,94 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import pytest
+
+from warehouse.utils import refresh
+from warehouse.utils.refresh import PeriodicallyRefreshed
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(refresh.time, "monotonic", clock)
+    return clock
+
+
+class Counter(PeriodicallyRefreshed):
+    refresh_interval = 10
+
+    def __init__(self):
+        super().__init__()
+        self.refreshes = []
+
+    def _is_loaded(self):
+        return bool(self.refreshes)
+
+    def _refresh(self, db, now):
+        self.refreshes.append((db, now))
+
+
+class TestPeriodicallyRefreshed:
+    def test_refreshes_once_per_interval(self, clock):
+        counter = Counter()
+
+        counter.refresh("db")
+        clock.now += 9
+        counter.refresh("db")
+
+        assert counter.refreshes == [("db", 1000.0)]
+
+        clock.now += 1
+        counter.refresh("db")
+
+        assert counter.refreshes == [("db", 1000.0), ("db", 1010.0)]
+
+    def test_invalidate(self, clock):
+        counter = Counter()
+        counter.refresh("db")
+
+        counter.invalidate()
+        counter.refresh("db")
+
+        assert counter.refreshes == [("db", 1000.0), ("db", 1000.0)]
+
+    def test_refresh_skipped_while_locked(self, clock):
+        counter = Counter()
+        counter.refresh("db")
+        clock.now += 10
+
+        with counter._lock:
+            counter.refresh("db")
+
+        assert counter.refreshes == [("db", 1000.0)]
+
+    def test_refresh_rechecks_after_lock(self, clock, mocker):
+        counter = Counter()
+        counter._is_fresh = mocker.Mock(side_effect=[False, True])
+
+        counter.refresh("db")
+
+        assert counter.refreshes == []
+
+    def test_failed_refresh_releases_lock(self, clock, mocker):
+        counter = Counter()
+        mocker.patch.object(counter, "_refresh", side_effect=ValueError("broken"))
+
+        with pytest.raises(ValueError, match="broken"):
+            counter.refresh("db")
+
+        assert not counter._lock.locked()
+        assert counter._refreshed_at is None
+
+    def test_must_be_subclassed(self):
+        with pytest.raises(NotImplementedError):
+            PeriodicallyRefreshed()._is_loaded()
+        with pytest.raises(NotImplementedError):
+            PeriodicallyRefreshed()._refresh("db", 1000.0)
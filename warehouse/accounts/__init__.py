@@ -1,7 +1,10 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import redis
+
 from celery.schedules import crontab
 
+from warehouse.accounts.identity import IdentityCache
 from warehouse.accounts.interfaces import (
     IDomainStatusService,
     IEmailBreachedService,
@@ -85,7 +88,11 @@ def _unauthenticated_userid(request):
 
 
 def includeme(config):
-    # Register our login service
+    # Register our login service, along with the snapshots of users that it
+    # shares between requests.
+    config.registry["accounts.identity_cache"] = IdentityCache(
+        redis.StrictRedis.from_url(config.registry.settings["sessions.url"])
+    )
     config.register_service_factory(database_login_factory, IUserService)
 
     # Register our token services
@@ -0,0 +1,152 @@
+# SPDX-License-Identifier: Apache-2.0
+
+from __future__ import annotations
+
+import collections
+import threading
+import time
+
+from dataclasses import dataclass
+
+import redis
+import structlog
+
+from sqlalchemy import inspect
+
+from warehouse import db
+from warehouse.accounts.models import DisableReason, Email, User, WebAuthn
+
+logger = structlog.get_logger(__name__)
+
+# How long a worker keeps its snapshot of a user, in seconds. A snapshot is only
+# trusted while the user's generation in Redis is the one it was taken at, so a
+# change committed on any worker is seen by every worker on its next request.
+EXPIRES = 10
+
+# How long a user's generation is kept in Redis after it was last bumped, which
+# only has to outlive the snapshots taken before that bump.
+GENERATION_EXPIRES = 24 * 60 * 60  # 24 hours
+
+# How many snapshots each worker keeps, the least recently used are dropped.
+MAX_ENTRIES = 10_000
+
+
+@dataclass(frozen=True)
+class IdentitySnapshot:
+    """
+    Everything about a user that's needed to authenticate a login session and
+    to check its permissions, so that those checks don't need the user itself.
+    """
+
+    user_id: str
+    is_disabled: bool
+    disabled_reason: DisableReason | None
+    password_timestamp: float
+    has_two_factor: bool
+    has_primary_verified_email: bool
+    principals: tuple[str, ...]
+
+
+class IdentityCache:
+    """
+    An in-process, short lived cache of IdentitySnapshot objects, keyed by the
+    string form of the user id.
+
+    Every snapshot is stored under the generation that its user had in Redis
+    before it was loaded, and is only served while the user is still at that
+    generation. Committing a change to a user bumps its generation, so that a
+    freeze, a password change or a change to its principals is authoritative on
+    every worker, not only the one which made it.
+    """
+
+    def __init__(self, conn, *, expires=EXPIRES, max_entries=MAX_ENTRIES):
+        self.conn = conn
+        self.expires = expires
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def format_generation_key(self, user_id):
+        return f"warehouse/identity/generation/{user_id}"
+
+    def generation(self, user_id):
+        """
+        The current generation of ``user_id``, or None if it can't be read, in
+        which case no snapshot of the user should be trusted or stored.
+        """
+        try:
+            return int(self.conn.get(self.format_generation_key(user_id)) or 0)
+        except redis.exceptions.RedisError:
+            logger.warning("identity_generation_unavailable", user_id=str(user_id))
+            return None
+
+    def get(self, user_id, generation):
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            snapshot, stored_generation, expires_at = entry
+            if stored_generation != generation or time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return snapshot
+
+    def add(self, snapshot, generation):
+        with self._lock:
+            self._entries[snapshot.user_id] = (
+                snapshot,
+                generation,
+                time.monotonic() + self.expires,
+            )
+            self._entries.move_to_end(snapshot.user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(str(user_id), None)
+
+        pipeline = self.conn.pipeline()
+        for user_id in user_ids:
+            key = self.format_generation_key(user_id)
+            pipeline.incr(key)
+            pipeline.expire(key, GENERATION_EXPIRES)
+        pipeline.execute()
+
+
+@db.listens_for(db.Session, "after_flush")
+def store_identity_changes(config, session, flush_context):
+    changed = session.info.setdefault("warehouse.accounts.identity.changed", set())
+    for obj in session.new | session.dirty | session.deleted:
+        # Read ids from the identity map and from what's already loaded rather
+        # than from the attributes, so that we never have to load a row (which
+        # might be gone) just to find out which user it belongs to.
+        if isinstance(obj, User):
+            identity = inspect(obj).identity
+            user_id = identity[0] if identity is not None else None
+        elif isinstance(obj, Email | WebAuthn):
+            user_id = inspect(obj).dict.get("user_id")
+        else:
+            continue
+        if user_id is not None:
+            changed.add(str(user_id))
+
+
+@db.listens_for(db.Session, "after_commit")
+def invalidate_identities(config, session):
+    changed = session.info.pop("warehouse.accounts.identity.changed", None)
+    if not changed:
+        return
+
+    identity_cache = config.registry.get("accounts.identity_cache")
+    if identity_cache is None:
+        return
+
+    try:
+        identity_cache.invalidate(changed)
+    except redis.exceptions.RedisError:
+        # Other workers keep trusting their snapshots until they expire.
+        logger.warning("identity_invalidation_failed", users=len(changed))
@@ -56,6 +56,12 @@ class IUserService(Interface):
         there is no user for that ID.
         """
 
+    def get_identity(user_id):
+        """
+        Return an IdentitySnapshot of the given userid, which might be cached
+        until the user next changes, or None if there is no user for that ID.
+        """
+
     def get_user_by_username(username):
         """
         Return the user object corresponding with the given username, or None
@@ -124,6 +130,11 @@ class IUserService(Interface):
         (IsDisabled: bool, Reason: Optional[DisableReason])
         """
 
+    def is_user_disabled(user):
+        """
+        Like is_disabled, but for a user object that has already been loaded.
+        """
+
     def has_two_factor(user_id):
         """
         Returns True if the user has any form of two factor
@@ -12,7 +12,7 @@ from zope.interface import implementer
 
 from warehouse.accounts.interfaces import IUserService
 from warehouse.accounts.models import DisableReason
-from warehouse.accounts.utils import UserContext
+from warehouse.accounts.utils import SessionUserContext, UserContext
 from warehouse.cache.http import add_vary_callback
 from warehouse.errors import WarehouseDenied
 from warehouse.predicates import auth_methods_for_route
@@ -64,20 +64,22 @@ class SessionSecurityPolicy:
 
         login_service = request.find_service(IUserService, context=None)
 
+        # Everything we need to check here, and later in permits(), comes from
+        # one snapshot of the user, which might be cached for a few seconds.
+        #
         # A user might delete their account and immediately issue a request
         # while the deletion is processing, causing the session check
         # (via authenticated_userid above) to pass despite the user no longer
         # existing. We catch that here to avoid raising during the password
         # staleness check immediately below.
-        user = login_service.get_user(userid)
-        if user is None:
+        identity = login_service.get_identity(userid)
+        if identity is None:
             return None
 
         # User may have been frozen or disabled since the session was created.
-        is_disabled, disabled_reason = login_service.is_disabled(userid)
-        if is_disabled:
+        if identity.is_disabled:
             request.session.invalidate()
-            if disabled_reason == DisableReason.AccountFrozen:
+            if identity.disabled_reason == DisableReason.AccountFrozen:
                 request.session.flash(
                     "Your account has been suspended. "
                     "Please contact security@pypi.org for assistance.",
@@ -88,9 +90,7 @@ class SessionSecurityPolicy:
             return None
 
         # Our session might be "valid" despite predating a password change.
-        if request.session.password_outdated(
-            login_service.get_password_timestamp(userid)
-        ):
+        if request.session.password_outdated(identity.password_timestamp):
             request.session.invalidate()
             request.session.flash(
                 "Session invalidated by password change", queue="error"
@@ -98,7 +98,7 @@ class SessionSecurityPolicy:
             return None
 
         # Sessions can only authenticate users, not any other type of identity.
-        return UserContext(user=user, macaroon=None)
+        return SessionUserContext(identity, login_service.get_user)
 
     def forget(self, request, **kw):
         return self._session_helper.forget(request, **kw)
@@ -183,7 +183,7 @@ def _permits_for_user_policy(acl, request, context, permission):
     # Verify email before you can manage account/projects.
     if (
         isinstance(res, Allowed)
-        and not request.identity.user.has_primary_verified_email
+        and not request.identity.has_primary_verified_email
         and request.matched_route.name
         not in {"manage.unverified-account", "accounts.verify-email"}
     ):
@@ -208,7 +208,7 @@ def _check_for_mfa(request, context) -> WarehouseDenied | None:
     assert isinstance(request.identity, UserContext)
     assert request.identity.macaroon is None
 
-    if request.identity.user.has_two_factor:
+    if request.identity.has_two_factor:
         # We're good to go!
         return None
 
@@ -29,6 +29,7 @@ from ua_parser import user_agent_parser
 from webauthn.helpers import bytes_to_base64url
 from zope.interface import implementer
 
+from warehouse.accounts.identity import IdentitySnapshot
 from warehouse.accounts.interfaces import (
     BurnedRecoveryCode,
     IDomainStatusService,
@@ -62,7 +63,12 @@ from warehouse.email import send_unrecognized_login_email
 from warehouse.events.models import UserAgentInfo
 from warehouse.events.tags import EventTag
 from warehouse.metrics import IMetricsService
-from warehouse.rate_limiting import DummyRateLimiter, IRateLimiter
+from warehouse.rate_limiting import (
+    DummyRateLimiter,
+    IRateLimiter,
+    first_exceeded,
+    hit_all,
+)
 from warehouse.utils import otp, webauthn
 from warehouse.utils.crypto import BadData, SignatureExpired, URLSafeTimedSerializer
 
@@ -78,7 +84,9 @@ RECOVERY_CODE_BYTES = 8
 
 @implementer(IUserService)
 class DatabaseUserService:
-    def __init__(self, session, *, ratelimiters=None, remote_addr, metrics):
+    def __init__(
+        self, session, *, ratelimiters=None, remote_addr, metrics, identity_cache=None
+    ):
         if ratelimiters is None:
             ratelimiters = {}
         ratelimiters = collections.defaultdict(DummyRateLimiter, ratelimiters)
@@ -103,6 +111,7 @@ class DatabaseUserService:
         self.remote_addr = remote_addr
         self._metrics = metrics
         self.cached_get_user = functools.lru_cache(self._get_user)
+        self.identity_cache = identity_cache
 
     def _get_user(self, userid):
         # TODO: We probably don't actually want to just return the database
@@ -119,6 +128,34 @@ class DatabaseUserService:
     def get_user(self, userid):
         return self.cached_get_user(userid)
 
+    def get_identity(self, userid):
+        # The generation is read before the user is loaded, so that a change
+        # committed in between is never stored under the generation it bumped.
+        generation = None
+        if self.identity_cache is not None:
+            generation = self.identity_cache.generation(userid)
+            snapshot = self.identity_cache.get(userid, generation)
+            if snapshot is not None:
+                return snapshot
+
+        user = self.get_user(userid)
+        if user is None:
+            return None
+
+        is_disabled, disabled_reason = self.is_user_disabled(user)
+        snapshot = IdentitySnapshot(
+            user_id=str(userid),
+            is_disabled=is_disabled,
+            disabled_reason=disabled_reason,
+            password_timestamp=self.get_password_timestamp(userid),
+            has_two_factor=user.has_two_factor,
+            has_primary_verified_email=user.has_primary_verified_email,
+            principals=tuple(user.__principals__()),
+        )
+        if generation is not None:
+            self.identity_cache.add(snapshot, generation)
+        return snapshot
+
     @functools.lru_cache
     def get_user_by_username(self, username):
         user_id = self.find_userid(username)
@@ -174,82 +211,84 @@ class DatabaseUserService:
 
         return user_id
 
+    def _raise_for_ratelimits(self, checks, tags):
+        # Test every limiter in one go, then report on the first of them (in
+        # the order given) that has been exceeded.
+        exceeded = first_exceeded(
+            (self.ratelimiters[name], identifiers) for name, identifiers, *_ in checks
+        )
+        if exceeded is None:
+            return
+
+        name, identifiers, ratelimiter, message = checks[exceeded]
+        if message is not None:
+            logger.warning(message)
+        self._metrics.increment(
+            "warehouse.authentication.ratelimited",
+            tags=[*tags, f"ratelimiter:{ratelimiter}"],
+        )
+        raise TooManyFailedLogins(
+            resets_in=self.ratelimiters[name].resets_in(*identifiers)
+        )
+
     def _check_ratelimits(self, userid=None, tags=None):
         tags = tags if tags is not None else []
 
-        # First we want to check if a single IP is exceeding our rate limiter.
-        if self.remote_addr is not None and not self.ratelimiters["ip.login"].test(
-            self.remote_addr
-        ):
-            logger.warning("IP failed login threshold reached.")
-            self._metrics.increment(
-                "warehouse.authentication.ratelimited",
-                tags=[*tags, "ratelimiter:ip"],
-            )
-            raise TooManyFailedLogins(
-                resets_in=self.ratelimiters["ip.login"].resets_in(self.remote_addr)
-            )
-
-        # Next check to see if we've hit our global rate limit or not,
-        # assuming that we've been configured with a global rate limiter anyways.
-        if not self.ratelimiters["global.login"].test():
-            logger.warning("Global failed login threshold reached.")
-            self._metrics.increment(
-                "warehouse.authentication.ratelimited",
-                tags=[*tags, "ratelimiter:global"],
-            )
-            raise TooManyFailedLogins(
-                resets_in=self.ratelimiters["global.login"].resets_in()
+        # We want to check if a single IP is exceeding our rate limiter, then
+        # whether we've hit our global rate limit or not (assuming that we've
+        # been configured with a global rate limiter anyways), and finally that
+        # we haven't hitten a rate limit on a per user basis.
+        checks = []
+        if self.remote_addr is not None:
+            checks.append(
+                (
+                    "ip.login",
+                    (self.remote_addr,),
+                    "ip",
+                    "IP failed login threshold reached.",
+                )
             )
+        checks.append(
+            ("global.login", (), "global", "Global failed login threshold reached.")
+        )
+        if userid is not None:
+            checks.append(("user.login", (userid,), "user", None))
 
-        # Now, check to make sure that we haven't hitten a rate limit on a
-        # per user basis.
-        if userid is not None and not self.ratelimiters["user.login"].test(userid):
-            self._metrics.increment(
-                "warehouse.authentication.ratelimited",
-                tags=[*tags, "ratelimiter:user"],
-            )
-            raise TooManyFailedLogins(
-                resets_in=self.ratelimiters["user.login"].resets_in(userid)
-            )
+        self._raise_for_ratelimits(checks, tags)
 
     def _hit_ratelimits(self, userid=None):
+        checks = []
         if userid is not None:
-            self.ratelimiters["user.login"].hit(userid)
-        self.ratelimiters["global.login"].hit()
-        self.ratelimiters["ip.login"].hit(self.remote_addr)
+            checks.append((self.ratelimiters["user.login"], (userid,)))
+        checks.append((self.ratelimiters["global.login"], ()))
+        checks.append((self.ratelimiters["ip.login"], (self.remote_addr,)))
+        hit_all(checks)
 
     def _check_2fa_ratelimits(self, userid: int, tags: list[str] | None = None) -> None:
         tags = tags if tags is not None else []
 
-        # Check IP-based 2FA rate limit
-        if self.remote_addr is not None and not self.ratelimiters["2fa.ip"].test(
-            self.remote_addr
-        ):
-            logger.warning("IP failed 2FA threshold reached.")
-            self._metrics.increment(
-                "warehouse.authentication.ratelimited",
-                tags=[*tags, "ratelimiter:ip"],
-            )
-            raise TooManyFailedLogins(
-                resets_in=self.ratelimiters["2fa.ip"].resets_in(self.remote_addr)
+        # Check the IP-based, then the user-based 2FA rate limit.
+        checks = []
+        if self.remote_addr is not None:
+            checks.append(
+                (
+                    "2fa.ip",
+                    (self.remote_addr,),
+                    "ip",
+                    "IP failed 2FA threshold reached.",
+                )
             )
+        checks.append(
+            ("2fa.user", (userid,), "user", "User failed 2FA threshold reached.")
+        )
 
-        # Check user-based 2FA rate limit
-        if not self.ratelimiters["2fa.user"].test(userid):
-            logger.warning("User failed 2FA threshold reached.")
-            self._metrics.increment(
-                "warehouse.authentication.ratelimited",
-                tags=[*tags, "ratelimiter:user"],
-            )
-            raise TooManyFailedLogins(
-                resets_in=self.ratelimiters["2fa.user"].resets_in(userid)
-            )
+        self._raise_for_ratelimits(checks, tags)
 
     def _hit_2fa_ratelimits(self, userid: int) -> None:
-        self.ratelimiters["2fa.user"].hit(userid)
+        checks = [(self.ratelimiters["2fa.user"], (userid,))]
         if self.remote_addr is not None:
-            self.ratelimiters["2fa.ip"].hit(self.remote_addr)
+            checks.append((self.ratelimiters["2fa.ip"], (self.remote_addr,)))
+        hit_all(checks)
 
     def check_password(self, userid, password, *, tags=None):
         tags = tags if tags is not None else []
@@ -373,8 +412,9 @@ class DatabaseUserService:
         )
 
     def is_disabled(self, user_id):
-        user = self.get_user(user_id)
+        return self.is_user_disabled(self.get_user(user_id))
 
+    def is_user_disabled(self, user):
         if user.is_frozen:
             return (True, DisableReason.AccountFrozen)
 
@@ -969,6 +1009,7 @@ def database_login_factory(context, request):
         request.db,
         metrics=request.find_service(IMetricsService, context=None),
         remote_addr=request.remote_addr,
+        identity_cache=request.registry.get("accounts.identity_cache"),
         ratelimiters={
             "ip.login": request.find_service(
                 IRateLimiter, name="ip.login", context=None
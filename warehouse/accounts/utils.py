@@ -10,8 +10,11 @@ from warehouse.accounts.models import Email
 from warehouse.accounts.services import IDomainStatusService
 
 if TYPE_CHECKING:
+    from collections.abc import Callable
+
     from pyramid.request import Request
 
+    from warehouse.accounts.identity import IdentitySnapshot
     from warehouse.accounts.models import User
     from warehouse.macaroons.models import Macaroon
 
@@ -41,6 +44,53 @@ class UserContext:
     def __principals__(self) -> list[str]:
         return self.user.__principals__()
 
+    @property
+    def has_two_factor(self) -> bool:
+        return self.user.has_two_factor
+
+    @property
+    def has_primary_verified_email(self) -> bool:
+        return self.user.has_primary_verified_email
+
+
+class SessionUserContext(UserContext):
+    """
+    The UserContext of a request authenticated via login session.
+
+    It answers the questions asked while authenticating and authorizing the
+    request from an `IdentitySnapshot`, and only loads the user itself when
+    something asks for it.
+    """
+
+    def __init__(
+        self, snapshot: IdentitySnapshot, get_user: Callable[[str], User]
+    ) -> None:
+        self.snapshot = snapshot
+        self.macaroon = None
+        self._get_user = get_user
+        self._user: User | None = None
+
+    @property
+    def user(self) -> User:
+        if self._user is None:
+            self._user = self._get_user(self.snapshot.user_id)
+        return self._user
+
+    @user.setter
+    def user(self, user: User) -> None:
+        self._user = user
+
+    def __principals__(self) -> list[str]:
+        return list(self.snapshot.principals)
+
+    @property
+    def has_two_factor(self) -> bool:
+        return self.snapshot.has_two_factor
+
+    @property
+    def has_primary_verified_email(self) -> bool:
+        return self.snapshot.has_primary_verified_email
+
 
 def update_email_domain_status(email: Email, request: Request) -> None:
     """
@@ -1,23 +1,93 @@
 # SPDX-License-Identifier: Apache-2.0
 
-from sqlalchemy import type_coerce
+import ipaddress
+
+from sqlalchemy import inspect, select, type_coerce
 from sqlalchemy.dialects.postgresql import INET
 
+from warehouse import db
 from warehouse.accounts.interfaces import IUserService
 from warehouse.events.models import IpAddress
+from warehouse.utils.refresh import PeriodicallyRefreshed
+
+# How often each worker reloads the banned IP addresses, in seconds. A worker
+# which commits a change to a ban reloads straight away, every other worker
+# picks it up at its next reload.
+REFRESH_INTERVAL = 10
+
+
+class _State:
+    def __init__(self, addresses, networks):
+        self.addresses = addresses
+        self.networks = networks
+
+
+class BannedIPs(PeriodicallyRefreshed):
+    """
+    An in-process copy of every banned IP address, so that checking whether a
+    request comes from one doesn't cost a query. Bans are expected to be few,
+    so single addresses are kept in a set and networks (any banned value with a
+    prefix shorter than a single address) are checked one by one.
+    """
+
+    refresh_interval = REFRESH_INTERVAL
+
+    def __init__(self):
+        super().__init__()
+        self._state = None
+
+    def _is_loaded(self):
+        return self._state is not None
+
+    def _refresh(self, db, now):
+        addresses = set()
+        networks = []
+        for value in db.scalars(
+            select(IpAddress.ip_address).where(IpAddress.is_banned)
+        ):
+            network = ipaddress.ip_network(str(value), strict=False)
+            if network.prefixlen == network.max_prefixlen:
+                addresses.add(network.network_address)
+            else:
+                networks.append(network)
+        self._state = _State(frozenset(addresses), tuple(networks))
+
+    def is_banned(self, ip_address):
+        state = self._state
+        if state is None:
+            raise RuntimeError("Cannot check bans before a refresh.")
+
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return False
+
+        return address in state.addresses or any(
+            address in network for network in state.networks
+        )
 
 
 class Bans:
     def __init__(self, request):
         self.request = request
 
-    def by_ip(self, ip_address: str) -> bool:
+    def _by_ip_query(self, ip_address):
         banned = (
             self.request.db.query(IpAddress)
             .filter_by(ip_address=type_coerce(ip_address, INET), is_banned=True)
             .one_or_none()
         )
-        if banned is not None:
+        return banned is not None
+
+    def by_ip(self, ip_address: str) -> bool:
+        banned_ips = self.request.registry.get("admin.banned_ips")
+        if banned_ips is not None:
+            banned_ips.refresh(self.request.db)
+            banned = banned_ips.is_banned(ip_address)
+        else:
+            banned = self._by_ip_query(ip_address)
+
+        if banned:
             login_service = self.request.find_service(IUserService, context=None)
             login_service._check_ratelimits(userid=None, tags=["banned:by_ip"])
             login_service._hit_ratelimits(userid=None)
@@ -26,5 +96,36 @@ class Bans:
         return False
 
 
+@db.listens_for(db.Session, "after_flush")
+def store_ban_changes(config, session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, IpAddress):
+            continue
+
+        # Look at the attribute history rather than the attribute itself, so
+        # that we never have to load a row just to find out whether it's a ban.
+        state = inspect(obj)
+        if obj in session.deleted:
+            changed = state.dict.get("is_banned", True)
+        elif obj in session.new:
+            changed = any(state.attrs.is_banned.history.added)
+        else:
+            changed = state.attrs.is_banned.history.has_changes()
+        if changed:
+            session.info["warehouse.admin.bans.changed"] = True
+            return
+
+
+@db.listens_for(db.Session, "after_commit")
+def invalidate_banned_ips(config, session):
+    if not session.info.pop("warehouse.admin.bans.changed", False):
+        return
+
+    banned_ips = config.registry.get("admin.banned_ips")
+    if banned_ips is not None:
+        banned_ips.invalidate()
+
+
 def includeme(config):
+    config.registry["admin.banned_ips"] = BannedIPs()
     config.add_request_method(Bans, name="banned", reify=True)
@@ -9,6 +9,7 @@ def includeme(config):
 
     # General Admin pages
     config.add_route("admin.dashboard", "/admin/", domain=warehouse)
+    config.add_route("admin.db_pool", "/admin/db-pool/", domain=warehouse)
 
     # Organization related Admin pages
     config.add_route(
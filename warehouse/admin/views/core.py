@@ -1,5 +1,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import os
+
 from pyramid.view import view_config
 from sqlalchemy import distinct, func
 
@@ -129,3 +131,19 @@ def dashboard(request):
         "orgs_with_projects": orgs_with_projects,
         "orgs_with_multiple_members": orgs_with_multiple_members,
     }
+
+
+@view_config(
+    route_name="admin.db_pool",
+    renderer="json",
+    permission=Permissions.AdminDashboardRead,
+    request_method="GET",
+    uses_session=True,
+)
+def db_pool(request):
+    """The connection pools of whichever worker process served this request."""
+    pool_stats = request.registry.get("sqlalchemy.pool_stats", {})
+    return {
+        "pid": os.getpid(),
+        "pools": {name: stats.as_dict() for name, stats in pool_stats.items()},
+    }
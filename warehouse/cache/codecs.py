@@ -0,0 +1,103 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Encodings for values stored in our Redis caches.
+
+Every binary encoding starts with a header byte naming its format, so that the
+codec used for writing can be changed without invalidating what is already
+stored. Plain JSON text, which is what the caches stored before there were
+codecs, can never start with one of those bytes, so anything else is decoded
+as JSON.
+
+Switching to a binary codec is a two step rollout: every reader has to be able
+to decode it before any writer starts producing it.
+"""
+
+import json
+
+from compression import zstd
+
+import msgpack
+
+MSGPACK_HEADER = b"\x01"
+MSGPACK_ZSTD_HEADER = b"\x02"
+
+
+class JSONCodec:
+    """
+    Compact JSON text, without a header, so that it can still be read by code
+    which expects plain JSON.
+    """
+
+    name = "json"
+
+    def __init__(self, **options):
+        self.options = {"separators": (",", ":"), **options}
+
+    def encode(self, value):
+        return json.dumps(value, **self.options)
+
+
+class MsgpackCodec:
+    """
+    MessagePack, which is smaller and several times faster to decode than JSON.
+
+    Unlike JSON, non-str dict keys keep their type, and bytes are supported.
+    """
+
+    name = "msgpack"
+
+    def encode(self, value):
+        return MSGPACK_HEADER + msgpack.packb(value, use_bin_type=True)
+
+
+class MsgpackZstdCodec:
+    """
+    MessagePack compressed with Zstandard, for large values which are mostly
+    names and numbers, like the serial of every project.
+    """
+
+    name = "msgpack+zstd"
+
+    def __init__(self, level=3):
+        self.level = level
+
+    def encode(self, value):
+        return MSGPACK_ZSTD_HEADER + zstd.compress(
+            msgpack.packb(value, use_bin_type=True), level=self.level
+        )
+
+
+CODECS = {codec.name: codec for codec in [JSONCodec, MsgpackCodec, MsgpackZstdCodec]}
+
+
+def get_codec(name, **json_options):
+    """
+    Look up a codec by name. ``json_options`` are passed to ``json.dumps`` when
+    the codec is JSON, and ignored otherwise.
+    """
+    try:
+        codec = CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown cache codec: {name!r}") from None
+    if codec is JSONCodec:
+        return codec(**json_options)
+    return codec()
+
+
+def _unpack(data):
+    return msgpack.unpackb(data, raw=False, use_list=True, strict_map_key=False)
+
+
+def decode(data):
+    """
+    Decode a value written by any of the codecs, or by the caches before there
+    were codecs.
+    """
+    if isinstance(data, bytes):
+        header, payload = data[:1], data[1:]
+        if header == MSGPACK_HEADER:
+            return _unpack(payload)
+        if header == MSGPACK_ZSTD_HEADER:
+            return _unpack(zstd.decompress(payload))
+    return json.loads(data)
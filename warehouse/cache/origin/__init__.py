@@ -7,12 +7,18 @@ import operator
 from itertools import chain
 from typing import Any, NamedTuple
 
+import redis
 import structlog
 
 from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.exc import NoInspectionAvailable
 
 from warehouse import db
+from warehouse.cache.origin.debounce import (
+    FLUSH_INTERVAL,
+    PurgeDebouncer,
+    flush_purges,
+)
 from warehouse.cache.origin.derivers import html_cache_deriver
 from warehouse.cache.origin.interfaces import IOriginCache
 from warehouse.utils.db import orm_session_from_obj
@@ -98,6 +104,17 @@ def execute_purge(config, session):
     if not purges:
         return
 
+    debouncer = config.registry.get("origin_cache.debouncer")
+    if debouncer is not None:
+        try:
+            debouncer.add(purges)
+        except redis.RedisError as exc:
+            # Better to purge too often than to leave stale pages behind.
+            logger.warning("cache_purge_debounce_failed", error=str(exc))
+        else:
+            logger.info("cache_purge_debounced", count=len(purges), keys=sorted(purges))
+            return
+
     try:
         cacher_factory = config.find_service_factory(IOriginCache)
     except LookupError:
@@ -217,4 +234,18 @@ def includeme(config):
         config.register_service_factory(cache_class.create_service, IOriginCache)
         config.add_view_deriver(html_cache_deriver)
 
+        # Optionally collapse repeated purges of the same key, from any worker,
+        # into one purge per window.
+        debounce_window = int(
+            config.registry.settings.get("origin_cache.debounce_window", 0)
+        )
+        if debounce_window:
+            config.registry["origin_cache.debouncer"] = PurgeDebouncer(
+                redis.StrictRedis.from_url(
+                    config.registry.settings["origin_cache.debounce_url"]
+                ),
+                window=debounce_window,
+            )
+            config.add_periodic_task(FLUSH_INTERVAL, flush_purges)
+
     config.add_directive("register_origin_cache_keys", register_origin_cache_keys)
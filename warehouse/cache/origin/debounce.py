@@ -0,0 +1,92 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import time
+
+import structlog
+
+from warehouse import tasks
+from warehouse.cache.origin.interfaces import IOriginCache
+
+logger = structlog.get_logger(__name__)
+
+# How often the pending purges are checked for ones that are due, in seconds.
+FLUSH_INTERVAL = 5
+
+PENDING_KEY = "warehouse.cache.origin.pending_purges"
+CHANGED_KEY = "warehouse.cache.origin.changed_purges"
+
+# Takes each purged key off the pending set, unless it has been queued again
+# since the flush read it, in which case that later change still needs a purge.
+_REMOVE_PURGED_SCRIPT = """
+for _, key in ipairs(ARGV) do
+    local changed = redis.call("ZSCORE", KEYS[2], key)
+    if not changed or tonumber(changed) <= tonumber(ARGV[1]) then
+        redis.call("ZREM", KEYS[1], key)
+        redis.call("ZREM", KEYS[2], key)
+    end
+end
+"""
+
+
+class PurgeDebouncer:
+    """
+    Collects the keys to purge from every worker in a Redis sorted set, so that
+    a key which changes many times in a short burst (such as a project that a
+    CI job is uploading dozens of files to) is purged once rather than once per
+    commit.
+
+    Each key is scored with the time that it was first queued, and is purged
+    ``window`` seconds after that. A commit which queues a key that is already
+    pending doesn't move it, so a key that keeps changing is still purged
+    regularly. Keys are only ever queued after the commit that changed them,
+    and only taken off the set once the purge that follows has succeeded, and
+    only if they haven't been queued again since, so the last change to a key
+    is always followed by a purge.
+    """
+
+    def __init__(self, redis, *, window):
+        self.redis = redis
+        self.window = window
+        self._remove_purged = redis.register_script(_REMOVE_PURGED_SCRIPT)
+
+    def add(self, keys):
+        now = time.time()
+        with self.redis.pipeline() as pipe:
+            pipe.zadd(PENDING_KEY, dict.fromkeys(keys, now), nx=True)
+            pipe.zadd(CHANGED_KEY, dict.fromkeys(keys, now))
+            pipe.execute()
+
+    def due(self):
+        """
+        Returns the keys which are due to be purged, along with the time that
+        they were read, which should be passed to :meth:`purged` afterwards.
+        """
+        now = time.time()
+        due = self.redis.zrangebyscore(PENDING_KEY, "-inf", now - self.window)
+        return {key.decode("utf-8") for key in due}, now
+
+    def purged(self, keys, read_at):
+        if keys:
+            self._remove_purged(
+                keys=[PENDING_KEY, CHANGED_KEY], args=[read_at, *sorted(keys)]
+            )
+
+
+@tasks.task(ignore_result=True, acks_late=True)
+def flush_purges(request):
+    debouncer = request.registry.get("origin_cache.debouncer")
+    if debouncer is None:
+        return
+
+    keys, read_at = debouncer.due()
+    if not keys:
+        return
+
+    logger.info("cache_purge_executing", count=len(keys), keys=sorted(keys))
+    request.metrics.histogram("warehouse.cache.origin.debounce.flushed", len(keys))
+    # Purged here rather than by queueing another task, which would only be
+    # published once this task has finished, so that the keys are only taken
+    # off the pending set once they have really been purged. If the purge
+    # fails they stay pending, and the next flush tries them again.
+    request.find_service(IOriginCache).purge_keys(keys, metrics=request.metrics)
+    debouncer.purged(keys, read_at)
@@ -1,5 +1,6 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import functools
 import time
 import urllib.parse
 
@@ -12,11 +13,50 @@ from warehouse import tasks
 from warehouse.cache.origin.interfaces import IOriginCache
 from warehouse.metrics.interfaces import IMetricsService
 
+# Fastly accepts at most this many surrogate keys in a single purge request.
+# https://www.fastly.com/documentation/reference/api/purging/#bulk-purge-tag
+MAX_KEYS_PER_PURGE = 256
+
 
 class UnsuccessfulPurgeError(Exception):
     pass
 
 
+@functools.cache
+def _session(api_endpoint, connect_via):
+    """
+    Returns a session that lives as long as the worker, so that purges reuse a
+    pooled, keep-alive connection to the Fastly API instead of opening a new
+    one every time.
+    """
+    session = requests.Session()
+    if connect_via is not None:
+        session.mount(
+            api_endpoint,
+            forcediphttpsadapter.adapters.ForcedIPHTTPSAdapter(dest_ip=connect_via),
+        )
+    return session
+
+
+@tasks.task(bind=True, ignore_result=True, acks_late=True)
+def purge_keys(task, request, keys):
+    cacher = request.find_service(IOriginCache)
+    metrics = request.find_service(IMetricsService, context=None)
+    request.log.info("Purging cache keys", keys=keys)
+    try:
+        cacher.purge_keys(keys, metrics=metrics)
+    except (
+        requests.ConnectionError,
+        requests.HTTPError,
+        requests.Timeout,
+        UnsuccessfulPurgeError,
+    ) as exc:
+        request.log.error("Error purging cache keys", keys=keys, error=str(exc))
+        raise task.retry(exc=exc)
+
+
+# Superseded by purge_keys, kept so that any tasks which are already queued still
+# get run.
 @tasks.task(bind=True, ignore_result=True, acks_late=True)
 def purge_key(task, request, key):
     cacher = request.find_service(IOriginCache)
@@ -54,7 +94,7 @@ class FastlyCache:
             ),
             api_key=request.registry.settings["origin_cache.api_key"],
             service_id=request.registry.settings["origin_cache.service_id"],
-            purger=request.task(purge_key).delay,
+            purger=request.task(purge_keys).delay,
         )
 
     def cache(
@@ -93,29 +133,64 @@ class FastlyCache:
             response.headers["Surrogate-Control"] = ", ".join(values)
 
     def purge(self, keys):
-        for key in keys:
-            self._purger(key)
+        # Every key from one commit goes out in one task, which purges them
+        # together instead of one request (and one task) each.
+        if keys:
+            self._purger(sorted(keys))
 
-    def _purge_key(self, key, connect_via=None):
-        path = f"/service/{self.service_id}/purge/{key}"
+    def _purge_keys(self, keys, connect_via=None):
+        path = f"/service/{self.service_id}/purge"
         url = urllib.parse.urljoin(self.api_endpoint, path)
         headers = {
             "Accept": "application/json",
             "Fastly-Key": self.api_key,
             "Fastly-Soft-Purge": "1",
+            "Surrogate-Key": " ".join(keys),
         }
 
-        session = requests.Session()
+        resp = _session(self.api_endpoint, connect_via).post(url, headers=headers)
+        resp.raise_for_status()
+        # Fastly responds with the id of the purge of each key that it purged.
+        missing = set(keys) - resp.json().keys()
+        if missing:
+            raise UnsuccessfulPurgeError(f"Could not purge {sorted(missing)!r}")
 
-        if connect_via is not None:
-            session.mount(
-                self.api_endpoint,
-                forcediphttpsadapter.adapters.ForcedIPHTTPSAdapter(
-                    dest_ip=self.api_connect_via
-                ),
+    def _double_purge_keys(self, keys, connect_via=None):
+        self._purge_keys(keys, connect_via=connect_via)
+        # https://developer.fastly.com/learning/concepts/purging/#race-conditions
+        time.sleep(2)
+        self._purge_keys(keys, connect_via=connect_via)
+
+    def purge_keys(self, keys, *, metrics):
+        keys = sorted(keys)
+        for start in range(0, len(keys), MAX_KEYS_PER_PURGE):
+            batch = keys[start : start + MAX_KEYS_PER_PURGE]
+            metrics.histogram(
+                "warehouse.cache.origin.fastly.purge.batch_size", len(batch)
             )
+            with metrics.timed("warehouse.cache.origin.fastly.purge.duration"):
+                try:
+                    self._purge_keys(batch, connect_via=self.api_connect_via)
+                except requests.ConnectionError:
+                    if self.api_connect_via is None:
+                        raise
+                    metrics.increment(
+                        "warehouse.cache.origin.fastly.connect_via.failed",
+                        tags=[f"ip_address:{self.api_connect_via}"],
+                    )
+                    # Do not connect via on fallback
+                    self._double_purge_keys(batch)
 
-        resp = session.post(url, headers=headers)
+    def _purge_key(self, key, connect_via=None):
+        path = f"/service/{self.service_id}/purge/{key}"
+        url = urllib.parse.urljoin(self.api_endpoint, path)
+        headers = {
+            "Accept": "application/json",
+            "Fastly-Key": self.api_key,
+            "Fastly-Soft-Purge": "1",
+        }
+
+        resp = _session(self.api_endpoint, connect_via).post(url, headers=headers)
         resp.raise_for_status()
         if resp.json().get("status") != "ok":
             raise UnsuccessfulPurgeError(f"Could not purge {key!r}")
@@ -155,3 +230,17 @@ class NullFastlyCache(FastlyCache):
         print("Origin cache purge issued:")  # noqa: T201
         print(f"* URL: {url!r}")  # noqa: T201
         print(f"* Headers: {headers!r}")  # noqa: T201
+
+    def _purge_keys(self, keys, connect_via=None):
+        path = f"/service/{self.service_id}/purge"
+        url = urllib.parse.urljoin(self.api_endpoint, path)
+        headers = {
+            "Accept": "application/json",
+            "Fastly-Key": self.api_key,
+            "Fastly-Soft-Purge": "1",
+            "Surrogate-Key": " ".join(keys),
+        }
+
+        print("Origin cache purge issued:")  # noqa: T201
+        print(f"* URL: {url!r}")  # noqa: T201
+        print(f"* Headers: {headers!r}")  # noqa: T201
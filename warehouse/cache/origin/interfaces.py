@@ -36,3 +36,9 @@ class IOriginCache(Interface):
         """
         Purge and responses associated with the specific keys.
         """
+
+    def purge_keys(keys, *, metrics):
+        """
+        Purge the responses associated with the specific keys straight away,
+        rather than in the background.
+        """
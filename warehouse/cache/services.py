@@ -2,13 +2,13 @@
 
 from __future__ import annotations
 
-import json
 import typing
 
 import redis
 
 from zope.interface import implementer
 
+from warehouse.cache import codecs
 from warehouse.cache.interfaces import IQueryResultsCache
 
 if typing.TYPE_CHECKING:
@@ -23,30 +23,29 @@ class RedisQueryResults:
     Anything using this service must assume that the key results may be empty,
     and handle the case where the key is not found in the cache.
 
-    The key is a string, and the value is a JSON-serialized object as a string.
+    The key is a string, and the value is serialized with one of the codecs in
+    `warehouse.cache.codecs`, JSON by default.
     """
 
-    def __init__(self, redis_client):
+    def __init__(self, redis_client, codec=None):
         self.redis_client = redis_client
+        self.codec = codec if codec is not None else codecs.JSONCodec(allow_nan=False)
 
     @classmethod
     def create_service(cls, _context, request: Request) -> RedisQueryResults:
         redis_url = request.registry.settings["db_results_cache.url"]
         redis_client = redis.StrictRedis.from_url(redis_url)
-        return cls(redis_client)
+        codec = codecs.get_codec(
+            request.registry.settings.get("db_results_cache.codec", "json"),
+            allow_nan=False,
+        )
+        return cls(redis_client, codec=codec)
 
     def get(self, key: str) -> list | dict | None:
         """Get a cached result by key."""
         result = self.redis_client.get(key)
-        # deserialize the value as a JSON object
-        return json.loads(result) if result else None
+        return codecs.decode(result) if result else None
 
     def set(self, key: str, value) -> None:
         """Set a cached result by key."""
-        # serialize the value as a JSON string
-        value = json.dumps(
-            value,
-            separators=(",", ":"),
-            allow_nan=False,
-        )
-        self.redis_client.set(key, value)
+        self.redis_client.set(key, self.codec.encode(value))
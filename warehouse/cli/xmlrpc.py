@@ -0,0 +1,37 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import click
+
+from warehouse.cli import warehouse
+
+
+@warehouse.group()
+def xmlrpc():
+    """
+    Manage the XML-RPC API.
+    """
+
+
+@xmlrpc.command()
+@click.pass_obj
+def index_cache_tags(config):
+    """
+    Index existing XML-RPC cache entries by their purge tag.
+
+    Purges only look at the entries recorded for a tag, so this needs to be run
+    once, after every worker is writing those records, for entries cached before
+    then to be purged rather than left to expire.
+    """
+    # Imported here because we don't want to trigger an import from anything
+    # but warehouse.cli at the module scope.
+    import redis
+
+    from warehouse.legacy.api.xmlrpc.cache import RedisLru
+
+    settings = config.registry.settings
+    redis_lru = RedisLru(
+        redis.StrictRedis.from_url(settings["warehouse.xmlrpc.cache.url"], db=0),
+        name=settings.get("warehouse.xmlrpc.cache.name", "xmlrpc"),
+    )
+
+    click.echo(f"Indexed {redis_lru.index_tags()} cache entries.")
@@ -389,19 +389,45 @@ def configure(settings=None):
     maybe_set_redis(settings, "celery.result_url", "REDIS_URL", db=12)
     maybe_set_redis(settings, "celery.scheduler_url", "REDIS_URL", db=0)
     maybe_set_redis(settings, "oidc.jwk_cache_url", "REDIS_URL", db=1)
+    maybe_set_redis(settings, "tasks.profiling.url", "REDIS_URL", db=7)
+    maybe_set(settings, "tasks.profiling.tasks", "TASK_PROFILING_TASKS", str.split)
+    maybe_set(settings, "tasks.profiling.interval", "TASK_PROFILING_INTERVAL", float)
+    maybe_set(settings, "tasks.profiling.directory", "TASK_PROFILING_DIRECTORY")
     maybe_set(settings, "database.url", "DATABASE_URL")
+    maybe_set(settings, "database.pool_size", "DATABASE_POOL_SIZE", int)
+    maybe_set(settings, "database.max_overflow", "DATABASE_MAX_OVERFLOW", int)
+    maybe_set(settings, "database.pool_timeout", "DATABASE_POOL_TIMEOUT", int)
+    maybe_set(
+        settings, "database.query_budget.count", "DATABASE_QUERY_BUDGET_COUNT", int
+    )
+    maybe_set(
+        settings,
+        "database.query_budget.duration",
+        "DATABASE_QUERY_BUDGET_DURATION",
+        float,
+    )
+    maybe_set(settings, "database.replica_url", "DATABASE_REPLICA_URL")
+    maybe_set(settings, "database.replica_max_lag", "DATABASE_REPLICA_MAX_LAG", float)
+    maybe_set_redis(settings, "database.replica_redis_url", "REDIS_URL", db=8)
     maybe_set(settings, "opensearch.url", "OPENSEARCH_URL")
     maybe_set(settings, "sentry.dsn", "SENTRY_DSN")
     maybe_set(settings, "sentry.transport", "SENTRY_TRANSPORT")
     maybe_set_redis(settings, "sessions.url", "REDIS_URL", db=2)
     maybe_set_redis(settings, "ratelimit.url", "REDIS_URL", db=3)
+    maybe_set(settings, "ratelimit.local_fraction", "RATELIMIT_LOCAL_FRACTION", float)
     maybe_set_redis(settings, "db_results_cache.url", "REDIS_URL", db=5)
+    maybe_set_redis(settings, "origin_cache.debounce_url", "REDIS_URL", db=6)
+    maybe_set(settings, "db_results_cache.codec", "DB_RESULTS_CACHE_CODEC")
     maybe_set(settings, "captcha.backend", "CAPTCHA_BACKEND")
     maybe_set(settings, "recaptcha.site_key", "RECAPTCHA_SITE_KEY")
     maybe_set(settings, "recaptcha.secret_key", "RECAPTCHA_SECRET_KEY")
     maybe_set(settings, "hcaptcha.site_key", "HCAPTCHA_SITE_KEY")
     maybe_set(settings, "hcaptcha.secret_key", "HCAPTCHA_SECRET_KEY")
     maybe_set(settings, "sessions.secret", "SESSION_SECRET")
+    maybe_set(
+        settings, "sessions.max_connections", "SESSION_REDIS_MAX_CONNECTIONS", int
+    )
+    maybe_set(settings, "sessions.pool_timeout", "SESSION_REDIS_POOL_TIMEOUT", int)
     maybe_set(settings, "camo.url", "CAMO_URL")
     maybe_set(settings, "camo.key", "CAMO_KEY")
     maybe_set(settings, "docs.url", "DOCS_URL")
@@ -413,6 +439,7 @@ def configure(settings=None):
     maybe_set(settings, "token.remember_device.secret", "TOKEN_REMEMBER_DEVICE_SECRET")
     maybe_set(settings, "token.confirm_login.secret", "TOKEN_CONFIRM_LOGIN_SECRET")
     maybe_set_redis(settings, "warehouse.xmlrpc.cache.url", "REDIS_URL", db=4)
+    maybe_set(settings, "warehouse.xmlrpc.cache.codec", "XMLRPC_CACHE_CODEC")
     maybe_set(
         settings,
         "warehouse.xmlrpc.client.ratelimit_string",
@@ -602,6 +629,20 @@ def configure(settings=None):
         "SEARCH_RATELIMIT_STRING",
         default="5 per second",
     )
+    maybe_set(
+        settings,
+        "warehouse.search.slow_query_threshold_ms",
+        "SEARCH_SLOW_QUERY_THRESHOLD_MS",
+        coercer=int,
+        default=1000,
+    )
+    maybe_set(
+        settings,
+        "warehouse.search.slow_query_sample_rate",
+        "SEARCH_SLOW_QUERY_SAMPLE_RATE",
+        coercer=float,
+        default=0.1,
+    )
 
     # OIDC feature flags and settings
     maybe_set(settings, "warehouse.oidc.audience", "OIDC_AUDIENCE")
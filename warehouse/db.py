@@ -1,19 +1,26 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import collections
+import contextlib
+import contextvars
 import enum
 import functools
+import threading
+import time
 
 from uuid import UUID
 
 import alembic.config
 import psycopg.types.json
 import pyramid_retry
+import redis
 import sqlalchemy
 import structlog
 import venusian
 import zope.sqlalchemy  # pyright: ignore[reportMissingImports]
 
 from pyramid.renderers import JSON
+from pyramid.tweens import EXCVIEW
 from sqlalchemy import event, func, inspect
 from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
@@ -29,6 +36,65 @@ logger = structlog.get_logger(__name__)
 
 DEFAULT_ISOLATION = "READ COMMITTED"
 
+# The pool that each engine keeps per worker process, unless overridden by the
+# database.pool_size, database.max_overflow and database.pool_timeout settings.
+DEFAULT_POOL_SIZE = 35
+DEFAULT_MAX_OVERFLOW = 65
+DEFAULT_POOL_TIMEOUT = 20
+
+# How far behind the primary, in seconds, the read replica may fall before the
+# routes which read from it go back to the primary.
+DEFAULT_REPLICA_MAX_LAG = 5
+
+# How often each worker checks how far behind the read replica is, in seconds.
+REPLICA_LAG_INTERVAL = 5
+
+# Where the primary's WAL is up to, as a number of bytes.
+PRIMARY_LSN_QUERY = sqlalchemy.text("SELECT pg_current_wal_lsn() - '0/0'::pg_lsn")
+
+# How far behind the primary the replica is, given where the primary's WAL was up
+# to just beforehand. A replica that has replayed that much is caught up, even if
+# the last transaction that it replayed was a while ago because the primary has
+# been idle. Comparing with the primary, rather than with what the replica has
+# received, means that a replica whose WAL receiver has stalled isn't mistaken
+# for one which is caught up, and one without a WAL receiver at all has no lag
+# (NULL), and can't be used.
+REPLICA_LAG_QUERY = sqlalchemy.text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() IS NULL THEN NULL
+        WHEN NOT EXISTS (SELECT FROM pg_stat_wal_receiver) THEN NULL
+        WHEN pg_last_wal_replay_lsn() - '0/0'::pg_lsn >= :primary_lsn THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+# Where the replica has replayed the primary's WAL up to, as a number of bytes,
+# or where its own WAL is up to if it isn't a replica at all.
+REPLAY_LSN_QUERY = sqlalchemy.text(
+    """
+    SELECT CASE
+        WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn()
+        ELSE pg_current_wal_lsn()
+    END - '0/0'::pg_lsn
+    """
+)
+
+# Where the primary's WAL was up to after the latest commit that wrote to it, as
+# 16 hex digits so that the positions compare as strings.
+WRITTEN_LSN_KEY = "warehouse/db/written-lsn"
+
+# Only ever moves the position forwards, however the commits race to record it.
+_RECORD_WRITTEN_LSN_SCRIPT = """
+local current = redis.call("GET", KEYS[1])
+if not current or ARGV[1] > current then
+    redis.call("SET", KEYS[1], ARGV[1])
+end
+"""
+
 
 # On the surface this might seem wrong, because retrying a request whose data violates
 # the constraints of the database doesn't seem like a useful endeavor. However what
@@ -129,22 +195,298 @@ def _configure_alembic(config):
     return alembic_cfg
 
 
-def _create_session(request):
-    metrics = request.find_service(IMetricsService, context=None)
-    metrics.increment("warehouse.db.session.start")
+class PoolStats:
+    """
+    What has happened to one engine's connection pool in this worker process,
+    for sizing the pool against the number of threads or Celery concurrency
+    that share it.
+
+    The pool's own events count checkouts, new connections and invalidated
+    ones, while the time spent waiting for a connection and the checkouts that
+    gave up after ``pool_timeout`` are recorded by ``_create_session``, which
+    is the only place that knows which route or task was waiting.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def listen(self):
+        event.listen(self.engine, "checkout", self._on_checkout)
+        event.listen(self.engine, "connect", self._on_connect)
+        event.listen(self.engine, "invalidate", self._on_invalidate)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def as_dict(self):
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                "size": pool.size(),
+                "timeout": pool.timeout(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(0, pool.overflow()),
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_total": self.wait_total,
+                "wait_max": self.wait_max,
+            }
+
+
+class ReadReplica:
+    """
+    A second engine, against a streaming replica of the primary, for the routes
+    which only read from the database (see ``warehouse.predicates``).
+
+    Each worker checks how far behind the ``primary`` the replica is at most
+    once every ``interval`` seconds, and routes go back to reading from the
+    primary for as long as it's more than ``max_lag`` seconds behind, isn't
+    receiving WAL, or can't be reached. Only one thread does the check, the
+    others carry on with the result of the previous one in the meantime.
+
+    The responses which read from the replica are cached, and purged once a
+    change to them has been committed to the primary, so the replica must not
+    refill them from before that change. Every commit that wrote to the primary
+    records where the primary's WAL was up to afterwards (``record_write``), in
+    Redis, so that every worker can tell whether the replica has replayed it
+    yet (``has_replayed_writes``), and read from the primary until it has.
+    """
+
+    def __init__(
+        self, engine, primary, conn, *, max_lag, interval=REPLICA_LAG_INTERVAL
+    ):
+        self.engine = engine
+        self.primary = primary
+        self.conn = conn
+        self.max_lag = max_lag
+        self.interval = interval
+        self._usable = True
+        self._checked_at = None
+        self._replayed_lsn = 0
+        self._record_written_lsn = conn.register_script(_RECORD_WRITTEN_LSN_SCRIPT)
+        self._lock = threading.Lock()
+
+    def is_usable(self, metrics):
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.interval:
+                return self._usable
+            self._checked_at = now
+
+        try:
+            with self.primary.connect() as connection:
+                primary_lsn = connection.execute(PRIMARY_LSN_QUERY).scalar()
+            with self.engine.connect() as connection:
+                lag = connection.execute(
+                    REPLICA_LAG_QUERY, {"primary_lsn": primary_lsn}
+                ).scalar()
+        except OperationalError, psycopg.Error:
+            logger.warning("Got an error checking replication lag", exc_info=True)
+            metrics.increment("warehouse.db.replica.error", tags=["error_in:lag"])
+            usable = False
+        else:
+            if lag is None:
+                logger.warning("Read replica isn't receiving WAL from the primary")
+                metrics.increment(
+                    "warehouse.db.replica.error", tags=["error_in:receiver"]
+                )
+                usable = False
+            else:
+                lag = float(lag)
+                metrics.gauge("warehouse.db.replica.lag", lag)
+                usable = lag <= self.max_lag
+
+        with self._lock:
+            self._usable = usable
+        return usable
+
+    def record_write(self):
+        with self.primary.connect() as connection:
+            lsn = connection.execute(PRIMARY_LSN_QUERY).scalar()
+        self._record_written_lsn(keys=[WRITTEN_LSN_KEY], args=[f"{int(lsn):016x}"])
+
+    def has_replayed_writes(self, connection, metrics):
+        """
+        Whether the replica, read through ``connection``, has replayed every
+        commit which wrote to the primary before this was called.
+        """
+        try:
+            written = self.conn.get(WRITTEN_LSN_KEY)
+        except redis.exceptions.RedisError:
+            logger.warning("Got an error reading the written LSN", exc_info=True)
+            metrics.increment("warehouse.db.replica.error", tags=["error_in:written"])
+            return False
+        # Nothing has been recorded since Redis lost the position, if ever.
+        if written is None:
+            return True
+
+        written = int(written, 16)
+        with self._lock:
+            if written <= self._replayed_lsn:
+                return True
+
+        replayed = int(connection.execute(REPLAY_LSN_QUERY).scalar())
+        # Don't leave a transaction open on the connection that the request's
+        # session is about to be bound to.
+        connection.rollback()
+        with self._lock:
+            self._replayed_lsn = max(self._replayed_lsn, replayed)
+        return replayed >= written
+
+    def mark_unusable(self):
+        # Until the next check, which will put it back if it has recovered.
+        with self._lock:
+            self._usable = False
+            self._checked_at = time.monotonic()
+
+
+@listens_for(Session, "after_flush")
+def store_write(config, session, flush_context):
+    # Every change that leads to a purge is flushed, so flushes are all that we
+    # need to look out for.
+    session.info["warehouse.db.wrote"] = True
+
+
+# Inserted ahead of the other listeners, so that the position is recorded before
+# any of them purge the responses that the change affects.
+@listens_for(Session, "after_commit", insert=True)
+def record_write(config, session):
+    if not session.info.pop("warehouse.db.wrote", False):
+        return
+
+    replica = config.registry.get("sqlalchemy.replica")
+    if replica is None:
+        return
+
+    try:
+        replica.record_write()
+    except OperationalError, psycopg.Error, redis.exceptions.RedisError:
+        logger.warning("Got an error recording the written LSN", exc_info=True)
+
+
+@listens_for(Session, "after_rollback")
+def discard_write(config, session):
+    session.info.pop("warehouse.db.wrote", None)
+
+
+def _select_engine(request, metrics):
+    # Deferred for the same reason as the AdminFlag import in _create_session.
+    from warehouse.predicates import uses_read_replica  # noqa: PLC0415
+
+    replica = request.registry.get("sqlalchemy.replica")
+    if replica is not None and uses_read_replica(request.matched_route):
+        if replica.is_usable(metrics):
+            return "replica", replica.engine
+        metrics.increment("warehouse.db.replica.fallback", tags=["reason:lag"])
+    return "primary", request.registry["sqlalchemy.engine"]
+
+
+def _pool_tags(request, name):
+    tags = [f"engine:{name}"]
+    if request.matched_route is not None:
+        tags.append(f"route:{request.matched_route.name}")
+    elif getattr(request, "task_name", None) is not None:
+        tags.append(f"task:{request.task_name}")
+    return tags
+
+
+def _record_pool(metrics, engine, tags):
+    metrics.gauge("warehouse.db.pool.checkedout", engine.pool.checkedout(), tags=tags)
+    # Negative until the pool has opened pool_size connections.
+    overflow = max(0, engine.pool.overflow())
+    metrics.gauge("warehouse.db.pool.overflow", overflow, tags=tags)
+
+
+def _connect(request, metrics, name, engine):
+    pool_stats = request.registry.get("sqlalchemy.pool_stats", {}).get(name)
+    tags = _pool_tags(request, name)
 
     # Create our connection, most likely pulling it from the pool of
     # connections
+    start = time.monotonic()
     try:
-        connection = request.registry["sqlalchemy.engine"].connect()
+        connection = engine.connect()
+    except sqlalchemy.exc.TimeoutError:
+        # Every connection in the pool, overflow included, stayed checked out
+        # for all of pool_timeout.
+        logger.warning("Timed out waiting for a connection from the pool")
+        metrics.increment("warehouse.db.pool.timeout", tags=tags)
+        if pool_stats is not None:
+            pool_stats.record_timeout()
+        raise
     except OperationalError:
         # When we tried to connection to PostgreSQL, our database was not available for
         # some reason. We're going to log it here and then raise our error. Most likely
         # this is a transient error that will go away.
         logger.warning("Got an error connecting to PostgreSQL", exc_info=True)
-        metrics.increment("warehouse.db.session.error", tags=["error_in:connecting"])
+        metrics.increment(
+            "warehouse.db.session.error",
+            tags=["error_in:connecting", f"engine:{name}"],
+        )
         raise DatabaseNotAvailableError
 
+    wait = time.monotonic() - start
+    metrics.timing("warehouse.db.pool.checkout_wait", wait * 1000, tags=tags)
+    if pool_stats is not None:
+        pool_stats.record_wait(wait)
+    _record_pool(metrics, engine, tags)
+    return connection
+
+
+def _create_session(request):
+    metrics = request.find_service(IMetricsService, context=None)
+    engine_name, engine = _select_engine(request, metrics)
+    metrics.increment("warehouse.db.session.start", tags=[f"engine:{engine_name}"])
+
+    try:
+        connection = _connect(request, metrics, engine_name, engine)
+    except DatabaseNotAvailableError:
+        if engine_name != "replica":
+            raise
+        # The replica is only ever an optimization, so rather than failing the
+        # request, read from the primary instead.
+        metrics.increment("warehouse.db.replica.fallback", tags=["reason:connecting"])
+        request.registry["sqlalchemy.replica"].mark_unusable()
+        engine_name, engine = "primary", request.registry["sqlalchemy.engine"]
+        connection = _connect(request, metrics, engine_name, engine)
+
+    if engine_name == "replica" and not request.registry[
+        "sqlalchemy.replica"
+    ].has_replayed_writes(connection, metrics):
+        # A response read from the replica now might be cached as if the latest
+        # change, whose purge is on its way, had never happened.
+        connection.close()
+        metrics.increment("warehouse.db.replica.fallback", tags=["reason:writes"])
+        engine_name, engine = "primary", request.registry["sqlalchemy.engine"]
+        connection = _connect(request, metrics, engine_name, engine)
+
     # Now, create a session from our connection
     session = Session(bind=connection)
 
@@ -155,7 +497,9 @@ def _create_session(request):
     # end of our connection.
     @request.add_finished_callback
     def cleanup(request):
-        metrics.increment("warehouse.db.session.finished")
+        metrics.increment(
+            "warehouse.db.session.finished", tags=[f"engine:{engine_name}"]
+        )
         session.close()
         connection.close()
 
@@ -189,18 +533,145 @@ def unwrap_dbapi_exceptions(context):
         raise context.original_exception from context.sqlalchemy_exception
 
 
+class QueryStats:
+    """
+    How many queries one request or task has run, and how long the database
+    took to answer them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = collections.Counter()
+        self._started = None
+
+    def start(self, statement):
+        self.count += 1
+        self.statements[statement] += 1
+        self._started = time.perf_counter()
+
+    def finish(self):
+        if self._started is not None:
+            self.duration += time.perf_counter() - self._started
+            self._started = None
+
+
+# The QueryStats of the request or task that the current thread is handling, if
+# any.
+_query_stats: contextvars.ContextVar[QueryStats | None] = contextvars.ContextVar(
+    "warehouse.db.query_stats", default=None
+)
+
+
+@event.listens_for(sqlalchemy.engine.Engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if (stats := _query_stats.get()) is not None:
+        stats.start(statement)
+
+
+@event.listens_for(sqlalchemy.engine.Engine, "after_cursor_execute")
+def time_query(conn, cursor, statement, parameters, context, executemany):
+    if (stats := _query_stats.get()) is not None:
+        stats.finish()
+
+
+@contextlib.contextmanager
+def count_queries():
+    """
+    Count the queries that are run within this context, and the time that the
+    database takes to answer them, in the QueryStats that it yields.
+    """
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def query_stats_tween_factory(handler, registry):
+    """
+    Count the queries that each request runs and the time that they take, so
+    that views which run a query per row (or the same query twice) stand out,
+    and log the requests which run more than ``database.query_budget.count``
+    queries or spend more than ``database.query_budget.duration`` milliseconds
+    waiting on them.
+    """
+    max_queries = registry.settings.get("database.query_budget.count")
+    max_duration = registry.settings.get("database.query_budget.duration")
+
+    def query_stats_tween(request):
+        with count_queries() as stats:
+            try:
+                return handler(request)
+            finally:
+                _record_query_stats(request, stats, max_queries, max_duration)
+
+    return query_stats_tween
+
+
+def _record_query_stats(request, stats, max_queries, max_duration):
+    if request.matched_route is None:
+        return
+
+    route = request.matched_route.name
+    metrics = request.find_service(IMetricsService, context=None)
+    tags = [f"route:{route}"]
+    duration_ms = stats.duration * 1000
+    metrics.histogram("warehouse.db.request.queries", stats.count, tags=tags)
+    metrics.timing("warehouse.db.request.query_time", duration_ms, tags=tags)
+
+    if (max_queries is not None and stats.count > max_queries) or (
+        max_duration is not None and duration_ms > max_duration
+    ):
+        statement, repeats = stats.statements.most_common(1)[0]
+        logger.warning(
+            "query_budget_exceeded",
+            route=route,
+            path=request.path,
+            queries=stats.count,
+            query_time_ms=round(duration_ms, 3),
+            most_repeated=statement,
+            most_repeated_count=repeats,
+        )
+
+
 def includeme(config):
     # Add a directive to get an alembic configuration.
     config.add_directive("alembic_config", _configure_alembic)
 
+    settings = config.registry.settings
+    pool_options = {
+        "pool_size": settings.get("database.pool_size", DEFAULT_POOL_SIZE),
+        "max_overflow": settings.get("database.max_overflow", DEFAULT_MAX_OVERFLOW),
+        "pool_timeout": settings.get("database.pool_timeout", DEFAULT_POOL_TIMEOUT),
+    }
+
     # Create our SQLAlchemy Engine.
-    config.registry["sqlalchemy.engine"] = sqlalchemy.create_engine(
-        config.registry.settings["database.url"],
-        isolation_level=DEFAULT_ISOLATION,
-        pool_size=35,
-        max_overflow=65,
-        pool_timeout=20,
+    engine = sqlalchemy.create_engine(
+        settings["database.url"], isolation_level=DEFAULT_ISOLATION, **pool_options
     )
+    config.registry["sqlalchemy.engine"] = engine
+    pool_stats = {"primary": PoolStats(engine)}
+
+    # Create a second engine for the routes which only read, if there is a read
+    # replica to point it at.
+    replica_url = settings.get("database.replica_url")
+    if replica_url:
+        replica_engine = sqlalchemy.create_engine(
+            replica_url, isolation_level=DEFAULT_ISOLATION, **pool_options
+        )
+        config.registry["sqlalchemy.replica"] = ReadReplica(
+            replica_engine,
+            engine,
+            redis.StrictRedis.from_url(settings["database.replica_redis_url"]),
+            max_lag=settings.get("database.replica_max_lag", DEFAULT_REPLICA_MAX_LAG),
+        )
+        pool_stats["replica"] = PoolStats(replica_engine)
+
+    for stats in pool_stats.values():
+        stats.listen()
+    config.registry["sqlalchemy.pool_stats"] = pool_stats
 
     # Possibly override how to fetch new db sessions from config.settings
     #  Useful in test fixtures
@@ -209,6 +680,9 @@ def includeme(config):
     )
     config.add_request_method(db_session_factory, name="db", reify=True)
 
+    # Count the queries that each request runs, exception views included.
+    config.add_tween("warehouse.db.query_stats_tween_factory", over=EXCVIEW)
+
     # Set a custom JSON serializer for psycopg
     renderer = JSON()
     renderer_factory = renderer(None)
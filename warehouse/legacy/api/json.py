@@ -1,8 +1,9 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from packaging.utils import canonicalize_name, canonicalize_version
-from pyramid.httpexceptions import HTTPMovedPermanently, HTTPNotFound
+from pyramid.httpexceptions import HTTPBadRequest, HTTPMovedPermanently, HTTPNotFound
 from pyramid.view import view_config
+from sqlalchemy import func, select
 from sqlalchemy.exc import MultipleResultsFound, NoResultFound
 from sqlalchemy.orm import Load, contains_eager, joinedload
 
@@ -11,6 +12,7 @@ from warehouse.cache.origin import origin_cache
 from warehouse.packaging.models import (
     Description,
     File,
+    JournalEntry,
     LifecycleStatus,
     Project,
     Release,
@@ -375,3 +377,42 @@ def json_release(release, request):
 )
 def json_release_slash(release, request):
     return json_release(release, request)
+
+
+@view_config(
+    route_name="legacy.api.json.serials",
+    renderer="json-with-newline",
+    decorator=[
+        cache_control(60),  # 1 minute
+        origin_cache(
+            1 * 24 * 60 * 60,  # 1 day
+            stale_if_error=1 * 24 * 60 * 60,  # 1 day
+            keys=["all-projects"],
+        ),
+    ],
+)
+def json_serials(request):
+    try:
+        since = int(request.params["since"])
+    except KeyError:
+        raise HTTPBadRequest("'since' is required.", headers=_CORS_HEADERS) from None
+    except ValueError:
+        raise HTTPBadRequest(
+            "'since' must be an integer.", headers=_CORS_HEADERS
+        ) from None
+
+    # Apply CORS headers.
+    request.response.headers.update(_CORS_HEADERS)
+
+    # Get the last serial before the projects, so that anything which changes
+    # in between will be returned again by the next request rather than missed.
+    last_serial = request.db.scalar(select(func.max(JournalEntry.id))) or 0
+    request.response.headers["X-PyPI-Last-Serial"] = str(last_serial)
+
+    projects = request.db.scalar(
+        select(func.jsonb_object_agg(Project.name, Project.last_serial)).where(
+            Project.last_serial > since
+        )
+    )
+
+    return {"last_serial": last_serial, "projects": projects or {}}
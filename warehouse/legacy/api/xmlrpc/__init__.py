@@ -1,8 +1,13 @@
 # SPDX-License-Identifier: Apache-2.0
 
+from warehouse.legacy.api.xmlrpc.changelog import JournalWindow
+from warehouse.legacy.api.xmlrpc.views import _clean_for_xml
+
 
 def includeme(config):
     ratelimit_string = config.registry.settings.get(
         "warehouse.xmlrpc.client.ratelimit_string"
     )
     config.register_rate_limiter(ratelimit_string, "xmlrpc.client")
+
+    config.registry["xmlrpc.changelog"] = JournalWindow(_clean_for_xml)
@@ -2,19 +2,27 @@
 
 from typing import Any, NamedTuple
 
+import redis
+import structlog
+
 from pyramid.exceptions import ConfigurationError
+from sqlalchemy import inspect
 from sqlalchemy.orm.base import NO_VALUE
 from urllib3.util import parse_url
 
 from warehouse import db
 from warehouse.accounts.models import Email, User
+from warehouse.legacy.api.xmlrpc.cache.classifiers import ClassifierIndex
 from warehouse.legacy.api.xmlrpc.cache.derivers import cached_return_view
-from warehouse.legacy.api.xmlrpc.cache.fncache import RedisLru
+from warehouse.legacy.api.xmlrpc.cache.fncache import LocalLru, RedisLru
 from warehouse.legacy.api.xmlrpc.cache.interfaces import IXMLRPCCache
 from warehouse.legacy.api.xmlrpc.cache.services import NullXMLRPCCache, RedisXMLRPCCache
+from warehouse.packaging.models import Release
 from warehouse.utils.db import orm_session_from_obj
 
-__all__ = ["RedisLru"]
+__all__ = ["ClassifierIndex", "LocalLru", "RedisLru"]
+
+logger = structlog.get_logger(__name__)
 
 
 class CacheKeys(NamedTuple):
@@ -50,6 +58,46 @@ def store_purge_keys(config, session, flush_context):
         purges.update(key_maker(obj).purge)
 
 
+@db.listens_for(db.Session, "after_flush")
+def store_classifier_changes(config, session, flush_context):
+    changes = session.info.setdefault(
+        "warehouse.legacy.api.xmlrpc.cache.classifier_changes", []
+    )
+
+    # The attribute history still holds the pre-flush changes at this point, so
+    # we can record exactly which classifiers were added to or removed from a
+    # release. Deleted releases are left in the index: `browse` looks the ids up
+    # again, and ids which no longer exist simply drop out.
+    for obj in session.new | session.dirty:
+        if not isinstance(obj, Release):
+            continue
+
+        history = inspect(obj).attrs._classifiers.history
+        changes.extend((True, classifier.id, obj.id) for classifier in history.added)
+        changes.extend((False, classifier.id, obj.id) for classifier in history.deleted)
+
+
+@db.listens_for(db.Session, "after_commit")
+def execute_classifier_changes(config, session):
+    changes = session.info.pop(
+        "warehouse.legacy.api.xmlrpc.cache.classifier_changes", []
+    )
+    index = config.registry.get("xmlrpc.cache.classifiers")
+    if not changes or index is None:
+        return
+
+    try:
+        index.update(changes)
+    except redis.exceptions.RedisError:
+        # The sets that missed this change are rebuilt once they expire.
+        logger.warning("xmlrpc_classifier_index_update_failed", changes=len(changes))
+
+
+@db.listens_for(db.Session, "after_rollback")
+def discard_classifier_changes(config, session):
+    session.info.pop("warehouse.legacy.api.xmlrpc.cache.classifier_changes", None)
+
+
 @db.listens_for(db.Session, "after_commit")
 def execute_purge(config, session):
     purges = session.info.pop("warehouse.legacy.api.xmlrpc.cache.purges", set())
@@ -89,6 +137,10 @@ def includeme(config):
     xmlrpc_cache_url_scheme = parse_url(xmlrpc_cache_url).scheme
     if xmlrpc_cache_url_scheme in ("redis", "rediss"):
         xmlrpc_cache_class = RedisXMLRPCCache
+        config.registry["xmlrpc.cache.classifiers"] = ClassifierIndex(
+            redis.StrictRedis.from_url(xmlrpc_cache_url, decode_responses=True),
+            name=config.registry.settings.get("warehouse.xmlrpc.cache.name", "xmlrpc"),
+        )
     elif xmlrpc_cache_url_scheme in ("null"):
         xmlrpc_cache_class = NullXMLRPCCache
     else:
@@ -103,6 +155,17 @@ def includeme(config):
             f'Unable to cast XMLRPCCache expires "{xmlrpc_cache_expires}"  to integer'
         )
 
+    config.registry["xmlrpc.cache.local"] = LocalLru(
+        max_entries=int(
+            config.registry.settings.get(
+                "warehouse.xmlrpc.cache.local_max_entries", 256
+            )
+        ),
+        expires=int(
+            config.registry.settings.get("warehouse.xmlrpc.cache.local_expires", 30)
+        ),
+    )
+
     config.register_service_factory(
         xmlrpc_cache_class.create_service, iface=IXMLRPCCache
     )
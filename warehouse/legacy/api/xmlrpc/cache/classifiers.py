@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import itertools
+
+# How long a classifier's set is kept once it has been built from the database,
+# which bounds how long a change that raced with building it can go unnoticed.
+DEFAULT_EXPIRES = 24 * 60 * 60  # 24 hours
+
+# How many release ids are added to a set at once while it's being built.
+BATCH_SIZE = 10_000
+
+# Added to a set once it holds every release id for its classifier. No release
+# id is ever empty.
+COMPLETE = ""
+
+
+class ClassifierIndex:
+    """
+    The ids of the releases which carry each classifier, kept as one Redis set
+    per classifier, so that `browse` can intersect them within Redis.
+
+    A set is built from the database the first time that it's needed, and from
+    then on it's kept up to date in place, rather than purged: `update` adds and
+    removes the ids of the releases that a classifier was added to or removed
+    from, once that change has been committed. A set which has only ever been
+    updated, because it expired or was never built, lacks the ``COMPLETE``
+    member, and is built before it's used.
+    """
+
+    def __init__(
+        self, conn, *, name="xmlrpc", expires=DEFAULT_EXPIRES, batch_size=BATCH_SIZE
+    ):
+        self.conn = conn
+        self.name = name
+        self.expires = expires
+        self.batch_size = batch_size
+
+    def format_key(self, classifier_id):
+        # Kept outside of the "{name}:" namespace of `RedisLru`.
+        return f"{self.name}-classifier:{classifier_id}"
+
+    def release_ids(self, classifier_ids, load):
+        """
+        The ids of the releases which carry every one of ``classifier_ids``,
+        building the set of any of them from ``load(classifier_id)`` first.
+        """
+        keys = [self.format_key(classifier_id) for classifier_id in classifier_ids]
+        for classifier_id, key in zip(classifier_ids, keys, strict=True):
+            if not self.conn.sismember(key, COMPLETE):
+                self._build(key, load(classifier_id))
+
+        release_ids = self.conn.sinter(keys)
+        release_ids.discard(COMPLETE)
+        return release_ids
+
+    def _build(self, key, release_ids):
+        # The ids are added to whatever the set already holds, rather than
+        # replacing it, so that any that `update` added while they were read
+        # from the database are kept.
+        for batch in itertools.batched(release_ids, self.batch_size, strict=False):
+            pipeline = self.conn.pipeline()
+            pipeline.sadd(key, *batch)
+            pipeline.expire(key, self.expires, nx=True)
+            pipeline.execute()
+
+        pipeline = self.conn.pipeline()
+        pipeline.sadd(key, COMPLETE)
+        pipeline.expire(key, self.expires)
+        pipeline.execute()
+
+    def update(self, changes):
+        """
+        Apply ``(added, classifier_id, release_id)`` changes, in order, once the
+        transaction that made them has been committed.
+        """
+        pipeline = self.conn.pipeline()
+        for added, classifier_id, release_id in changes:
+            key = self.format_key(classifier_id)
+            if added:
+                pipeline.sadd(key, str(release_id))
+                # A set which is only ever updated must still expire.
+                pipeline.expire(key, self.expires, nx=True)
+            else:
+                pipeline.srem(key, str(release_id))
+        pipeline.execute()
@@ -1,23 +1,94 @@
 # SPDX-License-Identifier: Apache-2.0
 
-import json
+import collections
+import contextlib
+import itertools
+import threading
+import time
 
 import redis
 
+from warehouse.cache import codecs
 from warehouse.legacy.api.xmlrpc.cache.interfaces import CacheError
 
 DEFAULT_EXPIRES = 86400
 
+# How long one worker may hold the lock for refilling a missing entry, and how
+# often the workers waiting on it check whether the entry has been filled.
+DEFAULT_LOCK_TIMEOUT = 10
+DEFAULT_POLL_INTERVAL = 0.05
+
 
 class StubMetricReporter:
     def increment(self, metric_name):
         return
 
 
+class LocalLru:
+    """
+    A bounded, in-process LRU cache which sits in front of a `RedisLru`, so that
+    repeated hits inside a worker skip both the round trip to Redis and the
+    `json.loads` of the stored value.
+
+    An entry is only served while it is younger than ``expires`` seconds, and
+    while its tag is still at the generation it was stored under. `RedisLru.purge`
+    bumps the generation in Redis, and the generation of a tag is re-read at most
+    once every ``generation_interval`` seconds, which bounds how long a purge can
+    go unnoticed here.
+
+    Values are handed to every caller as-is, so they must not be mutated.
+    """
+
+    def __init__(self, max_entries=256, expires=30, generation_interval=1):
+        self.max_entries = max_entries
+        self.expires = expires
+        self.generation_interval = generation_interval
+        self._entries = collections.OrderedDict()
+        # Bounded like the entries, since every tag that's looked up adds one.
+        self._generations = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def generation(self, tag, load):
+        now = time.monotonic()
+        with self._lock:
+            generation, checked_at = self._generations.get(tag, (None, None))
+        if generation is not None and now - checked_at < self.generation_interval:
+            return generation
+
+        generation = load(tag)
+        if generation is not None:
+            with self._lock:
+                self._generations[tag] = (generation, now)
+                self._generations.move_to_end(tag)
+                while len(self._generations) > self.max_entries:
+                    self._generations.popitem(last=False)
+        return generation
+
+    def get(self, key, generation):
+        with self._lock:
+            try:
+                value, stored_generation, expires_at = self._entries[key]
+            except KeyError:
+                return None
+            if stored_generation != generation or expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def add(self, key, value, generation):
+        with self._lock:
+            self._entries[key] = (value, generation, time.monotonic() + self.expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
 class RedisLru:
     """
     Redis backed LRU cache for functions which return an object which
-    can survive json.dumps() and json.loads() intact.
+    can survive json.dumps() and json.loads() intact. Values are written with
+    ``codec`` (JSON by default), and entries in any format are read back.
 
     Note the "intact" constraint is narrower than it looks: tuples come back as
     lists, scalar dict keys are coerced to strings without complaint, and
@@ -26,16 +97,37 @@ class RedisLru:
     `xmlrpc_cache_by_project` in warehouse/legacy/api/xmlrpc/views.py.
     """
 
-    def __init__(self, conn, name="lru", expires=None, metric_reporter=None):
+    def __init__(
+        self,
+        conn,
+        name="lru",
+        expires=None,
+        metric_reporter=None,
+        local_cache=None,
+        codec=None,
+        lock_timeout=DEFAULT_LOCK_TIMEOUT,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+    ):
         """
         conn:            Redis Connection Object
         name:            Prefix for all keys in the cache
         expires:         Default expiration
         metric_reporter: Object implementing an `increment(<string>)` method
+        local_cache:     Optional `LocalLru` to check before Redis
+        codec:           Codec from `warehouse.cache.codecs` to write values with
+        lock_timeout:    Longest time one caller may spend refilling a missing entry
+        poll_interval:   How often other callers check for the refilled entry
         """
         self.conn = conn
         self.name = name
         self.expires = expires or DEFAULT_EXPIRES
+        self.local_cache = local_cache
+        # `ensure_ascii` is left at its default so the JSON is always encodable:
+        # redis-py raises UnicodeEncodeError on lone surrogates, which is not a
+        # RedisError and escapes the handler in `add`.
+        self.codec = codec if codec is not None else codecs.JSONCodec()
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
         if callable(getattr(metric_reporter, "increment", None)):
             self.metric_reporter = metric_reporter
         else:
@@ -46,15 +138,47 @@ class RedisLru:
             return f"{self.name}:{tag}:{func_name}"
         return f"{self.name}:tag:{func_name}"
 
+    def format_tag_key(self, tag):
+        # The set of hash keys holding entries for a tag. It has one segment fewer
+        # than the keys from `format_key`, so it can never collide with them.
+        if tag is not None and tag != "None":
+            return f"{self.name}:{tag}"
+        return f"{self.name}:tag"
+
+    def format_lock_key(self, func_name, key, tag):
+        # Kept outside of the "{name}:" namespace, like the generation keys.
+        if tag is not None and tag != "None":
+            return f"{self.name}-lock:{tag}:{func_name}:{key}"
+        return f"{self.name}-lock:tag:{func_name}:{key}"
+
+    def format_generation_key(self, tag):
+        # Kept outside of the "{name}:" namespace, so that `index_tags` never
+        # mistakes it for a cached entry.
+        if tag is not None and tag != "None":
+            return f"{self.name}-generation:{tag}"
+        return f"{self.name}-generation:tag"
+
+    def generation(self, tag):
+        try:
+            return int(self.conn.get(self.format_generation_key(tag)) or 0)
+        except redis.exceptions.RedisError, redis.exceptions.ConnectionError:
+            self.metric_reporter.increment(f"warehouse.{self.name}.cache.error")
+            return None
+
     def get(self, func_name, key, tag):
+        value = self._get(func_name, key, tag)
+        if value is not None:
+            self.metric_reporter.increment(f"warehouse.{self.name}.cache.hit")
+        return value
+
+    def _get(self, func_name, key, tag):
         try:
             value = self.conn.hget(self.format_key(func_name, tag), str(key))
         except redis.exceptions.RedisError, redis.exceptions.ConnectionError:
             self.metric_reporter.increment(f"warehouse.{self.name}.cache.error")
             return None
         if value:
-            self.metric_reporter.increment(f"warehouse.{self.name}.cache.hit")
-            value = json.loads(value)
+            value = codecs.decode(value)
         return value
 
     def add(self, func_name, key, value, tag, expires):
@@ -62,15 +186,16 @@ class RedisLru:
             self.metric_reporter.increment(f"warehouse.{self.name}.cache.miss")
             pipeline = self.conn.pipeline()
             pipeline.hset(
-                self.format_key(func_name, tag),
-                str(key),
-                # `ensure_ascii` is left at its default so the serializer output is
-                # always encodable: redis-py raises UnicodeEncodeError on lone
-                # surrogates, which is not a RedisError and escapes the handler below.
-                json.dumps(value, separators=(",", ":")),
+                self.format_key(func_name, tag), str(key), self.codec.encode(value)
             )
             ttl = expires or self.expires
             pipeline.expire(self.format_key(func_name, tag), ttl)
+            # Record the hash under its tag, so that a purge only touches the keys
+            # for that tag. The set has to outlive every hash in it, so its TTL is
+            # only ever extended: NX sets it on a new set and GT raises it.
+            pipeline.sadd(self.format_tag_key(tag), self.format_key(func_name, tag))
+            pipeline.expire(self.format_tag_key(tag), ttl, nx=True)
+            pipeline.expire(self.format_tag_key(tag), ttl, gt=True)
             pipeline.execute()
             return value
         except redis.exceptions.RedisError, redis.exceptions.ConnectionError:
@@ -79,17 +204,75 @@ class RedisLru:
 
     def purge(self, tag):
         try:
-            keys = self.conn.scan_iter(f"{self.name}:{tag}:*", count=1000)
+            tag_key = self.format_tag_key(tag)
+            keys = self.conn.smembers(tag_key)
             pipeline = self.conn.pipeline()
-            for key in keys:
-                pipeline.delete(key)
+            if keys:
+                # Remove only the keys that we've read, rather than the whole set,
+                # so a key added by a concurrent `add` is still there to purge.
+                pipeline.delete(*keys)
+                pipeline.srem(tag_key, *keys)
+            # Bump the generation after the keys are gone, so that a `LocalLru`
+            # which sees the new generation can only go on to read fresh values.
+            pipeline.incr(self.format_generation_key(tag))
+            pipeline.expire(self.format_generation_key(tag), self.expires)
             pipeline.execute()
             self.metric_reporter.increment(f"warehouse.{self.name}.cache.purge")
         except redis.exceptions.RedisError, redis.exceptions.ConnectionError:
             self.metric_reporter.increment(f"warehouse.{self.name}.cache.error")
             raise CacheError
 
+    def index_tags(self, batch_size=1000):
+        """
+        Add every existing hash to the set for its tag, returning how many were
+        found. Entries written before tags were indexed are otherwise invisible to
+        `purge` until they expire, so this is run once the indexing code is live
+        on every worker.
+        """
+        count = 0
+        keys = self.conn.scan_iter(f"{self.name}:*:*", count=batch_size)
+        for batch in itertools.batched(keys, batch_size, strict=False):
+            pipeline = self.conn.pipeline()
+            for key in batch:
+                pipeline.ttl(key)
+            ttls = pipeline.execute()
+
+            pipeline = self.conn.pipeline()
+            for key, ttl in zip(batch, ttls, strict=True):
+                # Keys without a TTL (-1) are never written by `add`, and a key
+                # which expired since the scan (-2) needs no indexing.
+                if ttl < 0:
+                    continue
+                _, tag, _ = key.decode("utf8").split(":", 2)
+                pipeline.sadd(self.format_tag_key(tag), key)
+                pipeline.expire(self.format_tag_key(tag), ttl, nx=True)
+                pipeline.expire(self.format_tag_key(tag), ttl, gt=True)
+                count += 1
+            pipeline.execute()
+        return count
+
     def fetch(self, func, args, kwargs, key, tag, expires):
+        if self.local_cache is None:
+            return self._fetch(func, args, kwargs, key, tag, expires)
+
+        # Read the generation before the value, so that a purge which lands in
+        # between leaves us holding a value under the old generation, which is
+        # then ignored, rather than a stale value under the new one.
+        generation = self.local_cache.generation(str(tag), self.generation)
+        if generation is None:
+            return self._fetch(func, args, kwargs, key, tag, expires)
+
+        local_key = (func.__name__, str(key), str(tag))
+        value = self.local_cache.get(local_key, generation)
+        if value is not None:
+            self.metric_reporter.increment(f"warehouse.{self.name}.cache.local_hit")
+            return value
+
+        value = self._fetch(func, args, kwargs, key, tag, expires)
+        self.local_cache.add(local_key, value, generation)
+        return value
+
+    def _fetch(self, func, args, kwargs, key, tag, expires):
         # `get` returns None for both a miss and a Redis error, so compare against
         # None rather than testing truthiness: an empty list or dict is a real hit.
         # Treating it as a miss counts the request as both a hit and a miss and
@@ -97,6 +280,58 @@ class RedisLru:
         value = self.get(func.__name__, str(key), str(tag))
         if value is not None:
             return value
-        return self.add(
-            func.__name__, str(key), func(*args, **kwargs), str(tag), expires
+        return self._refill(func, args, kwargs, str(key), str(tag), expires)
+
+    def _refill(self, func, args, kwargs, key, tag, expires):
+        # When a popular entry expires or is purged, every concurrent caller
+        # misses at once. Only the caller holding the lock runs `func`, while the
+        # others wait for it to store the result, so a purge costs the database
+        # one query rather than one per caller.
+        lock = self.conn.lock(
+            self.format_lock_key(func.__name__, key, tag), timeout=self.lock_timeout
         )
+        try:
+            acquired, value = self._acquire_or_wait(lock, func.__name__, key, tag)
+        except redis.exceptions.RedisError, redis.exceptions.ConnectionError:
+            self.metric_reporter.increment(f"warehouse.{self.name}.cache.error")
+            return self.add(func.__name__, key, func(*args, **kwargs), tag, expires)
+
+        if value is not None:
+            self.metric_reporter.increment(f"warehouse.{self.name}.cache.coalesced")
+            return value
+
+        if not acquired:
+            # Whoever held the lock didn't store anything in time, so we stop
+            # waiting and run `func` ourselves.
+            self.metric_reporter.increment(f"warehouse.{self.name}.cache.lock_timeout")
+            return self.add(func.__name__, key, func(*args, **kwargs), tag, expires)
+
+        try:
+            return self.add(func.__name__, key, func(*args, **kwargs), tag, expires)
+        finally:
+            # If the lock has expired, or is gone with the rest of Redis, then
+            # there's nothing left for us to release.
+            with contextlib.suppress(redis.exceptions.RedisError):
+                lock.release()
+
+    def _acquire_or_wait(self, lock, func_name, key, tag):
+        """
+        Take the lock, or wait for whoever holds it to store the entry, for at
+        most ``lock_timeout`` seconds. Returns whether the lock was taken, and
+        the entry if it was stored in the meantime.
+        """
+        deadline = time.monotonic() + self.lock_timeout
+        while not lock.acquire(blocking=False):
+            while True:
+                if time.monotonic() >= deadline:
+                    return False, None
+                time.sleep(self.poll_interval)
+                value = self._get(func_name, key, tag)
+                if value is not None:
+                    return False, value
+                # Whoever held the lock let go of it without storing anything,
+                # because `func` raised or `add` failed, so there's nothing to
+                # wait for, and we try to take the lock ourselves.
+                if not self.conn.exists(lock.name):
+                    break
+        return True, None
@@ -5,6 +5,7 @@ import redis
 from zope.interface import implementer
 
 from warehouse import tasks
+from warehouse.cache import codecs
 from warehouse.legacy.api.xmlrpc import cache
 from warehouse.legacy.api.xmlrpc.cache import interfaces
 
@@ -30,10 +31,17 @@ class RedisXMLRPCCache:
         name="lru",
         expires=None,
         metric_reporter=None,
+        local_cache=None,
+        codec=None,
     ):
         self.redis_conn = redis.StrictRedis.from_url(redis_url, db=redis_db)
         self.redis_lru = cache.RedisLru(
-            self.redis_conn, name=name, expires=expires, metric_reporter=metric_reporter
+            self.redis_conn,
+            name=name,
+            expires=expires,
+            metric_reporter=metric_reporter,
+            local_cache=local_cache,
+            codec=codec,
         )
         self._purger = purger
 
@@ -54,6 +62,12 @@ class RedisXMLRPCCache:
             # so falling back to `StubMetricReporter` there loses nothing: the real
             # `purge` runs in the `purge_tag` task, which does have a request.
             metric_reporter=getattr(request, "metrics", None),
+            # Services are created per request, so the in-process cache is kept in
+            # the registry to be shared by every request in this worker.
+            local_cache=request.registry.get("xmlrpc.cache.local"),
+            codec=codecs.get_codec(
+                request.registry.settings.get("warehouse.xmlrpc.cache.codec", "json")
+            ),
         )
 
     def fetch(self, func, args, kwargs, key, tag, expires):
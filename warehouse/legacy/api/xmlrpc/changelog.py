@@ -0,0 +1,130 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import bisect
+import datetime
+
+from array import array
+
+from sqlalchemy import select
+
+from warehouse.packaging.models import JournalEntry
+from warehouse.utils.refresh import PeriodicallyRefreshed
+
+# How often to look for new journal entries, and how often to throw the window
+# away and load it from scratch, in seconds. The full reload picks up journal
+# entries which were changed or removed after we loaded them.
+REFRESH_INTERVAL = 1
+RELOAD_INTERVAL = 60 * 60
+
+# How many of the most recent journal entries are kept in memory.
+WINDOW_SIZE = 100_000
+
+
+def _columns():
+    return select(
+        JournalEntry.id,
+        JournalEntry.name,
+        JournalEntry.version,
+        JournalEntry.submitted_date,
+        JournalEntry.action,
+    )
+
+
+class _Window:
+    def __init__(self, floor, ids, entries, loaded_at):
+        # Every journal entry with an id greater than `floor` is in `entries`.
+        self.floor = floor
+        self.ids = ids
+        self.entries = entries
+        self.loaded_at = loaded_at
+
+    @property
+    def head(self):
+        return self.ids[-1] if self.ids else self.floor
+
+
+class JournalWindow(PeriodicallyRefreshed):
+    """
+    An in-process window over the most recent journal entries, already turned
+    into the tuples that ``changelog_since_serial`` returns, so that the polls
+    from mirrors which are keeping up are answered without querying the
+    journals.
+
+    The window is loaded from the database on first use and then extended with
+    the entries after the newest one we have. This is safe because journal ids
+    are handed out in commit order (see ``ensure_monotonic_journals``), so no
+    entry can later appear below one that we have already seen.
+    """
+
+    refresh_interval = REFRESH_INTERVAL
+
+    def __init__(self, clean):
+        super().__init__()
+        self._clean = clean
+        self._window = None
+
+    def _tuple(self, entry):
+        return (
+            entry.name,
+            entry.version,
+            int(entry.submitted_date.replace(tzinfo=datetime.UTC).timestamp()),
+            self._clean(entry.action),
+            entry.id,
+        )
+
+    def _is_loaded(self):
+        return self._window is not None
+
+    def _refresh(self, db, now):
+        if self._window is None or now - self._window.loaded_at >= RELOAD_INTERVAL:
+            self._load(db, now)
+        else:
+            self._extend(db)
+
+    def _load(self, db, now):
+        entries = db.execute(
+            _columns().order_by(JournalEntry.id.desc()).limit(WINDOW_SIZE)
+        ).all()
+        entries.reverse()
+        # If there are fewer entries than fit in the window then we have all of
+        # them, otherwise we only have those after the oldest one we loaded.
+        floor = entries[0].id - 1 if len(entries) == WINDOW_SIZE else 0
+        self._window = _Window(
+            floor,
+            array("q", [entry.id for entry in entries]),
+            [self._tuple(entry) for entry in entries],
+            now,
+        )
+
+    def _extend(self, db):
+        window = self._window
+        entries = db.execute(
+            _columns()
+            .where(JournalEntry.id > window.head)
+            .order_by(JournalEntry.id)
+            .limit(WINDOW_SIZE)
+        ).all()
+        if not entries:
+            return
+
+        ids = window.ids + array("q", [entry.id for entry in entries])
+        tuples = window.entries + [self._tuple(entry) for entry in entries]
+        floor = window.floor
+        if len(ids) > WINDOW_SIZE:
+            drop = len(ids) - WINDOW_SIZE
+            floor = ids[drop - 1]
+            ids, tuples = ids[drop:], tuples[drop:]
+        self._window = _Window(floor, ids, tuples, window.loaded_at)
+
+    def since(self, serial, limit):
+        """
+        Return up to ``limit`` entries after ``serial``, or None if the window
+        doesn't reach back that far.
+        """
+        window = self._window
+        if window is None:
+            raise RuntimeError("Cannot read the journal window before a refresh.")
+        if serial < window.floor:
+            return None
+        start = bisect.bisect_right(window.ids, serial)
+        return window.entries[start : start + limit]
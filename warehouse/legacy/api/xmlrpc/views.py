@@ -3,12 +3,15 @@
 import datetime
 import functools
 import re
+import uuid
 import xmlrpc.client
 import xmlrpc.server
 
 from collections.abc import Mapping
 from inspect import signature
 
+import redis
+
 from packaging.utils import canonicalize_name
 from pydantic import StrictBool, StrictInt, StrictStr, ValidationError, validate_call
 from pyramid.httpexceptions import HTTPMethodNotAllowed, HTTPTooManyRequests
@@ -21,7 +24,8 @@ from pyramid_rpc.xmlrpc import (
     exception_view as _exception_view,
     xmlrpc_method as _xmlrpc_method,
 )
-from sqlalchemy import func, select
+from sqlalchemy import any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 
 from warehouse.accounts.models import User
 from warehouse.classifiers.models import Classifier
@@ -158,9 +162,11 @@ def xmlrpc_method(**kwargs):
 
 
 # Caching wrappers for XML-RPC methods. Both store the view's return value in
-# Redis as JSON (see `warehouse.legacy.api.xmlrpc.cache`), so a view is only safe
-# to wrap if its return value survives a `json.dumps()`/`json.loads()` round
-# trip. Known limitations, roughly in order of how likely they are to bite:
+# Redis as JSON by default (see `warehouse.legacy.api.xmlrpc.cache`), so a view
+# is only safe to wrap if its return value survives a `json.dumps()`/
+# `json.loads()` round trip. The MessagePack codecs share limitations 1 and 2,
+# but keep non-str dict keys. Known limitations, roughly in order of how likely
+# they are to bite:
 #
 # 1. Types the stdlib encoder rejects raise `TypeError` from inside the view
 #    deriver, and nothing catches it: the RPC call fails outright instead of
@@ -191,7 +197,8 @@ def xmlrpc_method(**kwargs):
 #    result depends on a model with no matching purge key leaves it stale for up
 #    to `xmlrpc_cache_expires`.
 #
-# 7. Changing the serializer or the key format invalidates everything, and the
+# 7. Changing the key format invalidates everything (changing the codec does
+#    not: `warehouse.cache.codecs.decode` reads every format), and the
 #    orphans are not self-cleaning: `add` re-`expire`s the whole hash on every
 #    write, and Redis EXPIRE replaces the existing TTL, so a field written in the
 #    old format survives as long as any field in that hash keeps being written.
@@ -280,13 +287,26 @@ def changelog_last_serial(request):
     return request.db.query(func.max(JournalEntry.id)).scalar()
 
 
+CHANGELOG_LIMIT = 50000
+
+
 @xmlrpc_method(method="changelog_since_serial")
 def changelog_since_serial(request, serial: StrictInt):
+    # Mirrors which are keeping up are served from the recent entries that each
+    # worker keeps in memory, only those which have fallen further behind than
+    # that need to query the journals.
+    window = request.registry.get("xmlrpc.changelog")
+    if window is not None:
+        window.refresh(request.db)
+        recent = window.since(serial, CHANGELOG_LIMIT)
+        if recent is not None:
+            return recent
+
     entries = (
         request.db.query(JournalEntry)
         .filter(JournalEntry.id > serial)
         .order_by(JournalEntry.id)
-        .limit(50000)
+        .limit(CHANGELOG_LIMIT)
     )
 
     return [
@@ -314,6 +334,22 @@ def list_packages_with_serial(request):
     return result or {}
 
 
+@xmlrpc_method(method="list_packages_with_serial_since")
+def list_packages_with_serial_since(request, serial: StrictInt):
+    # Only the projects which have changed since the given serial, which uses
+    # the index on last_serial rather than reading the whole projects table.
+    # That is cheap enough not to be cached, which would otherwise keep an
+    # entry for every serial that a mirror has asked about.
+    query = select(
+        func.jsonb_object_agg(Project.name, Project.last_serial).label(
+            "package_serials"
+        )
+    ).where(Project.last_serial > serial)
+
+    result = request.db.execute(query).scalar()
+    return result or {}
+
+
 # Package querying methods
 
 
@@ -343,29 +379,76 @@ def user_packages(request, username: StrictStr):
     return [(r.role_name, r.project.name) for r in roles]
 
 
-@xmlrpc_method(method="browse")
-def browse(request, classifiers: list[StrictStr]):
-    classifiers_q = (
-        request.db.query(Classifier)
-        .filter(Classifier.classifier.in_(classifiers))
-        .subquery()
-    )
+# The release ids for each classifier are kept as an inverted index, so that
+# browsing by several classifiers intersects a few sets instead of grouping every
+# matching row of release_classifiers. Popular classifiers are attached to hundreds
+# of thousands of releases, which made the old query scan most of the table. See
+# `warehouse.legacy.api.xmlrpc.cache.classifiers.ClassifierIndex`.
 
-    release_classifiers_q = (
-        select(ReleaseClassifiers)
-        .where(ReleaseClassifiers.trove_id == classifiers_q.c.id)
-        .alias("rc")
+
+def _classifier_release_ids(db, classifier_id):
+    return (
+        str(release_id)
+        for release_id in db.scalars(
+            select(ReleaseClassifiers.release_id).where(
+                ReleaseClassifiers.trove_id == classifier_id
+            )
+        )
     )
 
-    releases = (
-        request.db.query(Project.name, Release.version)
-        .join(Release)
-        .join(release_classifiers_q, Release.id == release_classifiers_q.c.release_id)
-        .group_by(Project.name, Release.version)
-        .having(func.count() == len(classifiers))
+
+def _matching_release_ids(request, classifier_ids):
+    index = request.registry.get("xmlrpc.cache.classifiers")
+    if index is not None:
+        try:
+            return index.release_ids(
+                classifier_ids, functools.partial(_classifier_release_ids, request.db)
+            )
+        except redis.exceptions.RedisError:
+            # Fall back to matching the classifiers within the database.
+            pass
+
+    return {
+        str(release_id)
+        for release_id in request.db.scalars(
+            select(ReleaseClassifiers.release_id)
+            .where(ReleaseClassifiers.trove_id.in_(classifier_ids))
+            .group_by(ReleaseClassifiers.release_id)
+            .having(func.count() == len(classifier_ids))
+        )
+    }
+
+
+@xmlrpc_method(method="browse")
+def browse(request, classifiers: list[StrictStr]):
+    classifier_ids = request.db.scalars(
+        select(Classifier.id).where(Classifier.classifier.in_(classifiers))
+    ).all()
+
+    # A release has to match every classifier, so an unknown (or repeated)
+    # classifier matches nothing.
+    if not classifier_ids or len(classifier_ids) != len(classifiers):
+        return []
+
+    matched = _matching_release_ids(request, classifier_ids)
+    if not matched:
+        return []
+
+    releases = request.db.execute(
+        select(Project.name, Release.version)
+        .join(Release.project)
+        .where(
+            Release.id
+            == any_(
+                bindparam(
+                    "release_ids",
+                    [uuid.UUID(release_id) for release_id in matched],
+                    type_=ARRAY(UUID),
+                )
+            )
+        )
         .order_by(Project.name, Release.version)
-        .all()
-    )
+    ).all()
 
     return [(r.name, r.version) for r in releases]
 
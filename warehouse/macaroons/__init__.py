@@ -2,10 +2,11 @@
 
 from warehouse.macaroons.errors import InvalidMacaroonError
 from warehouse.macaroons.interfaces import IMacaroonService
-from warehouse.macaroons.services import database_macaroon_factory
+from warehouse.macaroons.services import LastUsedRecorder, database_macaroon_factory
 
 __all__ = ["InvalidMacaroonError", "includeme"]
 
 
 def includeme(config):
+    config.registry["macaroons.last_used"] = LastUsedRecorder()
     config.register_service_factory(database_macaroon_factory, IMacaroonService)
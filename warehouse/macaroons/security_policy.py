@@ -108,7 +108,9 @@ class MacaroonSecurityPolicy:
 
         # Every Macaroon is either associated with a user or an OIDC publisher.
         if dm.user is not None:
-            is_disabled, _ = login_service.is_disabled(dm.user.id)
+            # The user was loaded along with the macaroon, and is checked as it
+            # is now, rather than from a cached snapshot of it.
+            is_disabled, _ = login_service.is_user_disabled(dm.user)
             if is_disabled:
                 return None
             return UserContext(dm.user, dm)
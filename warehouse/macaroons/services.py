@@ -2,7 +2,11 @@
 
 from __future__ import annotations
 
+import collections
 import datetime
+import functools
+import threading
+import time
 import typing
 import uuid
 
@@ -21,6 +25,15 @@ from warehouse.macaroons.models import Macaroon
 if typing.TYPE_CHECKING:
     from pyramid.request import Request
 
+# How often each worker records that a macaroon was used, at most, in seconds.
+# `last_used` is only informational, so a token used many times in a row (such
+# as by a CI job uploading many files) doesn't need a write every time.
+LAST_USED_INTERVAL = 60
+
+# How many macaroons each worker remembers recording, the least recently used
+# are forgotten (and so are recorded again the next time that they're used).
+LAST_USED_MAX_ENTRIES = 10_000
+
 
 def _extract_raw_macaroon(prefixed_macaroon: str | None) -> str | None:
     """
@@ -94,16 +107,54 @@ def _record_attenuations(request: Request, extra: list[str] | None) -> None:
         )
 
 
+class LastUsedRecorder:
+    """
+    Remembers when this worker last recorded that each macaroon was used, so
+    that `last_used` is written at most once per interval for each macaroon.
+    """
+
+    def __init__(
+        self, *, interval=LAST_USED_INTERVAL, max_entries=LAST_USED_MAX_ENTRIES
+    ):
+        self.interval = interval
+        self.max_entries = max_entries
+        self._recorded = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def due(self, macaroon_id) -> bool:
+        """
+        Returns True if the use of the given macaroon should be recorded now,
+        and if so assumes that it will be.
+        """
+        now = time.monotonic()
+        with self._lock:
+            recorded_at = self._recorded.get(macaroon_id)
+            if recorded_at is not None and now - recorded_at < self.interval:
+                return False
+            self._recorded[macaroon_id] = now
+            self._recorded.move_to_end(macaroon_id)
+            while len(self._recorded) > self.max_entries:
+                self._recorded.popitem(last=False)
+            return True
+
+
 @implementer(IMacaroonService)
 class DatabaseMacaroonService:
-    def __init__(self, db_session):
+    def __init__(self, db_session, *, last_used=None):
         self.db = db_session
+        self.last_used = last_used
+        # Identity and permission checks each look the macaroon up, and a
+        # request can check its permissions more than once.
+        self.cached_find_macaroon = functools.lru_cache(self._find_macaroon)
 
     def find_macaroon(self, macaroon_id) -> Macaroon | None:
         """
         Returns a macaroon model from the DB by its identifier.
         Returns None if no macaroon has the given ID.
         """
+        return self.cached_find_macaroon(macaroon_id)
+
+    def _find_macaroon(self, macaroon_id) -> Macaroon | None:
         try:
             uuid.UUID(macaroon_id)
         except ValueError:
@@ -225,6 +276,9 @@ class DatabaseMacaroonService:
         if verified:
             _record_attenuations(request, attenuations)
 
+            if self.last_used is not None and not self.last_used.due(dm.id):
+                return True
+
             # Update last_used without dirtying the ORM object. A dirty
             # macaroon causes autoflush during Project.__acl__() evaluation,
             # which can deadlock with the journal advisory lock under
@@ -313,6 +367,7 @@ class DatabaseMacaroonService:
         """
         dm = self.find_macaroon(macaroon_id)
         self.db.delete(dm) if dm else None
+        self.cached_find_macaroon.cache_clear()
 
     def get_macaroon_by_description(self, user_id, description):
         """
@@ -330,4 +385,6 @@ class DatabaseMacaroonService:
 
 
 def database_macaroon_factory(context, request):
-    return DatabaseMacaroonService(request.db)
+    return DatabaseMacaroonService(
+        request.db, last_used=request.registry.get("macaroons.last_used")
+    )
@@ -0,0 +1,37 @@
+# SPDX-License-Identifier: Apache-2.0
+"""
+Add index on projects.last_serial
+
+Revision ID: 5d2f7c9a1e04
+Revises: 964076d0c4ad
+Create Date: 2026-10-18 10:12:31.502117
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+revision = "5d2f7c9a1e04"
+down_revision = "964076d0c4ad"
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot happen inside a transaction. We'll close
+    # our transaction here and issue the statement.
+    op.get_bind().commit()
+
+    with op.get_context().autocommit_block():
+        op.execute(sa.text("SET statement_timeout = 120000"))  # 120s
+        op.execute(sa.text("SET lock_timeout = 5000"))  # 5s
+
+        op.create_index(
+            "projects_last_serial_idx",
+            "projects",
+            ["last_serial"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    op.drop_index("projects_last_serial_idx", table_name="projects")
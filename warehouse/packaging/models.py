@@ -350,6 +350,7 @@ class Project(SitemapMixin, HasEvents, HasObservations, db.Model):
             func.ultranormalize_name(name),
         ),
         Index("projects_lifecycle_status_idx", "lifecycle_status"),
+        Index("projects_last_serial_idx", "last_serial"),
     )
 
     def __getitem__(self, version):
@@ -20,7 +20,7 @@ NameAnalyzer = analyzer(
 @doc_type
 class Project(Document):
     name = Text()
-    normalized_name = Text(analyzer=NameAnalyzer)
+    normalized_name = Text(analyzer=NameAnalyzer, fields={"keyword": Keyword()})
     summary = Text(analyzer="snowball")
     description = Text(analyzer="snowball")
     author = Text()
@@ -49,7 +49,11 @@ from warehouse.packaging.models import (
     Role,
 )
 from warehouse.packaging.tasks import typo_check_project_name
-from warehouse.rate_limiting import DummyRateLimiter, IRateLimiter
+from warehouse.rate_limiting import (
+    DummyRateLimiter,
+    IRateLimiter,
+    first_exceeded,
+)
 from warehouse.rate_limiting.headers import record_rate_limit
 from warehouse.utils.exceptions import DevelopmentModeWarning
 from warehouse.utils.project import PROJECT_NAME_RE
@@ -428,30 +432,13 @@ class ProjectService:
             partition_key="user",
         )
 
-        # First we want to check if a single IP is exceeding our rate limiter.
-        if request.remote_addr is not None and not self.ratelimiters[
-            "project.create.ip"
-        ].test(request.remote_addr):
-            logger.warning("IP failed project create threshold reached.")
-            self._metrics.increment(
-                "warehouse.project.create.ratelimited",
-                tags=["ratelimiter:ip"],
-            )
-            raise TooManyProjectsCreated(
-                resets_in=self.ratelimiters["project.create.ip"].resets_in(
-                    request.remote_addr
-                )
-            )
-
-        if not self.ratelimiters["project.create.user"].test(creator.id):
-            logger.warning("User failed project create threshold reached.")
-            self._metrics.increment(
-                "warehouse.project.create.ratelimited",
-                tags=["ratelimiter:user"],
-            )
-            raise TooManyProjectsCreated(
-                resets_in=self.ratelimiters["project.create.user"].resets_in(creator.id)
-            )
+        # Check the IP limiter and then the user limiter, in one go.
+        checks = self._ratelimit_checks(request, creator)
+        exceeded = first_exceeded(
+            (self.ratelimiters[name], (identifier,)) for name, identifier, *_ in checks
+        )
+        if exceeded is not None:
+            self._raise_ratelimited(checks[exceeded])
 
     def _hit_ratelimits(self, request, creator):
         # `.hit()` atomically increments and returns False when the limit is
@@ -459,30 +446,45 @@ class ProjectService:
         # in `_check_ratelimits` before any records a hit, so this atomic check
         # is what actually enforces the limit: a request that pushes a counter
         # past its limit is rejected here, rolling back the new project. The
-        # limiters are consulted in the same order as `_check_ratelimits`.
-        if request.remote_addr is not None and not self.ratelimiters[
-            "project.create.ip"
-        ].hit(request.remote_addr):
-            logger.warning("IP failed project create threshold reached.")
-            self._metrics.increment(
-                "warehouse.project.create.ratelimited",
-                tags=["ratelimiter:ip"],
-            )
-            raise TooManyProjectsCreated(
-                resets_in=self.ratelimiters["project.create.ip"].resets_in(
-                    request.remote_addr
+        # limiters are hit one at a time, in the same order as
+        # `_check_ratelimits`, so that a request which the IP limiter refuses
+        # doesn't use up one of the user's project creations as well.
+        for check in self._ratelimit_checks(request, creator):
+            name, identifier, *_ = check
+            if not self.ratelimiters[name].hit(identifier):
+                self._raise_ratelimited(check)
+
+    def _ratelimit_checks(self, request, creator):
+        checks = []
+        if request.remote_addr is not None:
+            checks.append(
+                (
+                    "project.create.ip",
+                    request.remote_addr,
+                    "ip",
+                    "IP failed project create threshold reached.",
                 )
             )
-
-        if not self.ratelimiters["project.create.user"].hit(creator.id):
-            logger.warning("User failed project create threshold reached.")
-            self._metrics.increment(
-                "warehouse.project.create.ratelimited",
-                tags=["ratelimiter:user"],
-            )
-            raise TooManyProjectsCreated(
-                resets_in=self.ratelimiters["project.create.user"].resets_in(creator.id)
+        checks.append(
+            (
+                "project.create.user",
+                creator.id,
+                "user",
+                "User failed project create threshold reached.",
             )
+        )
+        return checks
+
+    def _raise_ratelimited(self, check):
+        name, identifier, ratelimiter, message = check
+        logger.warning(message)
+        self._metrics.increment(
+            "warehouse.project.create.ratelimited",
+            tags=[f"ratelimiter:{ratelimiter}"],
+        )
+        raise TooManyProjectsCreated(
+            resets_in=self.ratelimiters[name].resets_in(identifier)
+        )
 
     def check_project_name(self, name: str) -> None:
         """
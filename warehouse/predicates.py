@@ -57,6 +57,34 @@ def auth_methods_for_route(route) -> frozenset[AuthenticationMethod] | None:
     return None
 
 
+class ReadReplicaPredicate:
+    """Storage-only route predicate marking a route whose views only read from
+    the database, so that ``request.db`` may be bound to the read replica.
+    Read off ``request.matched_route.predicates`` when the session is created.
+    Always matches; never affects route selection."""
+
+    def __init__(self, val, config):
+        self.val = bool(val)
+
+    def text(self):
+        return f"read_replica = {self.val}"
+
+    phash = text
+
+    def __call__(self, info, request):
+        return True
+
+
+def uses_read_replica(route) -> bool:
+    """Return whether a route has opted in to reading from the replica."""
+    if route is None:
+        return False
+    return any(
+        isinstance(predicate, ReadReplicaPredicate) and predicate.val
+        for predicate in route.predicates
+    )
+
+
 class HeadersPredicate:
     def __init__(self, val: list[str], config):
         if not val:
@@ -112,6 +140,7 @@ class ActiveOrganizationPredicate:
 def includeme(config):
     config.add_route_predicate("domain", DomainPredicate)
     config.add_route_predicate("auth_methods", AuthMethodsPredicate)
+    config.add_route_predicate("read_replica", ReadReplicaPredicate)
     config.add_view_predicate("require_headers", HeadersPredicate)
     config.add_view_predicate(
         "require_active_organization", ActiveOrganizationPredicate
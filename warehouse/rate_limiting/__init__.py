@@ -1,6 +1,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import functools
+import time
 
 from datetime import UTC, datetime
 
@@ -8,16 +9,63 @@ import redis
 import structlog
 
 from limits import parse_many
-from limits.storage import storage_from_string
+from limits.storage import RedisClusterStorage, RedisStorage, storage_from_string
 from limits.strategies import MovingWindowRateLimiter
 from more_itertools import first_true
 from zope.interface import implementer
 
 from warehouse.metrics import IMetricsService
+from warehouse.rate_limiting.buckets import TokenBuckets
 from warehouse.rate_limiting.interfaces import IRateLimiter, WindowStats
 
 logger = structlog.get_logger(__name__)
 
+# Tests, or when ARGV[2] is "1" hits, each of the moving windows in KEYS. They
+# are laid out the same way that limits lays out its own moving windows in
+# Redis (a list of timestamps, newest first, trimmed to the limit) so that the
+# rest of RateLimiter keeps working with them. ARGV[1] is the current time, and
+# each window then adds its limit, expiry, group and cost. Within a group (the
+# limits of one limiter) the windows after the first that is exceeded are
+# skipped, the same as calling MovingWindowRateLimiter.hit() for each limit in
+# turn.
+_MOVING_WINDOWS_SCRIPT = """
+local timestamp = tonumber(ARGV[1])
+local hit = ARGV[2] == "1"
+local exceeded = {}
+local results = {}
+
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[4 * i - 1])
+    local expiry = tonumber(ARGV[4 * i])
+    local group = ARGV[4 * i + 1]
+    local cost = tonumber(ARGV[4 * i + 2])
+    local allowed = 0
+    if not exceeded[group] then
+        local entry = cost <= limit and redis.call("lindex", key, limit - cost)
+        if cost > limit or (entry and tonumber(entry) >= timestamp - expiry) then
+            exceeded[group] = true
+        else
+            allowed = 1
+            if hit then
+                local entries = {}
+                for j = 1, cost do
+                    entries[j] = ARGV[1]
+                end
+                for j = 1, cost, 5000 do
+                    local last = math.min(j + 4999, cost)
+                    redis.call("lpush", key, unpack(entries, j, last))
+                end
+                redis.call("ltrim", key, 0, limit - 1)
+                redis.call("expire", key, expiry)
+            end
+        end
+    end
+    results[i] = allowed
+end
+
+return results
+"""
+
 
 def _return_on_exception(rvalue, *exceptions):
     def deco(fn):
@@ -37,9 +85,45 @@ def _return_on_exception(rvalue, *exceptions):
     return deco
 
 
+def _redis_storage(storage):
+    # Every key that a script touches has to live on the same node, which a
+    # cluster can't promise.
+    if isinstance(storage, RedisStorage) and not isinstance(
+        storage, RedisClusterStorage
+    ):
+        return storage
+    return None
+
+
+@functools.cache
+def _moving_windows_script(storage):
+    return storage.get_connection().register_script(_MOVING_WINDOWS_SCRIPT)
+
+
+def _evaluate(storage, checks, *, hit, costs=None):
+    if costs is None:
+        costs = [1] * len(checks)
+
+    keys = []
+    args = [time.time(), int(hit)]
+    owners = []
+    for index, (limiter, identifiers) in enumerate(checks):
+        key_identifiers = limiter._get_identifiers(identifiers)
+        for limit in limiter._limits:
+            keys.append(storage.prefixed_key(limit.key_for(*key_identifiers)))
+            args.extend([limit.amount, limit.get_expiry(), index, costs[index]])
+            owners.append(index)
+
+    allowed = [True] * len(checks)
+    results = _moving_windows_script(storage)(keys=keys, args=args)
+    for index, result in zip(owners, results, strict=True):
+        allowed[index] = allowed[index] and bool(result)
+    return allowed
+
+
 @implementer(IRateLimiter)
 class RateLimiter:
-    def __init__(self, storage, limit, *, identifiers=None, metrics):
+    def __init__(self, storage, limit, *, identifiers=None, metrics, buckets=None):
         if identifiers is None:
             identifiers = []
 
@@ -49,25 +133,91 @@ class RateLimiter:
         self._identifiers = identifiers
         self._metrics = metrics
 
+        # Only limits that are large enough to lease tokens from are worth
+        # pre-filtering, the rest always go to the storage.
+        self._lease_size = 0 if buckets is None else buckets.lease_size(self._limits)
+        self._buckets = buckets if self._lease_size else None
+
     def _get_identifiers(self, identifiers):
         return [str(i) for i in list(self._identifiers) + list(identifiers)]
 
-    @_return_on_exception(True, redis.RedisError)
-    def test(self, *identifiers):
+    def _bucket_key(self, identifiers):
+        return self._limits[0].key_for(*self._get_identifiers(identifiers))
+
+    def _lease_expires_in(self):
+        return min(limit.get_expiry() for limit in self._limits)
+
+    def _fill_bucket(self, identifiers, tokens, stats=None):
+        self._buckets.fill(
+            self._bucket_key(identifiers),
+            tokens,
+            expires_in=self._lease_expires_in(),
+            stats=stats,
+        )
+
+    def _refuse_lease(self, identifiers):
+        self._buckets.refuse(
+            self._bucket_key(identifiers), expires_in=self._lease_expires_in()
+        )
+
+    def _lease_cost(self, identifiers):
+        if self._buckets is None or not self._buckets.may_lease(
+            self._bucket_key(identifiers)
+        ):
+            return 1
+        return self._lease_size
+
+    def _test(self, identifiers):
+        if (storage := _redis_storage(self._storage)) is not None:
+            return all(_evaluate(storage, [(self, identifiers)], hit=False))
         return all(
             self._window.test(limit, *self._get_identifiers(identifiers))
             for limit in self._limits
         )
 
-    @_return_on_exception(True, redis.RedisError)
-    def hit(self, *identifiers):
+    def _hit(self, identifiers, cost=1):
+        if (storage := _redis_storage(self._storage)) is not None:
+            return all(
+                _evaluate(storage, [(self, identifiers)], hit=True, costs=[cost])
+            )
         return all(
-            self._window.hit(limit, *self._get_identifiers(identifiers))
+            self._window.hit(limit, *self._get_identifiers(identifiers), cost=cost)
             for limit in self._limits
         )
 
+    def _lease(self, identifiers):
+        if self._lease_cost(identifiers) == 1:
+            return False
+        if not self._hit(identifiers, cost=self._lease_size):
+            self._refuse_lease(identifiers)
+            return False
+        # This request uses the first of the leased tokens.
+        self._fill_bucket(
+            identifiers, self._lease_size - 1, stats=self._window_stats(identifiers)
+        )
+        return True
+
+    @_return_on_exception(True, redis.RedisError)
+    def test(self, *identifiers):
+        if self._buckets is not None and self._buckets.has_tokens(
+            self._bucket_key(identifiers)
+        ):
+            return True
+        return self._test(identifiers)
+
+    @_return_on_exception(True, redis.RedisError)
+    def hit(self, *identifiers):
+        if self._buckets is not None and (
+            self._buckets.take(self._bucket_key(identifiers))
+            or self._lease(identifiers)
+        ):
+            return True
+        return self._hit(identifiers)
+
     @_return_on_exception(None, redis.RedisError)
     def clear(self, *identifiers):
+        if self._buckets is not None:
+            self._buckets.drop(self._bucket_key(identifiers))
         for limit in self._limits:
             self._storage.clear(limit.key_for(*self._get_identifiers(identifiers)))
 
@@ -103,6 +253,14 @@ class RateLimiter:
 
     @_return_on_exception([], redis.RedisError)
     def get_window_stats(self, *identifiers):
+        if self._buckets is not None and (
+            (stats := self._buckets.window_stats(self._bucket_key(identifiers)))
+            is not None
+        ):
+            return stats
+        return self._window_stats(identifiers)
+
+    def _window_stats(self, identifiers):
         stats = []
         now = datetime.now(tz=UTC)
         for limit in self._limits:
@@ -140,6 +298,125 @@ class DummyRateLimiter:
         return []
 
 
+def _shared_redis_storage(limiters):
+    storages = {
+        limiter._storage if isinstance(limiter, RateLimiter) else None
+        for limiter in limiters
+    }
+    if len(storages) != 1:
+        return None
+    return _redis_storage(storages.pop())
+
+
+def _try_evaluate(storage, checks, *, hit, call, costs=None):
+    try:
+        return _evaluate(storage, checks, hit=hit, costs=costs)
+    except redis.RedisError as exc:
+        logger.warning("Error computing rate limits", error=repr(exc))
+        checks[0][0]._metrics.increment(
+            "warehouse.ratelimiter.error", tags=[f"call:{call}"]
+        )
+        return None
+
+
+def _bucket(limiter):
+    return limiter._buckets if isinstance(limiter, RateLimiter) else None
+
+
+def first_exceeded(checks):
+    """
+    Test each of ``checks``, pairs of a limiter and the identifiers to test it
+    with, and return the index of the first one that has been exceeded, or
+    None if none of them have.
+
+    When every limiter is backed by the same Redis storage, they are all tested
+    in a single round trip, otherwise each is tested in turn.
+    """
+    checks = [(limiter, tuple(identifiers)) for limiter, identifiers in checks]
+    storage = _shared_redis_storage(limiter for limiter, _ in checks)
+    if storage is None:
+        for index, (limiter, identifiers) in enumerate(checks):
+            if not limiter.test(*identifiers):
+                return index
+        return None
+
+    pending = [
+        index
+        for index, (limiter, identifiers) in enumerate(checks)
+        if (buckets := _bucket(limiter)) is None
+        or not buckets.has_tokens(limiter._bucket_key(identifiers))
+    ]
+    if not pending:
+        return None
+
+    results = _try_evaluate(
+        storage, [checks[i] for i in pending], hit=False, call="first_exceeded"
+    )
+    if results is None:
+        return None
+    return next((i for i, ok in zip(pending, results, strict=True) if not ok), None)
+
+
+def hit_all(checks):
+    """
+    Hit each of ``checks``, pairs of a limiter and the identifiers to hit it
+    with, and return whether each of them allowed the hit, the same as calling
+    ``hit()`` on each of them.
+
+    When every limiter is backed by the same Redis storage, they are all hit
+    in a single round trip, otherwise each is hit in turn.
+    """
+    checks = [(limiter, tuple(identifiers)) for limiter, identifiers in checks]
+    storage = _shared_redis_storage(limiter for limiter, _ in checks)
+    if storage is None:
+        return [limiter.hit(*identifiers) for limiter, identifiers in checks]
+
+    allowed = [True] * len(checks)
+    pending = [
+        index
+        for index, (limiter, identifiers) in enumerate(checks)
+        if (buckets := _bucket(limiter)) is None
+        or not buckets.take(limiter._bucket_key(identifiers))
+    ]
+    if not pending:
+        return allowed
+
+    # Limiters with a pre-filter lease their tokens in the same round trip, and
+    # those that can't lease as many are hit again for just this request.
+    costs = [checks[i][0]._lease_cost(checks[i][1]) for i in pending]
+    results = _try_evaluate(
+        storage,
+        [checks[i] for i in pending],
+        hit=True,
+        call="hit_all",
+        costs=costs,
+    )
+    if results is None:
+        return allowed
+
+    retry = []
+    for index, cost, ok in zip(pending, costs, results, strict=True):
+        limiter, identifiers = checks[index]
+        if cost == 1:
+            allowed[index] = ok
+        elif ok:
+            limiter._fill_bucket(identifiers, cost - 1)
+        else:
+            limiter._refuse_lease(identifiers)
+            retry.append(index)
+    if not retry:
+        return allowed
+
+    results = _try_evaluate(
+        storage, [checks[i] for i in retry], hit=True, call="hit_all"
+    )
+    if results is None:
+        return allowed
+    for index, ok in zip(retry, results, strict=True):
+        allowed[index] = ok
+    return allowed
+
+
 class RateLimit:
     def __init__(self, limit, identifiers=None, limiter_class=RateLimiter):
         self.limit = limit
@@ -152,6 +429,7 @@ class RateLimit:
             limit=self.limit,
             identifiers=self.identifiers,
             metrics=request.find_service(IMetricsService, context=None),
+            buckets=request.registry.get("ratelimiter.buckets"),
         )
 
     def __repr__(self):
@@ -185,4 +463,10 @@ def includeme(config):
     config.registry["ratelimiter.storage"] = storage_from_string(
         config.registry.settings["ratelimit.url"]
     )
+
+    # Optionally let each worker lease tokens from the rate limits, and hand
+    # them out without going to Redis.
+    local_fraction = float(config.registry.settings.get("ratelimit.local_fraction", 0))
+    if local_fraction:
+        config.registry["ratelimiter.buckets"] = TokenBuckets(fraction=local_fraction)
     config.add_tween("warehouse.rate_limiting.headers.rate_limit_headers_tween_factory")
@@ -0,0 +1,135 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import collections
+import dataclasses
+import threading
+import time
+
+from dataclasses import dataclass
+
+from warehouse.rate_limiting.interfaces import WindowStats
+
+# How long a worker may keep handing out the tokens that it has leased, in
+# seconds, unless the shortest limit that they were leased from is shorter.
+LEASE_TTL = 10
+
+# Leasing fewer tokens than this at once wouldn't save a round trip.
+MIN_LEASE = 2
+
+# How many leases each worker keeps, the least recently used are dropped.
+MAX_ENTRIES = 100_000
+
+
+@dataclass
+class _Lease:
+    tokens: int
+    leased_at: float
+    expires_at: float
+    stats: list[WindowStats] | None
+    refused: bool
+
+
+class TokenBuckets:
+    """
+    A per-worker pre-filter for the rate limits kept in Redis, so that a client
+    which is well below its limits doesn't cost a round trip to Redis for each
+    request.
+
+    Rather than hitting Redis once per request, a worker leases ``fraction`` of
+    the smallest of a limiter's limits at once, hitting the limits in Redis for
+    all of those tokens in one go, and then hands them out locally until they
+    run out or the lease expires. A client that is too close to its limits to
+    lease that many tokens is checked against Redis for every request, exactly
+    as without a pre-filter, until the refused lease expires.
+
+    Error bound: tokens are counted in Redis when they are leased rather than
+    when they're used, and each worker holds at most one lease per client, so
+    with ``N`` workers serving a client, a limit of ``amount`` admits at most
+    ``amount + N * fraction * amount`` requests in any one window. For the
+    same reason, up to ``N * fraction * amount`` leased tokens can go unused
+    before their lease expires, refusing a client that slightly early instead.
+    """
+
+    def __init__(self, *, fraction, ttl=LEASE_TTL, max_entries=MAX_ENTRIES):
+        self.fraction = fraction
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._leases = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def lease_size(self, limits):
+        size = int(min(limit.amount for limit in limits) * self.fraction)
+        return size if size >= MIN_LEASE else 0
+
+    def _get(self, key, now):
+        # Must be called with the lock held.
+        lease = self._leases.get(key)
+        if lease is None:
+            return None
+        if now >= lease.expires_at:
+            del self._leases[key]
+            return None
+        self._leases.move_to_end(key)
+        return lease
+
+    def has_tokens(self, key):
+        with self._lock:
+            lease = self._get(key, time.monotonic())
+            return lease is not None and lease.tokens > 0
+
+    def take(self, key):
+        with self._lock:
+            lease = self._get(key, time.monotonic())
+            if lease is None or lease.tokens <= 0:
+                return False
+            lease.tokens -= 1
+            return True
+
+    def may_lease(self, key):
+        with self._lock:
+            lease = self._get(key, time.monotonic())
+            return lease is None or not lease.refused
+
+    def fill(self, key, tokens, *, expires_in, stats=None):
+        self._store(key, tokens, expires_in=expires_in, stats=stats, refused=False)
+
+    def refuse(self, key, *, expires_in):
+        self._store(key, 0, expires_in=expires_in, stats=None, refused=True)
+
+    def _store(self, key, tokens, *, expires_in, stats, refused):
+        now = time.monotonic()
+        with self._lock:
+            self._leases[key] = _Lease(
+                tokens=tokens,
+                leased_at=now,
+                expires_at=now + min(self.ttl, expires_in),
+                stats=stats,
+                refused=refused,
+            )
+            self._leases.move_to_end(key)
+            while len(self._leases) > self.max_entries:
+                self._leases.popitem(last=False)
+
+    def window_stats(self, key):
+        """
+        The window stats from when the tokens for ``key`` were leased, brought
+        up to date with the tokens that haven't been handed out since.
+        """
+        now = time.monotonic()
+        with self._lock:
+            lease = self._get(key, now)
+            if lease is None or lease.stats is None:
+                return None
+            elapsed = int(now - lease.leased_at)
+            return [
+                dataclasses.replace(
+                    stats,
+                    remaining=min(stats.amount, stats.remaining + lease.tokens),
+                    resets_in_seconds=max(0, stats.resets_in_seconds - elapsed),
+                )
+                for stats in lease.stats
+            ]
+
+    def drop(self, key):
+        with self._lock:
+            self._leases.pop(key, None)
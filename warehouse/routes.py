@@ -25,8 +25,15 @@ def includeme(config):
     )
     config.add_route("security-txt", "/.well-known/security.txt", domain=warehouse)
     config.add_route("opensearch.xml", "/opensearch.xml", domain=warehouse)
-    config.add_route("index.sitemap.xml", "/sitemap.xml", domain=warehouse)
-    config.add_route("bucket.sitemap.xml", "/{bucket}.sitemap.xml", domain=warehouse)
+    config.add_route(
+        "index.sitemap.xml", "/sitemap.xml", read_replica=True, domain=warehouse
+    )
+    config.add_route(
+        "bucket.sitemap.xml",
+        "/{bucket}.sitemap.xml",
+        read_replica=True,
+        domain=warehouse,
+    )
 
     # Some static, template driven pages
     config.add_template_view(
@@ -152,6 +159,8 @@ def includeme(config):
 
     # Search Routes
     config.add_route("search", "/search/", domain=warehouse)
+    config.add_route("search.json", "/search/json", domain=warehouse)
+    config.add_route("search.suggest", "/search/suggest", domain=warehouse)
 
     # Stats Routes
     config.add_route("stats", "/stats/", accept="text/html", domain=warehouse)
@@ -601,13 +610,18 @@ def includeme(config):
     config.add_route("ses.hook", "/_/ses-hook/", domain=warehouse)
 
     # RSS
-    config.add_route("rss.updates", "/rss/updates.xml", domain=warehouse)
-    config.add_route("rss.packages", "/rss/packages.xml", domain=warehouse)
+    config.add_route(
+        "rss.updates", "/rss/updates.xml", read_replica=True, domain=warehouse
+    )
+    config.add_route(
+        "rss.packages", "/rss/packages.xml", read_replica=True, domain=warehouse
+    )
     config.add_route(
         "rss.project.releases",
         "/rss/project/{name}/releases.xml",
         factory="warehouse.packaging.models:ProjectFactory",
         traverse="/{name}/",
+        read_replica=True,
         domain=warehouse,
     )
 
@@ -630,12 +644,15 @@ def includeme(config):
 
     # API URLs
     config.add_route("api.billing.webhook", "/billing/webhook/", domain=warehouse)
-    config.add_route("api.simple.index", "/simple/", domain=warehouse)
+    config.add_route(
+        "api.simple.index", "/simple/", read_replica=True, domain=warehouse
+    )
     config.add_route(
         "api.simple.detail",
         "/simple/{name}/",
         factory="warehouse.packaging.models:ProjectFactory",
         traverse="/{name}/",
+        read_replica=True,
         domain=warehouse,
     )
 
@@ -691,12 +708,14 @@ def includeme(config):
         "legacy.api.json.project",
         "/pypi/{name}/json",
         factory="warehouse.legacy.api.json.latest_release_factory",
+        read_replica=True,
         domain=warehouse,
     )
     config.add_route(
         "legacy.api.json.project_slash",
         "/pypi/{name}/json/",
         factory="warehouse.legacy.api.json.latest_release_factory",
+        read_replica=True,
         domain=warehouse,
     )
 
@@ -704,12 +723,20 @@ def includeme(config):
         "legacy.api.json.release",
         "/pypi/{name}/{version}/json",
         factory="warehouse.legacy.api.json.release_factory",
+        read_replica=True,
         domain=warehouse,
     )
     config.add_route(
         "legacy.api.json.release_slash",
         "/pypi/{name}/{version}/json/",
         factory="warehouse.legacy.api.json.release_factory",
+        read_replica=True,
+        domain=warehouse,
+    )
+    config.add_route(
+        "legacy.api.json.serials",
+        "/pypi/json/serials",
+        read_replica=True,
         domain=warehouse,
     )
 
@@ -737,16 +764,25 @@ def includeme(config):
 
     # Legacy XMLRPC
     config.add_xmlrpc_endpoint(
-        "xmlrpc.pypi", pattern="/pypi", header="Content-Type:text/xml", domain=warehouse
+        "xmlrpc.pypi",
+        pattern="/pypi",
+        header="Content-Type:text/xml",
+        read_replica=True,
+        domain=warehouse,
     )
     config.add_xmlrpc_endpoint(
         "xmlrpc.pypi_slash",
         pattern="/pypi/",
         header="Content-Type:text/xml",
+        read_replica=True,
         domain=warehouse,
     )
     config.add_xmlrpc_endpoint(
-        "xmlrpc.RPC2", pattern="/RPC2", header="Content-Type:text/xml", domain=warehouse
+        "xmlrpc.RPC2",
+        pattern="/RPC2",
+        header="Content-Type:text/xml",
+        read_replica=True,
+        domain=warehouse,
     )
 
     # Legacy Documentation
@@ -14,6 +14,7 @@ from warehouse import db
 from warehouse.packaging.models import LifecycleStatus, Project, Release
 from warehouse.search.interfaces import ISearchService
 from warehouse.search.services import SearchService
+from warehouse.search.suggest import ProjectNameIndex
 from warehouse.search.tasks import reindex
 from warehouse.search.utils import get_index
 
@@ -111,6 +112,8 @@ def includeme(config):
     config.registry["opensearch.replicas"] = int(qs.get("replicas", ["0"])[0])
     config.add_request_method(opensearch, name="opensearch", reify=True)
 
+    config.registry["search.name_index"] = ProjectNameIndex()
+
     config.add_periodic_task(crontab(minute=0, hour=6), reindex)
 
     config.register_service_factory(SearchService.create_service, iface=ISearchService)
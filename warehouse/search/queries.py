@@ -94,6 +94,38 @@ def get_opensearch_query(opensearch, terms, order, classifiers):
     return query_for_order(query, order)
 
 
+def get_query_tags(terms, order, classifiers):
+    """
+    Returns metric tags describing the shape of the query which
+    ``get_opensearch_query`` builds from the same data.
+    """
+    if not terms:
+        query_type = "classifier_only" if classifiers else "match_all"
+    else:
+        quoted_string, unquoted_string = filter_query(terms)
+        if quoted_string and unquoted_string:
+            query_type = "mixed"
+        elif quoted_string:
+            query_type = "phrase"
+        else:
+            query_type = "best_fields"
+
+    # The order comes straight from the request, so only tag the ones we offer.
+    if order == "":
+        order_tag = "relevance"
+    elif order == "-created":
+        order_tag = "created"
+    else:
+        order_tag = "other"
+
+    return [
+        f"query_type:{query_type}",
+        f"prefix:{'true' if len(terms) > 1 else 'false'}",
+        f"classifiers:{'true' if classifiers else 'false'}",
+        f"order:{order_tag}",
+    ]
+
+
 def filter_query(s):
     """
     Filters given query with the below regex
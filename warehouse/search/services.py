@@ -1,9 +1,14 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import itertools
+
 from zope.interface import implementer
 
 from warehouse.search import interfaces, tasks
 
+# The maximum number of projects to (re|un)index in a single task.
+REINDEX_BATCH_SIZE = 500
+
 
 @implementer(interfaces.ISearchService)
 class SearchService:
@@ -14,13 +19,18 @@ class SearchService:
     def create_service(cls, context, request):
         return cls()
 
+    def _enqueue(self, config, projects):
+        names = sorted({project.normalized_name for project in projects})
+        for batch in itertools.batched(names, REINDEX_BATCH_SIZE, strict=False):
+            config.task(tasks.reindex_projects).delay(list(batch))
+
     def reindex(self, config, projects_to_update):
-        for project in projects_to_update:
-            config.task(tasks.reindex_project).delay(project.normalized_name)
+        self._enqueue(config, projects_to_update)
 
     def unindex(self, config, projects_to_delete):
-        for project in projects_to_delete:
-            config.task(tasks.unindex_project).delay(project.normalized_name)
+        # reindex_projects removes any project that can no longer be indexed, so
+        # unindexing is the same batched task.
+        self._enqueue(config, projects_to_delete)
 
 
 @implementer(interfaces.ISearchService)
@@ -0,0 +1,190 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import bisect
+import heapq
+import itertools
+import time
+
+from array import array
+
+from packaging.utils import canonicalize_name
+from sqlalchemy import func, or_, select
+
+from warehouse.packaging.models import JournalEntry, LifecycleStatus, Project
+from warehouse.utils.refresh import PeriodicallyRefreshed
+
+# How often to look for new journal entries, and how often to throw everything
+# away and load the names from scratch, in seconds. The full reload catches any
+# change that was not recorded in the journals.
+REFRESH_INTERVAL = 60
+RELOAD_INTERVAL = 60 * 60
+
+# The number of journal entries, or of pending additions and removals, past
+# which it's cheaper to rebuild the sorted names than to keep patching them.
+MAX_JOURNAL_ENTRIES = 10_000
+MAX_PENDING_CHANGES = 1_000
+
+
+def _visible():
+    return or_(
+        Project.lifecycle_status.notin_(
+            [LifecycleStatus.ArchivedNoindex, LifecycleStatus.QuarantineEnter]
+        ),
+        Project.lifecycle_status.is_(None),
+    )
+
+
+class _SortedNames:
+    """
+    An immutable, sorted sequence of names, stored as a single ``bytes`` blob
+    plus an array of offsets into it. This is several times smaller than a list
+    of ``str`` objects, and still supports ``bisect``.
+    """
+
+    def __init__(self, names):
+        self._blob = b"".join(names)
+        self._offsets = array("Q", [0])
+        self._offsets.extend(itertools.accumulate(len(name) for name in names))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        return self._blob[self._offsets[index] : self._offsets[index + 1]]
+
+    def __contains__(self, name):
+        index = bisect.bisect_left(self, name)
+        return index < len(self) and self[index] == name
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def startswith(self, prefix):
+        for index in range(bisect.bisect_left(self, prefix), len(self)):
+            name = self[index]
+            if not name.startswith(prefix):
+                break
+            yield name
+
+
+class _State:
+    def __init__(self, names, serial, *, added=(), removed=frozenset()):
+        self.names = names
+        self.serial = serial
+        self.added = added
+        self.removed = removed
+
+
+class ProjectNameIndex(PeriodicallyRefreshed):
+    """
+    An in-process index of every visible project's normalized name, used to
+    answer prefix lookups without a round trip to Postgres or OpenSearch.
+
+    The names are loaded from the database on first use, and then kept up to
+    date from the journals. Changes since the last full load are kept to one
+    side in a small sorted list of additions and a set of removals, which are
+    folded into the sorted names once they grow past ``MAX_PENDING_CHANGES``.
+    """
+
+    refresh_interval = REFRESH_INTERVAL
+
+    def __init__(self):
+        super().__init__()
+        self._state = None
+        self._loaded_at = None
+
+    def _is_loaded(self):
+        return self._state is not None
+
+    def _refresh(self, db, now):
+        if self._state is None or now - self._loaded_at >= RELOAD_INTERVAL:
+            self._load(db)
+        else:
+            self._update(db)
+
+    def _load(self, db):
+        # Get the serial first, so that we will reapply (rather than miss) any
+        # change made while we are loading the names.
+        serial = db.scalar(select(func.max(JournalEntry.id))) or 0
+        names = db.scalars(select(Project.normalized_name).where(_visible()))
+        self._state = _State(
+            _SortedNames(sorted(name.encode("utf8") for name in names)), serial
+        )
+        self._loaded_at = time.monotonic()
+
+    def _update(self, db):
+        state = self._state
+        entries = db.execute(
+            select(JournalEntry.id, JournalEntry.name)
+            .where(JournalEntry.id > state.serial)
+            .order_by(JournalEntry.id)
+            .limit(MAX_JOURNAL_ENTRIES + 1)
+        ).all()
+        if not entries:
+            return
+        if len(entries) > MAX_JOURNAL_ENTRIES:
+            self._load(db)
+            return
+
+        changed = {canonicalize_name(name) for _, name in entries if name}
+        present = set(
+            db.scalars(
+                select(Project.normalized_name).where(
+                    Project.normalized_name.in_(changed), _visible()
+                )
+            )
+        )
+
+        added = list(state.added)
+        removed = set(state.removed)
+        for name in changed:
+            encoded = name.encode("utf8")
+            index = bisect.bisect_left(added, encoded)
+            in_added = index < len(added) and added[index] == encoded
+            if name in present:
+                removed.discard(encoded)
+                if not in_added and encoded not in state.names:
+                    added.insert(index, encoded)
+            else:
+                if in_added:
+                    del added[index]
+                if encoded in state.names:
+                    removed.add(encoded)
+
+        serial = entries[-1].id
+        if len(added) + len(removed) > MAX_PENDING_CHANGES:
+            names = heapq.merge(
+                (name for name in state.names if name not in removed), added
+            )
+            self._state = _State(_SortedNames(list(names)), serial)
+        else:
+            self._state = _State(
+                state.names, serial, added=tuple(added), removed=frozenset(removed)
+            )
+
+    def suggest(self, prefix, limit=10):
+        state = self._state
+        if state is None:
+            raise RuntimeError("Cannot suggest names before a refresh.")
+
+        prefix = prefix.encode("utf8")
+        from_names = itertools.islice(
+            (
+                name
+                for name in state.names.startswith(prefix)
+                if name not in state.removed
+            ),
+            limit,
+        )
+        from_added = itertools.islice(
+            itertools.takewhile(
+                lambda name: name.startswith(prefix),
+                state.added[bisect.bisect_left(state.added, prefix) :],
+            ),
+            limit,
+        )
+
+        return [
+            name.decode("utf8")
+            for name in itertools.islice(heapq.merge(from_names, from_added), limit)
+        ]
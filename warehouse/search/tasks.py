@@ -30,7 +30,9 @@ from warehouse.packaging.search import Project as ProjectDocument
 from warehouse.search.utils import get_index
 
 
-def _project_docs(db, project_name: str | None = None):
+def _project_docs(
+    db, project_name: str | None = None, normalized_names: list[str] | None = None
+):
     classifiers_subquery = (
         select(func.array_agg(Classifier.classifier))
         .select_from(ReleaseClassifiers)
@@ -66,6 +68,12 @@ def _project_docs(db, project_name: str | None = None):
             Release.files.any(),
             # Filter by project_name if provided
             Project.name == project_name if project_name else text("TRUE"),
+            # Filter by a batch of normalized names if provided
+            (
+                Project.normalized_name.in_(normalized_names)
+                if normalized_names is not None
+                else text("TRUE")
+            ),
             # Don't index archived/quarantined projects
             or_(
                 Project.lifecycle_status.notin_(
@@ -237,6 +245,41 @@ def reindex_project(self, request, project_name):
         raise self.retry(countdown=60, exc=exc)
 
 
+@tasks.task(bind=True, ignore_result=True, acks_late=True)
+def reindex_projects(self, request, normalized_names):
+    """
+    Reindex a batch of projects with a single bulk request, removing any of them
+    which no longer have an indexable release from the index.
+    """
+    r = redis.StrictRedis.from_url(request.registry.settings["celery.scheduler_url"])
+    try:
+        with SearchLock(r, timeout=60, blocking_timeout=1):
+            client = request.registry["opensearch.client"]
+            index_name = request.registry["opensearch.index"]
+
+            def actions():
+                indexed = set()
+                for doc in _project_docs(
+                    request.db, normalized_names=list(normalized_names)
+                ):
+                    indexed.add(doc["_id"])
+                    yield doc
+
+                # Anything that we were asked to reindex, but which didn't come
+                # back from the database, has been deleted, archived or
+                # quarantined and so should no longer be in the index.
+                for name in sorted(set(normalized_names) - indexed):
+                    yield {"_op_type": "delete", "_id": name}
+
+            for _ in parallel_bulk(
+                client, actions(), index=index_name, ignore_status=(404,)
+            ):
+                pass
+    except redis.exceptions.LockError as exc:
+        sentry_sdk.capture_exception(exc)
+        raise self.retry(countdown=60, exc=exc)
+
+
 @tasks.task(bind=True, ignore_result=True, acks_late=True)
 def unindex_project(self, request, project_name):
     r = redis.StrictRedis.from_url(request.registry.settings["celery.scheduler_url"])
@@ -18,6 +18,11 @@ from warehouse.cache.http import add_vary
 from warehouse.utils import crypto, otp, webauthn
 from warehouse.utils.msgpack import object_encode
 
+# The size of each worker's pool of connections to Redis, and how long to wait
+# for a free connection in seconds, unless configured otherwise.
+DEFAULT_MAX_CONNECTIONS = 50
+DEFAULT_POOL_TIMEOUT = 20
+
 
 def _invalid_method(method):
     @functools.wraps(method)
@@ -60,15 +65,22 @@ class InvalidSession(dict):
         self._error_message()
 
 
-def _changed_method(method):
+def _loaded_method(method):
     @functools.wraps(method)
     def wrapped(self, *args, **kwargs):
-        self.changed()
+        self._load()
         return method(self, *args, **kwargs)
 
     return wrapped
 
 
+# Values of these types can be compared by equality to tell whether setting a
+# key has changed it, anything else might have been mutated in place.
+_IMMUTABLE_TYPES = (str, bytes, int, float, type(None))
+
+_MISSING = object()
+
+
 @implementer(ISession)
 class Session(dict):
     _csrf_token_key = "_csrf_token"  # noqa: S105
@@ -78,17 +90,23 @@ class Session(dict):
     _reauth_timestamp_key = "_reauth_timestamp"
     _password_timestamp_key = "_password_timestamp"  # noqa: S105
 
-    # A number of our methods need to be decorated so that they also call
-    # self.changed()
-    __delitem__ = _changed_method(dict.__delitem__)
-    __setitem__ = _changed_method(dict.__setitem__)
-    clear = _changed_method(dict.clear)
-    pop = _changed_method(dict.pop)
-    popitem = _changed_method(dict.popitem)
-    setdefault = _changed_method(dict.setdefault)
-    update = _changed_method(dict.update)
-
-    def __init__(self, data=None, session_id=None, new=True):
+    # Reading the session needs its data to have been loaded from Redis first.
+    __contains__ = _loaded_method(dict.__contains__)
+    __eq__ = _loaded_method(dict.__eq__)
+    __getitem__ = _loaded_method(dict.__getitem__)
+    __iter__ = _loaded_method(dict.__iter__)
+    __len__ = _loaded_method(dict.__len__)
+    __ne__ = _loaded_method(dict.__ne__)
+    __repr__ = _loaded_method(dict.__repr__)
+    copy = _loaded_method(dict.copy)
+    get = _loaded_method(dict.get)
+    items = _loaded_method(dict.items)
+    keys = _loaded_method(dict.keys)
+    values = _loaded_method(dict.values)
+
+    def __init__(
+        self, data=None, session_id=None, new=True, *, loader=None, stale=False
+    ):
         # Brand new sessions don't have any data, so we'll just create an empty
         # dictionary for them.
         if data is None:
@@ -97,29 +115,104 @@ class Session(dict):
         # Initialize our actual dictionary here.
         super().__init__(data)
 
-        # We need to track the state of our Session.
+        # Existing sessions are only loaded when they're first used, by calling
+        # the loader, which returns None if there is no longer any such session.
+        self._loader = loader
+
+        # We need to track the state of our Session, including which keys have
+        # been changed, so that we only save it when something has.
         self._sid = session_id
         self._changed = False
-        self.new = new
+        self._changed_keys = set()
+        self._new = new
         self.created = int(time.time())
 
+        # Whether it's been long enough since the session was saved that it
+        # should be kept alive, even if it hasn't changed.
+        self._stale = stale
+
         # We'll track all of the IDs that have been invalidated here
         self.invalidated = set()
 
+    def _load(self):
+        if self._loader is None:
+            return
+
+        loader, self._loader = self._loader, None
+        data = loader()
+        if data is None:
+            # The session has expired or is invalid, so start a new one instead.
+            self._sid = None
+            self._new = True
+        else:
+            dict.update(self, data)
+
+    @property
+    def new(self):
+        self._load()
+        return self._new
+
     @property
     def sid(self):
+        self._load()
         if self._sid is None:
             self._sid = crypto.random_token()
         return self._sid
 
     def changed(self):
+        self._load()
         self._changed = True
 
+    def __setitem__(self, key, value):
+        self._load()
+        current = dict.get(self, key, _MISSING)
+        if current != value or (
+            current is value and not isinstance(value, _IMMUTABLE_TYPES)
+        ):
+            self._changed_keys.add(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._load()
+        dict.__delitem__(self, key)
+        self._changed_keys.add(key)
+
+    def clear(self):
+        self._load()
+        self._changed_keys.update(dict.keys(self))
+        dict.clear(self)
+
+    def pop(self, key, *args):
+        self._load()
+        if dict.__contains__(self, key):
+            self._changed_keys.add(key)
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        self._load()
+        key, value = dict.popitem(self)
+        self._changed_keys.add(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        # The value we return may be mutated in place, so the key has to be
+        # assumed to have changed even if it was already set.
+        self._load()
+        self._changed_keys.add(key)
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
     def invalidate(self):
-        self.clear()
-        self.new = True
+        # The existing data is being thrown away, so there's no need to load it.
+        dict.clear(self)
+        self._loader = None
+        self._new = True
         self.created = int(time.time())
         self._changed = False
+        self._changed_keys = set()
 
         # If the current session id isn't None we'll want to record it as one
         # of the ones that have been invalidated.
@@ -128,7 +221,12 @@ class Session(dict):
             self._sid = None
 
     def should_save(self):
-        return self._changed
+        return self._changed or bool(self._changed_keys)
+
+    def should_refresh(self):
+        # There's no need to load a session just to keep it alive, if it isn't
+        # used then it can wait for a later request.
+        return self._stale and self._loader is None and not self._new
 
     def record_auth_timestamp(self):
         self[self._reauth_timestamp_key] = datetime.datetime.now().timestamp()
@@ -217,9 +315,25 @@ class Session(dict):
 class SessionFactory:
     cookie_name = "session_id"
     max_age = 12 * 60 * 60  # 12 hours
-
-    def __init__(self, secret, url):
-        self.redis = redis.StrictRedis.from_url(url)
+    # How long an unchanged session goes without being saved before we extend
+    # its lifetime, which means it may expire up to this much before max_age.
+    refresh_interval = 60 * 60  # 1 hour
+
+    def __init__(
+        self,
+        secret,
+        url,
+        *,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+        pool_timeout=DEFAULT_POOL_TIMEOUT,
+    ):
+        # Every thread in a worker shares one pool of connections, waiting for
+        # one to be free rather than opening more than max_connections.
+        self.redis = redis.StrictRedis(
+            connection_pool=redis.BlockingConnectionPool.from_url(
+                url, max_connections=max_connections, timeout=pool_timeout
+            )
+        )
         self.signer = crypto.TimestampSigner(secret, salt="session")
 
     def __call__(self, request):
@@ -228,6 +342,22 @@ class SessionFactory:
     def _redis_key(self, session_id):
         return f"warehouse/session/data/{session_id}"
 
+    def _load(self, session_id):
+        # Fetch the serialized data from redis
+        bdata = self.redis.get(self._redis_key(session_id))
+
+        # If the session didn't exist in redis, we'll give the user a new
+        # session.
+        if bdata is None:
+            return None
+
+        # De-serialize our session data
+        try:
+            return msgpack.unpackb(bdata, raw=False, use_list=True)
+        except msgpack.exceptions.UnpackException, msgpack.exceptions.ExtraData:
+            # If the session data was invalid we'll give the user a new session
+            return None
+
     def _process_request(self, request):
         # Register a callback with the request so we can save the session once
         # it's finished.
@@ -243,29 +373,21 @@ class SessionFactory:
 
         # Check to make sure we have a valid session id
         try:
-            session_id = self.signer.unsign(session_id, max_age=self.max_age)
+            session_id, signed = self.signer.unsign(
+                session_id, max_age=self.max_age, return_timestamp=True
+            )
             session_id = session_id.decode("utf8")
         except crypto.BadSignature:
             return Session()
 
-        # Fetch the serialized data from redis
-        bdata = self.redis.get(self._redis_key(session_id))
-
-        # If the session didn't exist in redis, we'll give the user a new
-        # session.
-        if bdata is None:
-            return Session()
-
-        # De-serialize our session data
-        try:
-            data = msgpack.unpackb(bdata, raw=False, use_list=True)
-        except msgpack.exceptions.UnpackException, msgpack.exceptions.ExtraData:
-            # If the session data was invalid we'll give the user a new session
-            return Session()
-
-        # If we were able to load existing session data, load it into a
-        # Session class
-        return Session(data, session_id, False)
+        # The session's data isn't fetched from Redis until it is used, since
+        # many requests only need the session to throw it away.
+        return Session(
+            session_id=session_id,
+            new=False,
+            loader=functools.partial(self._load, session_id),
+            stale=time.time() - signed.timestamp() >= self.refresh_interval,
+        )
 
     def _process_response(self, request, response):
         # If the request has an InvalidSession, then the view can't have
@@ -273,29 +395,33 @@ class SessionFactory:
         if isinstance(request.session, InvalidSession):
             return
 
-        # Check to see if the session has been marked to be deleted, if it has
-        # benn then we'll delete it, and tell our response to delete the
-        # session cookie as well.
-        if request.session.invalidated:
-            for session_id in request.session.invalidated:
-                self.redis.delete(self._redis_key(session_id))
-
-            if not request.session.should_save():
-                response.delete_cookie(self.cookie_name)
-
-        # Check to see if the session has been marked to be saved, generally
-        # this means that the session data has been modified and thus we need
-        # to store the new data.
-        if request.session.should_save():
-            # Save our session in Redis
-            self.redis.setex(
-                self._redis_key(request.session.sid),
-                self.max_age,
-                msgpack.packb(
-                    request.session, default=object_encode, use_bin_type=True
-                ),
-            )
+        should_save = request.session.should_save()
+        should_refresh = not should_save and request.session.should_refresh()
 
+        # Delete any sessions which have been invalidated, and save or extend
+        # the lifetime of the current one, all in a single round trip.
+        if request.session.invalidated or should_save or should_refresh:
+            pipeline = self.redis.pipeline()
+            for session_id in request.session.invalidated:
+                pipeline.delete(self._redis_key(session_id))
+            if should_save:
+                pipeline.setex(
+                    self._redis_key(request.session.sid),
+                    self.max_age,
+                    msgpack.packb(
+                        request.session, default=object_encode, use_bin_type=True
+                    ),
+                )
+            elif should_refresh:
+                pipeline.expire(self._redis_key(request.session.sid), self.max_age)
+            pipeline.execute()
+
+        # If the session has been invalidated, and there's no new one to replace
+        # it, tell our response to delete the session cookie as well.
+        if request.session.invalidated and not should_save:
+            response.delete_cookie(self.cookie_name)
+
+        if should_save or should_refresh:
             # Send our session cookie to the client
             # NOTE: The lack of a max_age here. This sends the cookie with:
             #  > Expires: Session
@@ -367,10 +493,15 @@ session_view.options = {"uses_session"}  # type: ignore[attr-defined]
 
 
 def includeme(config):
+    settings = config.registry.settings
     config.set_session_factory(
         SessionFactory(
-            config.registry.settings["sessions.secret"],
-            config.registry.settings["sessions.url"],
+            settings["sessions.secret"],
+            settings["sessions.url"],
+            max_connections=settings.get(
+                "sessions.max_connections", DEFAULT_MAX_CONNECTIONS
+            ),
+            pool_timeout=settings.get("sessions.pool_timeout", DEFAULT_POOL_TIMEOUT),
         )
     )
 
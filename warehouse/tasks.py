@@ -2,19 +2,26 @@
 
 from __future__ import annotations
 
+import contextlib
 import functools
 import hashlib
+import os
+import tempfile
+import threading
 import time
 import typing
 import urllib.parse
 
+from datetime import UTC, datetime
 from typing import Self
 
 import celery
 import celery.app.backends
 import celery.backends.redis
 import pyramid.scripting
+import pyramid.threadlocal
 import pyramid_retry
+import redis
 import structlog
 import transaction
 import venusian
@@ -24,12 +31,29 @@ from kombu import Queue
 from pyramid.threadlocal import get_current_request
 
 from warehouse.config import Environment
+from warehouse.db import count_queries
 from warehouse.metrics import IMetricsService
+from warehouse.utils.profiling import SamplingProfiler
 
 if typing.TYPE_CHECKING:
     from pyramid.config import Configurator
     from pyramid.request import Request
 
+logger = structlog.get_logger(__name__)
+
+# How often the stack of a task that is being profiled is sampled, in seconds.
+DEFAULT_PROFILE_INTERVAL = 0.01
+
+# How long a worker keeps what it read of a task's profiling flag, in seconds.
+PROFILE_FLAG_TTL = 30
+
+# A task is profiled while the Redis key made of this and its name exists.
+PROFILE_FLAG_KEY = "warehouse.tasks.profile:"
+
+# Where profiles are kept in the simple storage, which no project's normalized
+# name can start with.
+PROFILE_STORAGE_PREFIX = "_task-profiles/"
+
 # We need to trick Celery into supporting rediss:// URLs which is how redis-py
 # signals that you should use Redis with TLS.
 celery.app.backends.BACKEND_ALIASES["rediss"] = "warehouse.tasks:TLSRedisBackend"
@@ -52,6 +76,229 @@ class TLSRedisBackend(celery.backends.redis.RedisBackend):
         return params
 
 
+class _TaskRequestEnvironment:
+    """
+    The request handed to each task that a worker thread runs, which is built
+    with ``pyramid.scripting.prepare`` once, rather than once per task, and put
+    back the way that it was built before each task, so that nothing a task
+    left on it (a database session, a reified property, finished callbacks) is
+    seen by the next.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.in_use = False
+
+        env = pyramid.scripting.prepare(registry=registry)
+        # Only pops the threadlocals, nothing has used the request yet.
+        env["closer"]()
+
+        request = env["request"]
+        request.remote_addr = "127.0.0.1"
+        request.remote_addr_hashed = hashlib.sha256(
+            ("127.0.0.1" + registry.settings["warehouse.ip_salt"]).encode("utf8")
+        ).hexdigest()
+        self.request = request
+        # The closer has already reified the finished callbacks, which have to
+        # be left out so that each task gets its own, rather than sharing one.
+        self._attributes = {
+            name: value
+            for name, value in request.__dict__.items()
+            if name not in {"finished_callbacks", "response_callbacks"}
+        }
+        self._environ = dict(request.environ)
+
+    def begin(self, task):
+        request = self.request
+        request.__dict__.clear()
+        request.__dict__.update(self._attributes)
+        request.__dict__["environ"] = dict(self._environ)
+        request.tm = transaction.TransactionManager(explicit=True)
+        request.timings = {"new_request_start": time.time() * 1000}
+        request.task_name = task.name
+
+        pyramid.threadlocal.manager.push(
+            {"registry": self.registry, "request": request}
+        )
+        self.in_use = True
+        return {"request": request, "closer": self.end}
+
+    def end(self):
+        pyramid.threadlocal.manager.pop()
+        self.in_use = False
+
+
+# Each worker thread's _TaskRequestEnvironment.
+_local = threading.local()
+
+
+class TaskProfiler:
+    """
+    Opt-in sampling profiles of individual tasks, for the tasks that are named
+    in the ``tasks.profiling.tasks`` setting, and for those whose flag is set
+    in Redis, for instance for an hour:
+
+        SET warehouse.tasks.profile:warehouse.search.tasks.reindex 1 EX 3600
+
+    Each profile is written in the collapsed stack format, to the
+    ``tasks.profiling.directory`` if there is one and to the simple storage
+    otherwise, where it's as readable as anything else that is stored there.
+    """
+
+    def __init__(
+        self,
+        *,
+        tasks=(),
+        redis=None,
+        interval=DEFAULT_PROFILE_INTERVAL,
+        directory=None,
+        flag_ttl=PROFILE_FLAG_TTL,
+    ):
+        self.tasks = frozenset(tasks)
+        self.redis = redis
+        self.interval = interval
+        self.directory = directory
+        self.flag_ttl = flag_ttl
+        self._flags = {}
+        self._lock = threading.Lock()
+
+    def enabled_for(self, name):
+        if name in self.tasks:
+            return True
+        if self.redis is None:
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            flag = self._flags.get(name)
+            if flag is not None and now < flag[1]:
+                return flag[0]
+
+        try:
+            enabled = bool(self.redis.exists(PROFILE_FLAG_KEY + name))
+        except redis.RedisError:
+            # Profiling is never worth failing, or slowing down, a task over,
+            # so an unreachable Redis leaves it off until the flag is re-read.
+            enabled = False
+
+        with self._lock:
+            self._flags[name] = (enabled, now + self.flag_ttl)
+        return enabled
+
+    def save(self, request, name, sampler, stats):
+        path = f"{name}/{datetime.now(UTC):%Y%m%dT%H%M%S}-{request.id}.collapsed"
+        profile = sampler.collapsed().encode("utf-8")
+
+        if self.directory is not None:
+            path = os.path.join(self.directory, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(profile)
+        else:
+            # Importing warehouse.packaging imports its tasks, which need this
+            # module to have been imported first.
+            from warehouse.packaging.interfaces import ISimpleStorage  # noqa: PLC0415
+
+            path = PROFILE_STORAGE_PREFIX + path
+            storage = request.find_service(ISimpleStorage)
+            with tempfile.NamedTemporaryFile() as f:
+                f.write(profile)
+                f.flush()
+                storage.store(path, f.name, meta={"task": name})
+
+        logger.info(
+            "task_profiled",
+            task_name=name,
+            path=path,
+            samples=sampler.samples.total(),
+            duration_ms=round(sampler.duration * 1000, 3),
+            db_time_ms=round(stats.duration * 1000, 3),
+            queries=stats.count,
+        )
+
+
+@contextlib.contextmanager
+def _task_timings(request, name, metrics, tags):
+    """
+    Split the time that a task takes between waiting on the database and the
+    rest, and profile the task if that has been enabled for it.
+    """
+    profiler = request.registry.get("tasks.profiler")
+    sampler = None
+    if profiler is not None and profiler.enabled_for(name):
+        sampler = SamplingProfiler(interval=profiler.interval)
+        sampler.start()
+
+    started = time.perf_counter()
+    with count_queries() as stats:
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.timing("warehouse.task.db_time", stats.duration * 1000, tags=tags)
+            metrics.timing(
+                "warehouse.task.python_time",
+                (elapsed - stats.duration) * 1000,
+                tags=tags,
+            )
+
+            if sampler is not None:
+                sampler.stop()
+                try:
+                    profiler.save(request, name, sampler, stats)
+                except Exception:
+                    logger.exception("task_profile_failed", task_name=name)
+
+
+class _TaskBatch:
+    """
+    The tasks sent during one transaction, which are published together once it
+    has committed, over a single connection to the broker, rather than each
+    with its own after commit hook and its own trip to the broker's connection
+    pool.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.messages = []
+
+    @classmethod
+    def for_request(cls, request) -> _TaskBatch:
+        txn = request.tm.get()
+        try:
+            return txn.data(cls)
+        except KeyError:
+            batch = cls(request.find_service(IMetricsService, context=None))
+            txn.set_data(cls, batch)
+            txn.addAfterCommitHook(batch.publish)
+            return batch
+
+    def add(self, task, args, kwargs):
+        self.messages.append((task, args, kwargs))
+
+    def publish(self, success):
+        # Only send the tasks if the transaction was successful.
+        if not success:
+            return
+
+        self.metrics.histogram("warehouse.task.batch_size", len(self.messages))
+        with self.messages[0][0].app.producer_or_acquire() as producer:
+            # A task which is sent by another after commit hook while this one
+            # is publishing is appended to, and published with, this batch.
+            for task, args, kwargs in self.messages:
+                try:
+                    celery.Task.apply_async(
+                        task, *args, **{"producer": producer, **kwargs}
+                    )
+                except Exception:
+                    # Like a failing after commit hook, this shouldn't stop the
+                    # rest of the batch from being sent.
+                    logger.exception("task_publish_failed", task_name=task.name)
+                    self.metrics.increment(
+                        "warehouse.task.publish_failed", tags=[f"task:{task.name}"]
+                    )
+
+
 class WarehouseTask(celery.Task):
     """
     A custom Celery Task that integrates with Pyramid's transaction manager and
@@ -80,7 +327,11 @@ class WarehouseTask(celery.Task):
             metrics = request.find_service(IMetricsService, context=None)
             metric_tags = [f"task:{obj.name}"]
 
-            with request.tm, metrics.timed("warehouse.task.run", tags=metric_tags):
+            with (
+                _task_timings(request, obj.name, metrics, metric_tags),
+                request.tm,
+                metrics.timed("warehouse.task.run", tags=metric_tags),
+            ):
                 metrics.increment("warehouse.task.start", tags=metric_tags)
                 try:
                     result = original_run(*args, **kwargs)
@@ -114,8 +365,8 @@ class WarehouseTask(celery.Task):
         Get a request object to use for this task.
 
         This will either return the request object that was injected into the
-        task when it was called, or it will create a new request object to use
-        for the task.
+        task when it was called, or it will reset this worker thread's request
+        object for the task.
 
         Note: The `type: ignore` comments are necessary because the `pyramid_env`
         attribute is not defined on the request object, but we're adding it
@@ -123,13 +374,14 @@ class WarehouseTask(celery.Task):
         """
         if not hasattr(self.request, "pyramid_env"):
             registry = self.app.pyramid_config.registry  # type: ignore[attr-defined]
-            env = pyramid.scripting.prepare(registry=registry)
-            env["request"].tm = transaction.TransactionManager(explicit=True)
-            env["request"].timings = {"new_request_start": time.time() * 1000}
-            env["request"].remote_addr = "127.0.0.1"
-            env["request"].remote_addr_hashed = hashlib.sha256(
-                ("127.0.0.1" + registry.settings["warehouse.ip_salt"]).encode("utf8")
-            ).hexdigest()
+            environment = getattr(_local, "environment", None)
+            if environment is None or environment.registry is not registry:
+                environment = _local.environment = _TaskRequestEnvironment(registry)
+            if environment.in_use:
+                # This task was called directly from within another task, which
+                # is still using this thread's request.
+                environment = _TaskRequestEnvironment(registry)
+            env = environment.begin(self)
             # The request id joins the task_id/task_name bound at prerun, and
             # is cleared with them at postrun.
             structlog.contextvars.bind_contextvars(**{"request.id": env["request"].id})
@@ -144,13 +396,17 @@ class WarehouseTask(celery.Task):
         """
         if hasattr(self.request, "pyramid_env"):
             pyramid_env = self.request.pyramid_env
-            pyramid_env["request"]._process_finished_callbacks()
-            pyramid_env["closer"]()
+            try:
+                pyramid_env["request"]._process_finished_callbacks()
+            finally:
+                # Otherwise this thread's request would be left in use, and
+                # every later task would build a request of its own.
+                pyramid_env["closer"]()
 
     def apply_async(self, *args, **kwargs):
         """
-        Override the apply_async method to add an after commit hook to the
-        transaction manager to send the task after the transaction has been
+        Override the apply_async method to queue the task in the batch of tasks
+        that is sent by an after commit hook once the transaction has been
         committed.
 
         This is necessary because we want to ensure that the task is only sent
@@ -171,9 +427,7 @@ class WarehouseTask(celery.Task):
         # we're no longer going to be returning an async result from this when
         # called from within a request, response cycle. Ideally we shouldn't be
         # waiting for responses in a request/response cycle anyways though.
-        request.tm.get().addAfterCommitHook(
-            self._after_commit_hook, args=args, kws=kwargs
-        )
+        _TaskBatch.for_request(request).add(self, args, kwargs)
 
         return None
 
@@ -189,14 +443,6 @@ class WarehouseTask(celery.Task):
         metrics.increment("warehouse.task.retried", tags=[f"task:{self.name}"])
         return super().retry(*args, **kwargs)
 
-    def _after_commit_hook(self, success, *args, **kwargs):
-        """
-        This is the hook that gets called after the transaction has been
-        committed. We'll only send the task if the transaction was successful.
-        """
-        if success:
-            super().apply_async(*args, **kwargs)
-
 
 def task(**kwargs):
     """
@@ -321,6 +567,18 @@ def includeme(config: Configurator) -> None:
     config.registry["celery.app"].Task = WarehouseTask
     config.registry["celery.app"].pyramid_config = config
 
+    # Optionally profile the tasks named in the settings, or flagged in Redis.
+    profiled_tasks = s.get("tasks.profiling.tasks", [])
+    profiling_url = s.get("tasks.profiling.url")
+    if profiled_tasks or profiling_url:
+        interval = s.get("tasks.profiling.interval")
+        config.registry["tasks.profiler"] = TaskProfiler(
+            tasks=profiled_tasks,
+            redis=redis.StrictRedis.from_url(profiling_url) if profiling_url else None,
+            interval=DEFAULT_PROFILE_INTERVAL if interval is None else interval / 1000,
+            directory=s.get("tasks.profiling.directory"),
+        )
+
     signals.task_prerun.connect(on_task_prerun)
     signals.task_postrun.connect(on_task_postrun)
 
@@ -1,7 +1,17 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import base64
+import binascii
+import json
+
 from paginate import Page
 
+# A sort clause that is unique per document, appended to every cursor-paginated
+# query so that ``search_after`` has a total, stable ordering to resume from.
+SEARCH_AFTER_TIEBREAKER = {
+    "normalized_name.keyword": {"order": "asc", "unmapped_type": "keyword"}
+}
+
 
 class _OpenSearchWrapper:
     max_results = 10000
@@ -50,6 +60,76 @@ def OpenSearchPage(*args, **kwargs):  # noqa: N802
     return Page(*args, **kwargs)
 
 
+def encode_cursor(sort_values):
+    payload = json.dumps(list(sort_values), separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        sort_values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except binascii.Error, UnicodeError, ValueError:
+        raise ValueError("Invalid cursor.") from None
+
+    if not isinstance(sort_values, list) or not sort_values:
+        raise ValueError("Invalid cursor.")
+
+    return sort_values
+
+
+class OpenSearchCursorPage:
+    """
+    A page of OpenSearch results which is walked using ``search_after`` rather
+    than ``from``/``size``, so fetching a deep page costs the same as fetching
+    the first one and is not limited to ``_OpenSearchWrapper.max_results``.
+    """
+
+    def __init__(self, query, cursor=None, items_per_page=20, url_maker=None):
+        self.cursor = cursor
+        self.items_per_page = items_per_page
+        self.url_maker = url_maker
+        self.best_guess = None
+
+        # Relevance ordered queries have no explicit sort, so we make the score
+        # the primary sort key to keep the same ordering as the paginated view.
+        sort = query.to_dict().get("sort", ["_score"])
+        query = query.sort(*sort, SEARCH_AFTER_TIEBREAKER)
+        if cursor:
+            query = query.extra(search_after=decode_cursor(cursor))
+
+        self.results = query[:items_per_page].execute()
+        self.items = list(self.results)
+
+        if hasattr(self.results, "suggest") and self.results.suggest.name_suggestion:
+            suggestion = self.results.suggest.name_suggestion[0]
+            if suggestion.options:
+                self.best_guess = suggestion.options[0]
+
+    @property
+    def collection(self):
+        # Mirror paginate.Page, so templates can look up ``best_guess`` the same
+        # way regardless of which kind of page they are given.
+        return self
+
+    @property
+    def item_count(self):
+        if isinstance(self.results.hits.total, int):
+            return self.results.hits.total
+        return self.results.hits.total["value"]
+
+    @property
+    def next_cursor(self):
+        if len(self.items) < self.items_per_page:
+            return None
+        return encode_cursor(self.items[-1].meta.sort)
+
+    @property
+    def next_url(self):
+        if self.url_maker is None or self.next_cursor is None:
+            return None
+        return self.url_maker(self.next_cursor)
+
+
 def paginate_url_factory(request, query_arg="page"):
     def make_url(page):
         query_seq = [
@@ -0,0 +1,53 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import threading
+import time
+
+
+class PeriodicallyRefreshed:
+    """
+    A base for the in-process copies of database state that each worker keeps,
+    which are refreshed at most once every ``refresh_interval`` seconds.
+
+    Subclasses set ``refresh_interval``, and implement ``_is_loaded``, which
+    says whether there is anything to carry on using while another thread
+    refreshes, and ``_refresh``, which does the actual work.
+    """
+
+    refresh_interval: float
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+
+    def _is_fresh(self, now):
+        return (
+            self._refreshed_at is not None
+            and now - self._refreshed_at < self.refresh_interval
+        )
+
+    def _is_loaded(self):
+        raise NotImplementedError
+
+    def _refresh(self, db, now):
+        raise NotImplementedError
+
+    def invalidate(self):
+        self._refreshed_at = None
+
+    def refresh(self, db):
+        if self._is_fresh(time.monotonic()):
+            return
+
+        # Only one thread at a time needs to refresh, others can carry on using
+        # what we already have, unless nothing has been loaded yet.
+        if not self._lock.acquire(blocking=not self._is_loaded()):
+            return
+        try:
+            now = time.monotonic()
+            if self._is_fresh(now):
+                return
+            self._refresh(db, now)
+            self._refreshed_at = now
+        finally:
+            self._lock.release()
@@ -3,7 +3,9 @@
 from __future__ import annotations
 
 import collections
+import random
 import re
+import time
 import typing
 
 from datetime import UTC, datetime, timedelta
@@ -11,6 +13,7 @@ from pathlib import Path
 
 import opensearchpy
 
+from packaging.utils import canonicalize_name
 from pyramid.exceptions import PredicateMismatch
 from pyramid.httpexceptions import (
     HTTPBadRequest,
@@ -59,10 +62,18 @@ from warehouse.packaging.models import (
 )
 from warehouse.rate_limiting import IRateLimiter
 from warehouse.rate_limiting.headers import record_rate_limit
-from warehouse.search.queries import SEARCH_FILTER_ORDER, get_opensearch_query
+from warehouse.search.queries import (
+    SEARCH_FILTER_ORDER,
+    get_opensearch_query,
+    get_query_tags,
+)
 from warehouse.utils.cors import _CORS_HEADERS
 from warehouse.utils.http import is_safe_url
-from warehouse.utils.paginate import OpenSearchPage, paginate_url_factory
+from warehouse.utils.paginate import (
+    OpenSearchCursorPage,
+    OpenSearchPage,
+    paginate_url_factory,
+)
 from warehouse.utils.row_counter import RowCount
 
 if typing.TYPE_CHECKING:
@@ -389,19 +400,7 @@ def list_classifiers(request):
     return {"classifiers": sorted_classifiers}
 
 
-@view_config(
-    route_name="search",
-    renderer="warehouse:templates/search/results.html",
-    decorator=[
-        origin_cache(
-            1 * 60 * 60,  # 1 hour
-            stale_if_error=1 * 24 * 60 * 60,  # 1 day
-            keys=["all-projects"],
-        )
-    ],
-    has_translations=True,
-)
-def search(request):
+def _check_search_ratelimit(request):
     ratelimiter = request.find_service(IRateLimiter, name="search", context=None)
     metrics = request.find_service(IMetricsService, context=None)
 
@@ -426,6 +425,10 @@ def search(request):
         raise HTTPTooManyRequests(message)
     metrics.increment("warehouse.search.ratelimiter.hit")
 
+
+def _search_query(request):
+    metrics = request.find_service(IMetricsService, context=None)
+
     querystring = request.params.get("q", "").replace("'", '"')
     # Bail early for really long queries before ES raises an error
     if len(querystring) > 1000:
@@ -435,22 +438,108 @@ def search(request):
     order = request.params.get("o", "")
     classifiers = request.params.getall("c")
     query = get_opensearch_query(request.opensearch, querystring, order, classifiers)
+    tags = get_query_tags(querystring, order, classifiers)
 
-    try:
-        page_num = int(request.params.get("page", 1))
-    except ValueError:
-        raise HTTPBadRequest("'page' must be an integer.")
+    return querystring, order, query, tags
+
+
+def _execute_search(request, query, tags, make_page):
+    metrics = request.find_service(IMetricsService, context=None)
 
+    start = time.monotonic()
     try:
-        page = OpenSearchPage(
-            query, page=page_num, url_maker=paginate_url_factory(request)
-        )
+        page = make_page()
     except opensearchpy.TransportError:
         metrics.increment("warehouse.views.search.error")
         raise HTTPServiceUnavailable
+    duration = (time.monotonic() - start) * 1000
+
+    # Both kinds of page expose the raw OpenSearch response, which tells us how
+    # long the cluster itself spent on the query, separately from our overhead.
+    response = page.collection.results
+    metrics.timing("warehouse.views.search.duration", duration, tags=tags)
+    metrics.timing("warehouse.views.search.took", response.took, tags=tags)
+    if response._shards.failed:
+        metrics.increment(
+            "warehouse.views.search.shard_failures", response._shards.failed, tags=tags
+        )
+    if response.timed_out:
+        metrics.increment("warehouse.views.search.timed_out", tags=tags)
+
+    settings = request.registry.settings
+    threshold = settings.get("warehouse.search.slow_query_threshold_ms")
+    sample_rate = settings.get("warehouse.search.slow_query_sample_rate", 1.0)
+    if (
+        threshold is not None
+        and duration >= threshold
+        and random.random() < sample_rate  # noqa: S311
+    ):
+        request.log.warning(
+            "Slow search query",
+            duration_ms=round(duration),
+            took_ms=response.took,
+            tags=tags,
+            query=query.to_dict(),
+        )
+
+    return page
+
+
+def _search_cursor_page(request, query, tags, items_per_page):
+    try:
+        return _execute_search(
+            request,
+            query,
+            tags,
+            lambda: OpenSearchCursorPage(
+                query,
+                cursor=request.params.get("cursor") or None,
+                items_per_page=items_per_page,
+                url_maker=paginate_url_factory(request, query_arg="cursor"),
+            ),
+        )
+    except ValueError:
+        raise HTTPBadRequest("'cursor' is invalid.")
+
+
+@view_config(
+    route_name="search",
+    renderer="warehouse:templates/search/results.html",
+    decorator=[
+        origin_cache(
+            1 * 60 * 60,  # 1 hour
+            stale_if_error=1 * 24 * 60 * 60,  # 1 day
+            keys=["all-projects"],
+        )
+    ],
+    has_translations=True,
+)
+def search(request):
+    _check_search_ratelimit(request)
+    querystring, order, query, tags = _search_query(request)
+
+    # Requests that carry a ``cursor`` parameter (even an empty one, to start
+    # from the first page) walk the results with ``search_after``, which isn't
+    # bound by the maximum number of results that ``page`` can reach.
+    if "cursor" in request.params:
+        page = _search_cursor_page(request, query, tags, items_per_page=20)
+    else:
+        try:
+            page_num = int(request.params.get("page", 1))
+        except ValueError:
+            raise HTTPBadRequest("'page' must be an integer.")
+
+        page = _execute_search(
+            request,
+            query,
+            tags,
+            lambda: OpenSearchPage(
+                query, page=page_num, url_maker=paginate_url_factory(request)
+            ),
+        )
 
-    if page.page_count and page_num > page.page_count:
-        raise HTTPNotFound
+        if page.page_count and page_num > page.page_count:
+            raise HTTPNotFound
 
     available_filters = collections.defaultdict(list)
 
@@ -523,6 +612,69 @@ def search(request):
     }
 
 
+@view_config(
+    route_name="search.json",
+    renderer="json",
+    decorator=[
+        origin_cache(
+            1 * 60 * 60,  # 1 hour
+            stale_if_error=1 * 24 * 60 * 60,  # 1 day
+            keys=["all-projects"],
+        )
+    ],
+)
+def search_json(request):
+    _check_search_ratelimit(request)
+    _, _, query, tags = _search_query(request)
+    page = _search_cursor_page(request, query, tags, items_per_page=100)
+
+    metrics = request.find_service(IMetricsService, context=None)
+    metrics.histogram("warehouse.views.search.results", page.item_count)
+
+    return {
+        "meta": {
+            "total": page.item_count,
+            "next_cursor": page.next_cursor,
+            "next": page.next_url,
+        },
+        "projects": [
+            {
+                "name": item.name,
+                "normalized_name": item.normalized_name,
+                "summary": item.summary,
+                "created": item.created.isoformat() if item.created else None,
+            }
+            for item in page.items
+        ],
+    }
+
+
+@view_config(
+    route_name="search.suggest",
+    renderer="json",
+    decorator=[
+        cache_control(5 * 60),  # 5 minutes
+        origin_cache(
+            1 * 60 * 60,  # 1 hour
+            stale_if_error=1 * 24 * 60 * 60,  # 1 day
+            keys=["all-projects"],
+        ),
+    ],
+)
+def search_suggest(request):
+    prefix = canonicalize_name(request.params.get("q", ""))
+    if not prefix:
+        return {"suggestions": []}
+    # Bail early for really long queries, the same as for search
+    if len(prefix) > 1000:
+        raise HTTPRequestEntityTooLarge("Query string too long.")
+
+    name_index = request.registry["search.name_index"]
+    name_index.refresh(request.db)
+
+    return {"suggestions": name_index.suggest(prefix)}
+
+
 @view_config(
     route_name="stats",
     renderer="warehouse:templates/pages/stats.html",